@@ -0,0 +1,307 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Shared-memory ring buffer for microphone PCM frames.
+
+The capture stage writes each frame once into a named POSIX shared-memory
+segment; wake-word, VAD and STT stages attach to the same segment and read the
+frames in place as NumPy views, so the always-on path neither copies nor
+serializes audio between stages. Consumers can live in other processes, or in
+other containers started with ``ipc: "service:ovos"`` (the ``ovos`` service is
+marked ``ipc: shareable`` in ``docker-compose.ai.yml``).
+
+Every slot carries a monotonically increasing sequence number. The writer
+zeroes a slot's sequence before overwriting it and publishes the new sequence
+afterwards (a seqlock), so a reader that fell more than ``capacity`` frames
+behind detects the overrun instead of reading torn audio.
+
+Usage::
+
+    writer = AudioRingWriter("ovos_mic", frame_samples=1024)
+    pcm = writer.reserve()        # writable int16 view of the next slot
+    pcm[:] = capture()            # fill in place
+    writer.commit()
+
+    reader = AudioRingReader("ovos_mic")
+    for frame in reader.frames():
+        engine.update(frame.pcm)  # zero-copy view into shared memory
+        ...
+
+    python audio_ring.py info ovos_mic
+"""
+
+import argparse
+import struct
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+MAGIC = b"OVOSPCM1"
+VERSION = 1
+# magic, version, sample_rate, channels, sample_width, frame_bytes, capacity,
+# write_seq
+HEADER = struct.Struct("<8sIIIIIIQ")
+HEADER_SIZE = 64
+WRITE_SEQ_OFFSET = HEADER.size - 8
+# sequence, capture timestamp
+SLOT_HEADER = struct.Struct("<Qd")
+ALIGNMENT = 64
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+class AudioRingError(Exception):
+    """Raised when a ring segment is missing, incompatible or misused."""
+
+
+class FrameOverwritten(AudioRingError):
+    """Raised when a requested frame has already been replaced by the writer."""
+
+
+@dataclass
+class Frame:
+    """One PCM frame viewed in place in shared memory."""
+
+    seq: int
+    timestamp: float
+    pcm: np.ndarray
+
+
+def _slot_stride(frame_bytes: int) -> int:
+    size = SLOT_HEADER.size + frame_bytes
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class _Ring:
+    """Common layout handling for writer and reader."""
+
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self._shm = shm
+        buf = shm.buf
+        (
+            magic,
+            version,
+            self.sample_rate,
+            self.channels,
+            self.sample_width,
+            self.frame_bytes,
+            self.capacity,
+            _,
+        ) = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise AudioRingError(f"{shm.name} is not an audio ring (v{VERSION})")
+        self.name = shm.name
+        self._stride = _slot_stride(self.frame_bytes)
+        self._dtype = SAMPLE_DTYPES[self.sample_width]
+        self._samples = self.frame_bytes // self.sample_width
+
+    @property
+    def frame_duration(self) -> float:
+        """Seconds of audio per frame."""
+        return self._samples / self.channels / self.sample_rate
+
+    def latest(self) -> int:
+        """Sequence number of the newest committed frame (0 when empty)."""
+        return struct.unpack_from("<Q", self._shm.buf, WRITE_SEQ_OFFSET)[0]
+
+    def _offset(self, seq: int) -> int:
+        return HEADER_SIZE + ((seq - 1) % self.capacity) * self._stride
+
+    def _slot_seq(self, seq: int) -> tuple[int, float]:
+        return SLOT_HEADER.unpack_from(self._shm.buf, self._offset(seq))
+
+    def _pcm_view(self, seq: int) -> np.ndarray:
+        return np.ndarray(
+            (self._samples,),
+            dtype=self._dtype,
+            buffer=self._shm.buf,
+            offset=self._offset(seq) + SLOT_HEADER.size,
+        )
+
+
+class AudioRingWriter(_Ring):
+    """Single producer that owns (creates and unlinks) the segment."""
+
+    def __init__(
+        self,
+        name: str,
+        frame_samples: int = 1024,
+        capacity: int = 512,
+        sample_rate: int = 16000,
+        channels: int = 1,
+        sample_width: int = 2,
+    ):
+        if sample_width not in SAMPLE_DTYPES:
+            raise AudioRingError(f"Unsupported sample width: {sample_width}")
+        frame_bytes = frame_samples * channels * sample_width
+        size = HEADER_SIZE + capacity * _slot_stride(frame_bytes)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # A previous capture process died without unlinking; take it over.
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        HEADER.pack_into(
+            shm.buf,
+            0,
+            MAGIC,
+            VERSION,
+            sample_rate,
+            channels,
+            sample_width,
+            frame_bytes,
+            capacity,
+            0,
+        )
+        super().__init__(shm)
+        self._seq = 0
+
+    def reserve(self) -> np.ndarray:
+        """Invalidate the next slot and return a writable view of its PCM."""
+        seq = self._seq + 1
+        SLOT_HEADER.pack_into(self._shm.buf, self._offset(seq), 0, 0.0)
+        return self._pcm_view(seq)
+
+    def commit(self, timestamp: float | None = None) -> int:
+        """Publish the reserved slot and return its sequence number."""
+        self._seq += 1
+        stamp = time.time() if timestamp is None else timestamp
+        SLOT_HEADER.pack_into(self._shm.buf, self._offset(self._seq), self._seq, stamp)
+        struct.pack_into("<Q", self._shm.buf, WRITE_SEQ_OFFSET, self._seq)
+        return self._seq
+
+    def write(self, pcm: bytes | np.ndarray, timestamp: float | None = None) -> int:
+        """Copy one frame into the ring; prefer ``reserve``/``commit`` in capture."""
+        view = self.reserve()
+        data = np.frombuffer(pcm, dtype=self._dtype) if isinstance(pcm, bytes) else pcm
+        if data.size != view.size:
+            raise AudioRingError(
+                f"Frame has {data.size} samples, ring expects {view.size}"
+            )
+        view[:] = data
+        return self.commit(timestamp)
+
+    def close(self) -> None:
+        """Detach and remove the segment."""
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class AudioRingReader(_Ring):
+    """Consumer attached to an existing ring; any number may attach."""
+
+    def __init__(self, name: str, start: str = "latest"):
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError as e:
+            raise AudioRingError(f"No audio ring named {name!r}") from e
+        # Readers must not unlink the writer's segment when they exit.
+        resource_tracker.unregister(shm._name, "shared_memory")
+        super().__init__(shm)
+        latest = self.latest()
+        self.next_seq = (
+            latest + 1 if start == "latest" else max(1, latest - self.capacity + 1)
+        )
+        self.dropped = 0
+
+    def is_valid(self, seq: int) -> bool:
+        """True while frame ``seq`` has not been overwritten.
+
+        Check this after processing a view to be sure the audio was stable.
+        """
+        return self._slot_seq(seq)[0] == seq
+
+    def view(self, seq: int) -> Frame:
+        """Return frame ``seq`` as a zero-copy view."""
+        slot_seq, timestamp = self._slot_seq(seq)
+        if slot_seq != seq:
+            raise FrameOverwritten(f"Frame {seq} is no longer in {self.name}")
+        return Frame(seq, timestamp, self._pcm_view(seq))
+
+    def read(self, seq: int) -> Frame:
+        """Return a private copy of frame ``seq``, validated after copying."""
+        frame = self.view(seq)
+        frame.pcm = frame.pcm.copy()
+        if not self.is_valid(seq):
+            raise FrameOverwritten(f"Frame {seq} was overwritten while copying")
+        return frame
+
+    def poll(self) -> Iterator[Frame]:
+        """Yield every frame committed since the last call, skipping overruns."""
+        latest = self.latest()
+        oldest = latest - self.capacity + 1
+        if self.next_seq < oldest:
+            self.dropped += oldest - self.next_seq
+            self.next_seq = oldest
+        while self.next_seq <= latest:
+            seq = self.next_seq
+            self.next_seq += 1
+            try:
+                yield self.view(seq)
+            except FrameOverwritten:
+                self.dropped += 1
+
+    def frames(self, timeout: float | None = None) -> Iterator[Frame]:
+        """Yield frames as they arrive; stop after ``timeout`` seconds idle."""
+        idle_since = time.monotonic()
+        while True:
+            got = False
+            for frame in self.poll():
+                got = True
+                yield frame
+            if got:
+                idle_since = time.monotonic()
+            elif timeout is not None and time.monotonic() - idle_since > timeout:
+                return
+            else:
+                time.sleep(self.frame_duration / 4)
+
+    def close(self) -> None:
+        """Detach from the segment; release all frame views first."""
+        self._shm.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Print the layout and write position of a ring."""
+    parser = argparse.ArgumentParser(description="Inspect a shared-memory audio ring")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info")
+    info.add_argument("name")
+    args = parser.parse_args(argv)
+
+    try:
+        reader = AudioRingReader(args.name)
+    except AudioRingError as e:
+        print(f"ERROR: {e}")
+        return 1
+    latest = reader.latest()
+    print(f"ring:         {reader.name}")
+    print(
+        f"format:       {reader.sample_rate} Hz, {reader.channels} ch, "
+        f"{reader.sample_width * 8}-bit"
+    )
+    print(
+        f"frame:        {reader.frame_bytes} bytes "
+        f"({reader.frame_duration * 1000:.1f} ms)"
+    )
+    print(
+        f"capacity:     {reader.capacity} frames "
+        f"({reader.capacity * reader.frame_duration:.1f} s)"
+    )
+    print(f"write seq:    {latest}")
+    if latest:
+        frame = reader.view(latest)
+        print(f"latest age:   {(time.time() - frame.timestamp) * 1000:.1f} ms")
+        del frame
+    reader.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,257 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Answer cache for ``common_query.openvoiceos`` keyed by normalized question.
+
+Factual questions ("how tall is Mount Everest") come back again and again,
+and each time every question-answering skill used to be asked. ``AnswerCache``
+stores the winning answer under a normalized form of the question:
+lowercase, no punctuation, contractions expanded and polite fillers dropped.
+"Hey Mycroft, what's the capital of France?" and "what is the capital of
+france" therefore share one entry.
+
+How long an answer stays valid depends on the skill that gave it. Weather
+goes stale in minutes, encyclopedic facts in weeks. TTLs are matched by
+substring of the skill id. They are read from ``answer_cache_ttls`` /
+``answer_cache_default_ttl`` in the ``common_query.openvoiceos`` app
+settings, falling back to ``DEFAULT_TTLS``. Answers below ``min_conf`` are
+never cached.
+
+Entries persist in ``ovos_config/data/common_query_answers.json``, bounded
+to ``max_entries`` by least recent use. Hit/miss counters (the same
+``CacheMetrics`` as the persona semantic cache) are emitted as
+``ovos.common_query.cache.metrics`` by ``common_query_fanout``.
+
+Usage::
+
+    python common_query_cache.py show
+    python common_query_cache.py forget "what's the weather"
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from semantic_cache import CacheMetrics, normalize_question
+from stack_config import DEFAULT_DATA_DIR, conf_path
+
+logger = logging.getLogger("common_query_cache")
+
+CACHE_PATH = DEFAULT_DATA_DIR / "common_query_answers.json"
+METRICS_MESSAGE = "ovos.common_query.cache.metrics"
+DAY = 24 * 3600
+# Substring of the skill id -> seconds; the first match wins.
+DEFAULT_TTLS = {
+    "weather": 15 * 60,
+    "news": 30 * 60,
+    "date-time": 0,
+    "wikipedia": 30 * DAY,
+    "wolfie": 7 * DAY,
+    "ddg": 7 * DAY,
+}
+DEFAULT_TTL = DAY
+CONTRACTIONS = {
+    "what's": "what is",
+    "who's": "who is",
+    "where's": "where is",
+    "when's": "when is",
+    "how's": "how is",
+    "what're": "what are",
+}
+FILLER = re.compile(
+    r"^(?:(?:hey )?mycroft |please |(?:can|could) you (?:tell me |say )?"
+    r"|do you know |tell me |i want to know )+"
+)
+
+
+class AnswerCacheError(Exception):
+    """Raised when the cache file or TTL settings cannot be read."""
+
+
+def question_key(phrase: str, lang: str = "en-us") -> str:
+    """Normalized question, prefixed with the language."""
+    words = [CONTRACTIONS.get(w, w) for w in normalize_question(phrase).split()]
+    text = FILLER.sub("", " ".join(words) + " ").strip()
+    text = re.sub(r" please$", "", text)
+    return f"{lang.lower()}:{text}"
+
+
+def settings_path() -> Path:
+    """``settings.json`` of the ``common_query.openvoiceos`` app."""
+    return conf_path().parent / "apps" / "common_query.openvoiceos" / "settings.json"
+
+
+def load_ttls(path: str | os.PathLike | None = None) -> tuple[dict[str, float], float]:
+    """Per-skill TTLs and the default TTL from the app settings."""
+    path = Path(path) if path else settings_path()
+    if not path.exists():
+        return dict(DEFAULT_TTLS), DEFAULT_TTL
+    try:
+        settings = json.loads(path.read_text("utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        raise AnswerCacheError(f"Cannot read {path}: {e}") from e
+    ttls = settings.get("answer_cache_ttls", DEFAULT_TTLS)
+    return dict(ttls), float(settings.get("answer_cache_default_ttl", DEFAULT_TTL))
+
+
+@dataclass
+class CachedAnswer:
+    """An answer and where it came from."""
+
+    skill_id: str
+    answer: str
+    conf: float
+    created_at: float
+    expires_at: float
+    callback_data: dict[str, Any] = field(default_factory=dict)
+    hits: int = 0
+
+
+class AnswerCache:
+    """Normalized-question answer cache with per-skill TTLs."""
+
+    def __init__(
+        self,
+        ttls: dict[str, float] | None = None,
+        default_ttl: float = DEFAULT_TTL,
+        min_conf: float = 0.5,
+        max_entries: int = 5000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.min_conf = min_conf
+        self.max_entries = max_entries
+        self.clock = clock
+        self.metrics = CacheMetrics()
+        self._entries: OrderedDict[str, CachedAnswer] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ttl_for(self, skill_id: str) -> float:
+        """Seconds an answer from ``skill_id`` stays valid."""
+        for pattern, ttl in self.ttls.items():
+            if pattern in skill_id:
+                return float(ttl)
+        return self.default_ttl
+
+    def get(self, phrase: str, lang: str = "en-us") -> CachedAnswer | None:
+        """Fresh cached answer for ``phrase``, counting the lookup."""
+        key = question_key(phrase, lang)
+        with self._lock:
+            self.metrics.lookups += 1
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= self.clock():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.metrics.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.metrics.hits += 1
+            return entry
+
+    def put(
+        self,
+        phrase: str,
+        lang: str,
+        skill_id: str,
+        answer: str,
+        conf: float,
+        callback_data: dict[str, Any] | None = None,
+    ) -> bool:
+        """Cache an answer; return False if it is not worth caching."""
+        ttl = self.ttl_for(skill_id)
+        if conf < self.min_conf or ttl <= 0 or not answer:
+            return False
+        now = self.clock()
+        with self._lock:
+            self._entries[question_key(phrase, lang)] = CachedAnswer(
+                skill_id, answer, conf, now, now + ttl, callback_data or {}
+            )
+            self._entries.move_to_end(question_key(phrase, lang))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def forget(self, phrase: str, lang: str = "en-us") -> bool:
+        """Drop the entry for ``phrase``; return True if there was one."""
+        with self._lock:
+            return self._entries.pop(question_key(phrase, lang), None) is not None
+
+    def entries(self) -> list[tuple[str, CachedAnswer]]:
+        """Unexpired entries, least recently used first."""
+        now = self.clock()
+        with self._lock:
+            return [(k, e) for k, e in self._entries.items() if e.expires_at > now]
+
+    def save(self, path: str | os.PathLike = CACHE_PATH) -> None:
+        """Persist unexpired entries atomically."""
+        data = {key: asdict(entry) for key, entry in self.entries()}
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data), "utf-8")
+        os.replace(tmp, path)
+
+    def load(self, path: str | os.PathLike = CACHE_PATH) -> None:
+        """Restore what ``save`` wrote, skipping entries that expired since."""
+        try:
+            data = json.loads(Path(path).read_text("utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            raise AnswerCacheError(f"Cannot read {path}: {e}") from e
+        now = self.clock()
+        with self._lock:
+            for key, saved in data.items():
+                entry = CachedAnswer(**saved)
+                if entry.expires_at > now:
+                    self._entries[key] = entry
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Common query answer cache")
+    parser.add_argument("--cache", type=Path, default=CACHE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("show", help="list cached answers")
+    forget = sub.add_parser("forget", help="drop the answer to a question")
+    forget.add_argument("question")
+    forget.add_argument("--lang", default="en-us")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    cache = AnswerCache()
+    try:
+        if args.cache.exists():
+            cache.load(args.cache)
+        if args.command == "forget":
+            if not cache.forget(args.question, args.lang):
+                print("not cached")
+                return 1
+            cache.save(args.cache)
+            return 0
+    except AnswerCacheError as e:
+        logger.error(str(e))
+        return 1
+    now = time.time()
+    for key, entry in cache.entries():
+        left = (entry.expires_at - now) / 3600
+        print(f"{key:<50} {entry.skill_id:<35} {left:>7.1f} h  {entry.hits:>4} hits")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,522 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Deadline-bounded common query fan-out with per-skill latency tracking.
+
+``common_query.openvoiceos`` broadcasts ``question:query`` and every
+question-answering skill replies on ``question:query.response``: first
+``{"searching": true}``, later an answer with a confidence ``conf`` (or
+``{"searching": false}`` for no answer). Waiting for every skill lets one
+slow web lookup or LLM fallback hold up the whole answer.
+
+``CommonQueryFanout`` runs the same protocol with three exits, whichever
+comes first:
+
+* ``confident`` - an answer with ``conf >= early_conf`` arrived,
+* ``complete`` - every skill that announced itself has answered, except
+  demoted skills, which are not waited for,
+* ``deadline`` - ``deadline`` seconds passed.
+
+The best answer then gets ``question:action`` (the skill speaks it) and
+``ovos.common_query.answer`` reports the result. Late responses still
+count towards latency statistics. ``LatencyBook`` keeps recent latencies
+and timeouts per skill in ``ovos_config/data/common_query_stats.json``. A
+skill whose p90 latency exceeds the deadline, or which times out in at least
+half of its recent queries, is demoted. It recovers once it answers in time
+again.
+
+Questions enter through ``ovos.common_query.ask`` ``{"phrase", "lang"}``, so
+the persona or a fallback skill can route questions here instead of through
+the stock pipeline. With an ``AnswerCache`` (``common_query_cache``) a
+repeated question is spoken from the cache without asking any skill, and
+hit/miss counters follow every question as
+``ovos.common_query.cache.metrics``.
+
+Usage (inside the ``ovos`` container or any host that reaches the bus)::
+
+    python common_query_fanout.py run --deadline 3 --early-conf 0.8
+    python common_query_fanout.py run --no-cache
+    python common_query_fanout.py stats
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from common_query_cache import (
+    CACHE_PATH,
+    METRICS_MESSAGE,
+    AnswerCache,
+    AnswerCacheError,
+    load_ttls,
+)
+from stack_config import DEFAULT_DATA_DIR, bus_settings
+
+try:
+    from ovos_bus_client import Message, MessageBusClient
+except ImportError:
+    Message = MessageBusClient = None
+
+logger = logging.getLogger("common_query_fanout")
+
+QUERY_MESSAGE = "question:query"
+RESPONSE_MESSAGE = "question:query.response"
+ACTION_MESSAGE = "question:action"
+ASK_MESSAGE = "ovos.common_query.ask"
+ANSWER_MESSAGE = "ovos.common_query.answer"
+SPEAK_MESSAGE = "speak"
+STATS_PATH = DEFAULT_DATA_DIR / "common_query_stats.json"
+DEFAULT_DEADLINE = 3.0
+DEFAULT_EARLY_CONF = 0.8
+# Skills announce ``searching`` within a few ms; wait this long before
+# treating the set of announced skills as complete.
+ANNOUNCE_WINDOW = 0.25
+# Late answers within this time after a round closes still update stats.
+LATE_WINDOW = 15.0
+
+
+class FanoutError(Exception):
+    """Raised when the bus client is missing or statistics are unreadable."""
+
+
+@dataclass
+class Answer:
+    """One skill's answer to a question."""
+
+    skill_id: str
+    answer: str
+    conf: float
+    latency: float
+    callback_data: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class SkillStats:
+    """Recent latencies and timeouts of one skill."""
+
+    latencies: deque = field(default_factory=lambda: deque(maxlen=50))
+    outcomes: deque = field(default_factory=lambda: deque(maxlen=20))
+
+    def record(self, latency: float) -> None:
+        """Add a response that arrived before the round closed."""
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+
+    def record_late(self, latency: float, on_time: bool | None = None) -> None:
+        """Add the latency of an answer that arrived after the round closed.
+
+        ``on_time`` is None when the answer was already counted as a timeout;
+        otherwise the round ended early and it says whether the answer would
+        have made the deadline, so demoted skills can earn their way back.
+        """
+        self.latencies.append(latency)
+        if on_time is not None:
+            self.outcomes.append(on_time)
+
+    def record_timeout(self) -> None:
+        """Count a query the skill did not answer by the deadline."""
+        self.outcomes.append(False)
+
+    @property
+    def p90(self) -> float | None:
+        """90th percentile latency in seconds."""
+        return float(np.percentile(self.latencies, 90)) if self.latencies else None
+
+    @property
+    def timeout_rate(self) -> float:
+        """Fraction of recent queries not answered in time."""
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class LatencyBook:
+    """Per-skill latency statistics and the demotion rule."""
+
+    def __init__(self, deadline: float = DEFAULT_DEADLINE, min_samples: int = 5):
+        self.deadline = deadline
+        self.min_samples = min_samples
+        self.skills: dict[str, SkillStats] = {}
+        self._lock = threading.Lock()
+
+    def stats(self, skill_id: str) -> SkillStats:
+        """Statistics of ``skill_id``, created on first use."""
+        with self._lock:
+            return self.skills.setdefault(skill_id, SkillStats())
+
+    def demoted(self, skill_id: str) -> bool:
+        """True if queries should not wait for ``skill_id``."""
+        stats = self.skills.get(skill_id)
+        if stats is None or len(stats.outcomes) < self.min_samples:
+            return False
+        p90 = stats.p90
+        return stats.timeout_rate >= 0.5 or (p90 is not None and p90 > self.deadline)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Summary per skill, for the bus and the ``stats`` command."""
+        with self._lock:
+            items = list(self.skills.items())
+        return {
+            skill_id: {
+                "p90": None if stats.p90 is None else round(stats.p90, 3),
+                "timeout_rate": round(stats.timeout_rate, 2),
+                "samples": len(stats.outcomes),
+                "demoted": self.demoted(skill_id),
+            }
+            for skill_id, stats in items
+        }
+
+    def save(self, path: str | os.PathLike = STATS_PATH) -> None:
+        """Persist recent latencies and outcomes."""
+        with self._lock:
+            data = {
+                skill_id: {
+                    "latencies": list(stats.latencies),
+                    "outcomes": list(stats.outcomes),
+                }
+                for skill_id, stats in self.skills.items()
+            }
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(data), "utf-8")
+
+    def load(self, path: str | os.PathLike = STATS_PATH) -> None:
+        """Restore what ``save`` wrote."""
+        try:
+            data = json.loads(Path(path).read_text("utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            raise FanoutError(f"Cannot read {path}: {e}") from e
+        for skill_id, saved in data.items():
+            stats = self.stats(skill_id)
+            stats.latencies.extend(saved.get("latencies", []))
+            stats.outcomes.extend(saved.get("outcomes", []))
+
+
+class QueryRound:
+    """Responses to one question, collected until one of the exits fires."""
+
+    def __init__(
+        self,
+        phrase: str,
+        book: LatencyBook,
+        deadline: float,
+        early_conf: float,
+        announce_window: float = ANNOUNCE_WINDOW,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.phrase = phrase
+        self.book = book
+        self.deadline = deadline
+        self.early_conf = early_conf
+        self.announce_window = announce_window
+        self.clock = clock
+        self.started = clock()
+        self.searching: set[str] = set()
+        self.answered: set[str] = set()
+        self.answers: list[Answer] = []
+        self.timed_out: set[str] = set()
+        self.reason = ""
+        self.closed = False
+        self._changed = threading.Condition()
+
+    def on_response(self, data: dict[str, Any]) -> None:
+        """Handle one ``question:query.response`` for this phrase."""
+        skill_id = data.get("skill_id")
+        if not skill_id:
+            return
+        latency = self.clock() - self.started
+        with self._changed:
+            if data.get("searching"):
+                self.searching.add(skill_id)
+                self._changed.notify_all()
+                return
+            if skill_id in self.answered:
+                return
+            self.answered.add(skill_id)
+            in_time = not self.closed
+            counted = skill_id in self.timed_out
+            if in_time and data.get("answer"):
+                self.answers.append(
+                    Answer(
+                        skill_id,
+                        data["answer"],
+                        float(data.get("conf", 0.0)),
+                        latency,
+                        data.get("callback_data") or {},
+                    )
+                )
+            self._changed.notify_all()
+        if in_time:
+            self.book.stats(skill_id).record(latency)
+        else:
+            on_time = None if counted else latency <= self.deadline
+            self.book.stats(skill_id).record_late(latency, on_time)
+
+    def _exit(self) -> str:
+        if any(a.conf >= self.early_conf for a in self.answers):
+            return "confident"
+        elapsed = self.clock() - self.started
+        if elapsed >= self.deadline:
+            return "deadline"
+        if elapsed >= self.announce_window and self.searching:
+            waiting = {
+                skill_id
+                for skill_id in self.searching - self.answered
+                if not self.book.demoted(skill_id)
+            }
+            if not waiting:
+                return "complete"
+        return ""
+
+    def wait(self) -> Answer | None:
+        """Block until an exit fires; return the best answer in time."""
+        with self._changed:
+            while not (reason := self._exit()):
+                elapsed = self.clock() - self.started
+                if elapsed < self.announce_window:
+                    remaining = self.announce_window - elapsed
+                else:
+                    remaining = self.deadline - elapsed
+                self._changed.wait(max(remaining, 0.001))
+            self.reason = reason
+            self.closed = True
+            # After an early exit the skills left are not late yet; their
+            # answers are scored against the deadline when they arrive.
+            if self.clock() - self.started >= self.deadline:
+                self.timed_out = self.searching - self.answered
+        for skill_id in self.timed_out:
+            self.book.stats(skill_id).record_timeout()
+        return max(self.answers, key=lambda a: a.conf, default=None)
+
+
+class CommonQueryFanout:
+    """Runs common query rounds over the bus."""
+
+    def __init__(
+        self,
+        send: Callable[[str, dict[str, Any]], None],
+        book: LatencyBook | None = None,
+        deadline: float = DEFAULT_DEADLINE,
+        early_conf: float = DEFAULT_EARLY_CONF,
+        announce_window: float = ANNOUNCE_WINDOW,
+        clock: Callable[[], float] = time.monotonic,
+        cache: AnswerCache | None = None,
+    ):
+        self.send = send
+        self.book = book or LatencyBook(deadline)
+        self.cache = cache
+        self.deadline = deadline
+        self.early_conf = early_conf
+        self.announce_window = announce_window
+        self.clock = clock
+        self._rounds: dict[str, QueryRound] = {}
+        self._lock = threading.Lock()
+        self._worker = ThreadPoolExecutor(4, thread_name_prefix="common-query")
+
+    def _expire(self) -> None:
+        now = self.clock()
+        for phrase, query in list(self._rounds.items()):
+            if query.closed and now - query.started > LATE_WINDOW:
+                del self._rounds[phrase]
+
+    def _cached(self, phrase: str, lang: str) -> Answer | None:
+        started = self.clock()
+        hit = self.cache.get(phrase, lang)
+        elapsed = self.clock() - started
+        self.cache.metrics.lookup_seconds += elapsed
+        if hit is None:
+            return None
+        self.send(SPEAK_MESSAGE, {"utterance": hit.answer, "lang": lang})
+        self.send(
+            ANSWER_MESSAGE,
+            {
+                "phrase": phrase,
+                "skill_id": hit.skill_id,
+                "answer": hit.answer,
+                "conf": hit.conf,
+                "reason": "cached",
+                "seconds": round(elapsed, 3),
+                "skipped": [],
+            },
+        )
+        logger.info(f"{phrase!r}: cached answer from {hit.skill_id}")
+        return Answer(hit.skill_id, hit.answer, hit.conf, elapsed, hit.callback_data)
+
+    def ask(self, phrase: str, lang: str = "en-us") -> Answer | None:
+        """Ask every skill, or the cache first; return the winning answer."""
+        if self.cache is not None:
+            cached = self._cached(phrase, lang)
+            self.send(METRICS_MESSAGE, self.cache.metrics.snapshot())
+            if cached is not None:
+                return cached
+        query = QueryRound(
+            phrase,
+            self.book,
+            self.deadline,
+            self.early_conf,
+            self.announce_window,
+            self.clock,
+        )
+        with self._lock:
+            self._expire()
+            self._rounds[phrase] = query
+        self.send(QUERY_MESSAGE, {"phrase": phrase, "lang": lang})
+        best = query.wait()
+        elapsed = self.clock() - query.started
+        if best is not None:
+            self.send(
+                ACTION_MESSAGE,
+                {
+                    "skill_id": best.skill_id,
+                    "phrase": phrase,
+                    "callback_data": best.callback_data,
+                },
+            )
+        self.send(
+            ANSWER_MESSAGE,
+            {
+                "phrase": phrase,
+                "skill_id": best.skill_id if best else None,
+                "answer": best.answer if best else None,
+                "conf": best.conf if best else 0.0,
+                "reason": query.reason,
+                "seconds": round(elapsed, 3),
+                "skipped": sorted(
+                    s for s in query.searching - query.answered if self.book.demoted(s)
+                ),
+            },
+        )
+        logger.info(
+            f"{phrase!r}: {query.reason} after {elapsed:.2f}s, "
+            f"winner {best.skill_id if best else None}"
+        )
+        if self.cache is not None:
+            self.cache.metrics.generation_seconds += elapsed
+            if best is not None:
+                self.cache.put(
+                    phrase,
+                    lang,
+                    best.skill_id,
+                    best.answer,
+                    best.conf,
+                    best.callback_data,
+                )
+        return best
+
+    def on_response(self, message: Any) -> None:
+        """Route a ``question:query.response`` to its round."""
+        data = message.data
+        with self._lock:
+            query = self._rounds.get(data.get("phrase", ""))
+        if query is not None:
+            query.on_response(data)
+
+    def on_ask(self, message: Any) -> None:
+        """Answer ``ovos.common_query.ask`` off the bus thread."""
+        self._worker.submit(
+            self.ask, message.data["phrase"], message.data.get("lang", "en-us")
+        )
+
+    def attach(self, bus: Any) -> None:
+        """Subscribe to responses and ask requests on an ``ovos_bus_client`` bus."""
+        bus.on(RESPONSE_MESSAGE, self.on_response)
+        bus.on(ASK_MESSAGE, self.on_ask)
+
+
+def format_stats(snapshot: dict[str, dict[str, Any]]) -> str:
+    """Per-skill statistics as a table."""
+    lines = [f"{'skill':<40} {'p90 s':>7} {'timeouts':>8} {'n':>4} demoted"]
+    for skill_id, stats in sorted(snapshot.items()):
+        p90 = "-" if stats["p90"] is None else f"{stats['p90']:.2f}"
+        lines.append(
+            f"{skill_id:<40} {p90:>7} {stats['timeout_rate']:>8.0%} "
+            f"{stats['samples']:>4} {'yes' if stats['demoted'] else 'no'}"
+        )
+    return "\n".join(lines)
+
+
+def run(
+    fanout: CommonQueryFanout,
+    stats_path: Path,
+    interval: float = 60.0,
+    cache_path: Path = CACHE_PATH,
+) -> None:
+    """Serve ``ovos.common_query.ask``; save statistics and answers periodically."""
+    if MessageBusClient is None:
+        raise FanoutError("ovos-bus-client is required; run inside the ovos container")
+    if stats_path.exists():
+        fanout.book.load(stats_path)
+    if fanout.cache is not None and cache_path.exists():
+        fanout.cache.load(cache_path)
+    bus = MessageBusClient(**bus_settings())
+    fanout.send = lambda msg_type, data: bus.emit(Message(msg_type, data))
+    fanout.attach(bus)
+    bus.run_in_thread()
+    logger.info(f"Common query fan-out ready (deadline {fanout.deadline}s)")
+    try:
+        while True:
+            time.sleep(interval)
+            _save(fanout, stats_path, cache_path)
+    finally:
+        _save(fanout, stats_path, cache_path)
+
+
+def _save(fanout: CommonQueryFanout, stats_path: Path, cache_path: Path) -> None:
+    fanout.book.save(stats_path)
+    if fanout.cache is not None:
+        fanout.cache.save(cache_path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Common query fan-out")
+    parser.add_argument("--stats", type=Path, default=STATS_PATH)
+    parser.add_argument("--cache", type=Path, default=CACHE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="serve common queries on the bus")
+    run_cmd.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE)
+    run_cmd.add_argument("--early-conf", type=float, default=DEFAULT_EARLY_CONF)
+    run_cmd.add_argument(
+        "--no-cache", action="store_true", help="always ask every skill"
+    )
+    sub.add_parser("stats", help="print per-skill latency statistics")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        if args.command == "stats":
+            book = LatencyBook()
+            book.load(args.stats)
+            print(format_stats(book.snapshot()))
+            return 0
+        cache = None
+        if not args.no_cache:
+            ttls, default_ttl = load_ttls()
+            cache = AnswerCache(ttls, default_ttl)
+        fanout = CommonQueryFanout(
+            lambda msg_type, data: None,
+            LatencyBook(args.deadline),
+            deadline=args.deadline,
+            early_conf=args.early_conf,
+            cache=cache,
+        )
+        run(fanout, args.stats, cache_path=args.cache)
+    except (FanoutError, AnswerCacheError) as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
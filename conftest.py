@@ -0,0 +1,61 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Fakes shared by the test modules (``from conftest import FakeClock``)."""
+
+import threading
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+
+
+class FakeClock:
+    """Stand-in for ``time.monotonic``/``time.time`` that moves when told."""
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SimulatedSkills(ABC):
+    """Bus ``send`` that answers a fan-out query like skills would.
+
+    ``skills`` maps skill ids to ``(delay, ...)`` specs. Every skill is
+    announced at once and answers ``delay`` seconds later; subclasses say
+    how for their protocol.
+    """
+
+    query_message = ""
+
+    def __init__(self, skills):
+        self.skills = skills
+        self.sent = []
+        self.fanout = None
+
+    @abstractmethod
+    def announce(self, phrase, skill_id):
+        """Tell the fan-out that ``skill_id`` is handling ``phrase``."""
+
+    @abstractmethod
+    def answer(self, phrase, skill_id, spec):
+        """Response ``data`` of ``skill_id`` for ``phrase``."""
+
+    def __call__(self, msg_type, data):
+        self.sent.append((msg_type, data))
+        if msg_type != self.query_message:
+            return
+        for skill_id, spec in self.skills.items():
+            self.announce(data["phrase"], skill_id)
+            reply = SimpleNamespace(data=self.answer(data["phrase"], skill_id, spec))
+            timer = threading.Timer(spec[0], self.fanout.on_response, [reply])
+            timer.daemon = True
+            timer.start()
+
+    def of(self, msg_type):
+        return [data for sent_type, data in self.sent if sent_type == msg_type]
+
+
+def simulate(bus_class, fanout_class, skills, **kwargs):
+    """``(bus, fanout)`` with ``fanout_class`` sending through a new bus."""
+    bus = bus_class(skills)
+    bus.fanout = fanout_class(bus, announce_window=0.02, **kwargs)
+    return bus, bus.fanout
@@ -0,0 +1,416 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Bounded conversation memory for the persona with rolling summarization.
+
+An ``ollama run`` style chat (see ``ollama/history``) sends the whole
+conversation with every question, so prompt length and prefill time grow
+with every turn. ``ConversationMemory`` keeps the prompt bounded:
+
+* the last ``keep_turns`` exchanges stay verbatim,
+* older exchanges are folded into a rolling summary by a background worker,
+  so answering never waits for summarization,
+* durable facts (names, preferences, household details) extracted from the
+  folded exchanges go to the ``persona_facts`` collection in ``qdrant`` and
+  the most relevant ones are recalled for each question.
+
+The prompt is therefore at most: summary (``max_summary_chars``) + a few
+recalled facts + ``keep_turns`` exchanges + exchanges still waiting to be
+folded (capped at ``2 * fold_batch``) + the question.
+
+``replay`` feeds the questions of an ``ollama/history`` file through the
+memory and prints prompt size and Ollama's prefill counters per turn. ``chat``
+answers paraphrases of earlier questions from ``semantic_cache`` (namespaced
+by model and ``--namespace``) unless ``--no-cache`` is given.
+
+Usage::
+
+    python conversation_memory.py chat --system "You are a pirate."
+    python conversation_memory.py replay --history ollama/history --turns 20
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from embedding_cache import cached_embed
+from llm_backends import OllamaBackend
+from qdrant_store import QdrantStore
+from semantic_cache import SemanticCache
+from stack_config import DEFAULT_DATA_DIR, REPO_ROOT
+from stack_http import ServiceError
+from vector_mirror import mirrored_store
+
+logger = logging.getLogger("conversation_memory")
+
+FACTS_COLLECTION = "persona_facts"
+STATE_PATH = DEFAULT_DATA_DIR / "conversation_memory.json"
+HISTORY_PATH = REPO_ROOT / "ollama" / "history"
+
+SUMMARY_PROMPT = """Current summary of the conversation so far:
+{summary}
+
+Newer part of the conversation:
+{turns}
+
+Rewrite the summary so it also covers the newer part, in at most {words} words.
+Keep names, preferences, decisions and open questions. Reply with the summary only."""
+
+FACTS_PROMPT = """From this conversation, list durable facts about the user or
+their household (names, preferences, routines, devices) worth remembering for
+future conversations, one per line starting with "- ". Reply NONE if there are
+none.
+
+{turns}"""
+
+
+class ConversationError(Exception):
+    """Raised when the memory state file cannot be read or written."""
+
+
+@dataclass
+class Turn:
+    """One question and its answer."""
+
+    user: str
+    assistant: str
+    timestamp: float
+
+
+def format_turns(turns: list[Turn]) -> str:
+    """Render exchanges as ``User:``/``Assistant:`` lines."""
+    return "\n".join(f"User: {t.user}\nAssistant: {t.assistant}" for t in turns)
+
+
+def llm_summarizer(
+    generate: Callable[[str], str], words: int = 150
+) -> Callable[[str, list[Turn]], str]:
+    """Summarizer that asks the LLM to fold turns into the summary."""
+
+    def summarize(summary: str, turns: list[Turn]) -> str:
+        prompt = SUMMARY_PROMPT.format(
+            summary=summary or "(empty)", turns=format_turns(turns), words=words
+        )
+        return generate(prompt).strip()
+
+    return summarize
+
+
+def llm_fact_extractor(
+    generate: Callable[[str], str],
+) -> Callable[[list[Turn]], list[str]]:
+    """Extractor that asks the LLM for durable facts, one per line."""
+
+    def extract(turns: list[Turn]) -> list[str]:
+        reply = generate(FACTS_PROMPT.format(turns=format_turns(turns)))
+        return [
+            line.strip()[2:].strip()
+            for line in reply.splitlines()
+            if line.strip().startswith("- ") and line.strip()[2:].strip()
+        ]
+
+    return extract
+
+
+class FactStore:
+    """Long-term facts in Qdrant, one point per distinct fact."""
+
+    def __init__(
+        self,
+        embed: Callable[[str], list[float]],
+        store: QdrantStore,
+        namespace: str = "default",
+        collection: str = FACTS_COLLECTION,
+    ):
+        self.embed = embed
+        self.store = store
+        self.namespace = namespace
+        self.collection = collection
+        self._ready = False
+
+    def _ensure_collection(self, size: int) -> None:
+        if not self._ready:
+            self.store.ensure_collection(
+                self.collection, size, payload_indexes={"namespace": "keyword"}
+            )
+            self._ready = True
+
+    def remember(self, facts: list[str]) -> None:
+        """Store ``facts``; repeating a fact only refreshes its timestamp."""
+        points = []
+        for fact in facts:
+            vector = self.embed(fact)
+            self._ensure_collection(len(vector))
+            key = f"{self.namespace}:{fact.lower()}"
+            points.append(
+                {
+                    "id": str(uuid.uuid5(uuid.NAMESPACE_URL, key)),
+                    "vector": vector,
+                    "payload": {
+                        "namespace": self.namespace,
+                        "fact": fact,
+                        "created_at": time.time(),
+                    },
+                }
+            )
+        if points:
+            self.store.upsert(self.collection, points)
+
+    def recall(self, query: str, limit: int = 3, threshold: float = 0.5) -> list[str]:
+        """Facts most related to ``query``."""
+        vector = self.embed(query)
+        self._ensure_collection(len(vector))
+        results = self.store.search(
+            self.collection,
+            vector,
+            limit=limit,
+            score_threshold=threshold,
+            query_filter={
+                "must": [{"key": "namespace", "match": {"value": self.namespace}}]
+            },
+        )
+        return [result["payload"]["fact"] for result in results]
+
+
+class ConversationMemory:
+    """Recent turns verbatim, older turns summarized, facts in Qdrant."""
+
+    def __init__(
+        self,
+        summarize: Callable[[str, list[Turn]], str],
+        extract_facts: Callable[[list[Turn]], list[str]] | None = None,
+        facts: FactStore | None = None,
+        keep_turns: int = 6,
+        fold_batch: int = 4,
+        max_summary_chars: int = 1200,
+        recall_limit: int = 3,
+    ):
+        self.summarize = summarize
+        self.extract_facts = extract_facts
+        self.facts = facts
+        self.keep_turns = keep_turns
+        self.fold_batch = fold_batch
+        self.max_summary_chars = max_summary_chars
+        self.recall_limit = recall_limit
+        self.summary = ""
+        self.turns: list[Turn] = []
+        self._pending: list[Turn] = []
+        self._lock = threading.Lock()
+        self._worker = ThreadPoolExecutor(1, thread_name_prefix="memory-fold")
+        self._last_fold: Future | None = None
+        self.folds = 0
+        self.dropped = 0
+
+    def add_turn(self, user: str, assistant: str) -> None:
+        """Record an exchange; older ones are folded in the background."""
+        with self._lock:
+            self.turns.append(Turn(user, assistant, time.time()))
+            overflow = len(self.turns) - self.keep_turns
+            if overflow <= 0:
+                return
+            self._pending.extend(self.turns[:overflow])
+            del self.turns[:overflow]
+            limit = 2 * self.fold_batch
+            if len(self._pending) > limit:
+                # The summarizer is falling behind (or down): keep the prompt
+                # bounded by forgetting the oldest unfolded turns.
+                self.dropped += len(self._pending) - limit
+                del self._pending[: len(self._pending) - limit]
+                logger.warning("Summarizer behind; dropped unfolded turns")
+            ready = len(self._pending) >= self.fold_batch
+        if ready:
+            self._last_fold = self._worker.submit(self._fold)
+
+    def _fold(self) -> None:
+        with self._lock:
+            batch, summary = list(self._pending), self.summary
+        if not batch:
+            return
+        try:
+            new_summary = self.summarize(summary, batch)
+        except ServiceError as e:
+            logger.warning(f"Summarization failed; will retry with more turns: {e}")
+            return
+        with self._lock:
+            self.summary = new_summary[: self.max_summary_chars]
+            folded = {id(turn) for turn in batch}
+            self._pending = [t for t in self._pending if id(t) not in folded]
+            self.folds += 1
+        if self.extract_facts is not None and self.facts is not None:
+            try:
+                self.facts.remember(self.extract_facts(batch))
+            except ServiceError as e:
+                logger.warning(f"Storing long-term facts failed: {e}")
+
+    def wait_idle(self, timeout: float | None = None) -> None:
+        """Block until the last scheduled fold has finished."""
+        if self._last_fold is not None:
+            self._last_fold.result(timeout)
+
+    def build_prompt(self, question: str, volatile: str = "") -> str:
+        """Bounded prompt: summary, recent turns, then per-question context.
+
+        The summary and verbatim turns only change when a turn is added or a
+        batch is folded, so they come first and stay a reusable prefix for the
+        backend's prompt cache; recalled facts and ``volatile`` text (time,
+        device states) differ per question and go right before it.
+        """
+        facts: list[str] = []
+        if self.facts is not None and self.recall_limit:
+            try:
+                facts = self.facts.recall(question, self.recall_limit)
+            except ServiceError as e:
+                logger.warning(f"Fact recall failed: {e}")
+        with self._lock:
+            summary, recent = self.summary, self._pending + self.turns
+        parts = []
+        if summary:
+            parts.append(f"Summary of the earlier conversation:\n{summary}")
+        if recent:
+            parts.append(format_turns(recent))
+        if facts:
+            parts.append(
+                "Things you know about the user:\n"
+                + "\n".join(f"- {fact}" for fact in facts)
+            )
+        if volatile:
+            parts.append(volatile)
+        parts.append(f"User: {question}\nAssistant:")
+        return "\n\n".join(parts)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Summary and unfolded turns, for persistence."""
+        with self._lock:
+            return {
+                "summary": self.summary,
+                "turns": [asdict(t) for t in self._pending + self.turns],
+            }
+
+    def save(self, path: str | os.PathLike = STATE_PATH) -> None:
+        """Persist summary and recent turns."""
+        try:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            Path(path).write_text(json.dumps(self.to_dict(), indent=2), "utf-8")
+        except OSError as e:
+            raise ConversationError(f"Cannot write {path}: {e}") from e
+
+    def load(self, path: str | os.PathLike = STATE_PATH) -> None:
+        """Restore what ``save`` wrote; turns beyond ``keep_turns`` are folded."""
+        try:
+            data = json.loads(Path(path).read_text("utf-8"))
+        except OSError as e:
+            raise ConversationError(f"Cannot read {path}: {e}") from e
+        except json.JSONDecodeError as e:
+            raise ConversationError(f"{path} is not valid JSON: {e}") from e
+        self.summary = data.get("summary", "")
+        for turn in data.get("turns", []):
+            self.add_turn(turn["user"], turn["assistant"])
+
+
+def read_history(path: str | os.PathLike = HISTORY_PATH) -> list[str]:
+    """Questions from an ``ollama run`` history file, one per line."""
+    try:
+        lines = Path(path).read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError as e:
+        raise ConversationError(f"Cannot read {path}: {e}") from e
+    return [line.strip() for line in lines if line.strip()]
+
+
+def _make_memory(
+    backend: OllamaBackend, args: argparse.Namespace
+) -> ConversationMemory:
+    facts = None
+    if not args.no_facts:
+        facts = FactStore(
+            cached_embed(backend), mirrored_store(), namespace=args.namespace
+        )
+    return ConversationMemory(
+        llm_summarizer(backend.generate),
+        llm_fact_extractor(backend.generate),
+        facts,
+        keep_turns=args.keep_turns,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Bounded persona conversation")
+    parser.add_argument("--system", help="system prompt (persona)")
+    parser.add_argument("--keep-turns", type=int, default=6)
+    parser.add_argument("--namespace", default="default")
+    parser.add_argument("--no-facts", action="store_true", help="skip qdrant")
+    sub = parser.add_subparsers(dest="command", required=True)
+    chat = sub.add_parser("chat", help="interactive chat with bounded memory")
+    chat.add_argument("--state", type=Path, default=STATE_PATH)
+    chat.add_argument("--no-cache", action="store_true")
+    replay = sub.add_parser("replay", help="measure prompt size over a history")
+    replay.add_argument("--history", type=Path, default=HISTORY_PATH)
+    replay.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    backend = OllamaBackend()
+    memory = _make_memory(backend, args)
+    try:
+        if args.command == "replay":
+            print(f"{'turn':>4} {'chars':>6} {'prompt tok':>10} {'prefill ms':>10}")
+            for i, question in enumerate(read_history(args.history)[: args.turns]):
+                prompt = memory.build_prompt(question)
+                result = backend.generate_raw(prompt, args.system)
+                memory.add_turn(question, result.get("response", "").strip())
+                prefill = result.get("prompt_eval_duration", 0) / 1e6
+                print(
+                    f"{i + 1:>4} {len(prompt):>6} "
+                    f"{result.get('prompt_eval_count', 0):>10} {prefill:>10.0f}"
+                )
+            return 0
+        if args.state.exists():
+            memory.load(args.state)
+        cache = None
+        if not args.no_cache:
+            cache = SemanticCache(
+                cached_embed(backend),
+                mirrored_store(),
+                namespace=f"{backend.model}:{args.namespace}",
+            )
+
+        def generate(question: str) -> str:
+            return backend.generate(memory.build_prompt(question), args.system)
+
+        while True:
+            try:
+                question = input("> ").strip()
+            except EOFError:
+                break
+            if question in ("/bye", "exit"):
+                break
+            if question:
+                if cache is None:
+                    answer = generate(question)
+                else:
+                    answer = cache.answer(question, generate)
+                print(answer.strip())
+                memory.add_turn(question, answer.strip())
+        memory.wait_idle()
+        memory.save(args.state)
+    except (ConversationError, ServiceError) as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        if args.command == "chat":
+            memory.save(args.state)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
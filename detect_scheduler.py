@@ -0,0 +1,355 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Motion-gated object detection for CPU-only Frigate under a global budget.
+
+Frigate's motion detector is cheap (frame differencing on a small gray
+image); object detection on the CPU detector is not. Running detection on
+every camera all the time would saturate the host, which is why
+``detect: enabled: false`` ships in ``frigate/config/config.yaml``.
+``DetectScheduler`` keeps motion detection on for every camera and switches
+object detection per camera at runtime:
+
+* while a camera reports motion, and for ``hold`` seconds after, it runs
+  detection at its configured rate;
+* otherwise detection runs in short probes (``probe_for`` seconds every
+  ``probe_every``), a duty cycle that stands in for a low fps. Frigate cannot
+  change ``detect.fps`` without a restart, but it can toggle detection live;
+* every detecting camera costs its ``cost`` (CPU percent at full rate) and
+  the sum may not exceed ``budget``. Cameras with motion go first, by
+  ``priority`` and then most recent motion, and probes only fill what is
+  left. The detector processes' measured CPU (``/api/stats``) rescales all
+  costs, so a wrong estimate corrects itself.
+
+Motion state arrives and detect switches leave over Frigate's websocket
+(``/ws``, the MQTT topics without a broker): ``<camera>/motion`` ``ON/OFF``
+in, ``<camera>/detect/set`` and ``<camera>/motion/set`` out. Cameras and
+their detect resolution and fps come from ``/api/config``.
+
+Usage::
+
+    python detect_scheduler.py run --budget 60
+    python detect_scheduler.py run --budget 60 --cost front_door=35 \
+        --priority front_door=1
+    python detect_scheduler.py plan
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+import zlib
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from stack_config import service_url
+from stack_http import ServiceError, request_json
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+logger = logging.getLogger("detect_scheduler")
+
+DEFAULT_BUDGET = 60.0
+# CPU percent per megapixel of detect frames per second on the CPU detector.
+COST_PER_MEGAPIXEL_FPS = 5.0
+DEFAULT_HOLD = 20.0
+DEFAULT_PROBE_EVERY = 30.0
+DEFAULT_PROBE_FOR = 2.0
+
+
+class SchedulerError(Exception):
+    """Raised when Frigate cannot be reached or a camera setting is invalid."""
+
+
+@dataclass
+class CameraPolicy:
+    """How expensive one camera's detection is and how much it matters."""
+
+    name: str
+    cost: float
+    priority: int = 0
+    hold: float = DEFAULT_HOLD
+    probe_every: float = DEFAULT_PROBE_EVERY
+    probe_for: float = DEFAULT_PROBE_FOR
+
+
+@dataclass
+class CameraState:
+    """What the scheduler knows and decided about one camera."""
+
+    motion: bool = False
+    last_motion: float | None = None
+    detecting: bool | None = None  # None until the first decision is sent
+    mode: str = "idle"  # "motion", "probe" or "idle"
+
+
+def estimate_cost(width: int, height: int, fps: float) -> float:
+    """CPU percent of full-rate detection at ``width`` x ``height`` and ``fps``."""
+    return width * height / 1e6 * fps * COST_PER_MEGAPIXEL_FPS
+
+
+def policies_from_config(
+    config: dict[str, Any],
+    costs: dict[str, float] | None = None,
+    priorities: dict[str, int] | None = None,
+) -> list[CameraPolicy]:
+    """One policy per enabled camera in Frigate's ``/api/config``."""
+    costs, priorities = costs or {}, priorities or {}
+    policies = []
+    for name, camera in config.get("cameras", {}).items():
+        if not camera.get("enabled", True):
+            continue
+        detect = camera.get("detect") or {}
+        cost = costs.get(name) or estimate_cost(
+            detect.get("width") or 1280,
+            detect.get("height") or 720,
+            detect.get("fps") or 5,
+        )
+        policies.append(CameraPolicy(name, cost, priorities.get(name, 0)))
+    return policies
+
+
+class DetectScheduler:
+    """Decides which cameras run object detection."""
+
+    def __init__(
+        self,
+        cameras: Iterable[CameraPolicy],
+        publish: Callable[[str, str], None],
+        budget: float = DEFAULT_BUDGET,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.cameras = {camera.name: camera for camera in cameras}
+        self.publish = publish
+        self.budget = budget
+        self.clock = clock
+        self.cost_scale = 1.0
+        self.states = {name: CameraState() for name in self.cameras}
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Turn motion detection on everywhere; detection follows in ``tick``."""
+        for name in self.cameras:
+            self.publish(f"{name}/motion/set", "ON")
+        self.tick()
+
+    def on_motion(self, camera: str, active: bool) -> None:
+        """Record a ``<camera>/motion`` state change and reschedule."""
+        state = self.states.get(camera)
+        if state is None:
+            return
+        with self._lock:
+            state.motion = active
+            state.last_motion = self.clock()
+        self.tick()
+
+    def observe_cpu(self, percent: float, smoothing: float = 0.3) -> None:
+        """Rescale costs so estimated load tracks Frigate's measured CPU."""
+        with self._lock:
+            expected = sum(
+                self.cameras[name].cost
+                for name, state in self.states.items()
+                if state.detecting
+            )
+            if expected <= 0:
+                return
+            ratio = min(max(percent / expected, 0.25), 4.0)
+            self.cost_scale += smoothing * (ratio - self.cost_scale)
+
+    def _in_probe(self, camera: CameraPolicy, now: float) -> bool:
+        # Spread probes of different cameras over the cycle.
+        phase = zlib.crc32(camera.name.encode()) % 1000 / 1000 * camera.probe_every
+        return (now + phase) % camera.probe_every < camera.probe_for
+
+    def plan(self) -> dict[str, str]:
+        """Mode per camera for now: ``motion``, ``probe`` or ``idle``."""
+        now = self.clock()
+        with self._lock:
+            active, probing = [], []
+            for name, camera in self.cameras.items():
+                state = self.states[name]
+                recent = state.last_motion is not None and (
+                    state.motion or now - state.last_motion < camera.hold
+                )
+                if recent:
+                    active.append(camera)
+                elif self._in_probe(camera, now):
+                    probing.append(camera)
+            active.sort(
+                key=lambda c: (-c.priority, -(self.states[c.name].last_motion or 0))
+            )
+            probing.sort(key=lambda c: -c.priority)
+            left = self.budget
+            modes = {name: "idle" for name in self.cameras}
+            for mode, candidates in (("motion", active), ("probe", probing)):
+                for camera in candidates:
+                    cost = camera.cost * self.cost_scale
+                    if cost <= left:
+                        modes[camera.name] = mode
+                        left -= cost
+            return modes
+
+    def tick(self) -> dict[str, str]:
+        """Apply the current plan, publishing only detect switches that changed."""
+        modes = self.plan()
+        changes = []
+        with self._lock:
+            for name, mode in modes.items():
+                state = self.states[name]
+                detecting = mode != "idle"
+                if mode != state.mode and mode != "probe":
+                    logger.info(f"{name}: {state.mode} -> {mode}")
+                state.mode = mode
+                if detecting != state.detecting:
+                    state.detecting = detecting
+                    changes.append((f"{name}/detect/set", "ON" if detecting else "OFF"))
+        for topic, payload in changes:
+            self.publish(topic, payload)
+        return modes
+
+    def load(self) -> float:
+        """Estimated CPU percent of the cameras detecting now."""
+        with self._lock:
+            return sum(
+                self.cameras[name].cost * self.cost_scale
+                for name, state in self.states.items()
+                if state.detecting
+            )
+
+
+class FrigateSocket:
+    """Frigate's ``/ws`` websocket: MQTT topics as JSON messages."""
+
+    def __init__(self, base_url: str | None = None, timeout: float = 10.0):
+        if websocket is None:
+            raise SchedulerError("websocket-client is required")
+        url = (base_url or service_url("frigate")).replace("http", "ws", 1)
+        try:
+            self._ws = websocket.create_connection(f"{url}/ws", timeout=timeout)
+        except (OSError, websocket.WebSocketException) as e:
+            raise SchedulerError(f"Cannot connect to {url}/ws: {e}") from e
+        self._lock = threading.Lock()
+
+    def publish(self, topic: str, payload: str) -> None:
+        """Send one ``topic``/``payload`` pair."""
+        with self._lock:
+            self._ws.send(json.dumps({"topic": topic, "payload": payload}))
+
+    def messages(self) -> Iterable[tuple[str, Any]]:
+        """Yield ``(topic, payload)`` until the socket closes."""
+        while True:
+            try:
+                raw = self._ws.recv()
+            except websocket.WebSocketTimeoutException:
+                continue
+            except (OSError, websocket.WebSocketException) as e:
+                raise SchedulerError(f"Frigate websocket closed: {e}") from e
+            try:
+                message = json.loads(raw)
+            except (TypeError, json.JSONDecodeError):
+                continue
+            yield message.get("topic", ""), message.get("payload")
+
+
+def detector_cpu(stats: dict[str, Any]) -> float:
+    """CPU percent of all object detector processes in Frigate ``stats``.
+
+    Only detection is scheduled, so decoding, motion and recording (all in
+    ``frigate.full_system``) would skew the cost scale.
+    """
+    try:
+        return sum(
+            float(stats["cpu_usages"][str(detector["pid"])]["cpu"])
+            for detector in stats["detectors"].values()
+        )
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise ServiceError(f"No detector CPU usage in Frigate stats: {e}") from e
+
+
+def frigate_cpu(base_url: str | None = None) -> float:
+    """Detector CPU percent from Frigate's ``/api/stats``."""
+    base_url = (base_url or service_url("frigate")).rstrip("/")
+    return detector_cpu(request_json("GET", f"{base_url}/api/stats", None, 5.0))
+
+
+def run(scheduler: DetectScheduler, socket: FrigateSocket, stats_every: float) -> None:
+    """Follow motion, retick for probes and holds, and track measured CPU."""
+    stop = threading.Event()
+
+    def background() -> None:
+        last_stats = 0.0
+        while not stop.wait(1.0):
+            scheduler.tick()
+            if time.monotonic() - last_stats >= stats_every:
+                last_stats = time.monotonic()
+                try:
+                    scheduler.observe_cpu(frigate_cpu())
+                except ServiceError as e:
+                    logger.debug(f"No Frigate stats: {e}")
+
+    scheduler.start()
+    threading.Thread(target=background, daemon=True).start()
+    try:
+        for topic, payload in socket.messages():
+            camera, _, kind = topic.partition("/")
+            if kind == "motion":
+                scheduler.on_motion(camera, payload == "ON")
+    finally:
+        stop.set()
+
+
+def _pairs(values: list[str], kind: type) -> dict[str, Any]:
+    try:
+        return {
+            name: kind(value)
+            for name, value in (item.split("=", 1) for item in values or [])
+        }
+    except ValueError as e:
+        raise SchedulerError(f"Expected camera=value, got {values}: {e}") from e
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Motion-gated detection scheduler")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET)
+    parser.add_argument("--cost", action="append", help="camera=CPU percent")
+    parser.add_argument("--priority", action="append", help="camera=priority")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("plan", help="print cameras, costs and the budget")
+    run_cmd = sub.add_parser("run", help="drive Frigate detect switches")
+    run_cmd.add_argument("--stats-every", type=float, default=10.0)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        config = request_json("GET", f"{service_url('frigate')}/api/config", None, 10.0)
+        policies = policies_from_config(
+            config, _pairs(args.cost, float), _pairs(args.priority, int)
+        )
+        if args.command == "plan":
+            for policy in policies:
+                print(
+                    f"{policy.name:<24} {policy.cost:6.1f}% priority {policy.priority}"
+                )
+            total = sum(policy.cost for policy in policies)
+            print(f"{'all cameras':<24} {total:6.1f}% of a {args.budget:.0f}% budget")
+            return 0
+        socket = FrigateSocket()
+        scheduler = DetectScheduler(policies, socket.publish, args.budget)
+        run(scheduler, socket, args.stats_every)
+    except (SchedulerError, ServiceError) as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
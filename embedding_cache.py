@@ -0,0 +1,292 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Persistent on-disk cache of text embeddings.
+
+Entity names, repeated questions and common phrases pass through the memory
+and semantic-cache paths over and over; each pass used to cost an Ollama
+embeddings request. ``EmbeddingCache`` keeps one directory per embedding
+model under ``ovos_config/data/embedding_cache``:
+
+* ``vectors.f16`` - ``capacity x dim`` float16 matrix (half the size of
+  float32; cosine scores move by about 1e-3, well below any threshold used),
+* ``keys.u64`` - 64-bit BLAKE2b hash of the text in each row, 0 when empty,
+* ``used.f64`` - last access time of each row, for LRU eviction,
+* ``meta.json`` - ``dim``, ``capacity`` and the key ``layout``.
+
+The key array is itself the index: a text lives in one of the
+``PROBE_WINDOW`` slots from ``key % capacity`` on (open addressing with
+bounded linear probing), so a lookup reads at most that many keys plus one
+row, whatever the capacity. All three arrays are memory-mapped and shared by
+every process that opens the same directory. Writers serialize on an
+``flock`` of ``lock``; ``capacity`` is fixed when the directory is created
+from ``max_bytes``, and once a text's window is full its least recently used
+row is overwritten.
+
+Use ``cached_embed(backend)`` wherever ``backend.embed`` was passed before.
+
+Usage::
+
+    python embedding_cache.py stats
+    python embedding_cache.py clear --model nomic-embed-text
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from llm_backends import OllamaBackend
+from stack_config import DEFAULT_DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows hosts: in-process locking only
+    fcntl = None
+
+logger = logging.getLogger("embedding_cache")
+
+CACHE_ROOT = DEFAULT_DATA_DIR / "embedding_cache"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Slots a key may occupy after its home slot; bounds lookups and LRU choice.
+PROBE_WINDOW = 16
+LAYOUT = "probe"
+
+
+class EmbeddingCacheError(Exception):
+    """Raised when a cache directory is inconsistent with its use."""
+
+
+def text_key(text: str) -> int:
+    """Non-zero 64-bit hash of ``text`` (0 marks an empty row)."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class EmbeddingCache:
+    """Size-bounded, memory-mapped map from text to float16 vector."""
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.dim = 0
+        self.capacity = 0
+        self._vectors: np.memmap | None = None
+        self._keys: np.memmap | None = None
+        self._used: np.memmap | None = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / "lock", "a") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            yield
+
+    def _map(self, name: str, dtype: str, shape: tuple[int, ...]) -> np.memmap:
+        path = self.path / name
+        mode = "r+" if path.exists() else "w+"
+        return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+    def _open(self, dim: int | None = None) -> bool:
+        """Map the arrays, creating them for ``dim`` if needed."""
+        if self._keys is not None:
+            return True
+        meta_path = self.path / "meta.json"
+        if dim is None and not meta_path.exists():
+            return False
+        with self._file_lock():
+            if meta_path.exists():
+                meta = json.loads(meta_path.read_text("utf-8"))
+            else:
+                row_bytes = dim * 2 + 8 + 8
+                meta = {"dim": dim, "capacity": max(1, self.max_bytes // row_bytes)}
+            self.dim, self.capacity = meta["dim"], meta["capacity"]
+            self._vectors = self._map(
+                "vectors.f16", "float16", (self.capacity, self.dim)
+            )
+            self._keys = self._map("keys.u64", "uint64", (self.capacity,))
+            self._used = self._map("used.f64", "float64", (self.capacity,))
+            if meta.get("layout") != LAYOUT:
+                self._rehash()  # no-op for a new directory
+                meta["layout"] = LAYOUT
+                meta_path.write_text(json.dumps(meta), "utf-8")
+        return True
+
+    def _rehash(self) -> None:
+        """Move rows of an unindexed (scan-era) directory into their windows."""
+        occupied = np.flatnonzero(self._keys)
+        keys = np.array(self._keys[occupied])
+        vectors = np.array(self._vectors[occupied])
+        used = np.array(self._used[occupied])
+        self._keys[:] = 0
+        self._used[:] = 0
+        for i in np.argsort(used):  # oldest first, so the newest survive
+            slot = self._slot_for(int(keys[i]))
+            self._vectors[slot] = vectors[i]
+            self._keys[slot] = keys[i]
+            self._used[slot] = used[i]
+
+    def _window(self, key: int) -> np.ndarray:
+        home = key % self.capacity
+        return (home + np.arange(min(PROBE_WINDOW, self.capacity))) % self.capacity
+
+    def _find(self, key: int) -> int | None:
+        slots = self._window(key)
+        found = np.flatnonzero(self._keys[slots] == np.uint64(key))
+        return int(slots[found[0]]) if found.size else None
+
+    def _slot_for(self, key: int) -> int:
+        """Slot to write ``key`` to: its own, else a free one, else the LRU."""
+        slots = self._window(key)
+        keys = self._keys[slots]
+        for wanted in (np.uint64(key), np.uint64(0)):
+            found = np.flatnonzero(keys == wanted)
+            if found.size:
+                return int(slots[found[0]])
+        self.evictions += 1
+        return int(slots[np.argmin(self._used[slots])])
+
+    def get(self, text: str) -> list[float] | None:
+        """Cached vector of ``text``, or None."""
+        key = text_key(text)
+        with self._lock:
+            slot = self._find(key) if self._open() else None
+            if slot is None:
+                self.misses += 1
+                return None
+            vector = self._vectors[slot].astype(np.float32)
+            if self._keys[slot] != np.uint64(key):  # overwritten meanwhile
+                self.misses += 1
+                return None
+            self._used[slot] = self.clock()
+            self.hits += 1
+        return vector.tolist()
+
+    def put(self, text: str, vector: list[float]) -> None:
+        """Store ``vector`` for ``text``, evicting the LRU row when full."""
+        key = text_key(text)
+        with self._lock:
+            self._open(len(vector))
+            if len(vector) != self.dim:
+                raise EmbeddingCacheError(
+                    f"{self.path} holds {self.dim}-d vectors, got {len(vector)}"
+                )
+            with self._file_lock():
+                slot = self._slot_for(key)
+                self._keys[slot] = 0
+                self._vectors[slot] = np.asarray(vector, dtype=np.float16)
+                self._keys[slot] = np.uint64(key)
+                self._used[slot] = self.clock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            if not self._open():
+                return 0
+            return int(np.count_nonzero(self._keys))
+
+    def flush(self) -> None:
+        """Write dirty pages back to disk."""
+        with self._lock:
+            for array in (self._vectors, self._keys, self._used):
+                if array is not None:
+                    array.flush()
+
+    def stats(self) -> dict[str, int | float]:
+        """Entry count, capacity and this process's hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "capacity": self.capacity,
+            "dim": self.dim,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class CachedEmbedder:
+    """``embed(text)`` callable that consults an ``EmbeddingCache`` first."""
+
+    def __init__(self, embed: Callable[[str], list[float]], cache: EmbeddingCache):
+        self.embed = embed
+        self.cache = cache
+
+    def __call__(self, text: str) -> list[float]:
+        vector = self.cache.get(text)
+        if vector is not None:
+            return vector
+        vector = self.embed(text)
+        try:
+            self.cache.put(text, vector)
+        except (EmbeddingCacheError, OSError) as e:
+            logger.warning(f"Embedding not cached: {e}")
+        return vector
+
+
+def model_dir(model: str, root: str | os.PathLike = CACHE_ROOT) -> Path:
+    """Cache directory of embedding ``model``."""
+    return Path(root) / re.sub(r"[^\w.-]", "_", model)
+
+
+def cached_embed(
+    backend: OllamaBackend,
+    root: str | os.PathLike = CACHE_ROOT,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> CachedEmbedder:
+    """``backend.embed`` behind the shared cache of its embedding model."""
+    cache = EmbeddingCache(model_dir(backend.embed_model, root), max_bytes)
+    return CachedEmbedder(backend.embed, cache)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="On-disk embedding cache")
+    parser.add_argument("--root", type=Path, default=CACHE_ROOT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="entries and capacity per model")
+    clear = sub.add_parser("clear", help="delete a model's cache")
+    clear.add_argument("--model", default=OllamaBackend().embed_model)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    if args.command == "clear":
+        shutil.rmtree(model_dir(args.model, args.root), ignore_errors=True)
+        return 0
+    if not args.root.is_dir():
+        print("no embedding cache yet")
+        return 0
+    for path in sorted(p for p in args.root.iterdir() if p.is_dir()):
+        stats = EmbeddingCache(path).stats()
+        size = sum(f.stat().st_size for f in path.iterdir()) / 2**20
+        print(
+            f"{path.name:<30} {stats['entries']:>7}/{stats['capacity']:<7} "
+            f"dim {stats['dim']:<5} {size:.1f} MiB"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,468 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Bridge Frigate object events onto the OVOS messagebus without flooding it.
+
+Frigate reports a tracked object many times a second while it moves: every
+frame can change its score, box or zones. Forwarding that stream as-is would
+swamp ``ovos_messagebus`` during a detection burst. The bridge reduces it in
+three steps:
+
+1. ``Deduper`` keeps the last forwarded state of each tracked object and
+   passes an update on only when something a listener cares about changed:
+   the object is new, its label/sub-label or zones changed, its snapshot
+   became available, its score rose by ``score_step`` or it ended.
+2. ``EventBatcher`` coalesces pending updates per object (the newest state
+   wins, ``new``/``end`` are never lost) and emits them as one
+   ``frigate.events`` ``{"events": [...]}`` message of at most
+   ``max_batch`` events, at most ``rate`` messages per second.
+3. Backpressure: when ``max_pending`` objects are waiting, ``offer`` blocks
+   the source for up to ``block_timeout``. That stalls the MQTT network loop
+   (and with it the broker's TCP stream) or delays the next HTTP poll. Only
+   plain updates are dropped after that, and drops are counted.
+
+Events come from either source:
+
+* ``api`` (default) - polls Frigate's ``/api/events`` for objects that
+  started within ``lookback`` seconds or are still in progress, and fetches
+  objects the deduper still holds open by id so their end is not missed;
+  works with ``mqtt: enabled: false``.
+* ``mqtt`` - subscribes to ``frigate/events`` on a broker (``paho-mqtt``),
+  once ``mqtt`` is enabled in ``frigate/config/config.yaml``.
+
+The ``frigate_bridge`` Compose service runs the ``api`` source.
+
+Usage::
+
+    python frigate_bridge.py run --source api --rate 2 --max-batch 20
+    python frigate_bridge.py run --source mqtt --mqtt-host localhost
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any
+
+from stack_config import bus_settings, service_url
+from stack_http import ServiceError, request_json
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:
+    mqtt = None
+
+try:
+    from ovos_bus_client import Message, MessageBusClient
+except ImportError:
+    Message = MessageBusClient = None
+
+logger = logging.getLogger("frigate_bridge")
+
+EVENTS_MESSAGE = "frigate.events"
+MQTT_TOPIC = "frigate/events"
+DEFAULT_RATE = 2.0
+DEFAULT_MAX_BATCH = 20
+DEFAULT_MAX_PENDING = 200
+
+
+class BridgeError(Exception):
+    """Raised when an event source or the bus cannot be used."""
+
+
+@dataclass
+class ObjectEvent:
+    """The state of one tracked object at one point in time."""
+
+    id: str
+    camera: str
+    label: str
+    kind: str  # "new", "update" or "end"
+    score: float = 0.0
+    sub_label: str | None = None
+    zones: list[str] = field(default_factory=list)
+    start_time: float = 0.0
+    end_time: float | None = None
+    has_snapshot: bool = False
+
+
+def _sub_label(value: Any) -> str | None:
+    # Frigate 0.14+ sends [name, score]; older versions a plain string.
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value or None
+
+
+def from_mqtt(payload: dict[str, Any]) -> ObjectEvent:
+    """Event from a ``frigate/events`` MQTT message."""
+    after = payload["after"]
+    return ObjectEvent(
+        after["id"],
+        after["camera"],
+        after["label"],
+        payload.get("type", "update"),
+        float(after.get("top_score") or after.get("score") or 0.0),
+        _sub_label(after.get("sub_label")),
+        list(after.get("current_zones") or after.get("entered_zones") or []),
+        float(after.get("start_time") or 0.0),
+        after.get("end_time"),
+        bool(after.get("has_snapshot")),
+    )
+
+
+def from_api(event: dict[str, Any]) -> ObjectEvent:
+    """Event from one entry of Frigate's ``/api/events``."""
+    data = event.get("data") or {}
+    return ObjectEvent(
+        event["id"],
+        event["camera"],
+        event["label"],
+        "end" if event.get("end_time") else "update",
+        float(data.get("top_score") or event.get("top_score") or 0.0),
+        _sub_label(event.get("sub_label")),
+        list(event.get("zones") or []),
+        float(event.get("start_time") or 0.0),
+        event.get("end_time"),
+        bool(event.get("has_snapshot")),
+    )
+
+
+class Deduper:
+    """Drops updates that do not change what a listener would announce."""
+
+    def __init__(
+        self,
+        score_step: float = 0.1,
+        forget_after: float = 900.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.score_step = score_step
+        self.forget_after = forget_after
+        self.clock = clock
+        self.dropped = 0
+        self._seen: dict[str, tuple[ObjectEvent, float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def _changed(self, last: ObjectEvent, event: ObjectEvent) -> bool:
+        return (
+            event.label != last.label
+            or event.sub_label != last.sub_label
+            or sorted(event.zones) != sorted(last.zones)
+            or event.has_snapshot != last.has_snapshot
+            or event.score >= last.score + self.score_step
+        )
+
+    def significant(self, event: ObjectEvent) -> ObjectEvent | None:
+        """``event`` with its kind corrected, or None if it adds nothing."""
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            seen = self._seen.get(event.id)
+            if seen is None:
+                kind = "end" if event.kind == "end" else "new"
+            elif seen[0].kind == "end":
+                kind = None
+            elif event.kind == "end":
+                kind = "end"
+            elif self._changed(seen[0], event):
+                kind = "update"
+            else:
+                kind = None
+            if kind is None:
+                self.dropped += 1
+                self._seen[event.id] = (seen[0], now)  # still around
+                return None
+            event = replace(event, kind=kind)
+            self._seen[event.id] = (event, now)
+            return event
+
+    def open_ids(self) -> set[str]:
+        """Objects forwarded without their end yet."""
+        with self._lock:
+            return {
+                event_id
+                for event_id, (event, _) in self._seen.items()
+                if event.kind != "end"
+            }
+
+    def _expire(self, now: float) -> None:
+        for event_id, (_, at) in list(self._seen.items()):
+            if now - at > self.forget_after:
+                del self._seen[event_id]
+
+
+@dataclass
+class BatcherStats:
+    """Counters of what the batcher did with offered events."""
+
+    offered: int = 0
+    coalesced: int = 0
+    dropped: int = 0
+    batches: int = 0
+    sent: int = 0
+    blocked_seconds: float = 0.0
+
+
+class EventBatcher:
+    """Coalesces events per object and emits bounded batches at a bounded rate."""
+
+    def __init__(
+        self,
+        send: Callable[[str, dict[str, Any]], None],
+        max_batch: int = DEFAULT_MAX_BATCH,
+        rate: float = DEFAULT_RATE,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        block_timeout: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.send = send
+        self.max_batch = max_batch
+        self.interval = 1.0 / rate
+        self.max_pending = max_pending
+        self.block_timeout = block_timeout
+        self.clock = clock
+        self.stats = BatcherStats()
+        self._pending: OrderedDict[str, ObjectEvent] = OrderedDict()
+        self._changed = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def saturated(self) -> bool:
+        """True while sources should hold back."""
+        return len(self._pending) >= self.max_pending
+
+    def offer(self, event: ObjectEvent) -> bool:
+        """Queue ``event``; return False if it was dropped."""
+        with self._changed:
+            self.stats.offered += 1
+            pending = self._pending.get(event.id)
+            if pending is not None:
+                if pending.kind == "new" and event.kind == "update":
+                    event = replace(event, kind="new")
+                self._pending[event.id] = event
+                self.stats.coalesced += 1
+                return True
+            if self.saturated:
+                started = self.clock()
+                self._changed.wait_for(lambda: not self.saturated, self.block_timeout)
+                self.stats.blocked_seconds += self.clock() - started
+            if self.saturated:
+                if event.kind == "update":
+                    self.stats.dropped += 1
+                    return False
+                updates = [k for k, e in self._pending.items() if e.kind == "update"]
+                if updates:
+                    del self._pending[updates[0]]
+                    self.stats.dropped += 1
+            self._pending[event.id] = event
+            self._changed.notify_all()
+            return True
+
+    def flush(self) -> int:
+        """Send up to ``max_batch`` pending events as one message."""
+        with self._changed:
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                batch.append(self._pending.popitem(last=False)[1])
+            self._changed.notify_all()
+        if batch:
+            self.send(EVENTS_MESSAGE, {"events": [asdict(e) for e in batch]})
+            self.stats.batches += 1
+            self.stats.sent += len(batch)
+        return len(batch)
+
+    def run(self, stop: threading.Event) -> None:
+        """Flush at most once per ``interval`` until ``stop`` is set."""
+        while not stop.is_set():
+            with self._changed:
+                self._changed.wait_for(
+                    lambda: self._pending or stop.is_set(), self.interval
+                )
+            started = self.clock()
+            self.flush()
+            stop.wait(max(0.0, self.interval - (self.clock() - started)))
+        self.flush()
+
+
+class FrigateBridge:
+    """Feeds Frigate events through the deduper into the batcher."""
+
+    def __init__(self, deduper: Deduper, batcher: EventBatcher):
+        self.deduper = deduper
+        self.batcher = batcher
+
+    def handle(self, event: ObjectEvent) -> None:
+        """Forward ``event`` if it is significant."""
+        event = self.deduper.significant(event)
+        if event is not None:
+            self.batcher.offer(event)
+
+    def summary(self) -> str:
+        """Counters for the periodic log line."""
+        stats = self.batcher.stats
+        return (
+            f"{stats.sent} events in {stats.batches} messages, "
+            f"{self.deduper.dropped} duplicates, {stats.coalesced} coalesced, "
+            f"{stats.dropped} dropped, {stats.blocked_seconds:.1f}s blocked"
+        )
+
+
+def poll_events(
+    get: Callable[[str], Any], after: float, limit: int, open_ids: set[str]
+) -> list[dict[str, Any]]:
+    """Frigate events started after ``after``, in progress or in ``open_ids``.
+
+    ``get`` fetches an API path. Objects tracked for longer than the window
+    drop out of the ``after`` query; fetching the open ones by id is what
+    delivers their end.
+    """
+    events = {}
+    for query in (f"after={after:.0f}", "in_progress=1"):
+        for event in get(f"/api/events?{query}&limit={limit}") or []:
+            events[event["id"]] = event
+    for event_id in open_ids - events.keys():
+        try:
+            events[event_id] = get(f"/api/events/{event_id}")
+        except ServiceError as e:
+            logger.debug(f"Cannot fetch open event {event_id}: {e}")
+    return sorted(events.values(), key=lambda e: e.get("start_time") or 0.0)
+
+
+def poll_api(
+    bridge: FrigateBridge,
+    stop: threading.Event,
+    base_url: str | None = None,
+    interval: float = 2.0,
+    lookback: float = 600.0,
+    limit: int = 100,
+) -> None:
+    """Feed the bridge from Frigate's HTTP event API until ``stop`` is set.
+
+    ``lookback`` must stay below the deduper's ``forget_after`` so objects
+    that ended are not announced again. Objects that ended before the bridge
+    started are skipped.
+    """
+    base_url = (base_url or service_url("frigate")).rstrip("/")
+    started = time.time()
+    while not stop.is_set():
+        if bridge.batcher.saturated:
+            stop.wait(bridge.batcher.interval)
+            continue
+        try:
+            events = poll_events(
+                lambda path: request_json("GET", f"{base_url}{path}", None, 10.0),
+                time.time() - lookback,
+                limit,
+                bridge.deduper.open_ids(),
+            )
+        except ServiceError as e:
+            logger.warning(f"Frigate poll failed: {e}")
+            events = []
+        for event in events:  # oldest first
+            if not event.get("end_time") or event["end_time"] >= started:
+                bridge.handle(from_api(event))
+        stop.wait(interval)
+
+
+def subscribe_mqtt(
+    bridge: FrigateBridge,
+    stop: threading.Event,
+    host: str = "localhost",
+    port: int = 1883,
+    topic: str = MQTT_TOPIC,
+) -> None:
+    """Feed the bridge from Frigate's MQTT events until ``stop`` is set."""
+    if mqtt is None:
+        raise BridgeError("paho-mqtt is required for --source mqtt")
+
+    def on_message(client: Any, userdata: Any, message: Any) -> None:
+        try:
+            bridge.handle(from_mqtt(json.loads(message.payload)))
+        except (json.JSONDecodeError, KeyError) as e:
+            logger.warning(f"Bad Frigate event on {message.topic}: {e}")
+
+    if hasattr(mqtt, "CallbackAPIVersion"):  # paho-mqtt 2.x
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    else:
+        client = mqtt.Client()
+    client.on_message = on_message
+    try:
+        client.connect(host, port)
+    except OSError as e:
+        raise BridgeError(f"Cannot connect to MQTT broker {host}:{port}: {e}") from e
+    client.subscribe(topic)
+    client.loop_start()
+    try:
+        stop.wait()
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Frigate event bridge")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="forward Frigate events to the bus")
+    run_cmd.add_argument("--source", choices=("api", "mqtt"), default="api")
+    run_cmd.add_argument("--mqtt-host", default="localhost")
+    run_cmd.add_argument("--mqtt-port", type=int, default=1883)
+    run_cmd.add_argument("--poll-interval", type=float, default=2.0)
+    run_cmd.add_argument(
+        "--rate", type=float, default=DEFAULT_RATE, help="bus messages per second"
+    )
+    run_cmd.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    run_cmd.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    if MessageBusClient is None:
+        logger.error("ovos-bus-client is required")
+        return 1
+    bus = MessageBusClient(**bus_settings())
+    bus.run_in_thread()
+    bridge = FrigateBridge(
+        Deduper(),
+        EventBatcher(
+            lambda msg_type, data: bus.emit(Message(msg_type, data)),
+            max_batch=args.max_batch,
+            rate=args.rate,
+            max_pending=args.max_pending,
+        ),
+    )
+    stop = threading.Event()
+
+    def report() -> None:
+        while not stop.wait(60):
+            logger.info(bridge.summary())
+
+    threading.Thread(target=bridge.batcher.run, args=(stop,), daemon=True).start()
+    threading.Thread(target=report, daemon=True).start()
+    try:
+        if args.source == "mqtt":
+            subscribe_mqtt(bridge, stop, args.mqtt_host, args.mqtt_port)
+        else:
+            poll_api(bridge, stop, interval=args.poll_interval)
+    except BridgeError as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        logger.info(bridge.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
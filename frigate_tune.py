@@ -0,0 +1,523 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Size Frigate camera blocks to what this host can actually decode and detect.
+
+Hand-written ``cameras:`` blocks either ask for more than the CPU can do
+(dropped frames, ``detection_fps`` well under ``fps``) or far less (an idle
+CPU and missed objects). This tool measures and then writes the blocks:
+
+1. ``ffprobe`` reads codec, resolution and frame rate of each camera's
+   sample clip, main and optional sub stream. For an RTSP URL a clip of
+   ``--seconds`` is copied first (decoding a live stream would only ever
+   measure its real-time rate);
+2. ``ffmpeg -benchmark`` decodes each detect clip in software and with every
+   hardware decoder ``ffmpeg -hwaccels`` offers; the fastest working one
+   becomes the camera's ``hwaccel_args`` preset;
+3. detection throughput comes from timing the CPU detector model with
+   ``tflite_runtime`` when it is installed, else from Frigate's own
+   ``inference_speed`` in ``/api/stats``, else ``--inference-ms``.
+
+``plan_cameras`` then shares ``utilization`` of the measured decode and
+detect capacity across cameras. A camera with a sub stream detects on the
+sub stream and records the main one. Detect fps is capped at 5, the rate
+Frigate recommends, and the detect resolution steps down from 720p as the
+per-camera detection share shrinks.
+
+Frigate's bundled go2rtc pulls each RTSP stream once and restreams it at
+``rtsp://127.0.0.1:8554/<camera>`` (``<camera>_sub`` for a sub stream), so
+detect, record, Home Assistant and snapshotters share one camera session;
+``--no-restream`` points the inputs at the cameras directly. ``write``
+replaces only the ``go2rtc:`` and ``cameras:`` sections of
+``frigate/config/config.yaml``, keeping every other section as written.
+
+Usage::
+
+    python frigate_tune.py bench --camera front=rtsp://10.0.10.10:554/rtsp
+    python frigate_tune.py bench --camera front=clips/front_main.mp4,clips/front_sub.mp4
+    python frigate_tune.py write --camera front=rtsp://10.0.10.10:554/rtsp
+"""
+
+import argparse
+import json
+import logging
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from stack_config import REPO_ROOT, service_url
+from stack_http import ServiceError, request_json
+
+try:
+    import numpy as np
+    from tflite_runtime.interpreter import Interpreter
+except ImportError:
+    Interpreter = None
+
+logger = logging.getLogger("frigate_tune")
+
+CONFIG_PATH = REPO_ROOT / "frigate" / "config" / "config.yaml"
+MAX_DETECT_FPS = 5
+# go2rtc's RTSP server inside the Frigate container.
+RESTREAM_URL = "rtsp://127.0.0.1:8554/{name}"
+# Detect resolutions tried from the top, with the detections per second a
+# camera needs for each (more pixels → more and larger motion regions).
+DETECT_LADDER = [((1280, 720), 10.0), ((960, 540), 6.0), ((640, 360), 3.0)]
+# Frigate ffmpeg presets per ``ffmpeg -hwaccels`` name and codec.
+HWACCEL_PRESETS = {
+    "vaapi": {"h264": "preset-vaapi", "hevc": "preset-vaapi"},
+    "qsv": {"h264": "preset-intel-qsv-h264", "hevc": "preset-intel-qsv-h265"},
+    "cuda": {"h264": "preset-nvidia-h264", "hevc": "preset-nvidia-h265"},
+    "rkmpp": {"h264": "preset-rk-h264", "hevc": "preset-rk-h265"},
+}
+HWACCEL_DECODE_ARGS = {
+    "vaapi": ["-hwaccel", "vaapi", "-hwaccel_device", "/dev/dri/renderD128"],
+    "qsv": ["-hwaccel", "qsv"],
+    "cuda": ["-hwaccel", "cuda"],
+    "rkmpp": ["-hwaccel", "rkmpp"],
+}
+
+Runner = Callable[[list[str]], subprocess.CompletedProcess]
+
+
+class TuneError(Exception):
+    """Raised when a clip cannot be probed or decoded at all."""
+
+
+def _run(command: list[str], timeout: float = 300.0) -> subprocess.CompletedProcess:
+    try:
+        return subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.SubprocessError) as e:
+        raise TuneError(f"{command[0]} failed: {e}") from e
+
+
+@dataclass
+class StreamInfo:
+    """Codec and geometry of one camera stream."""
+
+    source: str
+    codec: str
+    width: int
+    height: int
+    fps: float
+    clip: str | None = None  # local copy of a live stream, for benchmarks
+
+
+@dataclass
+class DecodeResult:
+    """Decode throughput of one stream with one decoder."""
+
+    hwaccel: str  # "" for software
+    fps: float
+    seconds: float
+
+
+@dataclass
+class CameraBench:
+    """Everything measured for one camera."""
+
+    name: str
+    main: StreamInfo
+    sub: StreamInfo | None = None
+    decodes: list[DecodeResult] = field(default_factory=list)
+
+    @property
+    def detect_stream(self) -> StreamInfo:
+        """The stream Frigate should run detection on."""
+        return self.sub or self.main
+
+    @property
+    def best_decode(self) -> DecodeResult:
+        """The fastest decoder that worked."""
+        return max(self.decodes, key=lambda d: d.fps)
+
+
+@dataclass
+class CameraPlan:
+    """The generated settings for one camera."""
+
+    name: str
+    main: StreamInfo
+    sub: StreamInfo | None
+    detect_width: int
+    detect_height: int
+    detect_fps: int
+    hwaccel_preset: str | None
+    decode_load: float
+    detect_load: float
+
+
+def capture_clip(
+    url: str, seconds: float, directory: str | Path, run: Runner = _run
+) -> str:
+    """Copy ``seconds`` of a live stream into a local file, without decoding."""
+    path = str(Path(directory) / f"{abs(hash(url))}.mkv")
+    result = run(
+        ["ffmpeg", "-hide_banner", "-y", "-rtsp_transport", "tcp"]
+        + ["-t", str(seconds), "-i", url, "-an", "-c", "copy", path]
+    )
+    if result.returncode != 0:
+        raise TuneError(f"Cannot record {url}: {result.stderr.strip()[-200:]}")
+    return path
+
+
+def probe(source: str, run: Runner = _run) -> StreamInfo:
+    """Codec, resolution and frame rate of the first video stream."""
+    result = run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "stream=codec_name,width,height,avg_frame_rate,r_frame_rate",
+            "-of",
+            "json",
+        ]
+        + [source]
+    )
+    try:
+        stream = json.loads(result.stdout)["streams"][0]
+        num, _, den = (stream.get("avg_frame_rate") or "0/1").partition("/")
+        fps = float(num) / float(den or 1) if float(den or 1) else 0.0
+        if not fps:
+            num, _, den = stream["r_frame_rate"].partition("/")
+            fps = float(num) / float(den or 1)
+        return StreamInfo(
+            source, stream["codec_name"], stream["width"], stream["height"], fps
+        )
+    except (json.JSONDecodeError, KeyError, IndexError, ValueError) as e:
+        raise TuneError(f"Cannot probe {source}: {result.stderr.strip()}") from e
+
+
+def available_hwaccels(run: Runner = _run) -> list[str]:
+    """Hardware decoders ffmpeg offers that Frigate has presets for."""
+    result = run(["ffmpeg", "-hide_banner", "-hwaccels"])
+    names = result.stdout.split()
+    return [name for name in HWACCEL_DECODE_ARGS if name in names]
+
+
+def decode_fps(
+    stream: StreamInfo, hwaccel: str = "", run: Runner = _run
+) -> DecodeResult | None:
+    """Frames per second ffmpeg decodes ``stream`` at, or None if it failed."""
+    command = (
+        ["ffmpeg", "-hide_banner", "-benchmark"]
+        + HWACCEL_DECODE_ARGS.get(hwaccel, [])
+        + ["-i", stream.clip or stream.source, "-an", "-f", "null", "-"]
+    )
+    started = time.perf_counter()
+    result = run(command)
+    wall = time.perf_counter() - started
+    frames = re.findall(r"frame=\s*(\d+)", result.stderr)
+    rtime = re.search(r"rtime=([\d.]+)s", result.stderr)
+    if result.returncode != 0 or not frames or int(frames[-1]) == 0:
+        logger.info(f"{hwaccel or 'software'} decode of {stream.source} failed")
+        return None
+    elapsed = float(rtime.group(1)) if rtime else wall
+    return DecodeResult(hwaccel, int(frames[-1]) / max(elapsed, 1e-6), elapsed)
+
+
+def tflite_inference_ms(
+    model: str | Path, threads: int = 3, runs: int = 50
+) -> float | None:
+    """Mean CPU detector inference time in ms, if ``tflite_runtime`` exists."""
+    if Interpreter is None or not Path(model).exists():
+        return None
+    interpreter = Interpreter(model_path=str(model), num_threads=threads)
+    interpreter.allocate_tensors()
+    details = interpreter.get_input_details()[0]
+    frame = np.zeros(details["shape"], dtype=details["dtype"])
+    interpreter.set_tensor(details["index"], frame)
+    interpreter.invoke()  # warm-up
+    started = time.perf_counter()
+    for _ in range(runs):
+        interpreter.set_tensor(details["index"], frame)
+        interpreter.invoke()
+    return (time.perf_counter() - started) / runs * 1000
+
+
+def frigate_inference_ms(base_url: str | None = None) -> float | None:
+    """Mean ``inference_speed`` of Frigate's running detectors, if reachable."""
+    base_url = (base_url or service_url("frigate")).rstrip("/")
+    try:
+        stats = request_json("GET", f"{base_url}/api/stats", None, 5.0)
+    except ServiceError:
+        return None
+    speeds = [
+        float(detector["inference_speed"])
+        for detector in (stats or {}).get("detectors", {}).values()
+        if detector.get("inference_speed")
+    ]
+    return sum(speeds) / len(speeds) if speeds else None
+
+
+def stream_info(
+    source: str, seconds: float, directory: str | Path, run: Runner = _run
+) -> StreamInfo:
+    """Probe a clip, or a clip copied from a live stream."""
+    if "://" not in source:
+        return probe(source, run)
+    clip = capture_clip(source, seconds, directory, run)
+    info = probe(clip, run)
+    info.source, info.clip = source, clip
+    return info
+
+
+def bench_camera(
+    name: str,
+    main: str,
+    sub: str | None = None,
+    hwaccels: list[str] | None = None,
+    seconds: float = 10.0,
+    run: Runner = _run,
+) -> CameraBench:
+    """Probe a camera's streams and benchmark decoding its detect stream."""
+    with tempfile.TemporaryDirectory(prefix="frigate_tune") as directory:
+        bench = CameraBench(
+            name,
+            stream_info(main, seconds, directory, run),
+            stream_info(sub, seconds, directory, run) if sub else None,
+        )
+        for hwaccel in [""] + list(hwaccels or []):
+            result = decode_fps(bench.detect_stream, hwaccel, run)
+            if result is not None:
+                bench.decodes.append(result)
+    if not bench.decodes:
+        raise TuneError(f"No decoder could decode {bench.detect_stream.source}")
+    return bench
+
+
+def _fit(native: StreamInfo, width: int, height: int) -> tuple[int, int]:
+    """``width`` x ``height`` clamped to the stream, keeping its aspect ratio."""
+    width = min(width, native.width)
+    height = round(width * native.height / native.width / 2) * 2
+    return width, height
+
+
+def plan_cameras(
+    benches: list[CameraBench],
+    inference_ms: float,
+    detectors: int = 1,
+    utilization: float = 0.7,
+) -> list[CameraPlan]:
+    """Detect settings per camera that keep the host under ``utilization``.
+
+    Decode load of a camera is its stream fps over the measured decode fps
+    (the share of the host one decoder run used); detect load is the
+    detections per second its resolution needs over the detector capacity.
+    """
+    throughput = detectors * 1000.0 / inference_ms
+    per_camera = throughput * utilization / max(len(benches), 1)
+    plans = []
+    for bench in benches:
+        stream, decode = bench.detect_stream, bench.best_decode
+        for (width, height), needed in DETECT_LADDER:
+            fps = min(MAX_DETECT_FPS, int(per_camera / needed * MAX_DETECT_FPS))
+            if fps >= 3:
+                break
+        fps = max(fps, 1)
+        width, height = _fit(stream, width, height)
+        preset = (
+            HWACCEL_PRESETS[decode.hwaccel].get(stream.codec)
+            if decode.hwaccel
+            else None
+        )
+        plans.append(
+            CameraPlan(
+                bench.name,
+                bench.main,
+                bench.sub,
+                width,
+                height,
+                fps,
+                preset,
+                stream.fps / decode.fps,
+                needed * fps / MAX_DETECT_FPS / throughput,
+            )
+        )
+    total = sum(plan.decode_load for plan in plans)
+    if total > utilization:
+        logger.warning(
+            f"Decoding all detect streams needs {total:.0%} of the host; "
+            "add sub streams or a hardware decoder"
+        )
+    return plans
+
+
+def restream_url(name: str) -> str:
+    """Where Frigate's go2rtc serves stream ``name``."""
+    return RESTREAM_URL.format(name=name)
+
+
+def _streams(plan: CameraPlan) -> list[tuple[str, StreamInfo, list[str]]]:
+    """``(go2rtc name, stream, roles)`` for each input of ``plan``."""
+    if plan.sub:
+        return [
+            (f"{plan.name}_sub", plan.sub, ["detect"]),
+            (plan.name, plan.main, ["record"]),
+        ]
+    return [(plan.name, plan.main, ["detect", "record"])]
+
+
+def go2rtc_yaml(plans: list[CameraPlan]) -> str:
+    """The ``go2rtc:`` section pulling each RTSP stream of ``plans`` once."""
+    lines = ["go2rtc:", "  streams:"]
+    for plan in plans:
+        for name, stream, _ in _streams(plan):
+            if stream.source.startswith("rtsp://"):
+                lines.append(f"    {name}: {stream.source}")
+    return "\n".join(lines) + "\n" if len(lines) > 2 else ""
+
+
+def cameras_yaml(plans: list[CameraPlan], restream: bool = True) -> str:
+    """The ``cameras:`` section for ``plans``.
+
+    With ``restream``, RTSP inputs read go2rtc's local copy (see
+    ``go2rtc_yaml``) instead of opening their own session to the camera.
+    """
+    lines = ["cameras:"]
+    for plan in plans:
+        lines += [f"  {plan.name}:", "    enabled: true", "    ffmpeg:"]
+        if plan.hwaccel_preset:
+            lines.append(f"      hwaccel_args: {plan.hwaccel_preset}")
+        lines.append("      inputs:")
+        for name, stream, roles in _streams(plan):
+            if restream and stream.source.startswith("rtsp://"):
+                lines += [
+                    f"        - path: {restream_url(name)}",
+                    "          input_args: preset-rtsp-restream",
+                ]
+            else:
+                lines.append(f"        - path: {stream.source}")
+            lines.append("          roles:")
+            lines += [f"            - {role}" for role in roles]
+        lines += [
+            "    detect:",
+            "      enabled: true",
+            f"      width: {plan.detect_width}",
+            f"      height: {plan.detect_height}",
+            f"      fps: {plan.detect_fps}",
+            "    snapshots:",
+            "      enabled: true  # vision_describe.py reads event snapshots",
+            f"    # measured: decode {plan.decode_load:.0%} of host, "
+            f"detect {plan.detect_load:.0%} of detector",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def replace_section(config: str, key: str, section: str) -> str:
+    """``config`` with its top-level ``key:`` section replaced by ``section``."""
+    lines = config.splitlines(keepends=True)
+    start = next(
+        (i for i, line in enumerate(lines) if line.startswith(f"{key}:")), None
+    )
+    if start is None:
+        return config.rstrip("\n") + "\n\n" + section if config.strip() else section
+    end = next(
+        (
+            i
+            for i in range(start + 1, len(lines))
+            if lines[i].strip() and not lines[i][0].isspace() and lines[i][0] != "#"
+        ),
+        len(lines),
+    )
+    tail = lines[end:]
+    return "".join(lines[:start]) + section + ("\n" if tail else "") + "".join(tail)
+
+
+def format_plans(plans: list[CameraPlan], inference_ms: float) -> str:
+    """Measured capacity and chosen settings as a table."""
+    lines = [
+        f"detector: {inference_ms:.1f} ms/inference",
+        f"{'camera':<16} {'detect':>10} {'fps':>4} {'hwaccel':<22} "
+        f"{'decode':>7} {'detect':>7}",
+    ]
+    for plan in plans:
+        lines.append(
+            f"{plan.name:<16} {plan.detect_width:>4}x{plan.detect_height:<5} "
+            f"{plan.detect_fps:>4} {plan.hwaccel_preset or 'software':<22} "
+            f"{plan.decode_load:>7.0%} {plan.detect_load:>7.0%}"
+        )
+    return "\n".join(lines)
+
+
+def _cameras(values: list[str]) -> list[tuple[str, str, str | None]]:
+    cameras = []
+    for value in values:
+        name, _, sources = value.partition("=")
+        main, _, sub = sources.partition(",")
+        if not name or not main:
+            raise TuneError(f"Expected name=main[,sub], got {value!r}")
+        cameras.append((name, main, sub or None))
+    return cameras
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Frigate camera auto-tuning")
+    parser.add_argument("command", choices=("bench", "write"))
+    parser.add_argument(
+        "--camera",
+        action="append",
+        required=True,
+        help="name=main[,sub] clip path or RTSP URL (repeatable)",
+    )
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--model", type=Path, default=Path("/cpu_model.tflite"))
+    parser.add_argument("--detectors", type=int, default=1)
+    parser.add_argument("--inference-ms", type=float)
+    parser.add_argument("--utilization", type=float, default=0.7)
+    parser.add_argument("--config", type=Path, default=CONFIG_PATH)
+    parser.add_argument(
+        "--no-restream",
+        dest="restream",
+        action="store_false",
+        help="let each Frigate input open its own RTSP session",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        logger.error("ffmpeg and ffprobe are required")
+        return 1
+    try:
+        hwaccels = available_hwaccels()
+        benches = [
+            bench_camera(name, main_src, sub, hwaccels, args.seconds)
+            for name, main_src, sub in _cameras(args.camera)
+        ]
+        inference_ms = (
+            args.inference_ms
+            or tflite_inference_ms(args.model)
+            or frigate_inference_ms()
+        )
+        if not inference_ms:
+            raise TuneError("No detector timing; pass --inference-ms")
+        plans = plan_cameras(benches, inference_ms, args.detectors, args.utilization)
+    except TuneError as e:
+        logger.error(str(e))
+        return 1
+    print(format_plans(plans, inference_ms))
+    section = cameras_yaml(plans, args.restream)
+    streams = go2rtc_yaml(plans) if args.restream else ""
+    if args.command == "bench":
+        print(streams + section)
+        return 0
+    config = args.config.read_text("utf-8") if args.config.exists() else ""
+    if streams:
+        config = replace_section(config, "go2rtc", streams)
+    args.config.write_text(replace_section(config, "cameras", section), "utf-8")
+    logger.info(f"Wrote {len(plans)} camera blocks to {args.config}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
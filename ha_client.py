@@ -0,0 +1,45 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Client for the Home Assistant REST API.
+
+``homeassistant`` runs with host networking, so containers reach it through
+``HA_URL`` (default ``http://host.docker.internal:8123``). Requests carry a
+long-lived access token from the ``HA_TOKEN`` environment variable.
+"""
+
+import os
+from typing import Any
+
+from stack_config import service_url
+from stack_http import ServiceError, request_json
+
+
+class HomeAssistantClient:
+    """Reads entity states from Home Assistant."""
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        token: str | None = None,
+        timeout: float = 10.0,
+    ):
+        self.base_url = (base_url or service_url("homeassistant")).rstrip("/")
+        self.token = token or os.environ.get("HA_TOKEN")
+        self.timeout = timeout
+
+    def _get(self, path: str) -> Any:
+        if not self.token:
+            raise ServiceError("HA_TOKEN is not set; create a long-lived access token")
+        return request_json(
+            "GET",
+            f"{self.base_url}{path}",
+            timeout=self.timeout,
+            headers={"Authorization": f"Bearer {self.token}"},
+        )
+
+    def states(self) -> list[dict[str, Any]]:
+        """Every entity's state object (``entity_id``, ``state``, ``attributes``)."""
+        return self._get("/api/states")
+
+    def state(self, entity_id: str) -> dict[str, Any]:
+        """One entity's state object."""
+        return self._get(f"/api/states/{entity_id}")
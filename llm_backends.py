@@ -0,0 +1,283 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Clients for the stack's local LLM servers.
+
+``OllamaBackend`` talks to the ``ollama`` service (port 11434) and
+``TGIBackend`` to the ``tgi`` text-generation-inference service. Both offer
+``generate`` (whole answer) and ``stream`` (text chunks as they are decoded).
+``RouterBackend`` speaks the OpenAI chat API of ``llm_router.py``, which
+spreads requests over both servers. Ollama model names default to
+``OLLAMA_MODEL`` / ``OLLAMA_EMBED_MODEL`` from the environment; TGI serves
+whichever ``MODEL_ID`` it was started with.
+
+With ``OLLAMA_USAGE_LOG`` set (or an ``on_usage`` callback), every finished
+Ollama generation is reported as ``{"model", "load_seconds", "at"}``;
+``usage_logger`` appends those reports to the JSON-lines file that
+``ollama_residency.py`` follows.
+"""
+
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+from stack_config import DEFAULT_DATA_DIR, service_url
+from stack_http import ServiceError, request_bytes, request_json, stream_lines
+
+logger = logging.getLogger("llm_backends")
+
+DEFAULT_MODEL = "llama3:8b"
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+USAGE_LOG = DEFAULT_DATA_DIR / "ollama_usage.jsonl"
+
+
+def usage_logger(path: str | os.PathLike = USAGE_LOG) -> Callable[[dict], None]:
+    """A usage callback appending one JSON line per report to ``path``."""
+    path = Path(path)
+    lock = threading.Lock()
+
+    def log(report: dict[str, Any]) -> None:
+        line = json.dumps(report) + "\n"
+        try:
+            with lock, open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            logger.warning(f"Cannot write usage log {path}: {e}")
+
+    return log
+
+
+class OllamaBackend:
+    """Text generation and embeddings through the Ollama HTTP API."""
+
+    name = "ollama"
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        model: str | None = None,
+        embed_model: str | None = None,
+        timeout: float = 120.0,
+        on_usage: Callable[[dict], None] | None = None,
+    ):
+        self.base_url = (base_url or service_url("ollama")).rstrip("/")
+        self.model = model or os.environ.get("OLLAMA_MODEL", DEFAULT_MODEL)
+        self.embed_model = embed_model or os.environ.get(
+            "OLLAMA_EMBED_MODEL", DEFAULT_EMBED_MODEL
+        )
+        self.timeout = timeout
+        if on_usage is None and os.environ.get("OLLAMA_USAGE_LOG"):
+            on_usage = usage_logger(os.environ["OLLAMA_USAGE_LOG"])
+        self.on_usage = on_usage
+
+    def _report(self, final: dict[str, Any]) -> None:
+        if self.on_usage is not None:
+            self.on_usage(
+                {
+                    "model": final.get("model") or self.model,
+                    "load_seconds": final.get("load_duration", 0) / 1e9,
+                    "at": time.time(),
+                }
+            )
+
+    def generate_raw(
+        self,
+        prompt: str,
+        system: str | None = None,
+        options: dict | None = None,
+        images: list[bytes] | None = None,
+    ) -> dict:
+        """Return Ollama's whole response, including the timing counters.
+
+        ``prompt_eval_count``/``prompt_eval_duration`` measure prefill and
+        ``eval_count``/``eval_duration`` decoding (durations in ns).
+        ``options`` are Ollama model options such as ``num_predict``;
+        ``images`` are encoded images for a vision model.
+        """
+        body = {"model": self.model, "prompt": prompt, "stream": False}
+        if system:
+            body["system"] = system
+        if options:
+            body["options"] = options
+        if images:
+            body["images"] = [base64.b64encode(image).decode() for image in images]
+        response = request_json(
+            "POST", f"{self.base_url}/api/generate", body, timeout=self.timeout
+        )
+        self._report(response)
+        return response
+
+    def generate(self, prompt: str, system: str | None = None) -> str:
+        """Return the full completion for ``prompt``."""
+        return self.generate_raw(prompt, system).get("response", "")
+
+    def stream(self, prompt: str, system: str | None = None) -> Iterator[str]:
+        """Yield the completion for ``prompt`` chunk by chunk."""
+        body = {"model": self.model, "prompt": prompt, "stream": True}
+        if system:
+            body["system"] = system
+        for line in stream_lines(
+            "POST", f"{self.base_url}/api/generate", body, timeout=self.timeout
+        ):
+            try:
+                chunk = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ServiceError(
+                    f"Malformed Ollama stream line: {line[:80]!r}"
+                ) from e
+            if chunk.get("error"):
+                raise ServiceError(f"Ollama error: {chunk['error']}")
+            if chunk.get("response"):
+                yield chunk["response"]
+            if chunk.get("done"):
+                self._report(chunk)
+                return
+
+    def embed(self, text: str) -> list[float]:
+        """Return the embedding vector of ``text``."""
+        result = request_json(
+            "POST",
+            f"{self.base_url}/api/embeddings",
+            {"model": self.embed_model, "prompt": text},
+            timeout=self.timeout,
+        )
+        return result["embedding"]
+
+    def check_health(self) -> None:
+        """Raise ``ServiceError`` unless the server answers."""
+        request_json("GET", f"{self.base_url}/api/tags", timeout=5.0)
+
+    def installed_models(self) -> dict[str, int]:
+        """Map each locally pulled model to its size in bytes."""
+        result = request_json("GET", f"{self.base_url}/api/tags", timeout=self.timeout)
+        return {model["name"]: int(model.get("size", 0)) for model in result["models"]}
+
+    def keep_alive(self, model: str, seconds: float) -> None:
+        """Load ``model`` (if needed) and keep it resident for ``seconds``.
+
+        A request without a prompt only loads the model; ``seconds == 0``
+        unloads it immediately.
+        """
+        keep = "0" if seconds <= 0 else f"{int(seconds)}s"
+        request_json(
+            "POST",
+            f"{self.base_url}/api/generate",
+            {"model": model, "keep_alive": keep},
+            timeout=self.timeout,
+        )
+
+
+class TGIBackend:
+    """Text generation through HuggingFace text-generation-inference."""
+
+    name = "tgi"
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        max_new_tokens: int = 512,
+        timeout: float = 120.0,
+    ):
+        self.base_url = (base_url or service_url("tgi")).rstrip("/")
+        self.max_new_tokens = max_new_tokens
+        self.timeout = timeout
+
+    def _body(self, prompt: str, system: str | None) -> dict:
+        inputs = f"{system}\n\n{prompt}" if system else prompt
+        return {"inputs": inputs, "parameters": {"max_new_tokens": self.max_new_tokens}}
+
+    def generate(self, prompt: str, system: str | None = None) -> str:
+        """Return the full completion for ``prompt``."""
+        result = request_json(
+            "POST",
+            f"{self.base_url}/generate",
+            self._body(prompt, system),
+            timeout=self.timeout,
+        )
+        return result.get("generated_text", "")
+
+    def check_health(self) -> None:
+        """Raise ``ServiceError`` unless the server reports it is ready."""
+        request_bytes("GET", f"{self.base_url}/health", timeout=5.0)
+
+    def stream(self, prompt: str, system: str | None = None) -> Iterator[str]:
+        """Yield the completion token by token from the SSE stream."""
+        for line in stream_lines(
+            "POST",
+            f"{self.base_url}/generate_stream",
+            self._body(prompt, system),
+            timeout=self.timeout,
+        ):
+            if not line.startswith(b"data:"):
+                continue
+            try:
+                event = json.loads(line[5:])
+            except json.JSONDecodeError as e:
+                raise ServiceError(f"Malformed TGI event: {line[:80]!r}") from e
+            if event.get("error"):
+                raise ServiceError(f"TGI error: {event['error']}")
+            token = event.get("token") or {}
+            if token.get("text") and not token.get("special"):
+                yield token["text"]
+
+
+class RouterBackend:
+    """Text generation through the OpenAI-compatible ``llm_router`` proxy."""
+
+    name = "router"
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        model: str = "auto",
+        timeout: float = 120.0,
+    ):
+        self.base_url = (base_url or service_url("llm_router")).rstrip("/")
+        self.model = model
+        self.timeout = timeout
+
+    def _body(self, prompt: str, system: str | None, stream: bool) -> dict:
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        return {"model": self.model, "messages": messages, "stream": stream}
+
+    def generate(self, prompt: str, system: str | None = None) -> str:
+        """Return the full completion for ``prompt``."""
+        result = request_json(
+            "POST",
+            f"{self.base_url}/v1/chat/completions",
+            self._body(prompt, system, False),
+            timeout=self.timeout,
+        )
+        return result["choices"][0]["message"]["content"]
+
+    def stream(self, prompt: str, system: str | None = None) -> Iterator[str]:
+        """Yield the completion from the router's server-sent events."""
+        for line in stream_lines(
+            "POST",
+            f"{self.base_url}/v1/chat/completions",
+            self._body(prompt, system, True),
+            timeout=self.timeout,
+        ):
+            if not line.startswith(b"data:"):
+                continue
+            if line[5:].strip() == b"[DONE]":
+                return
+            try:
+                event = json.loads(line[5:])
+            except json.JSONDecodeError as e:
+                raise ServiceError(f"Malformed router event: {line[:80]!r}") from e
+            if event.get("error"):
+                raise ServiceError(f"Router error: {event['error'].get('message')}")
+            for choice in event.get("choices", []):
+                content = choice.get("delta", {}).get("content")
+                if content:
+                    yield content
+
+
+BACKENDS = {"ollama": OllamaBackend, "tgi": TGIBackend, "router": RouterBackend}
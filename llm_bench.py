@@ -0,0 +1,513 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""LLM throughput benchmark: TTFT, inter-token latency and concurrency scaling.
+
+Drives the ``ollama``, ``tgi`` or ``llm_router`` service with a prompt set at
+several concurrency levels and reports, per level:
+
+* time to first token (p50/p95),
+* inter-token latency (p50/p95),
+* aggregate tokens/s over the level and mean per-stream tokens/s,
+* host RAM drawn down during the level and peak GPU memory (``nvidia-smi``).
+
+Tokens are counted as streamed chunks, which both servers send one token at
+a time. Run it once per model, quantization or ``num_parallel`` setting and
+compare the tables.
+
+``record`` saves real answers with their chunk timing and ``standin`` replays
+them as a local server speaking both the Ollama (``/api/generate`` NDJSON)
+and TGI (``/generate_stream`` SSE) protocols, with a configurable number of
+decode slots, so the client side can be tested offline.
+
+Prompt files are JSON or JSONL: a list of strings or of
+``{"prompt": ..., "system": ...}`` objects.
+
+Usage::
+
+    python llm_bench.py run --backend ollama --levels 1,2,4,8 --requests 16
+    python llm_bench.py record --backend ollama --out ollama_answers.jsonl
+    python llm_bench.py standin --recordings ollama_answers.jsonl --port 11500
+    python llm_bench.py run --backend ollama --url http://127.0.0.1:11500
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import shutil
+import subprocess
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from llm_backends import BACKENDS
+from stack_config import available_memory
+from stack_http import ServiceError
+
+logger = logging.getLogger("llm_bench")
+
+DEFAULT_PROMPTS = [
+    {"prompt": "What is the capital of Australia?"},
+    {"prompt": "Give me three tips for sleeping better."},
+    {"prompt": "Explain how a heat pump works in two sentences."},
+    {"prompt": "Write a short good-morning announcement for the family."},
+]
+
+
+class BenchmarkError(Exception):
+    """Raised for unreadable prompt or recording files."""
+
+
+@dataclass
+class Prompt:
+    """One benchmark prompt."""
+
+    prompt: str
+    system: str | None = None
+
+
+@dataclass
+class RequestTiming:
+    """Timing of one streamed request (seconds)."""
+
+    ttft: float | None = None
+    gaps: list[float] = field(default_factory=list)
+    tokens: int = 0
+    total: float = 0.0
+    error: str | None = None
+
+
+@dataclass
+class LevelResult:
+    """Aggregate figures for one concurrency level."""
+
+    concurrency: int
+    requests: int
+    errors: int
+    wall_seconds: float
+    tokens: int
+    ttft_p50: float | None
+    ttft_p95: float | None
+    itl_p50: float | None
+    itl_p95: float | None
+    aggregate_tps: float
+    stream_tps: float | None
+    ram_delta_mb: float | None
+    gpu_peak_mb: float | None
+
+
+def _read_json_records(path: Path) -> list[Any]:
+    try:
+        text = path.read_text(encoding="utf-8")
+    except OSError as e:
+        raise BenchmarkError(f"Cannot read {path}: {e}") from e
+    try:
+        if path.suffix == ".jsonl":
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        raise BenchmarkError(f"{path} is not valid JSON: {e}") from e
+
+
+def load_prompts(path: str | Path | None) -> list[Prompt]:
+    """Prompts from a JSON/JSONL file, or the built-in set."""
+    records = DEFAULT_PROMPTS if path is None else _read_json_records(Path(path))
+    prompts = []
+    for record in records:
+        if isinstance(record, str):
+            prompts.append(Prompt(record))
+        elif isinstance(record, dict) and "prompt" in record:
+            prompts.append(Prompt(record["prompt"], record.get("system")))
+        else:
+            raise BenchmarkError(f"Unsupported prompt record: {record!r}")
+    if not prompts:
+        raise BenchmarkError("The prompt set is empty")
+    return prompts
+
+
+def timed_request(
+    stream: Callable[[str, str | None], Iterable[str]], prompt: Prompt
+) -> RequestTiming:
+    """Run one streamed request and time every chunk."""
+    timing = RequestTiming()
+    started = last = time.perf_counter()
+    try:
+        for _ in stream(prompt.prompt, prompt.system):
+            now = time.perf_counter()
+            if timing.ttft is None:
+                timing.ttft = now - started
+            else:
+                timing.gaps.append(now - last)
+            timing.tokens += 1
+            last = now
+    except ServiceError as e:
+        timing.error = str(e)
+    timing.total = time.perf_counter() - started
+    return timing
+
+
+def gpu_memory_used() -> float | None:
+    """Total GPU memory in use (MB) from ``nvidia-smi``, if available."""
+    if shutil.which("nvidia-smi") is None:
+        return None
+    try:
+        output = subprocess.run(
+            ["nvidia-smi", "--query-gpu=memory.used", "--format=csv,noheader,nounits"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+            check=True,
+        ).stdout
+        return float(sum(float(line) for line in output.split()))
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+class MemorySampler:
+    """Samples host free RAM and GPU memory in the background."""
+
+    def __init__(
+        self,
+        interval: float = 0.25,
+        host: Callable[[], int | None] = available_memory,
+        gpu: Callable[[], float | None] = gpu_memory_used,
+    ):
+        self.interval = interval
+        self.host = host
+        self.gpu = gpu
+        self.baseline: int | None = None
+        self.min_available: int | None = None
+        self.gpu_peak: float | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _sample(self) -> None:
+        available = self.host()
+        if available is not None:
+            self.min_available = min(available, self.min_available or available)
+        gpu = self.gpu()
+        if gpu is not None:
+            self.gpu_peak = max(gpu, self.gpu_peak or 0.0)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "MemorySampler":
+        self.baseline = self.host()
+        self._sample()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    @property
+    def ram_delta_mb(self) -> float | None:
+        """How far host free RAM dropped below its starting value."""
+        if self.baseline is None or self.min_available is None:
+            return None
+        return max(0, self.baseline - self.min_available) / 2**20
+
+
+def run_level(
+    stream: Callable[[str, str | None], Iterable[str]],
+    prompts: list[Prompt],
+    concurrency: int,
+    requests: int,
+) -> tuple[list[RequestTiming], float]:
+    """Issue ``requests`` prompts with ``concurrency`` in flight at once."""
+    batch = list(itertools.islice(itertools.cycle(prompts), requests))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        timings = list(pool.map(lambda prompt: timed_request(stream, prompt), batch))
+    return timings, time.perf_counter() - started
+
+
+def _percentiles(values: list[float]) -> tuple[float | None, float | None]:
+    if not values:
+        return None, None
+    p50, p95 = np.percentile(values, [50, 95])
+    return float(p50), float(p95)
+
+
+def summarize(
+    concurrency: int,
+    timings: list[RequestTiming],
+    wall: float,
+    memory: MemorySampler | None = None,
+) -> LevelResult:
+    """Aggregate the timings of one level."""
+    ok = [t for t in timings if t.error is None and t.ttft is not None]
+    ttft = _percentiles([t.ttft for t in ok])
+    itl = _percentiles([gap for t in ok for gap in t.gaps])
+    tokens = sum(t.tokens for t in ok)
+    per_stream = [
+        (t.tokens - 1) / (t.total - t.ttft)
+        for t in ok
+        if t.tokens > 1 and t.total > t.ttft
+    ]
+    return LevelResult(
+        concurrency=concurrency,
+        requests=len(timings),
+        errors=len(timings) - len(ok),
+        wall_seconds=wall,
+        tokens=tokens,
+        ttft_p50=ttft[0],
+        ttft_p95=ttft[1],
+        itl_p50=itl[0],
+        itl_p95=itl[1],
+        aggregate_tps=tokens / wall if wall > 0 else 0.0,
+        stream_tps=float(np.mean(per_stream)) if per_stream else None,
+        ram_delta_mb=memory.ram_delta_mb if memory else None,
+        gpu_peak_mb=memory.gpu_peak if memory else None,
+    )
+
+
+def benchmark(
+    stream: Callable[[str, str | None], Iterable[str]],
+    prompts: list[Prompt],
+    levels: list[int],
+    requests: int,
+    warmup: bool = True,
+) -> list[LevelResult]:
+    """Run every concurrency level in turn."""
+    if warmup:
+        timed_request(stream, prompts[0])  # load the model outside the figures
+    results = []
+    for level in levels:
+        with MemorySampler() as memory:
+            timings, wall = run_level(stream, prompts, level, max(requests, level))
+        result = summarize(level, timings, wall, memory)
+        logger.info(
+            f"concurrency {level}: {result.aggregate_tps:.1f} tok/s, "
+            f"{result.errors} errors"
+        )
+        results.append(result)
+    return results
+
+
+def format_table(results: list[LevelResult]) -> str:
+    """Plain-text table of level results (times in ms)."""
+
+    def ms(value: float | None) -> str:
+        return "-" if value is None else f"{value * 1000:.0f}"
+
+    def num(value: float | None, digits: int = 1) -> str:
+        return "-" if value is None else f"{value:.{digits}f}"
+
+    lines = [
+        f"{'conc':>4} {'req':>4} {'err':>4} {'ttft50':>7} {'ttft95':>7} "
+        f"{'itl50':>6} {'itl95':>6} {'agg t/s':>8} {'strm t/s':>8} "
+        f"{'ram MB':>7} {'gpu MB':>7}"
+    ]
+    for r in results:
+        lines.append(
+            f"{r.concurrency:>4} {r.requests:>4} {r.errors:>4} {ms(r.ttft_p50):>7} "
+            f"{ms(r.ttft_p95):>7} {ms(r.itl_p50):>6} {ms(r.itl_p95):>6} "
+            f"{r.aggregate_tps:>8.1f} {num(r.stream_tps):>8} "
+            f"{num(r.ram_delta_mb, 0):>7} {num(r.gpu_peak_mb, 0):>7}"
+        )
+    return "\n".join(lines)
+
+
+def record(
+    stream: Callable[[str, str | None], Iterable[str]],
+    prompts: list[Prompt],
+    path: str | Path,
+) -> int:
+    """Save each prompt's answer with per-chunk delays for the stand-in."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for prompt in prompts:
+            chunks = []
+            last = time.perf_counter()
+            for text in stream(prompt.prompt, prompt.system):
+                now = time.perf_counter()
+                chunks.append([round(now - last, 4), text])
+                last = now
+            f.write(json.dumps(dict(asdict(prompt), chunks=chunks)) + "\n")
+            count += 1
+    return count
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Replays recorded answers as an Ollama- and TGI-compatible server.
+
+    ``self.server`` carries ``recordings`` (prompt -> chunks), a ``slots``
+    semaphore limiting concurrent decodes and a ``speed`` factor for delays.
+    """
+
+    def _json(self, status: int, body: Any) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunks(self, prompt: str) -> list[list]:
+        server = self.server
+        if prompt in server.recordings:
+            return server.recordings[prompt]
+        with server.lock:
+            return next(server.fallback)
+
+    def _replay(self, chunks: list[list], frame: Callable[[str, bool], bytes]) -> None:
+        with self.server.slots:
+            for delay, text in chunks:
+                time.sleep(delay / self.server.speed)
+                self.wfile.write(frame(text, False))
+                self.wfile.flush()
+            self.wfile.write(frame("", True))
+
+    def do_GET(self) -> None:
+        if self.path == "/api/tags":
+            self._json(200, {"models": [{"name": "standin", "size": 0}]})
+        elif self.path == "/health":
+            self._json(200, {})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/api/generate":
+            chunks = self._chunks(body.get("prompt", ""))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+
+            def frame(text: str, done: bool) -> bytes:
+                return (json.dumps({"response": text, "done": done}) + "\n").encode()
+
+        elif self.path == "/generate_stream":
+            inputs = body.get("inputs", "")
+            chunks = self._chunks(inputs.rsplit("\n\n", 1)[-1])
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+
+            def frame(text: str, done: bool) -> bytes:
+                if done:
+                    return b""
+                token = {"text": text, "special": False}
+                return f"data: {json.dumps({'token': token})}\n\n".encode()
+
+        else:
+            return self._json(404, {"error": "not found"})
+        try:
+            self._replay(chunks, frame)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+
+def load_recordings(path: str | Path) -> dict[str, list[list]]:
+    """Recorded answers keyed by prompt."""
+    records = _read_json_records(Path(path))
+    if not records:
+        raise BenchmarkError(f"{path} has no recordings")
+    try:
+        return {record["prompt"]: record["chunks"] for record in records}
+    except (KeyError, TypeError) as e:
+        raise BenchmarkError(f"Malformed recording in {path}: {e}") from e
+
+
+def make_standin(
+    recordings: dict[str, list[list]],
+    host: str = "127.0.0.1",
+    port: int = 0,
+    slots: int = 1,
+    speed: float = 1.0,
+) -> ThreadingHTTPServer:
+    """Build (not start) a stand-in server; unknown prompts get round-robin."""
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    server.recordings = recordings
+    server.fallback = itertools.cycle(list(recordings.values()))
+    server.lock = threading.Lock()
+    server.slots = threading.BoundedSemaphore(slots)
+    server.speed = speed
+    return server
+
+
+def _backend_stream(args: argparse.Namespace) -> Callable[[str, str | None], Any]:
+    factory = BACKENDS[args.backend]
+    backend = factory(base_url=args.url) if args.url else factory()
+    if args.model and hasattr(backend, "model"):
+        backend.model = args.model
+    return backend.stream
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="LLM throughput benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("run", "record"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--backend", choices=sorted(BACKENDS), default="ollama")
+        cmd.add_argument("--url", help="override the service URL")
+        cmd.add_argument("--model", help="Ollama model tag")
+        cmd.add_argument("--prompts", type=Path)
+    run_cmd = sub.choices["run"]
+    run_cmd.add_argument("--levels", default="1,2,4,8")
+    run_cmd.add_argument("--requests", type=int, default=8)
+    run_cmd.add_argument("--no-warmup", action="store_true")
+    run_cmd.add_argument("--json", type=Path, help="also write results as JSON")
+    sub.choices["record"].add_argument("--out", type=Path, required=True)
+    standin = sub.add_parser("standin", help="replay recordings as a local server")
+    standin.add_argument("--recordings", type=Path, required=True)
+    standin.add_argument("--host", default="127.0.0.1")
+    standin.add_argument("--port", type=int, default=11500)
+    standin.add_argument("--slots", type=int, default=1)
+    standin.add_argument("--speed", type=float, default=1.0)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        if args.command == "standin":
+            server = make_standin(
+                load_recordings(args.recordings),
+                args.host,
+                args.port,
+                args.slots,
+                args.speed,
+            )
+            logger.info(f"Stand-in serving on {args.host}:{args.port}")
+            server.serve_forever()
+            return 0
+        prompts = load_prompts(args.prompts)
+        stream = _backend_stream(args)
+        if args.command == "record":
+            print(f"Recorded {record(stream, prompts, args.out)} answers")
+            return 0
+        levels = [int(level) for level in args.levels.split(",")]
+        results = benchmark(stream, prompts, levels, args.requests, not args.no_warmup)
+    except (BenchmarkError, ServiceError, ValueError) as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    print(format_table(results))
+    if args.json:
+        args.json.write_text(json.dumps([asdict(r) for r in results], indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
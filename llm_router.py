@@ -0,0 +1,523 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Queue-aware router exposing one OpenAI-compatible endpoint over ollama and tgi.
+
+Clients send ``POST /v1/chat/completions`` (or ``/v1/completions``) to the
+router instead of a specific server. For every request the router estimates
+how long each healthy backend would take to finish it::
+
+    queued waves  = in_flight // slots
+    expected time = queued waves * (ttft + mean_tokens / tokens_per_s)
+                    + ttft + max_tokens / tokens_per_s
+
+and sends it to the fastest. ``ttft``, ``tokens_per_s`` and ``mean_tokens``
+are moving averages measured from the streamed answers; ``slots`` is how many
+requests a backend decodes at once (Ollama 0.1.32 serves one at a time, TGI
+batches). A burst from several rooms therefore spreads over both servers
+instead of queueing on one.
+
+Health is tracked by the router itself: a periodic probe of each backend plus
+every failed request. A backend that fails before its first token is taken
+out of rotation with exponential back-off and the request fails over to the
+next one, so clients never depend on the per-container curl healthchecks.
+Set ``"model"`` to ``ollama`` or ``tgi`` to prefer a backend; anything else
+(``"auto"``) routes freely. Multi-turn ``messages`` are flattened into one
+prompt, as TGI 0.9 has no chat API.
+
+Identical requests that arrive while one is already being generated (the
+same briefing asked in every room) share that generation and its stream
+instead of running again (see ``single_flight.py``).
+
+Usage::
+
+    python llm_router.py serve --port 8000 --slots ollama=1 --slots tgi=4
+    python llm_router.py status
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from llm_backends import OllamaBackend, TGIBackend
+from single_flight import SharedStream, SingleFlight, flight_key
+from stack_config import service_url
+from stack_http import ServiceError, request_json
+
+logger = logging.getLogger("llm_router")
+
+DEFAULT_PORT = 8000
+DEFAULT_SLOTS = {"ollama": 1, "tgi": 4}
+DEFAULT_MAX_TOKENS = 256
+
+
+class RouterError(Exception):
+    """Raised when no backend can serve a request."""
+
+
+@dataclass
+class BackendStats:
+    """Live load and speed estimates for one backend."""
+
+    name: str
+    slots: int = 1
+    in_flight: int = 0
+    ttft: float = 0.5
+    tokens_per_second: float = 20.0
+    mean_tokens: float = 200.0
+    healthy: bool = True
+    failures: int = 0
+    down_until: float = 0.0
+    requests: int = 0
+    errors: int = 0
+
+    def expected_seconds(self, tokens: int) -> float:
+        """Estimated time to finish a new ``tokens``-token request here."""
+        per_request = self.ttft + self.mean_tokens / self.tokens_per_second
+        waves = self.in_flight // max(1, self.slots)
+        return waves * per_request + self.ttft + tokens / self.tokens_per_second
+
+
+class RoutedStream:
+    """Iterable answer whose ``backend`` is known once the first chunk arrives."""
+
+    def __init__(
+        self,
+        router: "LLMRouter",
+        prompt: str,
+        system: str | None,
+        max_tokens: int | None,
+        prefer: str | None,
+    ):
+        self.backend: str | None = None
+        self.tokens = 0
+        self._chunks = router._run(self, prompt, system, max_tokens, prefer)
+
+    def __iter__(self) -> Iterator[str]:
+        return self._chunks
+
+
+class LLMRouter:
+    """Chooses a backend per request and keeps its statistics."""
+
+    def __init__(
+        self,
+        backends: dict[str, Any],
+        slots: dict[str, int] | None = None,
+        alpha: float = 0.3,
+        retry_after: float = 5.0,
+        max_retry_after: float = 120.0,
+        clock: Callable[[], float] = time.monotonic,
+        flights: SingleFlight | None = None,
+    ):
+        if not backends:
+            raise RouterError("At least one backend is required")
+        slots = {**DEFAULT_SLOTS, **(slots or {})}
+        self.backends = backends
+        self.stats = {name: BackendStats(name, slots.get(name, 1)) for name in backends}
+        self.alpha = alpha
+        self.retry_after = retry_after
+        self.max_retry_after = max_retry_after
+        self.clock = clock
+        self.flights = flights
+        self._lock = threading.Lock()
+
+    def _ewma(self, old: float, new: float) -> float:
+        return (1 - self.alpha) * old + self.alpha * new
+
+    def choose(
+        self,
+        tokens: int = DEFAULT_MAX_TOKENS,
+        prefer: str | None = None,
+        exclude: set[str] | frozenset[str] = frozenset(),
+    ) -> str:
+        """Name of the backend with the lowest expected completion time."""
+        now = self.clock()
+        with self._lock:
+            candidates = [
+                stats
+                for name, stats in self.stats.items()
+                if name not in exclude and (stats.healthy or stats.down_until <= now)
+            ]
+            if not candidates:
+                raise RouterError("No healthy LLM backend available")
+            for stats in candidates:
+                if stats.name == prefer:
+                    return stats.name
+            return min(candidates, key=lambda s: s.expected_seconds(tokens)).name
+
+    def mark_failed(self, name: str, error: Exception) -> None:
+        """Take ``name`` out of rotation with exponential back-off."""
+        with self._lock:
+            stats = self.stats[name]
+            stats.failures += 1
+            stats.errors += 1
+            stats.healthy = False
+            backoff = self.retry_after * 2 ** (stats.failures - 1)
+            stats.down_until = self.clock() + min(self.max_retry_after, backoff)
+        logger.warning(f"Backend {name} unhealthy: {error}")
+
+    def mark_healthy(self, name: str) -> None:
+        """Return ``name`` to rotation."""
+        with self._lock:
+            stats = self.stats[name]
+            if not stats.healthy:
+                logger.info(f"Backend {name} healthy again")
+            stats.healthy, stats.failures, stats.down_until = True, 0, 0.0
+
+    def _record(self, name: str, ttft: float, tokens: int, decode: float) -> None:
+        with self._lock:
+            stats = self.stats[name]
+            stats.requests += 1
+            stats.ttft = self._ewma(stats.ttft, ttft)
+            stats.mean_tokens = self._ewma(stats.mean_tokens, tokens)
+            if tokens > 1 and decode > 0:
+                stats.tokens_per_second = self._ewma(
+                    stats.tokens_per_second, (tokens - 1) / decode
+                )
+
+    def stream(
+        self,
+        prompt: str,
+        system: str | None = None,
+        max_tokens: int | None = None,
+        prefer: str | None = None,
+    ) -> RoutedStream | SharedStream:
+        """Stream the answer from the best backend, failing over before token 1.
+
+        With ``flights`` set, an identical request already in flight is joined
+        instead; the leader's ``RoutedStream`` is then the result's ``source``.
+        """
+        if self.flights is None:
+            return RoutedStream(self, prompt, system, max_tokens, prefer)
+        return self.flights.stream(
+            flight_key(prompt, system, max_tokens, prefer),
+            lambda: RoutedStream(self, prompt, system, max_tokens, prefer),
+        )
+
+    def generate(
+        self,
+        prompt: str,
+        system: str | None = None,
+        max_tokens: int | None = None,
+        prefer: str | None = None,
+    ) -> str:
+        """Whole answer from the best backend."""
+        return "".join(self.stream(prompt, system, max_tokens, prefer))
+
+    def _run(
+        self,
+        routed: RoutedStream,
+        prompt: str,
+        system: str | None,
+        max_tokens: int | None,
+        prefer: str | None,
+    ) -> Iterator[str]:
+        tried: set[str] = set()
+        while True:
+            name = self.choose(max_tokens or DEFAULT_MAX_TOKENS, prefer, tried)
+            stats = self.stats[name]
+            with self._lock:
+                stats.in_flight += 1
+            started = time.perf_counter()
+            first = None
+            try:
+                for chunk in self.backends[name].stream(prompt, system):
+                    if first is None:
+                        first = time.perf_counter()
+                        routed.backend = name
+                    routed.tokens += 1
+                    yield chunk
+                    if max_tokens and routed.tokens >= max_tokens:
+                        break
+            except ServiceError as e:
+                if first is None:
+                    self.mark_failed(name, e)
+                    tried.add(name)
+                    logger.info(f"Failing over from {name}")
+                    continue
+                with self._lock:
+                    stats.errors += 1
+                raise
+            finally:
+                with self._lock:
+                    stats.in_flight -= 1
+            if first is not None:
+                self._record(
+                    name, first - started, routed.tokens, time.perf_counter() - first
+                )
+            routed.backend = name
+            return
+
+    def probe(self) -> None:
+        """Check every backend's health endpoint once."""
+        for name, backend in self.backends.items():
+            try:
+                backend.check_health()
+            except ServiceError as e:
+                if self.stats[name].healthy:
+                    self.mark_failed(name, e)
+            else:
+                self.mark_healthy(name)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Statistics of every backend."""
+        now = self.clock()
+        with self._lock:
+            return {
+                name: dict(
+                    asdict(stats),
+                    down_until=round(max(0.0, stats.down_until - now), 1),
+                    expected_seconds=round(
+                        stats.expected_seconds(DEFAULT_MAX_TOKENS), 3
+                    ),
+                )
+                for name, stats in self.stats.items()
+            }
+
+
+def messages_to_prompt(messages: list[dict[str, Any]]) -> tuple[str, str | None]:
+    """Flatten OpenAI chat ``messages`` into ``(prompt, system)``."""
+
+    def text(content: Any) -> str:
+        if isinstance(content, list):
+            return "".join(part.get("text", "") for part in content)
+        return str(content or "")
+
+    system = "\n".join(text(m["content"]) for m in messages if m["role"] == "system")
+    turns = [m for m in messages if m["role"] != "system"]
+    if len(turns) == 1:
+        return text(turns[0]["content"]), system or None
+    lines = [f"{m['role'].capitalize()}: {text(m['content'])}" for m in turns]
+    return "\n".join(lines + ["Assistant:"]), system or None
+
+
+class RouterHandler(BaseHTTPRequestHandler):
+    """HTTP front end; ``self.server.router`` is the shared ``LLMRouter``."""
+
+    def _reply(self, status: int, body: Any) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str, kind: str) -> None:
+        self._reply(status, {"error": {"message": message, "type": kind}})
+
+    def do_GET(self) -> None:
+        router = self.server.router
+        if self.path == "/health":
+            snapshot = router.snapshot()
+            healthy = any(stats["healthy"] for stats in snapshot.values())
+            self._reply(200 if healthy else 503, {"backends": snapshot})
+        elif self.path == "/stats":
+            coalescing = asdict(router.flights.metrics) if router.flights else None
+            self._reply(200, {"backends": router.snapshot(), "coalescing": coalescing})
+        elif self.path == "/v1/models":
+            names = ["auto"] + list(router.backends)
+            data = [
+                {"id": name, "object": "model", "owned_by": "local"} for name in names
+            ]
+            self._reply(200, {"object": "list", "data": data})
+        else:
+            self._error(404, f"Unknown path {self.path}", "not_found")
+
+    def do_POST(self) -> None:
+        if self.path not in ("/v1/chat/completions", "/v1/completions"):
+            return self._error(404, f"Unknown path {self.path}", "not_found")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length))
+            if self.path == "/v1/chat/completions":
+                prompt, system = messages_to_prompt(body["messages"])
+            else:
+                prompt, system = str(body["prompt"]), None
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            return self._error(400, f"Malformed request: {e}", "invalid_request_error")
+        chat = self.path == "/v1/chat/completions"
+        routed = self.server.router.stream(
+            prompt, system, body.get("max_tokens"), body.get("model")
+        )
+        chunks = iter(routed)
+        try:
+            first = next(chunks, "")
+        except (RouterError, ServiceError) as e:
+            return self._error(503, str(e), "service_unavailable")
+        if isinstance(routed, SharedStream):
+            routed = routed.source
+        completion_id = f"{'chatcmpl' if chat else 'cmpl'}-{uuid.uuid4().hex[:24]}"
+        if body.get("stream"):
+            self._stream(routed, chunks, first, completion_id, chat)
+        else:
+            self._complete(routed, chunks, first, completion_id, chat)
+
+    def _choice(self, text: str, chat: bool, finish: str | None, stream: bool) -> dict:
+        if not chat:
+            return {"index": 0, "text": text, "finish_reason": finish}
+        key = "delta" if stream else "message"
+        message = (
+            {"content": text} if stream else {"role": "assistant", "content": text}
+        )
+        return {"index": 0, key: message, "finish_reason": finish}
+
+    def _envelope(
+        self, routed: RoutedStream, completion_id: str, chat: bool, stream: bool
+    ) -> dict:
+        kind = "chat.completion" if chat else "text_completion"
+        return {
+            "id": completion_id,
+            "object": f"{kind}.chunk" if stream and chat else kind,
+            "created": int(time.time()),
+            "model": routed.backend,
+        }
+
+    def _complete(
+        self,
+        routed: RoutedStream,
+        chunks: Iterator[str],
+        first: str,
+        completion_id: str,
+        chat: bool,
+    ) -> None:
+        try:
+            text = first + "".join(chunks)
+        except ServiceError as e:
+            return self._error(502, str(e), "backend_error")
+        body = self._envelope(routed, completion_id, chat, stream=False)
+        body["choices"] = [self._choice(text, chat, "stop", stream=False)]
+        body["usage"] = {"completion_tokens": routed.tokens}
+        self._reply(200, body)
+
+    def _stream(
+        self,
+        routed: RoutedStream,
+        chunks: Iterator[str],
+        first: str,
+        completion_id: str,
+        chat: bool,
+    ) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def send(event: dict | str) -> None:
+            payload = event if isinstance(event, str) else json.dumps(event)
+            self.wfile.write(f"data: {payload}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def chunk_event(text: str, finish: str | None) -> dict:
+            event = self._envelope(routed, completion_id, chat, stream=True)
+            event["choices"] = [self._choice(text, chat, finish, stream=True)]
+            return event
+
+        try:
+            if first:
+                send(chunk_event(first, None))
+            for text in chunks:
+                send(chunk_event(text, None))
+            send(chunk_event("", "stop"))
+            send("[DONE]")
+        except ServiceError as e:
+            send({"error": {"message": str(e), "type": "backend_error"}})
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Client disconnected mid-stream")
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+
+def serve(
+    router: LLMRouter,
+    host: str = "0.0.0.0",
+    port: int = DEFAULT_PORT,
+    probe_interval: float = 10.0,
+) -> None:
+    """Probe backends in the background and serve HTTP forever."""
+
+    def probe_loop() -> None:
+        while True:
+            router.probe()
+            time.sleep(probe_interval)
+
+    threading.Thread(target=probe_loop, name="router-probe", daemon=True).start()
+    server = ThreadingHTTPServer((host, port), RouterHandler)
+    server.daemon_threads = True
+    server.router = router
+    logger.info(
+        f"LLM router listening on {host}:{port} for {', '.join(router.backends)}"
+    )
+    server.serve_forever()
+
+
+def _parse_slots(values: list[str]) -> dict[str, int]:
+    slots = {}
+    for value in values:
+        name, _, count = value.partition("=")
+        slots[name] = int(count)
+    return slots
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Queue-aware LLM router")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_cmd = sub.add_parser("serve", help="run the OpenAI-compatible proxy")
+    serve_cmd.add_argument("--host", default="0.0.0.0")
+    serve_cmd.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_cmd.add_argument(
+        "--backend",
+        action="append",
+        choices=["ollama", "tgi"],
+        help="backend to route to (repeatable; default both)",
+    )
+    serve_cmd.add_argument(
+        "--slots", action="append", default=[], help="NAME=N concurrent decodes"
+    )
+    serve_cmd.add_argument("--probe-interval", type=float, default=10.0)
+    serve_cmd.add_argument(
+        "--no-coalesce",
+        action="store_true",
+        help="run identical concurrent requests separately",
+    )
+    status = sub.add_parser("status", help="print backend statistics")
+    status.add_argument("--url", default=None)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        if args.command == "status":
+            url = (args.url or service_url("llm_router")).rstrip("/")
+            print(json.dumps(request_json("GET", f"{url}/stats"), indent=2))
+            return 0
+        factories = {"ollama": OllamaBackend, "tgi": TGIBackend}
+        names = args.backend or list(factories)
+        router = LLMRouter(
+            {name: factories[name]() for name in names},
+            _parse_slots(args.slots),
+            flights=None if args.no_coalesce else SingleFlight(),
+        )
+        serve(router, args.host, args.port, args.probe_interval)
+    except (RouterError, ServiceError, ValueError) as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
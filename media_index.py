@@ -0,0 +1,606 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Local media library index for ``ovos.common_play`` searches.
+
+Media skills used to walk their folders while OCP waited for results.
+``MediaIndex`` keeps the library in SQLite instead: one ``media`` row per
+audio file, video file or playlist, with title/artist/album/genre tags, and
+an FTS5 table over those tags plus folder names (so a ``Jazz`` folder counts
+as a genre). "play some jazz" then costs one indexed ``MATCH`` query.
+
+The index is kept current without rescanning:
+
+* ``scan`` compares each file's ``mtime``/``size`` with its row and only
+  reads tags of new or changed files, dropping rows of vanished files;
+* ``watch`` follows inotify events (``inotify_simple``) and re-indexes just
+  the touched paths. Without inotify it falls back to a periodic ``scan``.
+
+Tags come from ``mutagen`` when it is installed, otherwise from the path
+(``Artist/Album/01 Title.mp3``). ``.m3u``/``.m3u8``/``.pls`` playlists are
+indexed by name and entry names.
+
+Folders come from ``media_folders`` in the ``ovos.common_play`` app settings.
+``MediaIndexService`` answers ``ovos.common_play.query`` from the index like
+an OCP media skill.
+
+The ``media_index`` Compose service runs ``run`` next to ``ovos``.
+
+Usage::
+
+    python media_index.py scan
+    python media_index.py search "some jazz"
+    python media_index.py run
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from urllib.parse import unquote, urlparse
+
+from stack_config import DEFAULT_DATA_DIR, bus_settings, conf_path
+
+try:
+    import mutagen
+except ImportError:
+    mutagen = None
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # non-Linux hosts or package missing: periodic rescans
+    INotify = flags = None
+
+try:
+    from ovos_bus_client import Message, MessageBusClient
+except ImportError:
+    Message = MessageBusClient = None
+
+logger = logging.getLogger("media_index")
+
+INDEX_PATH = DEFAULT_DATA_DIR / "media_index.sqlite"
+DEFAULT_FOLDERS = ["~/Music", "~/Videos"]
+QUERY_MESSAGE = "ovos.common_play.query"
+RESPONSE_MESSAGE = "ovos.common_play.query.response"
+SKILL_ID = "media_index.openvoiceos"
+AUDIO_EXTENSIONS = {".mp3", ".flac", ".ogg", ".opus", ".m4a", ".aac", ".wav", ".wma"}
+VIDEO_EXTENSIONS = {".mp4", ".mkv", ".avi", ".mov", ".webm", ".m4v"}
+PLAYLIST_EXTENSIONS = {".m3u", ".m3u8", ".pls"}
+# OCP MediaType / PlaybackType values (ovos_utils.ocp).
+MEDIA_TYPES = {"audio": 2, "video": 3, "playlist": 2}
+PLAYBACK_AUDIO = 2
+PLAYBACK_VIDEO = 1
+QUESTION_KINDS = {1: ("audio", "playlist"), 2: ("audio", "playlist"), 3: ("video",)}
+STOPWORDS = {"play", "some", "a", "an", "the", "me", "my", "please", "by", "music"}
+# bm25 column weights: title, artist, album, genre, tags.
+RANK_WEIGHTS = (10.0, 6.0, 4.0, 3.0, 1.0)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL DEFAULT '',
+    album TEXT NOT NULL DEFAULT '',
+    genre TEXT NOT NULL DEFAULT '',
+    tags TEXT NOT NULL DEFAULT '',
+    duration REAL NOT NULL DEFAULT 0
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS media_fts USING fts5(
+    title, artist, album, genre, tags,
+    content='media', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS media_ai AFTER INSERT ON media BEGIN
+    INSERT INTO media_fts(rowid, title, artist, album, genre, tags)
+    VALUES (new.id, new.title, new.artist, new.album, new.genre, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS media_ad AFTER DELETE ON media BEGIN
+    INSERT INTO media_fts(media_fts, rowid, title, artist, album, genre, tags)
+    VALUES ('delete', old.id, old.title, old.artist, old.album, old.genre, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS media_au AFTER UPDATE ON media BEGIN
+    INSERT INTO media_fts(media_fts, rowid, title, artist, album, genre, tags)
+    VALUES ('delete', old.id, old.title, old.artist, old.album, old.genre, old.tags);
+    INSERT INTO media_fts(rowid, title, artist, album, genre, tags)
+    VALUES (new.id, new.title, new.artist, new.album, new.genre, new.tags);
+END;
+"""
+UPSERT = """
+INSERT INTO media (path, kind, mtime, size, title, artist, album, genre, tags, duration)
+VALUES (:path, :kind, :mtime, :size, :title, :artist, :album, :genre, :tags, :duration)
+ON CONFLICT(path) DO UPDATE SET
+    kind = excluded.kind, mtime = excluded.mtime, size = excluded.size,
+    title = excluded.title, artist = excluded.artist, album = excluded.album,
+    genre = excluded.genre, tags = excluded.tags, duration = excluded.duration
+"""
+
+
+class MediaIndexError(Exception):
+    """Raised when the index or the media settings cannot be used."""
+
+
+@dataclass
+class MediaEntry:
+    """One indexed file and how well it matched a search."""
+
+    path: str
+    kind: str
+    title: str
+    artist: str = ""
+    album: str = ""
+    genre: str = ""
+    duration: float = 0.0
+    score: float = 0.0
+    all_words: bool = True
+
+
+@dataclass
+class ScanStats:
+    """What one ``scan`` changed."""
+
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    seconds: float = 0.0
+
+
+def media_kind(path: str | os.PathLike) -> str | None:
+    """``audio``, ``video``, ``playlist`` or None for other files."""
+    suffix = Path(path).suffix.lower()
+    if suffix in AUDIO_EXTENSIONS:
+        return "audio"
+    if suffix in VIDEO_EXTENSIONS:
+        return "video"
+    if suffix in PLAYLIST_EXTENSIONS:
+        return "playlist"
+    return None
+
+
+def playlist_entries(path: str | os.PathLike) -> list[str]:
+    """Absolute paths (or URLs) listed in an m3u or pls playlist."""
+    path = Path(path)
+    try:
+        lines = path.read_text("utf-8", errors="replace").splitlines()
+    except OSError:
+        return []
+    if path.suffix.lower() == ".pls":
+        lines = [
+            line.split("=", 1)[1] for line in lines if re.match(r"(?i)file\d+=", line)
+        ]
+    entries = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if re.match(r"^[a-z]+://", line) and not line.startswith("file://"):
+            entries.append(line)
+            continue
+        if line.startswith("file://"):
+            line = unquote(urlparse(line).path)
+        entries.append(str((path.parent / line).resolve()))
+    return entries
+
+
+def _first(tags: Any, key: str) -> str:
+    value = tags.get(key) if tags else None
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return str(value).strip() if value else ""
+
+
+def read_tags(path: Path, kind: str, root: Path) -> dict[str, Any]:
+    """Tags of one file; the path fills in whatever the file does not say."""
+    folders = list(path.relative_to(root).parent.parts)
+    title = re.sub(r"^\d+[\s._-]+", "", path.stem).replace("_", " ")
+    fields = {
+        "title": title,
+        "artist": folders[-2] if len(folders) >= 2 else "",
+        "album": folders[-1] if folders else "",
+        "genre": "",
+        "duration": 0.0,
+        "tags": " ".join(folders),
+    }
+    if kind == "playlist":
+        names = [Path(entry).stem for entry in playlist_entries(path)]
+        fields.update(artist="", album="", tags=" ".join(folders + names))
+        return fields
+    if mutagen is not None:
+        try:
+            media = mutagen.File(path, easy=True)
+        except Exception as e:  # mutagen raises many types on damaged files
+            logger.debug(f"No tags in {path}: {e}")
+            media = None
+        if media is not None:
+            for key in ("title", "artist", "album", "genre"):
+                fields[key] = _first(media.tags, key) or fields[key]
+            fields["duration"] = float(getattr(media.info, "length", 0.0) or 0.0)
+    return fields
+
+
+def media_folders(settings: str | os.PathLike | None = None) -> list[Path]:
+    """``media_folders`` from the ``ovos.common_play`` app settings."""
+    path = (
+        Path(settings)
+        if settings
+        else conf_path().parent / "apps" / "ovos.common_play" / "settings.json"
+    )
+    folders = DEFAULT_FOLDERS
+    if path.exists():
+        try:
+            folders = json.loads(path.read_text("utf-8")).get("media_folders", folders)
+        except (OSError, json.JSONDecodeError) as e:
+            raise MediaIndexError(f"Cannot read {path}: {e}") from e
+    return [Path(folder).expanduser() for folder in folders]
+
+
+def fts_query(phrase: str, any_word: bool = False) -> str:
+    """FTS5 query matching every (or any) word of ``phrase`` as a prefix."""
+    words = [w for w in re.findall(r"\w+", phrase.lower()) if w not in STOPWORDS]
+    return (" OR " if any_word else " ").join(f'"{w}"*' for w in words)
+
+
+def _under(folder: str | os.PathLike) -> tuple[str, str]:
+    """Bounds of the paths below ``folder``, for an indexed range query."""
+    prefix = str(folder).rstrip(os.sep) + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+class MediaIndex:
+    """SQLite FTS5 index of local media folders."""
+
+    def __init__(
+        self,
+        path: str | os.PathLike = INDEX_PATH,
+        folders: Iterable[str | os.PathLike] = (),
+    ):
+        self.path = Path(path)
+        self.folders = [Path(folder).resolve() for folder in folders]
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            raise MediaIndexError(f"Cannot open {path}: {e}") from e
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM media").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database."""
+        self._db.close()
+
+    def _root(self, path: Path) -> Path:
+        for folder in self.folders:
+            if path.is_relative_to(folder):
+                return folder
+        return path.parent
+
+    def _row(self, path: Path, stat: os.stat_result, kind: str) -> dict[str, Any]:
+        fields = read_tags(path, kind, self._root(path))
+        return dict(fields, path=str(path), kind=kind, mtime=stat.st_mtime)
+
+    def scan(self, folders: Iterable[Path] | None = None) -> ScanStats:
+        """Bring the rows under ``folders`` (default: all) up to date."""
+        started = time.perf_counter()
+        stats = ScanStats()
+        for folder in folders or self.folders:
+            folder = Path(folder).resolve()
+            with self._lock:
+                known = {
+                    row["path"]: (row["mtime"], row["size"])
+                    for row in self._db.execute(
+                        "SELECT path, mtime, size FROM media "
+                        "WHERE path >= ? AND path < ?",
+                        _under(folder),
+                    )
+                }
+            changed = []
+            for dirpath, _, filenames in os.walk(folder):
+                for name in filenames:
+                    path = Path(dirpath) / name
+                    kind = media_kind(path)
+                    if kind is None:
+                        continue
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    before = known.pop(str(path), None)
+                    if before == (stat.st_mtime, stat.st_size):
+                        stats.unchanged += 1
+                        continue
+                    if before is None:
+                        stats.added += 1
+                    else:
+                        stats.updated += 1
+                    changed.append(dict(self._row(path, stat, kind), size=stat.st_size))
+            stats.removed += len(known)
+            with self._lock, self._db:
+                self._db.executemany(UPSERT, changed)
+                self._db.executemany(
+                    "DELETE FROM media WHERE path = ?", [(p,) for p in known]
+                )
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    def update_paths(self, paths: Iterable[str | os.PathLike]) -> int:
+        """Re-index or drop individual files; return how many rows changed."""
+        upserts, deletes = [], []
+        for path in paths:
+            path = Path(path)
+            kind = media_kind(path)
+            if kind is None:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                deletes.append((str(path),))
+                continue
+            upserts.append(dict(self._row(path, stat, kind), size=stat.st_size))
+        with self._lock, self._db:
+            self._db.executemany(UPSERT, upserts)
+            removed = self._db.executemany(
+                "DELETE FROM media WHERE path = ?", deletes
+            ).rowcount
+        return len(upserts) + max(removed, 0)
+
+    def remove_tree(self, folder: str | os.PathLike) -> int:
+        """Drop every row under ``folder`` (a directory was deleted or moved)."""
+        with self._lock, self._db:
+            return self._db.execute(
+                "DELETE FROM media WHERE path >= ? AND path < ?", _under(folder)
+            ).rowcount
+
+    def search(
+        self, phrase: str, limit: int = 20, kinds: Iterable[str] | None = None
+    ) -> list[MediaEntry]:
+        """Best matches for ``phrase``: all words if possible, else any word."""
+        kinds = tuple(kinds or ("audio", "video", "playlist"))
+        sql = (
+            f"SELECT media.*, bm25(media_fts, {', '.join(map(str, RANK_WEIGHTS))}) "
+            "AS rank FROM media_fts JOIN media ON media.id = media_fts.rowid "
+            f"WHERE media_fts MATCH ? AND media.kind IN ({', '.join('?' * len(kinds))})"
+            " ORDER BY rank LIMIT ?"
+        )
+        for any_word in (False, True):
+            query = fts_query(phrase, any_word)
+            if not query:
+                return []
+            with self._lock:
+                rows = self._db.execute(sql, (query, *kinds, limit)).fetchall()
+            if rows:
+                return [
+                    MediaEntry(
+                        row["path"],
+                        row["kind"],
+                        row["title"],
+                        row["artist"],
+                        row["album"],
+                        row["genre"],
+                        row["duration"],
+                        -row["rank"],
+                        not any_word,
+                    )
+                    for row in rows
+                ]
+        return []
+
+    def watch(
+        self,
+        stop: threading.Event,
+        poll_interval: float = 300.0,
+        debounce: float = 1.0,
+    ) -> None:
+        """Follow changes under the folders until ``stop`` is set."""
+        if INotify is None:
+            logger.info(f"inotify unavailable; rescanning every {poll_interval}s")
+            while not stop.wait(poll_interval):
+                self.scan()
+            return
+        inotify = INotify()
+        mask = (
+            flags.CLOSE_WRITE
+            | flags.CREATE
+            | flags.DELETE
+            | flags.MOVED_FROM
+            | flags.MOVED_TO
+        )
+        dirs: dict[int, Path] = {}
+
+        def add_tree(folder: Path) -> None:
+            for dirpath, _, _ in os.walk(folder):
+                try:
+                    dirs[inotify.add_watch(dirpath, mask)] = Path(dirpath)
+                except OSError as e:
+                    logger.warning(f"Cannot watch {dirpath}: {e}")
+
+        for folder in self.folders:
+            add_tree(folder)
+        logger.info(f"Watching {len(dirs)} directories")
+        while not stop.is_set():
+            files = set()
+            for event in inotify.read(timeout=1000, read_delay=int(debounce * 1000)):
+                parent = dirs.get(event.wd)
+                if parent is None or not event.name:
+                    continue
+                path = parent / event.name
+                if not event.mask & flags.ISDIR:
+                    files.add(path)
+                elif event.mask & (flags.CREATE | flags.MOVED_TO):
+                    add_tree(path)
+                    self.scan([path])
+                elif event.mask & (flags.DELETE | flags.MOVED_FROM):
+                    self.remove_tree(path)
+            if files:
+                logger.debug(f"Re-indexed {self.update_paths(files)} files")
+        inotify.close()
+
+
+def ocp_result(entry: MediaEntry, confidence: int) -> dict[str, Any]:
+    """An OCP search result for ``entry``."""
+    result = {
+        "title": entry.title,
+        "artist": entry.artist,
+        "album": entry.album,
+        "length": int(entry.duration * 1000),
+        "media_type": MEDIA_TYPES[entry.kind],
+        "playback": PLAYBACK_VIDEO if entry.kind == "video" else PLAYBACK_AUDIO,
+        "match_confidence": confidence,
+        "skill_id": SKILL_ID,
+    }
+    if entry.kind != "playlist":
+        return dict(result, uri=Path(entry.path).as_uri())
+    items = playlist_entries(entry.path)
+    return dict(
+        result,
+        playlist=[
+            dict(
+                result,
+                uri=item if "://" in item else Path(item).as_uri(),
+                title=Path(unquote(urlparse(item).path)).stem,
+            )
+            for item in items
+        ],
+    )
+
+
+class MediaIndexService:
+    """Answers ``ovos.common_play.query`` from a ``MediaIndex``."""
+
+    def __init__(
+        self,
+        index: MediaIndex,
+        send: Callable[[str, dict[str, Any]], None],
+        limit: int = 20,
+    ):
+        self.index = index
+        self.send = send
+        self.limit = limit
+
+    def results(self, phrase: str, question_type: int = 0) -> list[dict[str, Any]]:
+        """OCP results, the best match scored highest."""
+        entries = self.index.search(
+            phrase, self.limit, QUESTION_KINDS.get(question_type)
+        )
+        if not entries:
+            return []
+        best = entries[0].score or 1.0
+        # Every query word matched: 60-90; only some words: 30-60.
+        base = 60 if entries[0].all_words else 30
+        return [
+            ocp_result(entry, int(base + 30 * min(entry.score / best, 1.0)))
+            for entry in entries
+        ]
+
+    def on_query(self, message: Any) -> None:
+        """Reply to one OCP query."""
+        phrase = message.data.get("phrase", "")
+        started = time.perf_counter()
+        results = self.results(phrase, message.data.get("question_type", 0))
+        self.send(
+            RESPONSE_MESSAGE,
+            {
+                "phrase": phrase,
+                "skill_id": SKILL_ID,
+                "results": results,
+                "searching": False,
+            },
+        )
+        logger.info(
+            f"{phrase!r}: {len(results)} results in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+    def attach(self, bus: Any) -> None:
+        """Subscribe to OCP queries on an ``ovos_bus_client`` bus."""
+        bus.on(QUERY_MESSAGE, self.on_query)
+
+
+def run(index: MediaIndex, poll_interval: float) -> None:
+    """Scan, answer OCP queries and follow folder changes."""
+    if MessageBusClient is None:
+        raise MediaIndexError(
+            "ovos-bus-client is required; use the media_index service"
+        )
+    stats = index.scan()
+    logger.info(
+        f"Indexed {len(index)} items ({stats.added} new, {stats.updated} changed, "
+        f"{stats.removed} removed) in {stats.seconds:.1f}s"
+    )
+    bus = MessageBusClient(**bus_settings())
+    service = MediaIndexService(
+        index, lambda msg_type, data: bus.emit(Message(msg_type, data))
+    )
+    service.attach(bus)
+    bus.run_in_thread()
+    index.watch(threading.Event(), poll_interval)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Local media library index")
+    parser.add_argument("--index", type=Path, default=INDEX_PATH)
+    parser.add_argument(
+        "--folder",
+        action="append",
+        type=Path,
+        help="media folder (repeatable; default: ovos.common_play settings)",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("scan", help="index new and changed files")
+    search = sub.add_parser("search", help="query the index")
+    search.add_argument("phrase")
+    search.add_argument("--limit", type=int, default=10)
+    run_cmd = sub.add_parser("run", help="serve OCP queries and follow changes")
+    run_cmd.add_argument("--poll-interval", type=float, default=300.0)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        index = MediaIndex(args.index, args.folder or media_folders())
+        if args.command == "scan":
+            stats = index.scan()
+            print(
+                f"{len(index)} items: {stats.added} added, {stats.updated} updated, "
+                f"{stats.removed} removed, {stats.unchanged} unchanged "
+                f"in {stats.seconds:.2f}s"
+            )
+        elif args.command == "search":
+            started = time.perf_counter()
+            entries = index.search(args.phrase, args.limit)
+            for entry in entries:
+                print(
+                    f"{entry.score:6.2f}  {entry.kind:<8} {entry.title}  {entry.path}"
+                )
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"{len(entries)} results in {elapsed:.1f} ms")
+        else:
+            run(index, args.poll_interval)
+    except MediaIndexError as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
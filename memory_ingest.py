@@ -0,0 +1,401 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Batched ingestion of household knowledge into the ``qdrant`` "AI memory".
+
+Documents are streamed from their sources, embedded in batches on a small
+worker pool and upserted into the ``stack_memory`` collection in large
+batches. Sources:
+
+* ``ha`` - Home Assistant entity descriptions (name, domain, device class,
+  unit; never the state, which changes too often to be worth embedding),
+* ``notes`` - text and markdown files, split into paragraph chunks,
+* ``conversations`` - the summary and turns saved by ``conversation_memory``,
+* ``frigate`` - one-line summaries of Frigate events.
+
+Every document has a stable id (``uuid5`` of source and key) and a content
+digest. A checkpoint file records the digest of everything upserted, so an
+interrupted run resumes where it stopped and a re-run only embeds documents
+that are new or changed. The checkpoint is written after each upsert, never
+ahead of what Qdrant has acknowledged.
+
+At most ``concurrency`` embedding batches are in flight; the reader blocks
+when they are all busy, so a large notes folder never piles up in memory.
+Ollama 0.1.32 has no multi-input embeddings endpoint, so a batch is one
+request per text on its worker.
+
+Usage::
+
+    python memory_ingest.py run --sources ha notes --notes ~/notes
+    python memory_ingest.py run --sources frigate --batch-size 32 --concurrency 2
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from conversation_memory import STATE_PATH as CONVERSATION_PATH
+from embedding_cache import cached_embed
+from ha_client import HomeAssistantClient
+from llm_backends import OllamaBackend
+from qdrant_store import QdrantStore
+from stack_config import DEFAULT_DATA_DIR, service_url
+from stack_http import ServiceError, request_json
+
+logger = logging.getLogger("memory_ingest")
+
+COLLECTION = "stack_memory"
+CHECKPOINT_PATH = DEFAULT_DATA_DIR / "memory_ingest.json"
+NOTES_PATH = DEFAULT_DATA_DIR / "notes"
+NOTE_SUFFIXES = (".md", ".txt")
+MAX_CHUNK_CHARS = 1500
+
+
+class IngestError(Exception):
+    """Raised when a source or the checkpoint file cannot be read or written."""
+
+
+@dataclass
+class Document:
+    """One piece of text to embed, with payload metadata."""
+
+    source: str
+    key: str
+    text: str
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def point_id(self) -> str:
+        """Stable Qdrant point id, so re-ingesting replaces the point."""
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{self.source}:{self.key}"))
+
+    @property
+    def digest(self) -> str:
+        """Content hash used to skip unchanged documents."""
+        return hashlib.sha256(self.text.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class IngestStats:
+    """Counters of one ingestion run."""
+
+    seen: int = 0
+    skipped: int = 0
+    upserted: int = 0
+    failed: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def docs_per_second(self) -> float:
+        """Documents embedded and upserted per second of wall time."""
+        return self.upserted / self.seconds if self.seconds else 0.0
+
+
+class Checkpoint:
+    """Digest of every document already in Qdrant, keyed by point id."""
+
+    def __init__(self, path: str | os.PathLike | None = CHECKPOINT_PATH):
+        self.path = Path(path) if path else None
+        self.digests: dict[str, str] = {}
+        if self.path and self.path.exists():
+            try:
+                self.digests = json.loads(self.path.read_text("utf-8"))
+            except (OSError, json.JSONDecodeError) as e:
+                raise IngestError(f"Cannot read checkpoint {self.path}: {e}") from e
+
+    def done(self, document: Document) -> bool:
+        """True if ``document`` was ingested with the same content."""
+        return self.digests.get(document.point_id) == document.digest
+
+    def mark(self, documents: Iterable[Document]) -> None:
+        """Record ``documents`` as ingested and persist atomically."""
+        for document in documents:
+            self.digests[document.point_id] = document.digest
+        if self.path is None:
+            return
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(self.digests), "utf-8")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            raise IngestError(f"Cannot write checkpoint {self.path}: {e}") from e
+
+
+def chunk_text(text: str, max_chars: int = MAX_CHUNK_CHARS) -> list[str]:
+    """Split ``text`` on blank lines into chunks of at most ``max_chars``."""
+    chunks: list[str] = []
+    current = ""
+    for paragraph in (p.strip() for p in text.split("\n\n")):
+        if not paragraph:
+            continue
+        while len(paragraph) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def ha_documents(client: HomeAssistantClient) -> Iterator[Document]:
+    """Describe each Home Assistant entity in one sentence."""
+    for state in client.states():
+        entity_id = state["entity_id"]
+        domain = entity_id.split(".", 1)[0]
+        attributes = state.get("attributes", {})
+        name = attributes.get("friendly_name", entity_id)
+        text = f"{name} ({entity_id}) is a Home Assistant {domain}"
+        if attributes.get("device_class"):
+            text += f" of class {attributes['device_class']}"
+        if attributes.get("unit_of_measurement"):
+            text += f" measured in {attributes['unit_of_measurement']}"
+        yield Document(
+            "ha", entity_id, text + ".", {"entity_id": entity_id, "domain": domain}
+        )
+
+
+def note_documents(root: str | os.PathLike = NOTES_PATH) -> Iterator[Document]:
+    """Paragraph chunks of every note under ``root``."""
+    root = Path(root)
+    for path in sorted(root.rglob("*")):
+        if path.suffix.lower() not in NOTE_SUFFIXES or not path.is_file():
+            continue
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError as e:
+            logger.warning(f"Skipping {path}: {e}")
+            continue
+        relative = str(path.relative_to(root))
+        for i, chunk in enumerate(chunk_text(text)):
+            yield Document("notes", f"{relative}#{i}", chunk, {"path": relative})
+
+
+def conversation_documents(
+    path: str | os.PathLike = CONVERSATION_PATH,
+) -> Iterator[Document]:
+    """The saved conversation summary and each saved exchange."""
+    if not Path(path).exists():
+        logger.info(f"No saved conversation at {path}")
+        return
+    try:
+        data = json.loads(Path(path).read_text("utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        raise IngestError(f"Cannot read conversations from {path}: {e}") from e
+    if data.get("summary"):
+        yield Document("conversations", "summary", data["summary"])
+    for turn in data.get("turns", []):
+        text = f"User: {turn['user']}\nAssistant: {turn['assistant']}"
+        yield Document(
+            "conversations",
+            str(turn["timestamp"]),
+            text,
+            {"timestamp": turn["timestamp"]},
+        )
+
+
+def frigate_documents(
+    base_url: str | None = None, limit: int = 500, timeout: float = 10.0
+) -> Iterator[Document]:
+    """Summaries of the latest Frigate events from its HTTP API."""
+    base_url = (base_url or service_url("frigate")).rstrip("/")
+    events = request_json("GET", f"{base_url}/api/events?limit={limit}", None, timeout)
+    for event in events:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(event["start_time"]))
+        label = event.get("sub_label") or event["label"]
+        text = f"{label} seen by camera {event['camera']} at {when}"
+        if event.get("zones"):
+            text += f" in {', '.join(event['zones'])}"
+        yield Document(
+            "frigate",
+            event["id"],
+            text + ".",
+            {"camera": event["camera"], "start_time": event["start_time"]},
+        )
+
+
+class IngestPipeline:
+    """Embeds documents in parallel batches and upserts them into Qdrant."""
+
+    def __init__(
+        self,
+        embed: Callable[[str], list[float]],
+        store: QdrantStore,
+        collection: str = COLLECTION,
+        batch_size: int = 32,
+        upsert_size: int = 256,
+        concurrency: int = 4,
+        checkpoint: Checkpoint | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.embed = embed
+        self.store = store
+        self.collection = collection
+        self.batch_size = batch_size
+        self.upsert_size = upsert_size
+        self.concurrency = concurrency
+        self.checkpoint = checkpoint or Checkpoint(None)
+        self.clock = clock
+        self._ready = False
+
+    def _embed_batch(self, batch: list[Document]) -> list[dict[str, Any]]:
+        return [
+            {
+                "id": document.point_id,
+                "vector": self.embed(document.text),
+                "payload": {
+                    **document.metadata,
+                    "source": document.source,
+                    "key": document.key,
+                    "text": document.text,
+                    "ingested_at": time.time(),
+                },
+            }
+            for document in batch
+        ]
+
+    def _flush(self, points: list[dict[str, Any]], documents: list[Document]) -> None:
+        if not points:
+            return
+        if not self._ready:
+            self.store.ensure_collection(
+                self.collection,
+                len(points[0]["vector"]),
+                payload_indexes={"source": "keyword"},
+            )
+            self._ready = True
+        self.store.upsert(self.collection, points)
+        self.checkpoint.mark(documents)
+
+    def run(self, documents: Iterable[Document]) -> IngestStats:
+        """Ingest ``documents``; unchanged ones are skipped via the checkpoint."""
+        stats = IngestStats()
+        started = self.clock()
+        in_flight: list[tuple[Future, list[Document]]] = []
+        points: list[dict[str, Any]] = []
+        ready: list[Document] = []
+
+        def collect(future: Future, batch: list[Document]) -> None:
+            stats.batches += 1
+            try:
+                points.extend(future.result())
+            except ServiceError as e:
+                stats.failed += len(batch)
+                logger.warning(f"Embedding batch of {len(batch)} failed: {e}")
+                return
+            ready.extend(batch)
+            if len(points) >= self.upsert_size:
+                self._flush(points, ready)
+                stats.upserted += len(points)
+                points.clear()
+                ready.clear()
+
+        with ThreadPoolExecutor(
+            self.concurrency, thread_name_prefix="ingest-embed"
+        ) as pool:
+            batch: list[Document] = []
+            for document in self._fresh(documents, stats):
+                batch.append(document)
+                if len(batch) < self.batch_size:
+                    continue
+                if len(in_flight) >= self.concurrency:
+                    collect(*in_flight.pop(0))
+                in_flight.append((pool.submit(self._embed_batch, batch), batch))
+                batch = []
+            if batch:
+                in_flight.append((pool.submit(self._embed_batch, batch), batch))
+            for future, done in in_flight:
+                collect(future, done)
+        self._flush(points, ready)
+        stats.upserted += len(points)
+        stats.seconds = self.clock() - started
+        return stats
+
+    def _fresh(
+        self, documents: Iterable[Document], stats: IngestStats
+    ) -> Iterator[Document]:
+        for document in documents:
+            stats.seen += 1
+            if self.checkpoint.done(document):
+                stats.skipped += 1
+            else:
+                yield document
+
+
+SOURCES = ("ha", "notes", "conversations", "frigate")
+
+
+def read_sources(names: Iterable[str], notes: Path) -> Iterator[Document]:
+    """Chain the documents of the named sources."""
+    for name in names:
+        logger.info(f"Reading source {name}")
+        if name == "ha":
+            yield from ha_documents(HomeAssistantClient())
+        elif name == "notes":
+            yield from note_documents(notes)
+        elif name == "conversations":
+            yield from conversation_documents()
+        elif name == "frigate":
+            yield from frigate_documents()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Ingest documents into Qdrant")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="embed and upsert the selected sources")
+    run.add_argument("--sources", nargs="+", choices=SOURCES, default=list(SOURCES))
+    run.add_argument("--notes", type=Path, default=NOTES_PATH)
+    run.add_argument("--collection", default=COLLECTION)
+    run.add_argument("--batch-size", type=int, default=32)
+    run.add_argument("--upsert-size", type=int, default=256)
+    run.add_argument("--concurrency", type=int, default=4)
+    run.add_argument("--checkpoint", type=Path, default=CHECKPOINT_PATH)
+    run.add_argument("--full", action="store_true", help="ignore the checkpoint")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        checkpoint = Checkpoint(args.checkpoint)
+        if args.full:
+            checkpoint.digests.clear()
+        pipeline = IngestPipeline(
+            cached_embed(OllamaBackend()),
+            QdrantStore(),
+            args.collection,
+            batch_size=args.batch_size,
+            upsert_size=args.upsert_size,
+            concurrency=args.concurrency,
+            checkpoint=checkpoint,
+        )
+        stats = pipeline.run(read_sources(args.sources, args.notes))
+    except (IngestError, ServiceError) as e:
+        logger.error(str(e))
+        return 1
+    print(
+        f"{stats.seen} seen, {stats.skipped} unchanged, {stats.upserted} upserted, "
+        f"{stats.failed} failed in {stats.seconds:.1f}s "
+        f"({stats.docs_per_second:.1f} docs/s)"
+    )
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
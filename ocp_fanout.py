@@ -0,0 +1,521 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Concurrent ``ovos.common_play`` search with streaming results.
+
+An OCP search broadcasts ``ovos.common_play.query`` and every media skill
+replies with ``ovos.common_play.skill.search_start``, one or more
+``ovos.common_play.query.response`` messages carrying ``results`` (each with
+a ``match_confidence`` of 0-100) and ``ovos.common_play.skill.search_end``.
+Picking a result only after the slowest skill has finished makes "play some
+jazz" as slow as the slowest web search.
+
+``OCPFanout`` queries all skills at once and ranks results as they stream
+in (``StreamingRanker``: sorted by confidence, duplicates by URI dropped):
+
+* the first result at or above ``threshold`` starts playback immediately
+  (``ovos.common_play.play`` with everything ranked so far as playlist);
+* each skill gets its own timeout (``search_timeouts`` in the
+  ``ovos.common_play`` settings, matched by substring of the skill id), and
+  answers after it are ignored;
+* the rest of the search finishes in the background and late results are
+  appended with ``ovos.common_play.playlist.queue``, so "next" and
+  "shuffle" see them;
+* if nothing reaches ``threshold``, the best result above ``min_conf`` is
+  played once the search completes.
+
+``ovos.common_play.search.result`` reports the time to first playback and
+which skills timed out. Searches enter two ways:
+
+* the OCP pipeline's own ``ovos.common_play.query`` (sent when a "play ..."
+  intent matches) is observed rather than answered: the pipeline waits for
+  every skill that announced ``search_start`` to send ``search_end``, so
+  when a skill runs past its timeout the fan-out sends ``search_end`` on its
+  behalf and the pipeline picks from the results it has instead of waiting
+  out its global ``max_timeout``;
+* ``ovos.common_play.search.ask`` ``{"phrase", "question_type"}`` runs the
+  search here, with early playback as above.
+
+``search_start``/``search_end`` carry no phrase; they go to the oldest open
+search still waiting for that skill, as a skill answers queries in order.
+
+Usage (in the ``ocp_fanout`` service or any host that reaches the bus)::
+
+    python ocp_fanout.py run --threshold 70
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from stack_config import bus_settings, conf_path
+
+try:
+    from ovos_bus_client import Message, MessageBusClient
+except ImportError:
+    Message = MessageBusClient = None
+
+logger = logging.getLogger("ocp_fanout")
+
+QUERY_MESSAGE = "ovos.common_play.query"
+RESPONSE_MESSAGE = "ovos.common_play.query.response"
+START_MESSAGE = "ovos.common_play.skill.search_start"
+END_MESSAGE = "ovos.common_play.skill.search_end"
+PLAY_MESSAGE = "ovos.common_play.play"
+QUEUE_MESSAGE = "ovos.common_play.playlist.queue"
+ASK_MESSAGE = "ovos.common_play.search.ask"
+RESULT_MESSAGE = "ovos.common_play.search.result"
+DEFAULT_THRESHOLD = 70.0
+DEFAULT_MIN_CONF = 50.0
+DEFAULT_TIMEOUT = 3.0
+# Substring of the skill id -> seconds; the first match wins.
+DEFAULT_TIMEOUTS = {"media_index": 1.0, "youtube": 6.0, "bandcamp": 5.0}
+# Skills announce ``search_start`` within a few ms; wait this long before
+# treating the set of searching skills as complete.
+ANNOUNCE_WINDOW = 0.25
+
+
+class OCPFanoutError(Exception):
+    """Raised when the bus client is missing or settings are unreadable."""
+
+
+@dataclass(order=True)
+class Ranked:
+    """One search result in ranking order."""
+
+    sort_key: tuple[float, int]
+    skill_id: str = field(compare=False)
+    result: dict[str, Any] = field(compare=False)
+
+    @property
+    def confidence(self) -> float:
+        """``match_confidence`` of the result."""
+        return -self.sort_key[0]
+
+
+class StreamingRanker:
+    """Results kept sorted by confidence as they arrive."""
+
+    def __init__(self):
+        self._items: list[Ranked] = []
+        self._seen: set[str] = set()
+        self._order = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, skill_id: str, results: list[dict[str, Any]]) -> list[Ranked]:
+        """Insert new results; return the ones that were not duplicates."""
+        added = []
+        for result in results:
+            key = result.get("uri") or f"{skill_id}:{result.get('title', '')}"
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            conf = float(result.get("match_confidence", 0))
+            item = Ranked((-conf, next(self._order)), skill_id, result)
+            bisect.insort(self._items, item)
+            added.append(item)
+        return added
+
+    def best(self) -> Ranked | None:
+        """Highest-confidence result so far."""
+        return self._items[0] if self._items else None
+
+    def ranked(self) -> list[Ranked]:
+        """All results, best first."""
+        return list(self._items)
+
+
+def load_timeouts(
+    path: str | os.PathLike | None = None,
+) -> tuple[dict[str, float], float]:
+    """Per-skill search timeouts and the default from the OCP settings."""
+    path = (
+        Path(path)
+        if path
+        else conf_path().parent / "apps" / "ovos.common_play" / "settings.json"
+    )
+    if not path.exists():
+        return dict(DEFAULT_TIMEOUTS), DEFAULT_TIMEOUT
+    try:
+        settings = json.loads(path.read_text("utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        raise OCPFanoutError(f"Cannot read {path}: {e}") from e
+    timeouts = dict(settings.get("search_timeouts", DEFAULT_TIMEOUTS))
+    return timeouts, float(settings.get("search_default_timeout", DEFAULT_TIMEOUT))
+
+
+class SearchRound:
+    """Results of one search, collected until every skill finished or timed out."""
+
+    def __init__(
+        self,
+        phrase: str,
+        question_type: int,
+        timeout_for: Callable[[str], float],
+        threshold: float,
+        announce_window: float = ANNOUNCE_WINDOW,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.phrase = phrase
+        self.question_type = question_type
+        self.timeout_for = timeout_for
+        self.threshold = threshold
+        self.announce_window = announce_window
+        self.clock = clock
+        self.started = clock()
+        self.ranker = StreamingRanker()
+        self.searching: dict[str, float] = {}
+        self.finished: set[str] = set()
+        self.timed_out: set[str] = set()
+        self.played: Ranked | None = None
+        self.first_play: float | None = None
+        self.queued: set[int] = set()
+        self.reason = ""
+        self.closed = False
+        self.done = threading.Event()
+        self._changed = threading.Condition()
+
+    def on_start(self, skill_id: str) -> None:
+        """A skill announced that it is searching."""
+        with self._changed:
+            if not self.closed:
+                self.searching.setdefault(skill_id, self.clock())
+                self._changed.notify_all()
+
+    def on_response(self, data: dict[str, Any]) -> None:
+        """Handle results (or the end of the search) from one skill."""
+        skill_id = data.get("skill_id")
+        if not skill_id:
+            return
+        with self._changed:
+            if self.closed or skill_id in self.timed_out or skill_id in self.finished:
+                return
+            now = self.clock()
+            started = self.searching.setdefault(skill_id, now)
+            if now - started > self.timeout_for(skill_id):
+                self.timed_out.add(skill_id)
+                return
+            self.ranker.add(skill_id, data.get("results") or [])
+            if not data.get("searching"):
+                self.finished.add(skill_id)
+            self._changed.notify_all()
+
+    def on_end(self, skill_id: str) -> None:
+        """A skill finished searching."""
+        self.on_response({"skill_id": skill_id, "searching": False})
+
+    def awaits(self, skill_id: str, starting: bool) -> bool:
+        """Whether a phrase-less ``search_start``/``search_end`` belongs here."""
+        with self._changed:
+            if self.closed:
+                return False
+            if starting:
+                return skill_id not in self.searching
+            return skill_id in self.searching and not (
+                skill_id in self.finished or skill_id in self.timed_out
+            )
+
+    def _next_timeout(self, now: float) -> float:
+        """Mark overdue skills; return seconds until the next one is due."""
+        due = []
+        for skill_id, started in self.searching.items():
+            if skill_id in self.finished or skill_id in self.timed_out:
+                continue
+            left = started + self.timeout_for(skill_id) - now
+            if left <= 0:
+                self.timed_out.add(skill_id)
+            else:
+                due.append(left)
+        return min(due, default=float("inf"))
+
+    def _complete(self, now: float) -> bool:
+        if now - self.started < self.announce_window:
+            return False
+        return not set(self.searching) - self.finished - self.timed_out
+
+    def _wait(self, ready: Callable[[], bool]) -> None:
+        with self._changed:
+            while True:
+                now = self.clock()
+                next_due = self._next_timeout(now)
+                if ready() or self._complete(now):
+                    return
+                announce = self.started + self.announce_window - now
+                wait = next_due if announce <= 0 else min(next_due, announce)
+                self._changed.wait(max(min(wait, 1.0), 0.001))
+
+    def wait_first(self) -> Ranked | None:
+        """Block until a result reaches the threshold or the search completes."""
+
+        def confident() -> bool:
+            best = self.ranker.best()
+            return best is not None and best.confidence >= self.threshold
+
+        self._wait(confident)
+        best = self.ranker.best()
+        return best if best is not None and best.confidence >= self.threshold else None
+
+    def results(self) -> list[Ranked]:
+        """Results so far, best first."""
+        with self._changed:
+            return self.ranker.ranked()
+
+    def wait_complete(self) -> list[Ranked]:
+        """Block until every skill finished or timed out; close the round."""
+        self._wait(lambda: False)
+        with self._changed:
+            self.closed = True
+            return self.ranker.ranked()
+
+
+class OCPFanout:
+    """Runs OCP searches over the bus."""
+
+    def __init__(
+        self,
+        send: Callable[[str, dict[str, Any]], None],
+        timeouts: dict[str, float] | None = None,
+        default_timeout: float = DEFAULT_TIMEOUT,
+        threshold: float = DEFAULT_THRESHOLD,
+        min_conf: float = DEFAULT_MIN_CONF,
+        announce_window: float = ANNOUNCE_WINDOW,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.send = send
+        self.timeouts = DEFAULT_TIMEOUTS if timeouts is None else timeouts
+        self.default_timeout = default_timeout
+        self.threshold = threshold
+        self.min_conf = min_conf
+        self.announce_window = announce_window
+        self.clock = clock
+        self._rounds: dict[str, SearchRound] = {}
+        self._lock = threading.Lock()
+        self._worker = ThreadPoolExecutor(4, thread_name_prefix="ocp-search")
+
+    def timeout_for(self, skill_id: str) -> float:
+        """Seconds ``skill_id`` may search before its results are ignored."""
+        for pattern, timeout in self.timeouts.items():
+            if pattern in skill_id:
+                return float(timeout)
+        return self.default_timeout
+
+    def _play(self, query: SearchRound, best: Ranked) -> None:
+        ranked = query.results()
+        playlist = [item.result for item in ranked]
+        query.queued = {item.sort_key[1] for item in ranked}
+        query.played = best
+        query.first_play = self.clock() - query.started
+        self.send(
+            PLAY_MESSAGE,
+            {"media": best.result, "playlist": playlist, "disambiguation": playlist},
+        )
+        logger.info(
+            f"{query.phrase!r}: playing {best.result.get('title')!r} from "
+            f"{best.skill_id} after {query.first_play:.2f}s"
+        )
+
+    def _finish(self, query: SearchRound) -> None:
+        ranked = query.wait_complete()
+        if query.played is None:
+            best = ranked[0] if ranked else None
+            if best is not None and best.confidence >= self.min_conf:
+                query.reason = "complete"
+                self._play(query, best)
+            else:
+                query.reason = "no match"
+        else:
+            late = [i.result for i in ranked if i.sort_key[1] not in query.queued]
+            if late:
+                self.send(QUEUE_MESSAGE, {"tracks": late})
+        self._report(query, ranked)
+
+    def _release(self, query: SearchRound) -> None:
+        ranked = query.wait_complete()
+        for skill_id in sorted(query.timed_out):
+            self.send(END_MESSAGE, {"skill_id": skill_id, "phrase": query.phrase})
+        query.reason = "observed"
+        self._report(query, ranked)
+
+    def _report(self, query: SearchRound, ranked: list[Ranked]) -> None:
+        self.send(
+            RESULT_MESSAGE,
+            {
+                "phrase": query.phrase,
+                "reason": query.reason,
+                "skill_id": query.played.skill_id if query.played else None,
+                "title": query.played.result.get("title") if query.played else None,
+                "seconds_to_play": (
+                    None if query.first_play is None else round(query.first_play, 3)
+                ),
+                "seconds": round(self.clock() - query.started, 3),
+                "results": len(ranked),
+                "timed_out": sorted(query.timed_out),
+            },
+        )
+        query.done.set()
+
+    def _open(self, phrase: str, question_type: int) -> SearchRound | None:
+        """Register a round for ``phrase``; None if one is already open."""
+        query = SearchRound(
+            phrase,
+            question_type,
+            self.timeout_for,
+            self.threshold,
+            self.announce_window,
+            self.clock,
+        )
+        with self._lock:
+            self._rounds = {
+                p: r for p, r in self._rounds.items() if not r.done.is_set()
+            }
+            if phrase in self._rounds:
+                return None
+            self._rounds[phrase] = query
+        return query
+
+    def search(self, phrase: str, question_type: int = 0) -> SearchRound:
+        """Search every skill; play as soon as a result is good enough.
+
+        Returns once playback started (or the search completed without a
+        confident result). ``done`` is set on the returned round when late
+        results have been queued. A search for a phrase that is still open
+        returns the open round.
+        """
+        query = self._open(phrase, question_type)
+        if query is None:
+            with self._lock:
+                return self._rounds[phrase]
+        self.send(QUERY_MESSAGE, {"phrase": phrase, "question_type": question_type})
+        first = query.wait_first()
+        if first is None:
+            self._finish(query)
+            return query
+        query.reason = "confident"
+        self._play(query, first)
+        self._worker.submit(self._finish, query)
+        return query
+
+    def observe(self, phrase: str, question_type: int = 0) -> SearchRound | None:
+        """Follow a search someone else sent; end it for overdue skills.
+
+        Returns the new round, or None if ``phrase`` is already being
+        searched (the fan-out's own query coming back over the bus).
+        """
+        query = self._open(phrase, question_type)
+        if query is not None:
+            self._worker.submit(self._release, query)
+        return query
+
+    def on_query(self, message: Any) -> None:
+        """Observe the OCP pipeline's ``ovos.common_play.query``."""
+        self.observe(message.data["phrase"], int(message.data.get("question_type", 0)))
+
+    def on_response(self, message: Any) -> None:
+        """Route an ``ovos.common_play.query.response`` to its round."""
+        with self._lock:
+            query = self._rounds.get(message.data.get("phrase", ""))
+        if query is not None:
+            query.on_response(message.data)
+
+    def _on_skill(self, message: Any, starting: bool) -> None:
+        data = message.data
+        skill_id = data.get("skill_id") or message.context.get("skill_id")
+        if not skill_id:
+            return
+        with self._lock:
+            if "phrase" in data:
+                query = self._rounds.get(data["phrase"])
+            else:
+                rounds = (
+                    r for r in self._rounds.values() if r.awaits(skill_id, starting)
+                )
+                query = next(rounds, None)
+        if query is None:
+            return
+        if starting:
+            query.on_start(skill_id)
+        else:
+            query.on_end(skill_id)
+
+    def on_start(self, message: Any) -> None:
+        """Route ``ovos.common_play.skill.search_start`` to its round."""
+        self._on_skill(message, starting=True)
+
+    def on_end(self, message: Any) -> None:
+        """Route ``ovos.common_play.skill.search_end`` to its round."""
+        self._on_skill(message, starting=False)
+
+    def on_ask(self, message: Any) -> None:
+        """Answer ``ovos.common_play.search.ask`` off the bus thread."""
+        self._worker.submit(
+            self.search,
+            message.data["phrase"],
+            int(message.data.get("question_type", 0)),
+        )
+
+    def attach(self, bus: Any) -> None:
+        """Subscribe to skill responses and search requests on a bus."""
+        bus.on(QUERY_MESSAGE, self.on_query)
+        bus.on(RESPONSE_MESSAGE, self.on_response)
+        bus.on(START_MESSAGE, self.on_start)
+        bus.on(END_MESSAGE, self.on_end)
+        bus.on(ASK_MESSAGE, self.on_ask)
+
+
+def run(fanout: OCPFanout) -> None:
+    """Serve OCP searches on the bus until interrupted."""
+    if MessageBusClient is None:
+        raise OCPFanoutError(
+            "ovos-bus-client is required; run inside the ovos container"
+        )
+    bus = MessageBusClient(**bus_settings())
+    fanout.send = lambda msg_type, data: bus.emit(Message(msg_type, data))
+    fanout.attach(bus)
+    bus.run_in_thread()
+    logger.info(f"OCP search fan-out ready (threshold {fanout.threshold})")
+    threading.Event().wait()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Concurrent OCP search")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="serve OCP searches on the bus")
+    run_cmd.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    run_cmd.add_argument("--min-conf", type=float, default=DEFAULT_MIN_CONF)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        timeouts, default_timeout = load_timeouts()
+        fanout = OCPFanout(
+            lambda msg_type, data: None,
+            timeouts,
+            default_timeout,
+            threshold=args.threshold,
+            min_conf=args.min_conf,
+        )
+        run(fanout)
+    except OCPFanoutError as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,591 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Ollama model residency manager: pre-warming, keep-alive policy and LRU eviction.
+
+The pinned ``ollama/ollama:0.1.32`` image unloads a model five minutes after
+its last request, so the first voice question after a quiet spell pays a
+multi-second load. This manager keeps the persona model warm when it is
+likely to be needed and lets it go when it is not:
+
+* at start-up it loads the pinned (persona) models,
+* it learns a decayed request histogram per hour of the week and, during
+  hours that are usually busy (or the hour before), keeps pinned models
+  resident with a long ``keep_alive`` that it refreshes before it runs out,
+* on ``recognizer_loop:wakeword`` it loads cold pinned models while the user
+  is still speaking,
+* when resident models exceed the memory budget, or host free memory drops
+  below a floor, it unloads the least recently used model (pinned models go
+  last).
+
+0.1.32 has no ``/api/ps``, so residency is tracked client-side from the loads
+this manager issues, usage reports and Ollama's own idle timeout. Usage
+reports (``{"model": ..., "load_seconds": ..., "at": ...}``) come from the
+JSON-lines log that ``OllamaBackend`` clients write when ``OLLAMA_USAGE_LOG``
+is set (``llm_router`` does, so every routed Ollama request is counted) and
+from ``ovos.llm.usage`` bus messages when ovos-bus-client is installed.
+Load, unload, eviction and cold-hit events are logged, emitted on the bus as
+``ovos.llm.residency`` and counted in ``ovos_config/data/ollama_residency.json``.
+
+Usage::
+
+    python ollama_residency.py run --pin llama3:8b --budget-gb 14
+    python ollama_residency.py status
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from llm_backends import DEFAULT_MODEL, USAGE_LOG, OllamaBackend
+from stack_config import DEFAULT_DATA_DIR, available_memory, bus_settings
+from stack_http import ServiceError
+
+try:
+    from ovos_bus_client import Message, MessageBusClient
+except ImportError:
+    Message = MessageBusClient = None
+
+logger = logging.getLogger("ollama_residency")
+
+STATE_PATH = DEFAULT_DATA_DIR / "ollama_residency.json"
+EVENT_MESSAGE = "ovos.llm.residency"
+USAGE_MESSAGE = "ovos.llm.usage"
+PREWARM_MESSAGE = "recognizer_loop:wakeword"
+# Ollama's idle timeout for requests that do not set keep_alive.
+OLLAMA_KEEP_ALIVE = 300.0
+COLD_LOAD_SECONDS = 1.0
+HOURS_PER_WEEK = 7 * 24
+
+
+class ResidencyError(Exception):
+    """Raised when the residency state file cannot be read or written."""
+
+
+class UsageProfile:
+    """Exponentially decayed request counts per hour of the week."""
+
+    def __init__(
+        self,
+        half_life_days: float = 14.0,
+        counts: list[float] | None = None,
+        updated: float = 0.0,
+    ):
+        self.half_life = half_life_days * 86400
+        self.counts = list(counts) if counts else [0.0] * HOURS_PER_WEEK
+        self.updated = updated
+
+    @staticmethod
+    def bucket(timestamp: float) -> int:
+        """Local hour of the week (Monday 00:00 is 0)."""
+        local = time.localtime(timestamp)
+        return local.tm_wday * 24 + local.tm_hour
+
+    def _decay(self, now: float) -> None:
+        if self.updated and now > self.updated:
+            factor = 0.5 ** ((now - self.updated) / self.half_life)
+            self.counts = [count * factor for count in self.counts]
+        self.updated = max(self.updated, now)
+
+    def record(self, timestamp: float) -> None:
+        """Count one request at ``timestamp``."""
+        self._decay(timestamp)
+        self.counts[self.bucket(timestamp)] += 1.0
+
+    def activity(self, timestamp: float, lookahead_hours: int = 1) -> float:
+        """Busiest of this hour and the next ``lookahead_hours``, scaled 0..1.
+
+        Looking ahead means the model is warm before a usually busy hour
+        starts rather than after its first request.
+        """
+        peak = max(self.counts)
+        if peak <= 0:
+            return 0.0
+        start = self.bucket(timestamp)
+        upcoming = (
+            self.counts[(start + i) % HOURS_PER_WEEK]
+            for i in range(lookahead_hours + 1)
+        )
+        return max(upcoming) / peak
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-serialisable form."""
+        return {
+            "half_life_days": self.half_life / 86400,
+            "counts": [round(count, 4) for count in self.counts],
+            "updated": self.updated,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "UsageProfile":
+        """Inverse of ``to_dict``."""
+        counts = data.get("counts")
+        if counts is not None and len(counts) != HOURS_PER_WEEK:
+            raise ResidencyError(f"Usage profile needs {HOURS_PER_WEEK} hourly counts")
+        return cls(data.get("half_life_days", 14.0), counts, data.get("updated", 0.0))
+
+
+class UsageTail:
+    """Follows the usage log from where it was last read.
+
+    Starts at the end of an existing log (earlier reports are already in the
+    saved profile) and rotates the log to ``<name>.1`` past ``max_bytes``.
+    """
+
+    def __init__(self, path: str | os.PathLike, max_bytes: int = 1_000_000):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.offset = self.path.stat().st_size if self.path.exists() else 0
+
+    def _read_from(self, path: Path) -> list[dict[str, Any]]:
+        try:
+            if path.stat().st_size < self.offset:
+                self.offset = 0  # replaced or truncated by someone else
+            with open(path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            self.offset = 0
+            return []
+        complete = data.rfind(b"\n") + 1  # leave a half-written line for later
+        self.offset += complete
+        reports = []
+        for line in data[:complete].splitlines():
+            try:
+                reports.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping malformed usage line: {line[:80]!r}")
+        return reports
+
+    def read(self) -> list[dict[str, Any]]:
+        """Reports appended since the last call."""
+        reports = self._read_from(self.path)
+        if self.offset > self.max_bytes:
+            rotated = self.path.with_name(self.path.name + ".1")
+            try:
+                os.replace(self.path, rotated)
+            except OSError as e:
+                logger.warning(f"Cannot rotate {self.path}: {e}")
+                return reports
+            reports += self._read_from(rotated)  # appended just before the move
+            self.offset = 0
+        return reports
+
+
+@dataclass
+class ModelState:
+    """What the manager knows about one model."""
+
+    name: str
+    size: int = 0
+    resident: bool = False
+    expires_at: float = 0.0
+    last_used: float = 0.0
+    loads: int = 0
+    cold_hits: int = 0
+    evictions: int = 0
+
+
+class ResidencyManager:
+    """Decides which Ollama models stay loaded and for how long."""
+
+    def __init__(
+        self,
+        backend: OllamaBackend,
+        pinned: list[str],
+        budget_bytes: int | None = None,
+        min_free_bytes: int | None = None,
+        active_keep_alive: float = 3600.0,
+        idle_keep_alive: float = OLLAMA_KEEP_ALIVE,
+        activity_threshold: float = 0.25,
+        profile: UsageProfile | None = None,
+        free_memory: Callable[[], int | None] = available_memory,
+        send: Callable[[str, dict[str, Any]], None] | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.backend = backend
+        self.pinned = list(pinned)
+        self.budget_bytes = budget_bytes
+        self.min_free_bytes = min_free_bytes
+        self.active_keep_alive = active_keep_alive
+        self.idle_keep_alive = idle_keep_alive
+        self.activity_threshold = activity_threshold
+        self.profile = profile or UsageProfile()
+        self.free_memory = free_memory
+        self.send = send
+        self.clock = clock
+        # Least recently used first.
+        self.models: OrderedDict[str, ModelState] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _state(self, model: str) -> ModelState:
+        if model not in self.models:
+            self.models[model] = ModelState(model)
+        return self.models[model]
+
+    def _emit(self, event: str, state: ModelState, **extra: Any) -> None:
+        details = " ".join(f"{key}={value}" for key, value in extra.items())
+        logger.info(f"{event} {state.name} {details}".rstrip())
+        if self.send is not None:
+            self.send(
+                EVENT_MESSAGE,
+                dict(
+                    extra,
+                    event=event,
+                    model=state.name,
+                    loads=state.loads,
+                    cold_hits=state.cold_hits,
+                ),
+            )
+
+    def is_resident(self, model: str, now: float | None = None) -> bool:
+        """Whether ``model`` should still be loaded in Ollama."""
+        state = self.models.get(model)
+        now = self.clock() if now is None else now
+        return bool(state and state.resident and state.expires_at > now)
+
+    def refresh_sizes(self) -> None:
+        """Read model sizes from ``/api/tags`` for the memory budget."""
+        sizes = self.backend.installed_models()
+        with self._lock:
+            for name, size in sizes.items():
+                self._state(name).size = size
+        missing = [model for model in self.pinned if model not in sizes]
+        if missing:
+            logger.warning(f"Pinned models not pulled in Ollama: {', '.join(missing)}")
+
+    def keep_alive_for(self, now: float) -> float:
+        """Keep-alive to request at ``now`` based on the usage profile."""
+        if self.profile.activity(now) >= self.activity_threshold:
+            return self.active_keep_alive
+        return self.idle_keep_alive
+
+    def _resident_bytes(self, now: float) -> int:
+        return sum(
+            s.size for s in self.models.values() if self.is_resident(s.name, now)
+        )
+
+    def _victim(self, now: float, keep: str | None) -> ModelState | None:
+        candidates = [
+            state
+            for state in self.models.values()
+            if state.name != keep and self.is_resident(state.name, now)
+        ]
+        # Stable sort keeps LRU order within the unpinned and pinned groups.
+        candidates.sort(key=lambda state: state.name in self.pinned)
+        return candidates[0] if candidates else None
+
+    def _make_room(self, now: float, incoming: str | None = None) -> None:
+        extra = 0
+        if incoming is not None and not self.is_resident(incoming, now):
+            extra = self._state(incoming).size
+        while (
+            self.budget_bytes is not None
+            and self._resident_bytes(now) + extra > self.budget_bytes
+        ):
+            victim = self._victim(now, incoming)
+            if victim is None:
+                break
+            self._unload(victim, "budget")
+        free = self.free_memory() if self.min_free_bytes is not None else None
+        if free is not None and free < self.min_free_bytes:
+            # One model per check: freed memory shows up in /proc with a lag.
+            victim = self._victim(now, incoming)
+            if victim is not None:
+                self._unload(victim, "memory_pressure")
+
+    def _load(self, model: str, keep_alive: float, reason: str) -> None:
+        now = self.clock()
+        self._make_room(now, incoming=model)
+        state = self._state(model)
+        was_resident = self.is_resident(model, now)
+        started = time.perf_counter()
+        self.backend.keep_alive(model, keep_alive)
+        seconds = time.perf_counter() - started
+        state.resident = True
+        state.expires_at = now + keep_alive
+        self.models.move_to_end(model)
+        if not was_resident:
+            state.loads += 1
+            self._emit(
+                "load", state, reason=reason, seconds=round(seconds, 3), keep=keep_alive
+            )
+
+    def _unload(self, state: ModelState, reason: str) -> None:
+        self.backend.keep_alive(state.name, 0)
+        state.resident = False
+        state.expires_at = 0.0
+        state.evictions += 1
+        self._emit("unload", state, reason=reason)
+
+    def record_use(
+        self,
+        model: str,
+        load_seconds: float | None = None,
+        timestamp: float | None = None,
+    ) -> bool:
+        """Account for a request served by Ollama; return True if it was cold.
+
+        ``load_seconds`` is the ``load_duration`` Ollama reported for the
+        request; without it, a request to a model believed unloaded is cold.
+        """
+        now = self.clock() if timestamp is None else timestamp
+        with self._lock:
+            self.profile.record(now)
+            state = self._state(model)
+            was_resident = self.is_resident(model, now)
+            cold = (
+                load_seconds >= COLD_LOAD_SECONDS
+                if load_seconds is not None
+                else not was_resident
+            )
+            if cold:
+                state.cold_hits += 1
+                self._emit("cold_hit", state, load_seconds=load_seconds)
+            if not was_resident:
+                state.loads += 1
+            state.resident = True
+            state.last_used = now
+            # Requests without keep_alive reset Ollama's timer to its default,
+            # even after a long pre-load; the next tick extends it again.
+            state.expires_at = now + self.idle_keep_alive
+            self.models.move_to_end(model)
+            self._make_room(now, incoming=model)
+        return cold
+
+    def prewarm(self, reason: str = "prewarm") -> None:
+        """Load every pinned model that is not resident."""
+        with self._lock:
+            now = self.clock()
+            keep = self.keep_alive_for(now)
+            for model in self.pinned:
+                if not self.is_resident(model, now):
+                    self._load(model, keep, reason)
+
+    def tick(self) -> None:
+        """Expire, refresh and evict; call periodically."""
+        with self._lock:
+            now = self.clock()
+            for state in self.models.values():
+                if state.resident and state.expires_at <= now:
+                    state.resident = False
+                    self._emit("unload", state, reason="expired")
+            if self.keep_alive_for(now) == self.active_keep_alive:
+                for model in self.pinned:
+                    state = self._state(model)
+                    remaining = state.expires_at - now if state.resident else 0.0
+                    if remaining < self.active_keep_alive / 2:
+                        self._load(model, self.active_keep_alive, "schedule")
+            self._make_room(now)
+
+    def record_report(self, data: dict[str, Any]) -> bool | None:
+        """``record_use`` for one usage report; None if it names no model."""
+        if not data.get("model"):
+            logger.warning(f"Ignoring usage report without a model: {data!r}")
+            return None
+        load_seconds = data.get("load_seconds")
+        return self.record_use(
+            data["model"],
+            None if load_seconds is None else float(load_seconds),
+            data.get("at"),
+        )
+
+    def on_usage(self, message: Any) -> None:
+        """Bus handler for ``ovos.llm.usage``."""
+        self.record_report(getattr(message, "data", None) or {})
+
+    def on_wakeword(self, message: Any) -> None:
+        """Bus handler: load cold pinned models while the user is speaking."""
+        threading.Thread(
+            target=self._safe_prewarm, args=("wakeword",), daemon=True
+        ).start()
+
+    def _safe_prewarm(self, reason: str) -> None:
+        try:
+            self.prewarm(reason)
+        except ServiceError as e:
+            logger.warning(f"Pre-warm failed: {e}")
+
+    def attach(self, bus: Any) -> None:
+        """Subscribe to usage reports and wake words."""
+        bus.on(USAGE_MESSAGE, self.on_usage)
+        bus.on(PREWARM_MESSAGE, self.on_wakeword)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Per-model counters plus the usage profile."""
+        with self._lock:
+            return {
+                "models": {name: asdict(state) for name, state in self.models.items()},
+                "profile": self.profile.to_dict(),
+                "saved_at": self.clock(),
+            }
+
+    def save(self, path: str | os.PathLike = STATE_PATH) -> None:
+        """Write the snapshot atomically (its mtime doubles as a heartbeat)."""
+        path = Path(path)
+        tmp = path.with_suffix(".tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(self.snapshot(), indent=2), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as e:
+            raise ResidencyError(f"Cannot write {path}: {e}") from e
+
+    def restore(self, path: str | os.PathLike = STATE_PATH) -> None:
+        """Load counters and the usage profile saved by ``save``.
+
+        Residency itself is not restored: Ollama may have restarted since.
+        """
+        data = read_state(path)
+        with self._lock:
+            self.profile = UsageProfile.from_dict(data.get("profile", {}))
+            for name, fields in data.get("models", {}).items():
+                state = ModelState(**fields)
+                state.resident, state.expires_at = False, 0.0
+                self.models[name] = state
+
+
+def read_state(path: str | os.PathLike = STATE_PATH) -> dict[str, Any]:
+    """Read a saved residency snapshot."""
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except OSError as e:
+        raise ResidencyError(f"Cannot read {path}: {e}") from e
+    except json.JSONDecodeError as e:
+        raise ResidencyError(f"{path} is not valid JSON: {e}") from e
+
+
+def format_status(data: dict[str, Any], threshold: float = 0.25) -> str:
+    """Counters per model and the busy hours of each weekday."""
+    lines = [f"{'model':<28} {'loads':>6} {'cold':>6} {'evict':>6}  last used"]
+    for name, state in data.get("models", {}).items():
+        last = (
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(state["last_used"]))
+            if state["last_used"]
+            else "-"
+        )
+        lines.append(
+            f"{name:<28} {state['loads']:>6} {state['cold_hits']:>6} "
+            f"{state['evictions']:>6}  {last}"
+        )
+    profile = UsageProfile.from_dict(data.get("profile", {}))
+    peak = max(profile.counts)
+    lines.append("")
+    lines.append("busy hours (>= {:.0%} of peak):".format(threshold))
+    for day, name in enumerate(("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")):
+        counts = profile.counts[day * 24 : day * 24 + 24]
+        busy = [
+            f"{hour:02d}"
+            for hour, count in enumerate(counts)
+            if peak > 0 and count / peak >= threshold
+        ]
+        lines.append(f"  {name}  {' '.join(busy) or '-'}")
+    return "\n".join(lines)
+
+
+def run(
+    manager: ResidencyManager,
+    state_path: Path,
+    interval: float,
+    usage_log: Path | None = None,
+    usage_interval: float = 2.0,
+) -> None:
+    """Pre-load, then tick and save every ``interval`` seconds forever.
+
+    The usage log, if given, is read every ``usage_interval`` seconds so cold
+    hits are reported while they are still news.
+    """
+    if state_path.exists():
+        manager.restore(state_path)
+    tail = UsageTail(usage_log) if usage_log else None
+    if MessageBusClient is not None:
+        bus = MessageBusClient(**bus_settings())
+        manager.send = lambda msg_type, data: bus.emit(Message(msg_type, data))
+        manager.attach(bus)
+        bus.run_in_thread()
+    else:
+        logger.info("ovos-bus-client not installed; running without bus events")
+    while True:
+        try:
+            manager.refresh_sizes()
+            manager.prewarm("startup")
+            break
+        except ServiceError as e:
+            logger.warning(f"Ollama not ready, retrying: {e}")
+            time.sleep(min(interval, 10.0))
+    next_tick = 0.0
+    while True:
+        if tail is not None:
+            for report in tail.read():
+                manager.record_report(report)
+                next_tick = 0.0  # re-issue the long keep-alive it just reset
+        if time.monotonic() >= next_tick:
+            next_tick = time.monotonic() + interval
+            try:
+                manager.tick()
+            except ServiceError as e:
+                logger.warning(f"Residency tick failed: {e}")
+            manager.save(state_path)
+        time.sleep(usage_interval if tail is not None else interval)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Ollama model residency manager")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="manage residency until interrupted")
+    run_cmd.add_argument(
+        "--pin",
+        action="append",
+        help="persona model to keep warm (repeatable; default OLLAMA_MODEL)",
+    )
+    run_cmd.add_argument("--budget-gb", type=float, help="max bytes of loaded models")
+    run_cmd.add_argument("--min-free-gb", type=float, help="evict below this free RAM")
+    run_cmd.add_argument("--active-keep-alive", type=float, default=3600.0)
+    run_cmd.add_argument("--threshold", type=float, default=0.25)
+    run_cmd.add_argument("--interval", type=float, default=60.0)
+    run_cmd.add_argument("--state", type=Path, default=STATE_PATH)
+    run_cmd.add_argument(
+        "--usage-log",
+        type=Path,
+        default=USAGE_LOG,
+        help="JSON-lines usage log written by OLLAMA_USAGE_LOG clients",
+    )
+    status = sub.add_parser("status", help="print counters and busy hours")
+    status.add_argument("--state", type=Path, default=STATE_PATH)
+    status.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        if args.command == "status":
+            print(format_status(read_state(args.state), args.threshold))
+            return 0
+        manager = ResidencyManager(
+            OllamaBackend(timeout=300.0),
+            args.pin or [os.environ.get("OLLAMA_MODEL", DEFAULT_MODEL)],
+            budget_bytes=int(args.budget_gb * 1e9) if args.budget_gb else None,
+            min_free_bytes=int(args.min_free_gb * 1e9) if args.min_free_gb else None,
+            active_keep_alive=args.active_keep_alive,
+            activity_threshold=args.threshold,
+        )
+        run(manager, args.state, args.interval, args.usage_log)
+    except ResidencyError as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,300 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Persona prompt assembly with a stable, cacheable prefix.
+
+Ollama (llama.cpp) and TGI reuse the KV cache of the longest prompt prefix
+they saw last, so anything that changes between turns should sit as late in
+the prompt as possible. ``PersonaPrompt`` lays the prompt out as::
+
+    system  persona instructions + household details   (changes on config edits)
+    prompt  conversation summary + recent turns        (append-only between folds)
+            recalled facts, current time, HA states    (per question)
+            User: <question>
+
+Location, timezone and units come from ``mycroft.conf``; they only change
+when the file does, so they belong to the stable prefix. The time is rounded
+to the minute and Home Assistant states are sorted by entity id so the same
+situation always renders identically.
+
+``measure`` replays questions against ``ollama`` twice, once with the
+volatile block first (the old layout) and once stable-first, and reports
+Ollama's ``prompt_eval_count`` per turn: tokens Ollama actually had to
+prefill, so the difference is the prefill saved by prefix reuse.
+
+``PersonaPrompt.answer`` (the ``ask`` command) runs a question through the
+LLM behind ``semantic_cache``: a paraphrase of an earlier question is answered
+from the cache before any prompt is built. Answers that depend on live device
+states are never cached.
+
+Usage::
+
+    python persona_prompt.py show "is the garage door open"
+    python persona_prompt.py ask "how far away is the moon"
+    python persona_prompt.py measure --turns 8 --entity cover.garage_door
+"""
+
+import argparse
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from conversation_memory import HISTORY_PATH, ConversationMemory, read_history
+from embedding_cache import cached_embed
+from ha_client import HomeAssistantClient
+from llm_backends import OllamaBackend
+from semantic_cache import SemanticCache
+from stack_config import ConfigError, load_mycroft_conf
+from stack_http import ServiceError
+from vector_mirror import mirrored_store
+
+logger = logging.getLogger("persona_prompt")
+
+DEFAULT_PERSONA = (
+    "You are the household's voice assistant. Your replies are spoken aloud, "
+    "so answer in one to three short sentences without lists or markdown."
+)
+
+
+def household_details(conf: dict[str, Any]) -> str:
+    """Static facts about the home from ``mycroft.conf``."""
+    lines = []
+    location = conf.get("location", {})
+    place = ", ".join(
+        location[key] for key in ("city", "state", "country") if location.get(key)
+    )
+    if place:
+        lines.append(f"The household is in {place}.")
+    timezone = conf.get("timezone", {}).get("code")
+    if timezone:
+        lines.append(f"Local timezone: {timezone}.")
+    units = conf.get("units", {})
+    if units.get("system"):
+        lines.append(f"Use {units['system']} units.")
+    return " ".join(lines)
+
+
+def format_time(now: float, conf: dict[str, Any]) -> str:
+    """Local time to the minute, in the configured 12/24-hour style."""
+    twelve_hour = conf.get("units", {}).get("time", 12) == 12
+    clock = "%I:%M %p" if twelve_hour else "%H:%M"
+    return time.strftime(f"%A %d %B %Y, {clock}", time.localtime(now))
+
+
+def format_states(states: list[dict[str, Any]], entities: list[str] | None) -> str:
+    """Selected Home Assistant states, one sorted line each."""
+    wanted = set(entities) if entities else None
+    lines = []
+    for state in sorted(states, key=lambda s: s["entity_id"]):
+        if wanted is not None and state["entity_id"] not in wanted:
+            continue
+        attributes = state.get("attributes", {})
+        name = attributes.get("friendly_name", state["entity_id"])
+        unit = attributes.get("unit_of_measurement", "")
+        lines.append(f"- {name}: {state['state']}{' ' + unit if unit else ''}")
+    return "\n".join(lines)
+
+
+class PersonaPrompt:
+    """Builds ``(system, prompt)`` pairs with the volatile part last."""
+
+    def __init__(
+        self,
+        persona: str = DEFAULT_PERSONA,
+        conf: dict[str, Any] | None = None,
+        states: Callable[[], list[dict[str, Any]]] | None = None,
+        entities: list[str] | None = None,
+        memory: ConversationMemory | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        if conf is None:
+            try:
+                conf = load_mycroft_conf()
+            except ConfigError as e:
+                logger.warning(f"Household details unavailable: {e}")
+                conf = {}
+        self.conf = conf
+        self.states = states
+        self.entities = entities
+        self.memory = memory
+        self.clock = clock
+        details = household_details(conf)
+        self.system = f"{persona}\n\n{details}" if details else persona
+
+    def volatile(self) -> str:
+        """Per-question context: current time and device states."""
+        parts = [f"Current time: {format_time(self.clock(), self.conf)}"]
+        if self.states is not None:
+            try:
+                rendered = format_states(self.states(), self.entities)
+            except ServiceError as e:
+                logger.warning(f"Home Assistant states unavailable: {e}")
+                rendered = ""
+            if rendered:
+                parts.append(f"Device states:\n{rendered}")
+        return "\n".join(parts)
+
+    def build(self, question: str, stable_first: bool = True) -> tuple[str, str]:
+        """System prompt and prompt for ``question``.
+
+        ``stable_first=False`` renders the old volatile-first layout, kept
+        only so ``measure`` can compare the two.
+        """
+        volatile = self.volatile()
+        if not stable_first:
+            system = f"{volatile}\n\n{self.system}"
+            volatile = ""
+        else:
+            system = self.system
+        if self.memory is not None:
+            return system, self.memory.build_prompt(question, volatile)
+        prompt = f"User: {question}\nAssistant:"
+        return system, f"{volatile}\n\n{prompt}" if volatile else prompt
+
+    def answer(
+        self,
+        question: str,
+        generate: Callable[[str, str], str],
+        cache: SemanticCache | None = None,
+    ) -> str:
+        """Answer ``question`` with ``generate(prompt, system)``.
+
+        A ``cache`` hit skips both prompt assembly and the LLM; it is not
+        consulted when ``states`` are rendered into the prompt. The exchange
+        goes into the conversation memory either way.
+        """
+
+        def run(text: str) -> str:
+            system, prompt = self.build(text)
+            return generate(prompt, system).strip()
+
+        if cache is None or self.states is not None:
+            answer = run(question)
+        else:
+            answer = cache.answer(question, run)
+        if self.memory is not None:
+            self.memory.add_turn(question, answer)
+        return answer
+
+
+@dataclass
+class TurnPrefill:
+    """Prefill work Ollama reported for one turn."""
+
+    turn: int
+    prompt_tokens: int
+    prefill_ms: float
+
+
+def measure_prefill(
+    backend: OllamaBackend,
+    persona: PersonaPrompt,
+    questions: list[str],
+    stable_first: bool,
+    turn_seconds: float = 60.0,
+) -> list[TurnPrefill]:
+    """Replay ``questions`` as one conversation and record Ollama's prefill.
+
+    The clock advances ``turn_seconds`` per turn so the time line changes
+    like it does in a real conversation. Only one token is generated per
+    turn; the answer text is irrelevant to prefill.
+    """
+    start = time.time()
+    results = []
+    for turn, question in enumerate(questions):
+        persona.clock = lambda turn=turn: start + turn * turn_seconds
+        system, prompt = persona.build(question, stable_first)
+        result = backend.generate_raw(prompt, system, options={"num_predict": 1})
+        if persona.memory is not None:
+            persona.memory.add_turn(question, "(answer)")
+        results.append(
+            TurnPrefill(
+                turn + 1,
+                int(result.get("prompt_eval_count") or 0),
+                (result.get("prompt_eval_duration") or 0) / 1e6,
+            )
+        )
+    return results
+
+
+def format_comparison(old: list[TurnPrefill], new: list[TurnPrefill]) -> str:
+    """Per-turn prefill of both layouts and the tokens saved."""
+    lines = [
+        f"{'turn':>4} {'old tok':>8} {'new tok':>8} {'saved':>6} "
+        f"{'old ms':>7} {'new ms':>7}"
+    ]
+    for o, n in zip(old, new):
+        lines.append(
+            f"{o.turn:>4} {o.prompt_tokens:>8} {n.prompt_tokens:>8} "
+            f"{o.prompt_tokens - n.prompt_tokens:>6} {o.prefill_ms:>7.0f} "
+            f"{n.prefill_ms:>7.0f}"
+        )
+    # The first turn is cold in both layouts.
+    warm = list(zip(old, new))[1:]
+    if warm:
+        saved = sum(o.prompt_tokens - n.prompt_tokens for o, n in warm) / len(warm)
+        lines.append(f"mean prefill tokens saved per warm turn: {saved:.1f}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Persona prompt assembly")
+    parser.add_argument("--persona", default=DEFAULT_PERSONA)
+    parser.add_argument(
+        "--entity", action="append", help="HA entity to include (repeatable)"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="print the assembled prompt")
+    show.add_argument("question")
+    ask = sub.add_parser("ask", help="answer a question through the cache")
+    ask.add_argument("question")
+    ask.add_argument("--no-cache", action="store_true")
+    measure = sub.add_parser("measure", help="compare prefill of both layouts")
+    measure.add_argument("--history", default=HISTORY_PATH)
+    measure.add_argument("--turns", type=int, default=8)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    states = HomeAssistantClient().states if args.entity else None
+    try:
+        if args.command == "show":
+            system, prompt = PersonaPrompt(
+                args.persona, states=states, entities=args.entity
+            ).build(args.question)
+            print(f"--- system ---\n{system}\n--- prompt ---\n{prompt}")
+            return 0
+        backend = OllamaBackend()
+        if args.command == "ask":
+            cache = None
+            if not args.no_cache:
+                cache = SemanticCache(
+                    cached_embed(backend),
+                    mirrored_store(),
+                    namespace=f"{backend.model}:{args.persona}",
+                )
+            persona = PersonaPrompt(args.persona, states=states, entities=args.entity)
+            print(persona.answer(args.question, backend.generate, cache))
+            return 0
+        questions = read_history(args.history)[: args.turns]
+        runs = []
+        for stable_first in (False, True):
+            memory = ConversationMemory(
+                lambda summary, turns: summary, keep_turns=len(questions) + 1
+            )
+            persona = PersonaPrompt(
+                args.persona, states=states, entities=args.entity, memory=memory
+            )
+            runs.append(measure_prefill(backend, persona, questions, stable_first))
+    except ServiceError as e:
+        logger.error(str(e))
+        return 1
+    print(format_comparison(*runs))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,140 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Thin client for the ``qdrant`` service's REST API (port 6333).
+
+Only the calls the stack's memory and cache tools need are wrapped; every
+method maps to one documented Qdrant endpoint.
+"""
+
+from typing import Any
+
+from stack_config import service_url
+from stack_http import ServiceError, request_bytes, request_json
+
+
+class QdrantStore:
+    """Collection management, upsert, search and delete against Qdrant."""
+
+    def __init__(self, base_url: str | None = None, timeout: float = 10.0):
+        self.base_url = (base_url or service_url("qdrant")).rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, method: str, path: str, body: Any | None = None) -> Any:
+        result = request_json(method, f"{self.base_url}{path}", body, self.timeout)
+        return result.get("result") if isinstance(result, dict) else result
+
+    def collection_exists(self, name: str) -> bool:
+        """True if collection ``name`` exists."""
+        try:
+            self._call("GET", f"/collections/{name}")
+        except ServiceError as e:
+            if e.status == 404:
+                return False
+            raise
+        return True
+
+    def ensure_collection(
+        self,
+        name: str,
+        size: int,
+        distance: str = "Cosine",
+        payload_indexes: dict[str, str] | None = None,
+        config: dict[str, Any] | None = None,
+    ) -> bool:
+        """Create ``name`` if missing; return True when it was created.
+
+        ``config`` adds collection settings such as ``hnsw_config``,
+        ``quantization_config`` or ``on_disk_payload``; a ``vectors`` entry is
+        merged into the vector parameters (e.g. ``{"on_disk": true}``).
+        """
+        if self.collection_exists(name):
+            return False
+        config = dict(config or {})
+        vectors = {"size": size, "distance": distance, **config.pop("vectors", {})}
+        self._call("PUT", f"/collections/{name}", {"vectors": vectors, **config})
+        for field_name, schema in (payload_indexes or {}).items():
+            self._call(
+                "PUT",
+                f"/collections/{name}/index?wait=true",
+                {"field_name": field_name, "field_schema": schema},
+            )
+        return True
+
+    def update_collection(self, name: str, config: dict[str, Any]) -> None:
+        """Change the settings of an existing collection (``PATCH``)."""
+        self._call("PATCH", f"/collections/{name}", config)
+
+    def collection_info(self, name: str) -> dict[str, Any]:
+        """Status, point counts and configuration of ``name``."""
+        return self._call("GET", f"/collections/{name}")
+
+    def delete_collection(self, name: str) -> None:
+        """Drop ``name`` and all its points."""
+        self._call("DELETE", f"/collections/{name}")
+
+    def metrics(self) -> str:
+        """Prometheus text from ``/metrics`` (includes memory gauges)."""
+        payload = request_bytes("GET", f"{self.base_url}/metrics", None, self.timeout)
+        return payload.decode("utf-8", "replace")
+
+    def upsert(
+        self, name: str, points: list[dict[str, Any]], wait: bool = True
+    ) -> None:
+        """Insert or replace points (``{"id", "vector", "payload"}`` dicts)."""
+        self._call(
+            "PUT",
+            f"/collections/{name}/points?wait={str(wait).lower()}",
+            {"points": points},
+        )
+
+    def search(
+        self,
+        name: str,
+        vector: list[float],
+        limit: int = 5,
+        score_threshold: float | None = None,
+        query_filter: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
+        with_payload: bool = True,
+        with_vector: bool = False,
+    ) -> list[dict[str, Any]]:
+        """Nearest neighbours of ``vector`` with their scores and payloads.
+
+        ``params`` are search parameters such as ``hnsw_ef`` or quantization
+        rescoring.
+        """
+        body: dict[str, Any] = {
+            "vector": vector,
+            "limit": limit,
+            "with_payload": with_payload,
+        }
+        if with_vector:
+            body["with_vector"] = True
+        if score_threshold is not None:
+            body["score_threshold"] = score_threshold
+        if query_filter:
+            body["filter"] = query_filter
+        if params:
+            body["params"] = params
+        return self._call("POST", f"/collections/{name}/points/search", body) or []
+
+    def scroll(
+        self, name: str, limit: int = 256, offset: Any | None = None
+    ) -> tuple[list[dict[str, Any]], Any | None]:
+        """One page of points with vectors and payloads, and the next offset."""
+        body: dict[str, Any] = {
+            "limit": limit,
+            "with_payload": True,
+            "with_vector": True,
+        }
+        if offset is not None:
+            body["offset"] = offset
+        result = self._call("POST", f"/collections/{name}/points/scroll", body) or {}
+        return result.get("points", []), result.get("next_page_offset")
+
+    def delete(self, name: str, query_filter: dict[str, Any]) -> None:
+        """Delete every point matching ``query_filter``."""
+        self._call(
+            "POST",
+            f"/collections/{name}/points/delete?wait=true",
+            {"filter": query_filter},
+        )
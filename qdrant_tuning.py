@@ -0,0 +1,420 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Collection tuning profiles and benchmark for the ``qdrant`` service.
+
+Qdrant shares a small host with ``xtts`` and ``ollama``, so its resident
+memory competes with model weights. A profile bundles the settings that
+trade RAM for recall and latency:
+
+* ``hnsw_config`` - graph degree ``m`` and ``ef_construct``,
+* ``quantization_config`` - int8 scalar (4x smaller) or binary (32x) codes
+  kept in RAM while the full vectors live on disk,
+* ``vectors.on_disk`` / ``on_disk_payload`` - page vectors and payloads
+  from disk instead of holding them in RAM,
+* search ``params`` - ``hnsw_ef`` and quantization rescoring/oversampling.
+
+``apply`` creates the stack's memory collections (``persona_facts``,
+``persona_answer_cache``, ``stack_memory``) with a profile, or patches them
+if they exist. ``bench`` loads synthetic clustered vectors into a scratch
+collection per profile and size and reports recall@k against exact brute
+force (computed chunk-wise with NumPy), query latency and the growth of
+Qdrant's ``memory_resident_bytes`` gauge. Resident memory is process-wide,
+so run the benchmark against an otherwise idle instance.
+
+Usage::
+
+    python qdrant_tuning.py profiles
+    python qdrant_tuning.py apply --profile ram_lean --size 768
+    python qdrant_tuning.py bench --profiles default ram_lean binary \\
+        --sizes 10000 100000 1000000
+"""
+
+import argparse
+import logging
+import re
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from conversation_memory import FACTS_COLLECTION
+from memory_ingest import COLLECTION as MEMORY_COLLECTION
+from qdrant_store import QdrantStore
+from semantic_cache import COLLECTION as CACHE_COLLECTION
+from stack_http import ServiceError
+
+logger = logging.getLogger("qdrant_tuning")
+
+DEFAULT_DIM = 768  # nomic-embed-text
+STACK_COLLECTIONS = {
+    FACTS_COLLECTION: {"namespace": "keyword"},
+    CACHE_COLLECTION: {"namespace": "keyword", "created_at": "float"},
+    MEMORY_COLLECTION: {"source": "keyword"},
+}
+
+
+class TuningError(Exception):
+    """Raised when a profile is unknown or a benchmark cannot proceed."""
+
+
+@dataclass
+class Profile:
+    """Collection settings plus the search parameters that go with them."""
+
+    name: str
+    description: str
+    config: dict[str, Any] = field(default_factory=dict)
+    search: dict[str, Any] = field(default_factory=dict)
+
+
+def _quantized(
+    name: str,
+    description: str,
+    kind: str,
+    oversampling: float,
+    m: int = 16,
+    hnsw_ef: int = 64,
+) -> Profile:
+    if kind == "scalar":
+        quantization = {"scalar": {"type": "int8", "quantile": 0.99}}
+    else:
+        quantization = {"binary": {}}
+    quantization[kind]["always_ram"] = True
+    return Profile(
+        name,
+        description,
+        {
+            "vectors": {"on_disk": True},
+            "hnsw_config": {"m": m, "ef_construct": 100},
+            "quantization_config": quantization,
+            "on_disk_payload": True,
+        },
+        {
+            "hnsw_ef": hnsw_ef,
+            "quantization": {"rescore": True, "oversampling": oversampling},
+        },
+    )
+
+
+PROFILES = {
+    "default": Profile("default", "Qdrant defaults: everything in RAM"),
+    "ram_lean": _quantized(
+        "ram_lean",
+        "int8 codes in RAM, full vectors and payloads on disk, rescored",
+        "scalar",
+        2.0,
+    ),
+    "binary": _quantized(
+        "binary",
+        "1-bit codes in RAM, full vectors on disk, 3x oversampled rescoring",
+        "binary",
+        3.0,
+    ),
+    "small_graph": _quantized(
+        "small_graph",
+        "ram_lean with a sparser HNSW graph (m=8) and lower hnsw_ef",
+        "scalar",
+        2.0,
+        m=8,
+        hnsw_ef=32,
+    ),
+}
+
+
+def build_profile(
+    name: str,
+    m: int | None = None,
+    ef_construct: int | None = None,
+    hnsw_ef: int | None = None,
+    quantization: str | None = None,
+    on_disk: bool | None = None,
+) -> Profile:
+    """Profile ``name`` with individual settings overridden."""
+    if name not in PROFILES:
+        raise TuningError(f"Unknown profile {name!r}; choose from {sorted(PROFILES)}")
+    base = PROFILES[name]
+    config = {
+        key: dict(value) if isinstance(value, dict) else value
+        for key, value in base.config.items()
+    }
+    search = dict(base.search)
+    hnsw = config.setdefault("hnsw_config", {})
+    if m is not None:
+        hnsw["m"] = m
+    if ef_construct is not None:
+        hnsw["ef_construct"] = ef_construct
+    if not hnsw:
+        del config["hnsw_config"]
+    if hnsw_ef is not None:
+        search["hnsw_ef"] = hnsw_ef
+    if quantization == "none":
+        config.pop("quantization_config", None)
+        search.pop("quantization", None)
+    elif quantization:
+        oversampling = 2.0 if quantization == "scalar" else 3.0
+        quantized = _quantized(name, "", quantization, oversampling)
+        config["quantization_config"] = quantized.config["quantization_config"]
+        search["quantization"] = quantized.search["quantization"]
+    if on_disk is not None:
+        config["vectors"] = {"on_disk": on_disk}
+        config["on_disk_payload"] = on_disk
+    return Profile(name, base.description, config, search)
+
+
+def patch_body(profile: Profile) -> dict[str, Any]:
+    """``PATCH /collections/{name}`` body that moves a collection to ``profile``."""
+    config = profile.config
+    body: dict[str, Any] = {
+        "quantization_config": config.get("quantization_config", "Disabled"),
+        "params": {"on_disk_payload": config.get("on_disk_payload", False)},
+        "vectors": {"": {"on_disk": config.get("vectors", {}).get("on_disk", False)}},
+    }
+    if "hnsw_config" in config:
+        body["hnsw_config"] = config["hnsw_config"]
+    return body
+
+
+def apply_profile(store: QdrantStore, profile: Profile, size: int) -> list[str]:
+    """Create or patch the stack's memory collections; return what changed."""
+    changes = []
+    for name, indexes in STACK_COLLECTIONS.items():
+        if store.ensure_collection(
+            name, size, payload_indexes=indexes, config=profile.config
+        ):
+            changes.append(f"created {name}")
+        else:
+            store.update_collection(name, patch_body(profile))
+            changes.append(f"patched {name}")
+    return changes
+
+
+def vector_chunk(
+    seed: int, index: int, count: int, dim: int, clusters: int = 64
+) -> np.ndarray:
+    """Deterministic unit vectors drawn around ``clusters`` centres.
+
+    Real embeddings are clustered by topic; uniform noise would make HNSW
+    look worse than it is. Chunk ``index`` 0 is reserved for queries.
+    """
+    centres = np.random.default_rng(seed).normal(size=(clusters, dim))
+    rng = np.random.default_rng([seed, index])
+    vectors = centres[rng.integers(clusters, size=count)]
+    vectors += rng.normal(scale=0.6, size=(count, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def corpus_chunks(
+    seed: int, n: int, dim: int, chunk: int
+) -> Iterator[tuple[int, np.ndarray]]:
+    """``(first_id, vectors)`` chunks of an ``n``-vector corpus."""
+    for i, start in enumerate(range(0, n, chunk)):
+        yield start, vector_chunk(seed, i + 1, min(chunk, n - start), dim)
+
+
+def exact_top_k(
+    queries: np.ndarray, chunks: Iterator[tuple[int, np.ndarray]], k: int
+) -> np.ndarray:
+    """Ids of the ``k`` best cosine matches per query, by brute force.
+
+    Processes the corpus chunk by chunk so 1M x 768 never sits in RAM.
+    """
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.full((len(queries), k), -1, dtype=np.int64)
+    for start, vectors in chunks:
+        scores = queries @ vectors.T
+        ids = np.broadcast_to(np.arange(start, start + len(vectors)), scores.shape)
+        all_scores = np.concatenate([best_scores, scores], axis=1)
+        all_ids = np.concatenate([best_ids, ids], axis=1)
+        top = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(all_scores, top, axis=1)
+        best_ids = np.take_along_axis(all_ids, top, axis=1)
+    return best_ids
+
+
+def recall_at_k(found: list[list[int]], exact: np.ndarray) -> float:
+    """Mean fraction of the exact top-k that the index returned."""
+    k = exact.shape[1]
+    return float(
+        np.mean([len(set(f) & set(e.tolist())) / k for f, e in zip(found, exact)])
+    )
+
+
+def resident_bytes(store: QdrantStore) -> float | None:
+    """Qdrant's ``memory_resident_bytes`` gauge, if exposed."""
+    try:
+        text = store.metrics()
+    except ServiceError as e:
+        logger.warning(f"Cannot read Qdrant metrics: {e}")
+        return None
+    match = re.search(r"^memory_resident_bytes(?:\{[^}]*\})? (\S+)$", text, re.M)
+    return float(match.group(1)) if match else None
+
+
+@dataclass
+class BenchResult:
+    """One profile at one corpus size."""
+
+    profile: str
+    vectors: int
+    recall: float
+    p50_ms: float
+    p95_ms: float
+    upload_seconds: float
+    ram_mb: float | None
+
+
+def wait_indexed(store: QdrantStore, name: str, timeout: float = 3600.0) -> None:
+    """Block until Qdrant's optimizers have finished building the index."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = store.collection_info(name)
+        if info.get("status") == "green":
+            return
+        time.sleep(1.0)
+    raise TuningError(f"{name} was not indexed within {timeout:.0f}s")
+
+
+def run_case(
+    store: QdrantStore,
+    profile: Profile,
+    n: int,
+    dim: int = DEFAULT_DIM,
+    k: int = 10,
+    queries: int = 100,
+    seed: int = 7,
+    batch: int = 1000,
+    keep: bool = False,
+    clock: Callable[[], float] = time.perf_counter,
+) -> BenchResult:
+    """Load ``n`` vectors under ``profile``, then measure recall and latency."""
+    name = f"bench_{profile.name}_{n}"
+    if store.collection_exists(name):
+        store.delete_collection(name)
+    ram_before = resident_bytes(store)
+    store.ensure_collection(name, dim, config=profile.config)
+    started = clock()
+    for start, vectors in corpus_chunks(seed, n, dim, batch):
+        points = [
+            {"id": start + i, "vector": vector.tolist(), "payload": {"n": start + i}}
+            for i, vector in enumerate(np.round(vectors, 5))
+        ]
+        store.upsert(name, points, wait=False)
+    wait_indexed(store, name)
+    upload_seconds = clock() - started
+
+    query_vectors = vector_chunk(seed, 0, queries, dim)
+    exact = exact_top_k(query_vectors, corpus_chunks(seed, n, dim, batch), k)
+    found, latencies = [], []
+    for query in query_vectors:
+        started = clock()
+        hits = store.search(
+            name, query.tolist(), limit=k, params=profile.search, with_payload=False
+        )
+        latencies.append((clock() - started) * 1000)
+        found.append([hit["id"] for hit in hits])
+    ram_after = resident_bytes(store)
+    if not keep:
+        store.delete_collection(name)
+    ram_mb = None
+    if ram_before is not None and ram_after is not None:
+        ram_mb = (ram_after - ram_before) / 2**20
+    return BenchResult(
+        profile.name,
+        n,
+        recall_at_k(found, exact),
+        float(np.percentile(latencies, 50)),
+        float(np.percentile(latencies, 95)),
+        upload_seconds,
+        ram_mb,
+    )
+
+
+def format_results(results: list[BenchResult]) -> str:
+    """Benchmark results as a fixed-width table."""
+    lines = [
+        f"{'profile':<12} {'vectors':>9} {'recall':>7} {'p50 ms':>7} "
+        f"{'p95 ms':>7} {'load s':>8} {'RAM MB':>8}"
+    ]
+    for r in results:
+        ram = "-" if r.ram_mb is None else f"{r.ram_mb:.0f}"
+        lines.append(
+            f"{r.profile:<12} {r.vectors:>9} {r.recall:>7.3f} {r.p50_ms:>7.2f} "
+            f"{r.p95_ms:>7.2f} {r.upload_seconds:>8.1f} {ram:>8}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Qdrant tuning profiles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("profiles", help="list the built-in profiles")
+    apply = sub.add_parser("apply", help="create or patch the memory collections")
+    apply.add_argument("--profile", default="ram_lean")
+    apply.add_argument("--size", type=int, default=DEFAULT_DIM, help="vector size")
+    apply.add_argument("--m", type=int)
+    apply.add_argument("--ef-construct", type=int)
+    apply.add_argument(
+        "--quantization", choices=("none", "scalar", "binary"), default=None
+    )
+    apply.add_argument("--on-disk", action=argparse.BooleanOptionalAction, default=None)
+    bench = sub.add_parser("bench", help="recall/latency/RAM per profile and size")
+    bench.add_argument("--profiles", nargs="+", default=list(PROFILES))
+    bench.add_argument(
+        "--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000]
+    )
+    bench.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    bench.add_argument("--queries", type=int, default=100)
+    bench.add_argument("-k", type=int, default=10)
+    bench.add_argument("--hnsw-ef", type=int, help="override search hnsw_ef")
+    bench.add_argument("--keep", action="store_true", help="keep bench collections")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    if args.command == "profiles":
+        for profile in PROFILES.values():
+            print(f"{profile.name:<12} {profile.description}")
+        return 0
+    store = QdrantStore(timeout=120.0)
+    try:
+        if args.command == "apply":
+            profile = build_profile(
+                args.profile,
+                m=args.m,
+                ef_construct=args.ef_construct,
+                quantization=args.quantization,
+                on_disk=args.on_disk,
+            )
+            for change in apply_profile(store, profile, args.size):
+                print(change)
+            return 0
+        results = []
+        for n in args.sizes:
+            for name in args.profiles:
+                profile = build_profile(name, hnsw_ef=args.hnsw_ef)
+                logger.info(f"Benchmarking {name} with {n} vectors")
+                results.append(
+                    run_case(
+                        store,
+                        profile,
+                        n,
+                        args.dim,
+                        args.k,
+                        args.queries,
+                        keep=args.keep,
+                    )
+                )
+    except (TuningError, ServiceError) as e:
+        logger.error(str(e))
+        return 1
+    print(format_results(results))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
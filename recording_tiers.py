@@ -0,0 +1,567 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tiered retention and a time index for Frigate recordings.
+
+Frigate writes 10 second segments to
+``frigate/media/recordings/YYYY-MM-DD/HH/<camera>/MM.SS.mp4`` (UTC) on the
+SSD and keeps them for ``record.retain.days``. ``RecordingTiers`` adds
+tiers on top:
+
+* ``hot``: segments younger than ``hot_days`` stay where Frigate wrote them;
+* ``bulk``: older segments move to ``frigate/archive`` (bind this to the
+  bulk disk) under the same relative path;
+* ``event``: after ``full_days`` only bulk segments within ``padding``
+  seconds of a Frigate event are kept, so the archive thins to event clips;
+* after ``keep_days`` segments and their events are deleted.
+
+Set Frigate's ``record.retain.days`` above ``hot_days`` so segments move
+before Frigate deletes them. Frigate's UI only plays the hot tier; older
+footage is found through this index.
+
+Every segment is a row in SQLite, keyed by ``(camera, start)`` in a
+``WITHOUT ROWID`` table, so the rows are a B-tree sorted by time per camera.
+"The driveway at 3 pm yesterday" is one ``seek`` (O(log n)) instead of a
+directory walk, and a time range is that seek plus the rows it returns.
+``scan`` only lists hour directories it has not finished before. Frigate's
+``/api/events`` are copied into the same database so thinning still knows
+which segments to keep after Frigate has forgotten the events. If the event
+sync fails, nothing is thinned in that round.
+
+Usage::
+
+    python recording_tiers.py run --hot-days 2 --full-days 7 --keep-days 30
+    python recording_tiers.py seek driveway "yesterday 3pm"
+    python recording_tiers.py seek driveway "2026-10-18 15:00" --seconds 60
+    python recording_tiers.py stats
+"""
+
+import argparse
+import bisect
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from stack_config import DEFAULT_DATA_DIR, REPO_ROOT, service_url
+from stack_http import ServiceError, request_json
+
+logger = logging.getLogger("recording_tiers")
+
+HOT_DIR = REPO_ROOT / "frigate" / "media" / "recordings"
+BULK_DIR = REPO_ROOT / "frigate" / "archive"
+INDEX_PATH = DEFAULT_DATA_DIR / "recording_index.sqlite"
+DAY = 24 * 3600
+SEGMENT_SECONDS = 10.0
+DEFAULT_HOT_DAYS = 2.0
+DEFAULT_FULL_DAYS = 7.0
+DEFAULT_KEEP_DAYS = 30.0
+DEFAULT_PADDING = 15.0
+# Events are re-read this far back so ones that were still running get ends.
+EVENT_OVERLAP = 6 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    camera TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    tier TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (camera, start)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS segments_tier ON segments (tier, start);
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    camera TEXT NOT NULL,
+    label TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL
+);
+CREATE INDEX IF NOT EXISTS events_time ON events (camera, start);
+CREATE TABLE IF NOT EXISTS scanned (hour TEXT PRIMARY KEY);
+"""
+SEGMENT_NAME = re.compile(r"^(\d{2})\.(\d{2})\.mp4$")
+WHEN = re.compile(
+    r"^(?:(today|yesterday)\s+)?(\d{1,2})(?::(\d{2}))?\s*(am|pm)?$", re.IGNORECASE
+)
+
+
+class RecordingTiersError(Exception):
+    """Raised when the index cannot be used or a time cannot be parsed."""
+
+
+@dataclass
+class Segment:
+    """One indexed recording segment."""
+
+    camera: str
+    start: float
+    end: float
+    tier: str
+    path: str
+    size: int
+
+
+@dataclass
+class TierReport:
+    """What one retention pass did."""
+
+    indexed: int = 0
+    events: int = 0
+    moved: int = 0
+    thinned: int = 0
+    expired: int = 0
+    missing: int = 0
+    freed_bytes: int = 0
+    seconds: float = 0.0
+
+
+def hour_start(day: str, hour: str) -> float | None:
+    """UTC timestamp of the ``YYYY-MM-DD``/``HH`` directory pair, else None."""
+    try:
+        started = datetime.strptime(f"{day} {hour}", "%Y-%m-%d %H")
+    except ValueError:
+        return None
+    return started.replace(tzinfo=timezone.utc).timestamp()
+
+
+def segment_start(relative: Path) -> float | None:
+    """UTC start of ``YYYY-MM-DD/HH/<camera>/MM.SS.mp4``, else None."""
+    parts = relative.parts
+    match = SEGMENT_NAME.match(parts[-1]) if len(parts) == 4 else None
+    hour = hour_start(parts[0], parts[1]) if match else None
+    if hour is None:
+        return None
+    return hour + int(match[1]) * 60 + int(match[2])
+
+
+def parse_when(text: str, now: datetime | None = None) -> float:
+    """Timestamp of a local time: ISO ``2026-10-18 15:00`` or ``yesterday 3pm``."""
+    now = now or datetime.now().astimezone()
+    text = text.strip()
+    try:
+        moment = datetime.fromisoformat(text)
+    except ValueError:
+        match = WHEN.match(text)
+        if match is None:
+            raise RecordingTiersError(
+                f"Unknown time {text!r}; use 'YYYY-MM-DD HH:MM' or 'yesterday 3pm'"
+            ) from None
+        day, hour, minute, half = match.groups()
+        hour, minute = int(hour), int(minute or 0)
+        if half:
+            if not 1 <= hour <= 12:
+                raise RecordingTiersError(f"Unknown time {text!r}")
+            hour = hour % 12 + (12 if half.lower() == "pm" else 0)
+        if hour > 23 or minute > 59:
+            raise RecordingTiersError(f"Unknown time {text!r}")
+        moment = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if (day or "").lower() == "yesterday":
+            moment -= timedelta(days=1)
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    return moment.timestamp()
+
+
+def frigate_events(
+    after: float, base_url: str | None = None, limit: int = 500
+) -> list[dict[str, Any]]:
+    """Every Frigate event starting after ``after``, newest first."""
+    base_url = (base_url or service_url("frigate")).rstrip("/")
+    events: list[dict[str, Any]] = []
+    before = None
+    while True:
+        url = f"{base_url}/api/events?after={after:.0f}&limit={limit}"
+        if before is not None:
+            url += f"&before={before}"
+        page = request_json("GET", url, None, 30.0) or []
+        events += page
+        if len(page) < limit:
+            return events
+        before = min(event["start_time"] for event in page)
+
+
+def _merge(intervals: Iterable[tuple[float, float]]) -> list[tuple[float, float]]:
+    merged: list[tuple[float, float]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _overlaps(merged: list[tuple[float, float]], start: float, end: float) -> bool:
+    # The last interval starting before ``end`` is the only candidate.
+    i = bisect.bisect_left(merged, (end,)) - 1
+    return i >= 0 and merged[i][1] > start
+
+
+def _prune_dirs(path: Path, root: Path) -> None:
+    while path != root and path.is_relative_to(root):
+        try:
+            path.rmdir()
+        except OSError:
+            return
+        path = path.parent
+
+
+class RecordingTiers:
+    """Time index of Frigate segments and the retention passes over it."""
+
+    def __init__(
+        self,
+        path: str | os.PathLike = INDEX_PATH,
+        hot_dir: str | os.PathLike = HOT_DIR,
+        bulk_dir: str | os.PathLike = BULK_DIR,
+        hot_days: float = DEFAULT_HOT_DAYS,
+        full_days: float = DEFAULT_FULL_DAYS,
+        keep_days: float = DEFAULT_KEEP_DAYS,
+        padding: float = DEFAULT_PADDING,
+        segment_seconds: float = SEGMENT_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        if not hot_days <= full_days <= keep_days:
+            raise RecordingTiersError(
+                "Expected hot_days <= full_days <= keep_days, got "
+                f"{hot_days}, {full_days}, {keep_days}"
+            )
+        self.hot_dir = Path(hot_dir)
+        self.bulk_dir = Path(bulk_dir)
+        self.hot_days = hot_days
+        self.full_days = full_days
+        self.keep_days = keep_days
+        self.padding = padding
+        self.segment_seconds = segment_seconds
+        self.clock = clock
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            raise RecordingTiersError(f"Cannot open {path}: {e}") from e
+
+    def close(self) -> None:
+        """Close the database."""
+        self._db.close()
+
+    def _scan_tree(self, root: Path, tier: str) -> int:
+        if not root.is_dir():
+            return 0
+        with self._lock:
+            done = {row[0] for row in self._db.execute("SELECT hour FROM scanned")}
+        now, added = self.clock(), 0
+        for day in sorted(root.iterdir()):
+            for hour in sorted(day.iterdir()) if day.is_dir() else ():
+                key = f"{tier}/{day.name}/{hour.name}"
+                if key in done or not hour.is_dir():
+                    continue
+                rows = []
+                for segment in hour.glob("*/*.mp4"):
+                    start = segment_start(segment.relative_to(root))
+                    if start is None:
+                        continue
+                    row_tier = tier
+                    if tier == "bulk" and now - start > self.full_days * DAY:
+                        row_tier = "event"  # already thinned before a rebuild
+                    rows.append(
+                        (
+                            segment.parent.name,
+                            start,
+                            start + self.segment_seconds,
+                            row_tier,
+                            str(segment),
+                            segment.stat().st_size,
+                        )
+                    )
+                # Frigate moves finished segments in; an hour is done once
+                # its last segment has had time to arrive.
+                started = hour_start(day.name, hour.name)
+                finished = started and now - started > 3600 + 3 * self.segment_seconds
+                with self._lock, self._db:
+                    added += self._db.executemany(
+                        "INSERT OR IGNORE INTO segments VALUES (?, ?, ?, ?, ?, ?)", rows
+                    ).rowcount
+                    if finished:
+                        self._db.execute("INSERT INTO scanned VALUES (?)", (key,))
+        return added
+
+    def scan(self) -> int:
+        """Index segments in hour directories not fully indexed yet."""
+        return self._scan_tree(self.hot_dir, "hot") + self._scan_tree(
+            self.bulk_dir, "bulk"
+        )
+
+    def add_events(self, events: Iterable[dict[str, Any]]) -> int:
+        """Store Frigate ``/api/events`` entries (new ones and updated ends)."""
+        rows = [
+            (
+                event["id"],
+                event["camera"],
+                event.get("label") or "",
+                float(event["start_time"]),
+                event.get("end_time"),
+            )
+            for event in events
+        ]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO events VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET end = excluded.end",
+                rows,
+            )
+        return len(rows)
+
+    def sync_events(self, fetch: Callable[[float], list[dict[str, Any]]]) -> int:
+        """Copy events since the newest stored one (minus an overlap)."""
+        with self._lock:
+            newest = self._db.execute("SELECT max(start) FROM events").fetchone()[0]
+        after = (newest or self.clock() - self.keep_days * DAY) - EVENT_OVERLAP
+        return self.add_events(fetch(after))
+
+    def seek(self, camera: str, at: float) -> Segment | None:
+        """The segment of ``camera`` recording at ``at``, if there is one."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM segments WHERE camera = ? AND start <= ? "
+                "ORDER BY start DESC LIMIT 1",
+                (camera, at),
+            ).fetchone()
+        if row is None or row["end"] <= at:
+            return None
+        return Segment(**row)
+
+    def between(self, camera: str, start: float, end: float) -> list[Segment]:
+        """Segments of ``camera`` overlapping ``start`` to ``end``, in order."""
+        first = self.seek(camera, start)
+        lower = first.start if first else start
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM segments WHERE camera = ? AND start >= ? AND start < ? "
+                "ORDER BY start",
+                (camera, lower, end),
+            ).fetchall()
+        return [Segment(**row) for row in rows]
+
+    def _older_than(self, tier: str, days: float) -> list[Segment]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM segments WHERE tier = ? AND start < ? ORDER BY start",
+                (tier, self.clock() - days * DAY),
+            ).fetchall()
+        return [Segment(**row) for row in rows]
+
+    def _drop(self, segments: list[Segment], report: TierReport) -> int:
+        dropped = 0
+        for segment in segments:
+            path = Path(segment.path)
+            try:
+                path.unlink()
+                report.freed_bytes += segment.size
+            except FileNotFoundError:
+                report.missing += 1
+            except OSError as e:
+                logger.warning(f"Cannot delete {path}: {e}")
+                continue
+            _prune_dirs(path.parent, self._root(segment.tier))
+            dropped += 1
+            with self._lock, self._db:
+                self._db.execute(
+                    "DELETE FROM segments WHERE camera = ? AND start = ?",
+                    (segment.camera, segment.start),
+                )
+        return dropped
+
+    def _root(self, tier: str) -> Path:
+        return self.hot_dir if tier == "hot" else self.bulk_dir
+
+    def migrate(self, report: TierReport) -> None:
+        """Move hot segments older than ``hot_days`` to the bulk tier."""
+        for segment in self._older_than("hot", self.hot_days):
+            source = Path(segment.path)
+            try:
+                target = self.bulk_dir / source.relative_to(self.hot_dir)
+            except ValueError:
+                target = self.bulk_dir / Path(*source.parts[-4:])
+            try:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(source, target)
+            except FileNotFoundError:
+                self._drop([segment], report)  # Frigate's retention got there first
+                continue
+            except OSError as e:
+                logger.warning(f"Cannot move {source} to {target}: {e}")
+                continue
+            _prune_dirs(source.parent, self.hot_dir)
+            with self._lock, self._db:
+                self._db.execute(
+                    "UPDATE segments SET tier = 'bulk', path = ? "
+                    "WHERE camera = ? AND start = ?",
+                    (str(target), segment.camera, segment.start),
+                )
+            report.moved += 1
+
+    def thin(self, report: TierReport) -> None:
+        """Keep only bulk segments near events once they pass ``full_days``."""
+        segments = self._older_than("bulk", self.full_days)
+        if not segments:
+            return
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT camera, start, end FROM events WHERE start < ?",
+                (segments[-1].end + self.padding,),
+            ).fetchall()
+        now = self.clock()
+        keep = {
+            camera: _merge(
+                (row["start"] - self.padding, (row["end"] or now) + self.padding)
+                for row in rows
+                if row["camera"] == camera
+            )
+            for camera in {segment.camera for segment in segments}
+        }
+        kept, dropped = [], []
+        for segment in segments:
+            covered = _overlaps(keep[segment.camera], segment.start, segment.end)
+            (kept if covered else dropped).append(segment)
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE segments SET tier = 'event' WHERE camera = ? AND start = ?",
+                [(segment.camera, segment.start) for segment in kept],
+            )
+        report.thinned += self._drop(dropped, report)
+
+    def expire(self, report: TierReport) -> None:
+        """Delete segments and events older than ``keep_days``."""
+        for tier in ("hot", "bulk", "event"):
+            report.expired += self._drop(self._older_than(tier, self.keep_days), report)
+        cutoff = self.clock() - self.keep_days * DAY
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM events WHERE coalesce(end, start) < ?", (cutoff,)
+            )
+            self._db.execute(
+                "DELETE FROM scanned WHERE substr(hour, instr(hour, '/') + 1, 10) < ?",
+                (datetime.fromtimestamp(cutoff, timezone.utc).strftime("%Y-%m-%d"),),
+            )
+
+    def run_once(
+        self, fetch_events: Callable[[float], list[dict[str, Any]]] | None = None
+    ) -> TierReport:
+        """Index, sync events, then expire, move and thin."""
+        started = time.perf_counter()
+        report = TierReport(indexed=self.scan())
+        synced = fetch_events is None
+        if fetch_events is not None:
+            try:
+                report.events = self.sync_events(fetch_events)
+                synced = True
+            except ServiceError as e:
+                logger.warning(f"Event sync failed, not thinning this round: {e}")
+        self.expire(report)
+        self.migrate(report)
+        if synced:
+            self.thin(report)
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def tier_stats(self) -> dict[str, tuple[int, int]]:
+        """``{tier: (segments, bytes)}``."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT tier, count(*), sum(size) FROM segments GROUP BY tier"
+            ).fetchall()
+        return {row[0]: (row[1], row[2] or 0) for row in rows}
+
+
+def run(tiers: RecordingTiers, interval: float) -> None:
+    """Run a retention pass every ``interval`` seconds."""
+    while True:
+        report = tiers.run_once(frigate_events)
+        logger.info(
+            f"Indexed {report.indexed}, {report.events} events, moved {report.moved}, "
+            f"thinned {report.thinned}, expired {report.expired}, freed "
+            f"{report.freed_bytes / 2**20:.0f} MiB in {report.seconds:.1f}s"
+        )
+        time.sleep(interval)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Tiered Frigate recording retention")
+    parser.add_argument("--index", type=Path, default=INDEX_PATH)
+    parser.add_argument("--hot-dir", type=Path, default=HOT_DIR)
+    parser.add_argument("--bulk-dir", type=Path, default=BULK_DIR)
+    parser.add_argument("--hot-days", type=float, default=DEFAULT_HOT_DAYS)
+    parser.add_argument("--full-days", type=float, default=DEFAULT_FULL_DAYS)
+    parser.add_argument("--keep-days", type=float, default=DEFAULT_KEEP_DAYS)
+    parser.add_argument("--padding", type=float, default=DEFAULT_PADDING)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("scan", help="index new segments")
+    sub.add_parser("stats", help="segments and bytes per tier")
+    run_cmd = sub.add_parser("run", help="apply retention periodically")
+    run_cmd.add_argument("--interval", type=float, default=600.0)
+    seek = sub.add_parser("seek", help="find footage of a camera at a time")
+    seek.add_argument("camera")
+    seek.add_argument("when", help="'YYYY-MM-DD HH:MM' or '[yesterday] 3pm'")
+    seek.add_argument("--seconds", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        tiers = RecordingTiers(
+            args.index,
+            args.hot_dir,
+            args.bulk_dir,
+            args.hot_days,
+            args.full_days,
+            args.keep_days,
+            args.padding,
+        )
+        if args.command == "scan":
+            print(f"Indexed {tiers.scan()} new segments")
+        elif args.command == "stats":
+            for tier, (count, size) in sorted(tiers.tier_stats().items()):
+                print(f"{tier:<6} {count:>8} segments {size / 2**30:8.2f} GiB")
+        elif args.command == "seek":
+            tiers.scan()
+            at = parse_when(args.when)
+            started = time.perf_counter()
+            if args.seconds:
+                segments = tiers.between(args.camera, at, at + args.seconds)
+            else:
+                segments = [s for s in [tiers.seek(args.camera, at)] if s]
+            elapsed = (time.perf_counter() - started) * 1000
+            for segment in segments:
+                offset = max(at - segment.start, 0.0)
+                print(f"{segment.tier:<6} +{offset:4.1f}s  {segment.path}")
+            if not segments:
+                print(f"No footage of {args.camera} at {args.when}")
+            print(f"{len(segments)} segments in {elapsed:.2f} ms")
+            return 0 if segments else 1
+        else:
+            run(tiers, args.interval)
+    except RecordingTiersError as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,303 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Semantic answer cache for the persona/LLM path, backed by Qdrant.
+
+Each question is embedded and looked up in the ``persona_answer_cache``
+collection of the ``qdrant`` service. A neighbour above the similarity
+threshold and younger than the TTL is returned instead of running a new
+generation, so paraphrases such as "how far is the moon" and "distance to the
+moon" share one answer. Answers are namespaced (persona and model) so a cached
+reply never leaks between personas.
+
+Cache errors never break the voice path: a failed lookup or store is counted
+and the question falls through to the LLM. Hit rate and latency savings are
+kept in ``CacheMetrics`` and, when a ``send`` callable is given, emitted on the
+bus as ``ovos.persona.cache.metrics`` after every answer.
+
+Usage::
+
+    python semantic_cache.py ask "how far away is the moon"
+    python semantic_cache.py purge
+"""
+
+import argparse
+import logging
+import re
+import time
+import uuid
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from embedding_cache import cached_embed
+from llm_backends import OllamaBackend
+from qdrant_store import QdrantStore
+from stack_http import ServiceError
+from vector_mirror import mirrored_store
+
+logger = logging.getLogger("semantic_cache")
+
+COLLECTION = "persona_answer_cache"
+DEFAULT_THRESHOLD = 0.92
+DEFAULT_TTL = 7 * 24 * 3600
+METRICS_MESSAGE = "ovos.persona.cache.metrics"
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+
+@dataclass
+class CacheHit:
+    """A cached answer returned for a question."""
+
+    question: str
+    answer: str
+    score: float
+    age: float
+
+
+@dataclass
+class CacheMetrics:
+    """Counters for hit rate and generation time saved."""
+
+    lookups: int = 0
+    hits: int = 0
+    misses: int = 0
+    errors: int = 0
+    lookup_seconds: float = 0.0
+    generation_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache."""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def saved_seconds(self) -> float:
+        """Estimated generation time avoided by hits, net of lookup cost."""
+        if not self.misses:
+            return 0.0
+        average_generation = self.generation_seconds / self.misses
+        average_lookup = self.lookup_seconds / self.lookups
+        return self.hits * max(0.0, average_generation - average_lookup)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Counters plus derived rates, ready for the bus or a log line."""
+        return dict(
+            asdict(self),
+            hit_rate=round(self.hit_rate, 4),
+            saved_seconds=round(self.saved_seconds, 3),
+        )
+
+
+class SemanticCache:
+    """Embedding-similarity cache of question/answer pairs."""
+
+    def __init__(
+        self,
+        embed: Callable[[str], list[float]],
+        store: QdrantStore,
+        namespace: str = "default",
+        collection: str = COLLECTION,
+        threshold: float = DEFAULT_THRESHOLD,
+        ttl: float = DEFAULT_TTL,
+        send: Callable[[str, dict[str, Any]], None] | None = None,
+    ):
+        self.embed = embed
+        self.store = store
+        self.namespace = namespace
+        self.collection = collection
+        self.threshold = threshold
+        self.ttl = ttl
+        self.send = send
+        self.metrics = CacheMetrics()
+        self._ready = False
+
+    def _ensure_collection(self, size: int) -> None:
+        if not self._ready:
+            self.store.ensure_collection(
+                self.collection,
+                size,
+                payload_indexes={"namespace": "keyword", "created_at": "float"},
+            )
+            self._ready = True
+
+    def _filter(self, now: float) -> dict[str, Any]:
+        return {
+            "must": [
+                {"key": "namespace", "match": {"value": self.namespace}},
+                {"key": "created_at", "range": {"gte": now - self.ttl}},
+            ]
+        }
+
+    def _lookup(self, question: str) -> tuple[CacheHit | None, list[float]]:
+        vector = self.embed(normalize_question(question))
+        self._ensure_collection(len(vector))
+        now = time.time()
+        results = self.store.search(
+            self.collection,
+            vector,
+            limit=1,
+            score_threshold=self.threshold,
+            query_filter=self._filter(now),
+        )
+        if not results:
+            return None, vector
+        payload = results[0]["payload"]
+        hit = CacheHit(
+            question=payload["question"],
+            answer=payload["answer"],
+            score=results[0]["score"],
+            age=now - payload["created_at"],
+        )
+        return hit, vector
+
+    def lookup(self, question: str) -> CacheHit | None:
+        """Return the cached answer for ``question`` or None."""
+        return self._lookup(question)[0]
+
+    def put(
+        self, question: str, answer: str, vector: list[float] | None = None
+    ) -> None:
+        """Store ``answer`` for ``question``, replacing an identical question."""
+        normalized = normalize_question(question)
+        vector = vector or self.embed(normalized)
+        self._ensure_collection(len(vector))
+        point_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{self.namespace}:{normalized}"))
+        self.store.upsert(
+            self.collection,
+            [
+                {
+                    "id": point_id,
+                    "vector": vector,
+                    "payload": {
+                        "namespace": self.namespace,
+                        "question": question,
+                        "answer": answer,
+                        "created_at": time.time(),
+                    },
+                }
+            ],
+        )
+
+    def _counted_lookup(self, question: str) -> tuple[CacheHit | None, list | None]:
+        self.metrics.lookups += 1
+        started = time.perf_counter()
+        hit, vector = None, None
+        try:
+            hit, vector = self._lookup(question)
+        except (ServiceError, KeyError) as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            self.metrics.errors += 1
+        self.metrics.lookup_seconds += time.perf_counter() - started
+        if hit is not None:
+            self.metrics.hits += 1
+            logger.info(
+                f"Cache hit ({hit.score:.3f}) for {question!r} ~ {hit.question!r}"
+            )
+            self._emit_metrics()
+        else:
+            self.metrics.misses += 1
+        return hit, vector
+
+    def _record_generation(
+        self, question: str, answer: str, vector: list | None, seconds: float
+    ) -> None:
+        self.metrics.generation_seconds += seconds
+        if answer:
+            try:
+                self.put(question, answer, vector)
+            except ServiceError as e:
+                logger.warning(f"Semantic cache store failed: {e}")
+                self.metrics.errors += 1
+        self._emit_metrics()
+
+    def answer(self, question: str, generate: Callable[[str], str]) -> str:
+        """Answer from the cache, or call ``generate`` and cache its result."""
+        hit, vector = self._counted_lookup(question)
+        if hit is not None:
+            return hit.answer
+        started = time.perf_counter()
+        answer = generate(question)
+        self._record_generation(question, answer, vector, time.perf_counter() - started)
+        return answer
+
+    def answer_stream(
+        self, question: str, stream: Callable[[str], Iterable[str]]
+    ) -> Iterator[str]:
+        """Streaming variant of ``answer``.
+
+        Yields the cached answer as one chunk, or the live chunks of
+        ``stream(question)``; the full text is cached once the stream ends.
+        """
+        hit, vector = self._counted_lookup(question)
+        if hit is not None:
+            yield hit.answer
+            return
+        started = time.perf_counter()
+        chunks = []
+        for chunk in stream(question):
+            chunks.append(chunk)
+            yield chunk
+        self._record_generation(
+            question, "".join(chunks).strip(), vector, time.perf_counter() - started
+        )
+
+    def purge_expired(self) -> None:
+        """Delete entries older than the TTL from this namespace."""
+        self.store.delete(
+            self.collection,
+            {
+                "must": [{"key": "namespace", "match": {"value": self.namespace}}],
+                "must_not": [
+                    {"key": "created_at", "range": {"gte": time.time() - self.ttl}}
+                ],
+            },
+        )
+
+    def _emit_metrics(self) -> None:
+        if self.send is not None:
+            self.send(
+                METRICS_MESSAGE, dict(self.metrics.snapshot(), namespace=self.namespace)
+            )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Persona semantic answer cache")
+    parser.add_argument("--namespace", default="default")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL)
+    sub = parser.add_subparsers(dest="command", required=True)
+    ask = sub.add_parser("ask", help="answer a question through the cache")
+    ask.add_argument("question")
+    sub.add_parser("purge", help="delete expired entries")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    backend = OllamaBackend()
+    cache = SemanticCache(
+        cached_embed(backend),
+        mirrored_store(),
+        namespace=args.namespace,
+        threshold=args.threshold,
+        ttl=args.ttl,
+    )
+    try:
+        if args.command == "purge":
+            cache.purge_expired()
+            return 0
+        print(cache.answer(args.question, backend.generate))
+    except ServiceError as e:
+        logger.error(str(e))
+        return 1
+    print(cache.metrics.snapshot())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
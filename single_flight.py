@@ -0,0 +1,219 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Single-flight coalescing of identical concurrent LLM and XTTS calls.
+
+When every room asks for the morning briefing at once, or a broadcast is
+announced on every satellite, identical requests reach the ``ollama``/``tgi``
+and ``xtts`` services side by side. ``SingleFlight`` runs the first of them
+(the leader) and attaches every identical request that arrives while it is
+still running (followers) to the same computation:
+
+* ``stream`` shares a streamed result: the leader's chunks are buffered, a
+  follower replays what it missed and then follows live, and all of them end
+  (or fail with the same error) together;
+* ``do`` shares a single return value.
+
+Nothing is cached: once a flight finishes, the next identical request starts a
+new one. If every subscriber of a streamed flight stops reading, the upstream
+stream is closed so the server stops generating.
+
+``CoalescingBackend`` and ``CoalescingTTS`` wrap the clients in
+``llm_backends.py`` and ``xtts_client.py``; ``llm_router.py`` coalesces the
+requests of all rooms at its shared endpoint.
+
+Usage::
+
+    flights = SingleFlight()
+    llm = CoalescingBackend(OllamaBackend(), flights)
+    tts = CoalescingTTS(XTTSClient(), flights)
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger("single_flight")
+
+
+def flight_key(*parts: Any) -> str:
+    """Stable key for a request made of JSON-like ``parts``."""
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class FlightMetrics:
+    """How many requests ran and how many rode along."""
+
+    leaders: int = 0
+    followers: int = 0
+    cancelled: int = 0
+
+
+class _Flight:
+    def __init__(self):
+        self.chunks: list[Any] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.source: Any = None
+        self.subscribers = 0
+        self.cond = threading.Condition()
+
+
+class SharedStream:
+    """One subscriber's view of a flight; iterate it once.
+
+    ``source`` is the object the leader's factory returned, for metadata such
+    as which backend answered.
+    """
+
+    def __init__(self, flight: _Flight, leader: bool):
+        self._flight = flight
+        self.leader = leader
+        with flight.cond:
+            flight.subscribers += 1
+
+    @property
+    def source(self) -> Any:
+        """The leader's upstream iterable (None until it has been created)."""
+        return self._flight.source
+
+    def __iter__(self) -> Iterator[Any]:
+        flight = self._flight
+        index = 0
+        try:
+            while True:
+                with flight.cond:
+                    while index >= len(flight.chunks) and not flight.done:
+                        flight.cond.wait()
+                    if index < len(flight.chunks):
+                        chunk = flight.chunks[index]
+                        index += 1
+                    elif flight.error is not None:
+                        raise flight.error
+                    else:
+                        return
+                yield chunk
+        finally:
+            with flight.cond:
+                flight.subscribers -= 1
+
+
+class SingleFlight:
+    """Coalesces identical in-flight calls by key."""
+
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.metrics = FlightMetrics()
+
+    def stream(self, key: str, factory: Callable[[], Iterable[Any]]) -> SharedStream:
+        """Share the chunks of ``factory()`` among identical concurrent calls."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.metrics.followers += 1
+                return SharedStream(flight, leader=False)
+            flight = self._flights[key] = _Flight()
+            self.metrics.leaders += 1
+            shared = SharedStream(flight, leader=True)
+        threading.Thread(
+            target=self._produce,
+            args=(key, flight, factory),
+            name="single-flight",
+            daemon=True,
+        ).start()
+        return shared
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Share the return value of ``fn()`` among identical concurrent calls."""
+        for value in self.stream(key, lambda: (fn(),)):
+            return value
+
+    def _produce(
+        self, key: str, flight: _Flight, factory: Callable[[], Iterable[Any]]
+    ) -> None:
+        chunks = None
+        try:
+            flight.source = factory()
+            # Iterables such as llm_router.RoutedStream have no close() of
+            # their own; the iterator they hand out is what holds upstream.
+            chunks = iter(flight.source)
+            for chunk in chunks:
+                with flight.cond:
+                    if flight.subscribers == 0:
+                        self.metrics.cancelled += 1
+                        logger.info("All subscribers left; closing upstream stream")
+                        break
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+        except Exception as e:
+            flight.error = e
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            with self._lock:
+                # Requests arriving from now on start a fresh flight.
+                self._flights.pop(key, None)
+            with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+
+
+class CoalescingBackend:
+    """LLM backend wrapper that coalesces identical generations."""
+
+    def __init__(self, backend: Any, flights: SingleFlight | None = None):
+        self.backend = backend
+        self.flights = flights or SingleFlight()
+        self.name = backend.name
+
+    def _key(self, kind: str, *parts: Any) -> str:
+        model = getattr(self.backend, "model", None)
+        return flight_key(kind, self.name, model, *parts)
+
+    def generate(self, prompt: str, system: str | None = None) -> str:
+        """Whole answer, shared with identical concurrent calls."""
+        return self.flights.do(
+            self._key("generate", prompt, system),
+            lambda: self.backend.generate(prompt, system),
+        )
+
+    def stream(self, prompt: str, system: str | None = None) -> Iterator[str]:
+        """Streamed answer, shared with identical concurrent calls."""
+        return iter(
+            self.flights.stream(
+                self._key("stream", prompt, system),
+                lambda: self.backend.stream(prompt, system),
+            )
+        )
+
+    def embed(self, text: str) -> list[float]:
+        """Embedding, shared with identical concurrent calls."""
+        return self.flights.do(
+            self._key("embed", getattr(self.backend, "embed_model", None), text),
+            lambda: self.backend.embed(text),
+        )
+
+
+class CoalescingTTS:
+    """XTTS client wrapper that synthesizes identical concurrent text once."""
+
+    def __init__(self, client: Any, flights: SingleFlight | None = None):
+        self.client = client
+        self.flights = flights or SingleFlight()
+
+    def synthesize(self, text: str, speaker: str | None = None) -> bytes:
+        """WAV bytes for ``text``, shared with identical concurrent calls."""
+        key = flight_key(
+            "tts",
+            self.client.base_url,
+            speaker or self.client.speaker,
+            self.client.language,
+            text,
+        )
+        return self.flights.do(key, lambda: self.client.synthesize(text, speaker))
@@ -0,0 +1,250 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Shared in-memory cache of decoded camera snapshots.
+
+The camera at ``rtsp://10.0.10.10:554/rtsp`` is pulled once, by the go2rtc
+restream built into Frigate (``go2rtc:`` in ``frigate/config/config.yaml``).
+Frigate detect/record read ``rtsp://127.0.0.1:8554/<camera>`` inside the
+container, and Home Assistant's camera entity reads
+``rtsp://localhost:8554/<camera>`` on the host. Nobody opens a second
+session to the camera itself.
+
+Still images are where the remaining duplicate work was: every vision or
+LLM snapshotter and every HA still-image refresh asked for a JPEG on its
+own. ``SnapshotCache`` keeps the last JPEG per camera and height in memory
+and answers everyone from it while it is younger than ``max_age``.
+Concurrent misses for the same image share one upstream request
+(``single_flight``), and the cache is bounded to ``max_bytes`` by least
+recent use. Images come from Frigate's ``/api/<camera>/latest.jpg``, a frame
+Frigate has already decoded, so there is no extra RTSP session or decode.
+go2rtc's ``/api/frame.jpeg`` is the fallback when Frigate has no frame.
+
+``serve`` exposes the cache over HTTP for HA (generic camera "Still image
+URL" ``http://localhost:8090/snapshot/<camera>.jpg``) and the other
+containers (``http://snapshot_cache:8090/...``).
+
+Usage::
+
+    python snapshot_cache.py serve --port 8090 --max-age 1.0
+    curl 'http://localhost:8090/snapshot/name_of_your_camera.jpg?h=360'
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, quote, urlparse
+
+from single_flight import SingleFlight, flight_key
+from stack_config import service_url
+from stack_http import ServiceError, request_bytes
+
+logger = logging.getLogger("snapshot_cache")
+
+DEFAULT_PORT = 8090
+DEFAULT_MAX_AGE = 1.0
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+GO2RTC_URL = "http://frigate:1984"
+
+Fetch = Callable[[str, int | None], bytes]
+
+
+@dataclass
+class Snapshot:
+    """One cached JPEG."""
+
+    jpeg: bytes
+    taken_at: float
+
+
+@dataclass
+class SnapshotStats:
+    """Counters for the ``/stats`` endpoint."""
+
+    hits: int = 0
+    misses: int = 0
+    fetches: int = 0
+    errors: int = 0
+    fetch_seconds: float = 0.0
+
+
+def frigate_fetch(
+    base_url: str | None = None, go2rtc_url: str = GO2RTC_URL, timeout: float = 5.0
+) -> Fetch:
+    """Fetch ``camera``'s latest frame from Frigate, falling back to go2rtc."""
+    base_url = (base_url or service_url("frigate")).rstrip("/")
+
+    def fetch(camera: str, height: int | None) -> bytes:
+        query = f"?h={height}" if height else ""
+        try:
+            return request_bytes(
+                "GET",
+                f"{base_url}/api/{quote(camera)}/latest.jpg{query}",
+                None,
+                timeout,
+            )
+        except ServiceError as e:
+            logger.info(f"No Frigate frame for {camera} ({e}); asking go2rtc")
+        query = f"&h={height}" if height else ""
+        return request_bytes(
+            "GET",
+            f"{go2rtc_url.rstrip('/')}/api/frame.jpeg?src={quote(camera)}{query}",
+            None,
+            timeout,
+        )
+
+    return fetch
+
+
+class SnapshotCache:
+    """Freshness-bounded, size-bounded JPEG cache with coalesced misses."""
+
+    def __init__(
+        self,
+        fetch: Fetch,
+        max_age: float = DEFAULT_MAX_AGE,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.fetch = fetch
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stats = SnapshotStats()
+        self.flights = SingleFlight()
+        self._images: OrderedDict[tuple[str, int | None], Snapshot] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(
+        self, camera: str, height: int | None = None, max_age: float | None = None
+    ) -> Snapshot:
+        """A snapshot of ``camera`` no older than ``max_age`` seconds."""
+        key = (camera, height)
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            cached = self._images.get(key)
+            if cached is not None and self.clock() - cached.taken_at <= max_age:
+                self._images.move_to_end(key)
+                self.stats.hits += 1
+                return cached
+            self.stats.misses += 1
+        return self.flights.do(
+            flight_key("snapshot", camera, height), lambda: self._load(key)
+        )
+
+    def _load(self, key: tuple[str, int | None]) -> Snapshot:
+        started = self.clock()
+        try:
+            jpeg = self.fetch(*key)
+        except ServiceError:
+            with self._lock:
+                self.stats.errors += 1
+            raise
+        snapshot = Snapshot(jpeg, self.clock())
+        with self._lock:
+            self.stats.fetches += 1
+            self.stats.fetch_seconds += snapshot.taken_at - started
+            old = self._images.pop(key, None)
+            self._bytes += len(jpeg) - (len(old.jpeg) if old else 0)
+            self._images[key] = snapshot
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= len(evicted.jpeg)
+        return snapshot
+
+    def snapshot_stats(self) -> dict[str, Any]:
+        """Counters plus current size, for ``/stats``."""
+        with self._lock:
+            return dict(asdict(self.stats), images=len(self._images), bytes=self._bytes)
+
+
+class SnapshotHandler(BaseHTTPRequestHandler):
+    """HTTP front end; ``self.server.cache`` is the shared ``SnapshotCache``."""
+
+    def _reply(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, body: Any) -> None:
+        self._reply(status, json.dumps(body).encode("utf-8"), "application/json")
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        cache = self.server.cache
+        if url.path == "/health":
+            return self._json(200, {"status": "ok"})
+        if url.path == "/stats":
+            return self._json(200, cache.snapshot_stats())
+        if not (url.path.startswith("/snapshot/") and url.path.endswith(".jpg")):
+            return self._json(404, {"error": f"Unknown path {url.path}"})
+        camera = url.path[len("/snapshot/") : -len(".jpg")]
+        query = parse_qs(url.query)
+        try:
+            height = int(query["h"][0]) if "h" in query else None
+            max_age = float(query["max_age"][0]) if "max_age" in query else None
+        except ValueError as e:
+            return self._json(400, {"error": f"Malformed query: {e}"})
+        try:
+            snapshot = cache.get(camera, height, max_age)
+        except ServiceError as e:
+            return self._json(502, {"error": str(e)})
+        self._reply(200, snapshot.jpeg, "image/jpeg")
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+
+def serve(
+    cache: SnapshotCache, host: str = "0.0.0.0", port: int = DEFAULT_PORT
+) -> None:
+    """Serve the cache over HTTP forever."""
+    server = ThreadingHTTPServer((host, port), SnapshotHandler)
+    server.daemon_threads = True
+    server.cache = cache
+    logger.info(f"Snapshot cache listening on {host}:{port} (max age {cache.max_age}s)")
+    server.serve_forever()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Shared camera snapshot cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_cmd = sub.add_parser("serve", help="serve cached snapshots over HTTP")
+    serve_cmd.add_argument("--host", default="0.0.0.0")
+    serve_cmd.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_cmd.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE)
+    serve_cmd.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / 2**20)
+    serve_cmd.add_argument("--go2rtc-url", default=GO2RTC_URL)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    cache = SnapshotCache(
+        frigate_fetch(go2rtc_url=args.go2rtc_url),
+        args.max_age,
+        int(args.max_mb * 2**20),
+    )
+    try:
+        serve(cache, args.host, args.port)
+    except OSError as e:
+        logger.error(f"Cannot listen on {args.host}:{args.port}: {e}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
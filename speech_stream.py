@@ -0,0 +1,343 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Stream LLM tokens straight into sentence-level TTS and playback.
+
+Instead of waiting for the whole LLM answer and then the whole synthesis, the
+bridge runs three overlapping stages:
+
+1. the caller's thread reads tokens from the ``ollama``/``tgi`` stream and cuts
+   them into sentences as soon as a boundary arrives,
+2. a TTS worker sends each sentence to ``xtts`` in order,
+3. a player worker plays each rendered sentence while later ones are still
+   being generated and synthesized.
+
+Time-to-first-word therefore drops from "whole answer" to "first sentence".
+Sentences longer than ``max_chars`` are cut at a clause or word boundary so
+each XTTS request stays under its per-request length limit. When a
+``SemanticCache`` is given, a cached answer skips the LLM entirely and a fresh
+answer is cached once its stream completes. With ovos-bus-client installed,
+the first synthesized byte and the playback start are marked on the bus for
+``turn_tracer.py``. Processes running several streamers over shared clients
+(one per room, say) can wrap them in ``single_flight.CoalescingBackend`` and
+``CoalescingTTS`` so identical concurrent requests are generated and
+synthesized once.
+
+Usage::
+
+    python speech_stream.py "tell me about the moon" --backend ollama \\
+        --speaker "Claribel Dervla" --player "aplay -q -"
+"""
+
+import argparse
+import logging
+import queue
+import re
+import shlex
+import subprocess
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+
+from embedding_cache import cached_embed
+from llm_backends import BACKENDS, OllamaBackend
+from semantic_cache import SemanticCache
+from stack_config import bus_settings
+from stack_http import ServiceError
+from trace_hooks import bus_mark
+from vector_mirror import mirrored_store
+from xtts_client import XTTSClient
+
+try:
+    from ovos_bus_client import MessageBusClient
+except ImportError:
+    MessageBusClient = None
+
+logger = logging.getLogger("speech_stream")
+
+# Words that end in a period without ending the sentence.
+ABBREVIATIONS = {
+    "mr",
+    "mrs",
+    "ms",
+    "dr",
+    "prof",
+    "sr",
+    "jr",
+    "st",
+    "vs",
+    "etc",
+    "e.g",
+    "i.e",
+    "approx",
+    "no",
+    "mt",
+}
+BOUNDARY = re.compile(r"[.!?]+[\"'”’)\]]*(?=\s)|\n+")
+CLAUSE = re.compile(r"[,;:—]\s")
+XTTS_MAX_CHARS = 250
+_STOP = object()
+
+
+class StreamError(Exception):
+    """Raised when a stage of the speech stream fails."""
+
+
+class SentenceSplitter:
+    """Incrementally cuts streamed text into speakable sentences."""
+
+    def __init__(self, min_chars: int = 12, max_chars: int = XTTS_MAX_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def _is_abbreviation(self, end: int) -> bool:
+        words = self._buffer[:end].rstrip(".").split()
+        if not words:
+            return False
+        word = words[-1].lower()
+        return word in ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+    def _next_cut(self) -> int | None:
+        for match in BOUNDARY.finditer(self._buffer):
+            if match.group().startswith(".") and self._is_abbreviation(match.start()):
+                continue
+            if len(self._buffer[: match.end()].strip()) < self.min_chars:
+                continue
+            return match.end()
+        if len(self._buffer) > self.max_chars:
+            head = self._buffer[: self.max_chars]
+            clauses = list(CLAUSE.finditer(head))
+            if clauses:
+                return clauses[-1].end()
+            space = head.rfind(" ")
+            return space if space > 0 else self.max_chars
+        return None
+
+    def feed(self, text: str) -> list[str]:
+        """Add streamed text; return the sentences it completed."""
+        self._buffer += text
+        sentences = []
+        while (cut := self._next_cut()) is not None:
+            sentence, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:]
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def flush(self) -> list[str]:
+        """Return whatever text remains at the end of the stream."""
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+@dataclass
+class StreamTimings:
+    """Milestones of one streamed answer (``time.perf_counter`` values)."""
+
+    started: float
+    first_chunk: float | None = None
+    first_sentence: float | None = None
+    first_audio: float | None = None
+    playback_start: float | None = None
+    finished: float | None = None
+    sentences: list[str] = field(default_factory=list)
+
+    def offsets(self) -> dict[str, float | None]:
+        """Milestones as seconds since the stream started."""
+        names = (
+            "first_chunk",
+            "first_sentence",
+            "first_audio",
+            "playback_start",
+            "finished",
+        )
+        return {
+            name: (
+                None
+                if getattr(self, name) is None
+                else getattr(self, name) - self.started
+            )
+            for name in names
+        }
+
+
+class CommandPlayer:
+    """Plays WAV bytes by piping them to a command such as ``aplay -q -``."""
+
+    def __init__(self, command: list[str]):
+        self.command = command
+
+    def __call__(self, audio: bytes) -> None:
+        try:
+            subprocess.run(self.command, input=audio, check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise StreamError(f"Player {self.command[0]!r} failed: {e}") from e
+
+
+class SpeechStreamer:
+    """Overlaps LLM generation, sentence synthesis and playback."""
+
+    def __init__(
+        self,
+        synthesize: Callable[[str], bytes],
+        play: Callable[[bytes], None],
+        mark: Callable[[str], None] | None = None,
+        queue_size: int = 4,
+        max_chars: int = XTTS_MAX_CHARS,
+    ):
+        self.synthesize = synthesize
+        self.play = play
+        self.mark = mark
+        self.queue_size = queue_size
+        self.max_chars = max_chars
+
+    def _put(self, q: queue.Queue, item: object, failed: threading.Event) -> None:
+        while not failed.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue, failed: threading.Event) -> object:
+        while not failed.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _STOP
+
+    def _mark(self, stage: str) -> None:
+        if self.mark is not None:
+            try:
+                self.mark(stage)
+            except Exception as e:  # tracing must never break speech
+                logger.debug(f"Trace mark {stage} failed: {e}")
+
+    def speak_stream(self, chunks: Iterable[str]) -> StreamTimings:
+        """Speak streamed text; return once the last sentence has played."""
+        timings = StreamTimings(started=time.perf_counter())
+        text_q: queue.Queue = queue.Queue(self.queue_size)
+        audio_q: queue.Queue = queue.Queue(self.queue_size)
+        failed = threading.Event()
+        errors: list[BaseException] = []
+
+        def tts_worker() -> None:
+            try:
+                while (sentence := self._get(text_q, failed)) is not _STOP:
+                    audio = self.synthesize(sentence)
+                    if timings.first_audio is None:
+                        timings.first_audio = time.perf_counter()
+                        self._mark("tts_first_byte")
+                    self._put(audio_q, audio, failed)
+            except Exception as e:
+                errors.append(e)
+                failed.set()
+            finally:
+                self._put(audio_q, _STOP, failed)
+
+        def player_worker() -> None:
+            try:
+                while (audio := self._get(audio_q, failed)) is not _STOP:
+                    if timings.playback_start is None:
+                        timings.playback_start = time.perf_counter()
+                        self._mark("playback")
+                    self.play(audio)
+            except Exception as e:
+                errors.append(e)
+                failed.set()
+
+        workers = [
+            threading.Thread(target=tts_worker, name="speech-tts", daemon=True),
+            threading.Thread(target=player_worker, name="speech-play", daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+
+        splitter = SentenceSplitter(max_chars=self.max_chars)
+        try:
+            for chunk in chunks:
+                if failed.is_set():
+                    break
+                if timings.first_chunk is None:
+                    timings.first_chunk = time.perf_counter()
+                for sentence in splitter.feed(chunk):
+                    self._queue_sentence(sentence, timings, text_q, failed)
+            for sentence in splitter.flush():
+                self._queue_sentence(sentence, timings, text_q, failed)
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+        finally:
+            self._put(text_q, _STOP, failed)
+            for worker in workers:
+                worker.join()
+
+        timings.finished = time.perf_counter()
+        if errors:
+            raise StreamError(f"Speech stream failed: {errors[0]}") from errors[0]
+        return timings
+
+    def _queue_sentence(
+        self,
+        sentence: str,
+        timings: StreamTimings,
+        text_q: queue.Queue,
+        failed: threading.Event,
+    ) -> None:
+        if timings.first_sentence is None:
+            timings.first_sentence = time.perf_counter()
+        timings.sentences.append(sentence)
+        self._put(text_q, sentence, failed)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Ask a question and speak the streamed answer."""
+    parser = argparse.ArgumentParser(description="Stream an LLM answer into XTTS")
+    parser.add_argument("question")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="ollama")
+    parser.add_argument("--system", help="system prompt (persona)")
+    parser.add_argument("--speaker")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--player", default="aplay -q -")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    backend = BACKENDS[args.backend]()
+    xtts = XTTSClient(speaker=args.speaker, language=args.language)
+    mark = None
+    if MessageBusClient is not None:  # feed turn_tracer's tts_first_byte stage
+        bus = MessageBusClient(**bus_settings())
+        bus.run_in_thread()
+        mark = bus_mark(bus)
+    streamer = SpeechStreamer(
+        xtts.synthesize, CommandPlayer(shlex.split(args.player)), mark
+    )
+
+    def stream(question: str) -> Iterable[str]:
+        return backend.stream(question, system=args.system)
+
+    try:
+        if args.no_cache:
+            chunks = stream(args.question)
+        else:
+            cache = SemanticCache(
+                cached_embed(OllamaBackend()),
+                mirrored_store(),
+                namespace=f"{args.backend}:{args.system or 'default'}",
+            )
+            chunks = cache.answer_stream(args.question, stream)
+        timings = streamer.speak_stream(chunks)
+    except (ServiceError, StreamError) as e:
+        logger.error(str(e))
+        return 1
+    for name, offset in timings.offsets().items():
+        print(f"{name:<15} {'-' if offset is None else f'{offset:.2f} s'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,137 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Shared configuration helpers for the stack's Python tools.
+
+``mycroft.conf`` in this repository is JSON with ``//`` comments, which the
+standard ``json`` module rejects. This module strips the comments, loads the
+file from the same location the ``ovos`` container uses and exposes the
+service URLs of the Compose stack so tools never hardcode container hosts.
+``available_memory`` reads the host's free memory for the tools that size
+their work to it.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+REPO_ROOT = Path(__file__).resolve().parent
+DEFAULT_CONF_PATH = REPO_ROOT / "ovos_config" / "config" / "mycroft.conf"
+DEFAULT_DATA_DIR = REPO_ROOT / "ovos_config" / "data"
+
+# Docker Compose service names (see docker-compose.ai.yml). Each URL can be
+# overridden by the matching environment variable for host-side runs.
+SERVICE_URLS = {
+    "ollama": ("OLLAMA_URL", "http://ollama:11434"),
+    "tgi": ("TGI_URL", "http://tgi:80"),
+    "xtts": ("XTTS_URL", "http://xtts:5002"),
+    "qdrant": ("QDRANT_URL", "http://qdrant:6333"),
+    "whisper": ("WHISPER_URL", "http://whisper:10300"),
+    "frigate": ("FRIGATE_URL", "http://frigate:5000"),
+    "llm_router": ("LLM_ROUTER_URL", "http://llm_router:8000"),
+    "snapshot_cache": ("SNAPSHOT_CACHE_URL", "http://snapshot_cache:8090"),
+    # homeassistant runs with host networking (docker-compose.home.yml).
+    "homeassistant": ("HA_URL", "http://host.docker.internal:8123"),
+}
+
+
+class ConfigError(Exception):
+    """Raised when a stack configuration file is missing or malformed."""
+
+
+def strip_json_comments(text: str) -> str:
+    """Remove ``//`` and ``/* */`` comments from JSON text.
+
+    Comment markers inside string literals are preserved.
+    """
+    out = []
+    i = 0
+    in_string = False
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if in_string:
+            out.append(char)
+            if char == "\\" and i + 1 < length:
+                out.append(text[i + 1])
+                i += 2
+                continue
+            if char == '"':
+                in_string = False
+            i += 1
+        elif char == '"':
+            in_string = True
+            out.append(char)
+            i += 1
+        elif text.startswith("//", i):
+            end = text.find("\n", i)
+            i = length if end == -1 else end
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = length if end == -1 else end + 2
+        else:
+            out.append(char)
+            i += 1
+    return "".join(out)
+
+
+def conf_path() -> Path:
+    """Return the ``mycroft.conf`` path, honouring ``MYCROFT_CONF_PATH``."""
+    env_path = os.environ.get("MYCROFT_CONF_PATH")
+    if env_path and Path(env_path).exists():
+        return Path(env_path)
+    return DEFAULT_CONF_PATH
+
+
+def load_mycroft_conf(path: str | os.PathLike | None = None) -> dict[str, Any]:
+    """Load ``mycroft.conf`` (JSON with comments) into a dictionary."""
+    path = Path(path) if path else conf_path()
+    try:
+        text = path.read_text(encoding="utf-8-sig")
+    except OSError as e:
+        raise ConfigError(f"Cannot read {path}: {e}") from e
+    try:
+        return json.loads(strip_json_comments(text))
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"{path} is not valid JSON: {e}") from e
+
+
+def service_url(name: str) -> str:
+    """Return the base URL of a Compose service, without trailing slash."""
+    try:
+        env_var, default = SERVICE_URLS[name]
+    except KeyError as e:
+        raise ConfigError(f"Unknown stack service: {name}") from e
+    return os.environ.get(env_var, default).rstrip("/")
+
+
+def bus_settings(conf: dict[str, Any] | None = None) -> dict[str, Any]:
+    """Messagebus ``host``/``port``/``route`` for clients.
+
+    Follows the precedence the ``ovos`` container uses: ``MESSAGEBUS_*``
+    environment variables, then ``message_bus_client`` in ``mycroft.conf``.
+    """
+    if conf is None:
+        try:
+            conf = load_mycroft_conf()
+        except ConfigError:
+            conf = {}
+    client = conf.get("message_bus_client", {})
+    return {
+        "host": os.environ.get(
+            "MESSAGEBUS_HOST", client.get("host", "ovos_messagebus")
+        ),
+        "port": int(os.environ.get("MESSAGEBUS_PORT", client.get("port", 8181))),
+        "route": os.environ.get("MESSAGEBUS_ROUTE", client.get("route", "/core")),
+    }
+
+
+def available_memory() -> int | None:
+    """Host ``MemAvailable`` in bytes, or None where /proc is unavailable."""
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
@@ -0,0 +1,96 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Minimal JSON-over-HTTP helpers for talking to the stack's services.
+
+Uses only the standard library so the tools run in any container of the stack.
+"""
+
+import json
+import urllib.error
+import urllib.request
+from collections.abc import Iterator
+from typing import Any
+
+
+class ServiceError(Exception):
+    """Raised when a stack service is unreachable or answers with an error."""
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+def _build_request(
+    method: str, url: str, body: Any | None, headers: dict[str, str] | None = None
+) -> urllib.request.Request:
+    data = None if body is None else json.dumps(body).encode("utf-8")
+    all_headers = {"Accept": "application/json", **(headers or {})}
+    if data is not None:
+        all_headers["Content-Type"] = "application/json"
+    return urllib.request.Request(url, data=data, method=method, headers=all_headers)
+
+
+def _open(
+    method: str,
+    url: str,
+    body: Any | None,
+    timeout: float,
+    headers: dict[str, str] | None = None,
+) -> Any:
+    try:
+        return urllib.request.urlopen(
+            _build_request(method, url, body, headers), timeout=timeout
+        )
+    except urllib.error.HTTPError as e:
+        detail = e.read().decode("utf-8", "replace")[:500]
+        raise ServiceError(f"{method} {url} -> {e.code}: {detail}", e.code) from e
+    except (urllib.error.URLError, OSError) as e:
+        raise ServiceError(f"{method} {url} failed: {e}") from e
+
+
+def request_bytes(
+    method: str,
+    url: str,
+    body: Any | None = None,
+    timeout: float = 30.0,
+    headers: dict[str, str] | None = None,
+) -> bytes:
+    """Send a request (JSON body if given) and return the raw response body."""
+    with _open(method, url, body, timeout, headers) as response:
+        try:
+            return response.read()
+        except OSError as e:
+            raise ServiceError(f"{method} {url} failed while reading: {e}") from e
+
+
+def request_json(
+    method: str,
+    url: str,
+    body: Any | None = None,
+    timeout: float = 30.0,
+    headers: dict[str, str] | None = None,
+) -> Any:
+    """Send a JSON request and return the decoded JSON response (or None)."""
+    payload = request_bytes(method, url, body, timeout, headers)
+    if not payload:
+        return None
+    try:
+        return json.loads(payload)
+    except json.JSONDecodeError as e:
+        raise ServiceError(f"{method} {url} returned invalid JSON: {e}") from e
+
+
+def stream_lines(
+    method: str, url: str, body: Any | None = None, timeout: float = 120.0
+) -> Iterator[bytes]:
+    """Send a request and yield the non-empty lines of a streamed response.
+
+    Suits Ollama's NDJSON streams and the ``data:`` lines of server-sent events.
+    """
+    with _open(method, url, body, timeout) as response:
+        try:
+            for line in response:
+                line = line.strip()
+                if line:
+                    yield line
+        except OSError as e:
+            raise ServiceError(f"{method} {url} stream broke: {e}") from e
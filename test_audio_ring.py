@@ -0,0 +1,86 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for the shared-memory audio ring (audio_ring.py)."""
+
+import multiprocessing
+import uuid
+
+import numpy as np
+import pytest
+
+from audio_ring import (
+    AudioRingError,
+    AudioRingReader,
+    AudioRingWriter,
+    FrameOverwritten,
+)
+
+
+@pytest.fixture
+def writer():
+    ring = AudioRingWriter(
+        f"test_{uuid.uuid4().hex[:8]}", frame_samples=160, capacity=8
+    )
+    yield ring
+    ring.close()
+
+
+def _sum_frames(name, count, queue):
+    reader = AudioRingReader(name, start="oldest")
+    total = 0
+    for frame in reader.frames(timeout=5):
+        total += int(frame.pcm.sum())
+        count -= 1
+        if count == 0:
+            break
+    del frame
+    reader.close()
+    queue.put(total)
+
+
+def test_reader_sees_frames_in_place(writer):
+    reader = AudioRingReader(writer.name)
+    pcm = writer.reserve()
+    pcm[:] = np.arange(160, dtype=np.int16)
+    seq = writer.commit(timestamp=12.5)
+    (frame,) = list(reader.poll())
+    assert (frame.seq, frame.timestamp) == (seq, 12.5)
+    assert np.array_equal(frame.pcm, np.arange(160))
+    assert not frame.pcm.flags.owndata
+    del frame
+    reader.close()
+
+
+def test_overrun_is_detected_and_counted(writer):
+    reader = AudioRingReader(writer.name)
+    for i in range(20):
+        writer.write(np.full(160, i, dtype=np.int16))
+    frames = list(reader.poll())
+    assert [f.seq for f in frames] == list(range(13, 21))
+    assert reader.dropped == 12
+    assert not reader.is_valid(1)
+    with pytest.raises(FrameOverwritten):
+        reader.view(1)
+    del frames
+    reader.close()
+
+
+def test_write_rejects_wrong_frame_size(writer):
+    with pytest.raises(AudioRingError):
+        writer.write(np.zeros(10, dtype=np.int16))
+
+
+def test_missing_ring_raises():
+    with pytest.raises(AudioRingError):
+        AudioRingReader("no_such_ring_here")
+
+
+def test_reader_in_another_process(writer):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    for i in range(4):
+        writer.write(np.full(160, i, dtype=np.int16))
+    proc = ctx.Process(target=_sum_frames, args=(writer.name, 4, queue))
+    proc.start()
+    assert queue.get(timeout=30) == 160 * (0 + 1 + 2 + 3)
+    proc.join(timeout=10)
+    assert proc.exitcode == 0
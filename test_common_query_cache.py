@@ -0,0 +1,86 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for common_query_cache.py and its use by the common query fan-out."""
+
+import json
+
+import pytest
+
+import common_query_cache as cqc
+import common_query_fanout as cq
+from test_common_query_fanout import make
+
+
+def test_question_key_normalizes_phrasing():
+    key = cqc.question_key("Hey Mycroft, what's the capital of France?")
+    assert key == "en-us:what is the capital of france"
+    assert (
+        cqc.question_key("can you tell me what is the capital of france please") == key
+    )
+    assert cqc.question_key("Tell me: who's Ada Lovelace") == cqc.question_key(
+        "who is ada lovelace", "EN-US"
+    )
+
+
+def test_per_skill_ttls_expire_entries():
+    now = [0.0]
+    cache = cqc.AnswerCache(clock=lambda: now[0])
+    assert cache.put("weather today", "en-us", "skill-weather.openvoiceos", "Sun", 0.9)
+    assert cache.put(
+        "who wrote hamlet", "en-us", "ovos-skill-wikipedia", "Shakespeare", 0.9
+    )
+    assert not cache.put("what time is it", "en-us", "skill-date-time.x", "noon", 0.9)
+    assert not cache.put("who wrote it", "en-us", "ovos-skill-wikipedia", "?", 0.2)
+    now[0] = 3600.0
+    assert cache.get("weather today") is None
+    assert cache.get("Who wrote Hamlet?").answer == "Shakespeare"
+    assert cache.metrics.snapshot()["hit_rate"] == 0.5
+
+
+def test_lru_bound_and_persistence(tmp_path):
+    now = [0.0]
+    cache = cqc.AnswerCache(max_entries=2, clock=lambda: now[0])
+    for question in ("a one", "b two", "c three"):
+        cache.put(question, "en-us", "wiki", question.upper(), 0.9)
+    assert len(cache) == 2 and cache.get("a one") is None
+    cache.save(tmp_path / "answers.json")
+    restored = cqc.AnswerCache(clock=lambda: now[0])
+    restored.load(tmp_path / "answers.json")
+    assert restored.get("c three").answer == "C THREE"
+    now[0] = 2 * cqc.DAY
+    expired = cqc.AnswerCache(clock=lambda: now[0])
+    expired.load(tmp_path / "answers.json")
+    assert len(expired) == 0
+
+
+def test_ttls_from_app_settings(tmp_path):
+    settings = tmp_path / "settings.json"
+    settings.write_text(
+        json.dumps(
+            {"answer_cache_ttls": {"weather": 60}, "answer_cache_default_ttl": 5}
+        )
+    )
+    assert cqc.load_ttls(settings) == ({"weather": 60}, 5.0)
+    assert cqc.load_ttls(tmp_path / "missing.json")[0] == cqc.DEFAULT_TTLS
+    settings.write_text("{")
+    with pytest.raises(cqc.AnswerCacheError):
+        cqc.load_ttls(settings)
+
+
+def test_fanout_answers_repeated_questions_from_the_cache():
+    bus, fanout = make(
+        {"wiki.skill": (0.02, "8849 metres", 0.9)},
+        deadline=1.0,
+        cache=cqc.AnswerCache(),
+    )
+    assert fanout.ask("how tall is everest").answer == "8849 metres"
+    bus.sent.clear()
+    best = fanout.ask("How tall is Everest?")
+    assert best.skill_id == "wiki.skill"
+    types = [t for t, _ in bus.sent]
+    assert cq.QUERY_MESSAGE not in types and cq.ACTION_MESSAGE not in types
+    assert (cq.SPEAK_MESSAGE, {"utterance": "8849 metres", "lang": "en-us"}) in bus.sent
+    (report,) = [d for t, d in bus.sent if t == cq.ANSWER_MESSAGE]
+    assert report["reason"] == "cached"
+    (metrics,) = [d for t, d in bus.sent if t == cqc.METRICS_MESSAGE]
+    assert metrics["hits"] == 1 and metrics["misses"] == 1
+    assert metrics["generation_seconds"] > 0
@@ -0,0 +1,116 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for common_query_fanout.py with simulated skills."""
+
+import time
+from types import SimpleNamespace
+
+import common_query_fanout as cq
+from conftest import SimulatedSkills, simulate
+
+
+class CommonQuerySkills(SimulatedSkills):
+    """Common query skills; specs are ``(delay, answer, conf)``."""
+
+    query_message = cq.QUERY_MESSAGE
+
+    def announce(self, phrase, skill_id):
+        reply = {"phrase": phrase, "skill_id": skill_id, "searching": True}
+        self.fanout.on_response(SimpleNamespace(data=reply))
+
+    def answer(self, phrase, skill_id, spec):
+        _, answer, conf = spec
+        return {"phrase": phrase, "skill_id": skill_id, "answer": answer, "conf": conf}
+
+
+def make(skills, **kwargs):
+    return simulate(CommonQuerySkills, cq.CommonQueryFanout, skills, **kwargs)
+
+
+def test_confident_answer_cuts_the_query_short():
+    bus, fanout = make(
+        {
+            "wiki.skill": (0.02, "8849 metres", 0.9),
+            "web.skill": (2.0, "about 8.8 km", 0.95),
+        },
+        deadline=1.0,
+    )
+    started = time.monotonic()
+    best = fanout.ask("how tall is everest")
+    assert best.skill_id == "wiki.skill"
+    assert time.monotonic() - started < 0.5
+    action = bus.of(cq.ACTION_MESSAGE)
+    assert action == [
+        {"skill_id": "wiki.skill", "phrase": "how tall is everest", "callback_data": {}}
+    ]
+    (report,) = bus.of(cq.ANSWER_MESSAGE)
+    assert report["reason"] == "confident"
+
+
+def test_deadline_bounds_the_wait_and_counts_timeouts():
+    bus, fanout = make(
+        {"wiki.skill": (0.02, "Paris", 0.5), "llm.skill": (1.0, "Paris!", 0.7)},
+        deadline=0.2,
+    )
+    started = time.monotonic()
+    best = fanout.ask("capital of france")
+    assert 0.2 <= time.monotonic() - started < 0.5
+    assert best.skill_id == "wiki.skill"
+    stats = fanout.book.stats("llm.skill")
+    assert stats.timeout_rate == 1.0
+    time.sleep(1.2)  # the late answer still feeds the latency statistics
+    assert len(stats.outcomes) == 1 and stats.p90 >= 1.0
+
+
+def test_all_answers_in_ends_the_round_early():
+    _, fanout = make(
+        {"a.skill": (0.03, "x", 0.4), "b.skill": (0.05, "y", 0.6)}, deadline=2.0
+    )
+    started = time.monotonic()
+    assert fanout.ask("q").skill_id == "b.skill"
+    assert time.monotonic() - started < 0.5
+
+
+def test_chronically_slow_skill_is_demoted_and_not_waited_for():
+    book = cq.LatencyBook(deadline=2.0, min_samples=3)
+    for _ in range(3):
+        book.stats("llm.skill").record_timeout()
+    assert book.demoted("llm.skill")
+    bus, fanout = make(
+        {"wiki.skill": (0.02, "x", 0.5), "llm.skill": (1.0, "y", 0.6)},
+        book=book,
+        deadline=2.0,
+    )
+    started = time.monotonic()
+    assert fanout.ask("q").skill_id == "wiki.skill"
+    assert time.monotonic() - started < 0.5
+    (report,) = bus.of(cq.ANSWER_MESSAGE)
+    assert report["reason"] == "complete" and report["skipped"] == ["llm.skill"]
+
+
+def test_demoted_skill_recovers_when_its_late_answers_beat_the_deadline():
+    book = cq.LatencyBook(deadline=1.0, min_samples=3)
+    for _ in range(3):
+        book.stats("llm.skill").record_timeout()
+    _, fanout = make(
+        {"wiki.skill": (0.02, "x", 0.5), "llm.skill": (0.1, "y", 0.6)},
+        book=book,
+        deadline=1.0,
+    )
+    for i in range(4):
+        assert fanout.ask(f"q{i}").skill_id == "wiki.skill"  # not waited for
+        time.sleep(0.15)
+    stats = book.stats("llm.skill")
+    assert list(stats.outcomes) == [False] * 3 + [True] * 4
+    assert not book.demoted("llm.skill")
+    assert fanout.ask("q4").skill_id == "llm.skill"
+
+
+def test_stats_survive_a_restart(tmp_path):
+    book = cq.LatencyBook(deadline=1.0, min_samples=2)
+    book.stats("slow.skill").record(3.0)
+    book.stats("slow.skill").record(2.5)
+    book.save(tmp_path / "stats.json")
+    restored = cq.LatencyBook(deadline=1.0, min_samples=2)
+    restored.load(tmp_path / "stats.json")
+    assert restored.demoted("slow.skill")
+    assert "slow.skill" in cq.format_stats(restored.snapshot())
@@ -0,0 +1,116 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for conversation_memory.py with fake summarizer and fact store."""
+
+import threading
+
+import pytest
+
+import conversation_memory as cm
+from stack_http import ServiceError
+
+
+class FakeFacts:
+    def __init__(self):
+        self.stored = []
+
+    def remember(self, facts):
+        self.stored.extend(facts)
+
+    def recall(self, query, limit=3, threshold=0.5):
+        return [fact for fact in self.stored if query.split()[0] in fact][:limit]
+
+
+def summarize(summary, turns):
+    return (summary + " " + " ".join(t.user for t in turns)).strip()
+
+
+def test_recent_turns_stay_verbatim_and_older_ones_fold():
+    memory = cm.ConversationMemory(summarize, keep_turns=2, fold_batch=2)
+    for i in range(6):
+        memory.add_turn(f"q{i}", f"a{i}")
+    memory.wait_idle(5)
+    assert [t.user for t in memory.turns] == ["q4", "q5"]
+    assert memory.summary == "q0 q1 q2 q3"
+    prompt = memory.build_prompt("next")
+    assert "q0 q1 q2 q3" in prompt and "User: q5\nAssistant: a5" in prompt
+    assert prompt.endswith("User: next\nAssistant:")
+    assert "User: q1" not in prompt
+
+
+def test_prompt_stays_bounded_over_a_long_chat():
+    memory = cm.ConversationMemory(
+        lambda summary, turns: "x" * 5000, keep_turns=3, max_summary_chars=300
+    )
+    sizes = []
+    for i in range(40):
+        memory.add_turn(f"question {i}", "answer " * 20)
+        memory.wait_idle(5)
+        sizes.append(len(memory.build_prompt("q")))
+    assert max(sizes[10:]) <= max(sizes[:10]) + 300
+
+
+def test_answers_do_not_wait_for_summarization():
+    release = threading.Event()
+
+    def slow(summary, turns):
+        release.wait(5)
+        return "folded"
+
+    memory = cm.ConversationMemory(slow, keep_turns=1, fold_batch=1)
+    memory.add_turn("q0", "a0")
+    memory.add_turn("q1", "a1")  # schedules a fold that blocks
+    assert "User: q0" in memory.build_prompt("q2")  # still pending, not lost
+    release.set()
+    memory.wait_idle(5)
+    assert memory.summary == "folded" and "User: q0" not in memory.build_prompt("q")
+
+
+def test_failed_summaries_retry_and_unfolded_turns_are_capped():
+    def down(summary, turns):
+        raise ServiceError("ollama down")
+
+    memory = cm.ConversationMemory(down, keep_turns=1, fold_batch=2)
+    for i in range(12):
+        memory.add_turn(f"q{i}", f"a{i}")
+        memory.wait_idle(5)
+    assert memory.summary == "" and memory.dropped > 0
+    assert len(memory.to_dict()["turns"]) == 1 + 2 * memory.fold_batch
+
+
+def test_facts_are_extracted_stored_and_recalled():
+    facts = FakeFacts()
+    memory = cm.ConversationMemory(
+        summarize,
+        extract_facts=lambda turns: [f"{t.user} likes nasi goreng" for t in turns],
+        facts=facts,
+        keep_turns=1,
+        fold_batch=1,
+    )
+    memory.add_turn("Jay", "noted")
+    memory.add_turn("hello", "hi")
+    memory.wait_idle(5)
+    assert facts.stored == ["Jay likes nasi goreng"]
+    assert "- Jay likes nasi goreng" in memory.build_prompt("Jay wants dinner")
+
+
+def test_llm_fact_extractor_parses_bullets():
+    extract = cm.llm_fact_extractor(lambda prompt: "- Has a dog\nNONE\n-\n- Owns a ute")
+    assert extract([cm.Turn("q", "a", 0)]) == ["Has a dog", "Owns a ute"]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    memory = cm.ConversationMemory(summarize, keep_turns=3)
+    memory.summary = "earlier"
+    memory.add_turn("q", "a")
+    memory.save(tmp_path / "memory.json")
+    fresh = cm.ConversationMemory(summarize, keep_turns=3)
+    fresh.load(tmp_path / "memory.json")
+    assert fresh.summary == "earlier" and fresh.turns[0].user == "q"
+    with pytest.raises(cm.ConversationError):
+        fresh.load(tmp_path / "missing.json")
+
+
+def test_read_history_skips_blank_lines(tmp_path):
+    path = tmp_path / "history"
+    path.write_text("hello\n\n  how are you \n")
+    assert cm.read_history(path) == ["hello", "how are you"]
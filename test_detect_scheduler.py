@@ -0,0 +1,110 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for detect_scheduler.py with a simulated clock."""
+
+import pytest
+
+import detect_scheduler as ds
+from conftest import FakeClock
+
+
+def make(cameras, budget=60.0):
+    clock, published = FakeClock(1000.0), []
+    scheduler = ds.DetectScheduler(
+        cameras,
+        lambda topic, payload: published.append((topic, payload)),
+        budget,
+        clock,
+    )
+    return scheduler, clock, published
+
+
+def no_probes(name, cost, priority=0):
+    return ds.CameraPolicy(
+        name, cost, priority, hold=10.0, probe_every=1e9, probe_for=0
+    )
+
+
+def test_motion_turns_detection_on_until_hold_expires():
+    scheduler, clock, published = make([no_probes("door", 30)])
+    scheduler.start()
+    assert published == [("door/motion/set", "ON"), ("door/detect/set", "OFF")]
+    published.clear()
+    scheduler.on_motion("door", True)
+    clock.now += 60
+    assert scheduler.tick() == {"door": "motion"}  # motion still on
+    scheduler.on_motion("door", False)
+    clock.now += 9
+    scheduler.tick()
+    clock.now += 2
+    scheduler.tick()
+    assert published == [("door/detect/set", "ON"), ("door/detect/set", "OFF")]
+
+
+def test_budget_admits_by_priority_then_recent_motion():
+    scheduler, clock, _ = make(
+        [
+            no_probes("yard", 30),
+            no_probes("door", 30, priority=1),
+            no_probes("drive", 30),
+        ]
+    )
+    scheduler.on_motion("yard", True)
+    clock.now += 1
+    scheduler.on_motion("drive", True)
+    clock.now += 1
+    scheduler.on_motion("door", True)
+    assert scheduler.tick() == {"yard": "idle", "door": "motion", "drive": "motion"}
+    assert scheduler.load() == pytest.approx(60)
+
+
+def test_probes_duty_cycle_and_yield_to_motion():
+    probe = ds.CameraPolicy("garden", 30, probe_every=30, probe_for=2)
+    scheduler, clock, _ = make([probe, no_probes("door", 40)], budget=60)
+    modes = []
+    for _ in range(300):
+        clock.now += 0.1
+        modes.append(scheduler.tick()["garden"])
+    assert 0.05 <= modes.count("probe") / len(modes) <= 0.1
+    scheduler.on_motion("door", True)
+    for _ in range(300):
+        clock.now += 0.1
+        assert scheduler.tick()["garden"] == "idle"  # 30 + 40 exceeds 60
+
+
+def test_measured_cpu_rescales_costs():
+    scheduler, clock, _ = make([no_probes("a", 20), no_probes("b", 20)], budget=50)
+    scheduler.on_motion("a", True)
+    scheduler.on_motion("b", True)
+    assert scheduler.load() == pytest.approx(40)
+    for _ in range(20):
+        scheduler.observe_cpu(60.0)  # actually 1.5x the estimate
+    assert scheduler.cost_scale == pytest.approx(1.5, rel=0.01)
+    assert list(scheduler.tick().values()).count("motion") == 1
+
+
+def test_measured_cpu_is_the_detector_processes_only():
+    stats = {
+        "detectors": {"cpu1": {"pid": 41}, "cpu2": {"pid": 42}},
+        "cpu_usages": {
+            "frigate.full_system": {"cpu": "93.0"},
+            "41": {"cpu": "30.5"},
+            "42": {"cpu": "12.0"},
+        },
+    }
+    assert ds.detector_cpu(stats) == pytest.approx(42.5)
+    del stats["cpu_usages"]["42"]  # detector restarted, stats not caught up
+    with pytest.raises(ds.ServiceError):
+        ds.detector_cpu(stats)
+
+
+def test_policies_from_frigate_config():
+    config = {
+        "cameras": {
+            "front": {"detect": {"width": 1280, "height": 720, "fps": 5}},
+            "back": {"enabled": False},
+            "side": {"detect": {"width": 640, "height": 360, "fps": 5}},
+        }
+    }
+    front, side = ds.policies_from_config(config, costs={"side": 7.5})
+    assert front.cost == pytest.approx(1280 * 720 / 1e6 * 5 * 5)
+    assert (side.name, side.cost) == ("side", 7.5)
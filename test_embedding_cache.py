@@ -0,0 +1,92 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for embedding_cache.py."""
+
+import pytest
+
+import embedding_cache as ec
+
+
+def test_round_trip_persists_across_instances(tmp_path):
+    cache = ec.EmbeddingCache(tmp_path)
+    assert cache.get("kitchen light") is None
+    cache.put("kitchen light", [0.1, 0.2, 0.3])
+    cache.flush()
+    reopened = ec.EmbeddingCache(tmp_path)
+    assert reopened.get("kitchen light") == pytest.approx([0.1, 0.2, 0.3], abs=1e-3)
+    assert (reopened.hits, len(reopened)) == (1, 1)
+    assert (tmp_path / "vectors.f16").stat().st_size == reopened.capacity * 3 * 2
+
+
+def test_full_cache_evicts_least_recently_used(tmp_path):
+    now = iter(range(100))
+    # Room for two 4-d rows (2 * 4 + 16 bytes each).
+    cache = ec.EmbeddingCache(tmp_path, max_bytes=48, clock=lambda: next(now))
+    cache.put("a", [1.0] * 4)
+    cache.put("b", [2.0] * 4)
+    assert cache.get("a") is not None
+    cache.put("c", [3.0] * 4)
+    assert cache.get("b") is None and cache.get("a") is not None
+    assert (len(cache), cache.evictions) == (2, 1)
+
+
+def test_rewriting_a_text_reuses_its_row(tmp_path):
+    cache = ec.EmbeddingCache(tmp_path, max_bytes=48)
+    cache.put("a", [1.0] * 4)
+    cache.put("a", [2.0] * 4)
+    assert len(cache) == 1 and cache.get("a") == [2.0] * 4
+
+
+def test_keys_stay_in_their_probe_window(tmp_path):
+    cache = ec.EmbeddingCache(tmp_path, max_bytes=64 * 24)  # 64 rows of 4-d
+    texts = [f"text {i}" for i in range(200)]
+    for i, text in enumerate(texts):
+        cache.put(text, [float(i)] * 4)
+    assert len(cache) == 64 and cache.evictions == 136
+    for slot in map(int, cache._keys.nonzero()[0]):
+        distance = (slot - int(cache._keys[slot]) % cache.capacity) % cache.capacity
+        assert distance < ec.PROBE_WINDOW
+    kept = [text for text in texts if cache.get(text) is not None]
+    assert len(kept) == 64 and texts[-1] in kept
+
+
+def test_scan_era_directory_is_rehashed_on_open(tmp_path):
+    cache = ec.EmbeddingCache(tmp_path, max_bytes=64 * 24)
+    cache.put("seed", [0.0] * 4)
+    texts = [f"text {i}" for i in range(10)]
+    cache._keys[:] = 0
+    for slot, text in enumerate(texts):  # rows filled from slot 0 up
+        cache._vectors[slot] = [float(slot)] * 4
+        cache._keys[slot] = ec.text_key(text)
+        cache._used[slot] = slot
+    cache.flush()
+    meta = tmp_path / "meta.json"
+    meta.write_text(meta.read_text().replace(', "layout": "probe"', ""))
+    reopened = ec.EmbeddingCache(tmp_path)
+    assert [reopened.get(text)[0] for text in texts] == list(range(10))
+    assert '"layout": "probe"' in meta.read_text()
+
+
+def test_dimension_mismatch_is_reported(tmp_path):
+    cache = ec.EmbeddingCache(tmp_path)
+    cache.put("a", [1.0, 2.0])
+    with pytest.raises(ec.EmbeddingCacheError):
+        cache.put("b", [1.0, 2.0, 3.0])
+
+
+def test_cached_embedder_calls_backend_once_per_text(tmp_path):
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return [float(len(text)), 1.0]
+
+    embedder = ec.CachedEmbedder(embed, ec.EmbeddingCache(tmp_path))
+    assert embedder("hello") == embedder("hello") == [5.0, 1.0]
+    assert calls == ["hello"]
+    assert embedder.cache.stats()["hit_rate"] == 0.5
+
+
+def test_model_dirs_are_filesystem_safe(tmp_path):
+    assert ec.model_dir("nomic-embed-text:latest", tmp_path).name == (
+        "nomic-embed-text_latest"
+    )
@@ -0,0 +1,144 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for frigate_bridge.py with synthetic detection bursts."""
+
+import threading
+import time
+from dataclasses import replace
+
+import frigate_bridge as fb
+
+
+def event(object_id, kind="update", score=0.7, zones=(), label="person"):
+    return fb.ObjectEvent(
+        object_id, "front_door", label, kind, score, zones=list(zones)
+    )
+
+
+def test_mqtt_and_api_payloads_normalize_alike():
+    mqtt = fb.from_mqtt(
+        {
+            "type": "new",
+            "after": {
+                "id": "1.0-abc",
+                "camera": "driveway",
+                "label": "car",
+                "top_score": 0.81,
+                "sub_label": ["Dad's car", 0.9],
+                "current_zones": ["drive"],
+                "start_time": 1.0,
+            },
+        }
+    )
+    api = fb.from_api(
+        {
+            "id": "1.0-abc",
+            "camera": "driveway",
+            "label": "car",
+            "sub_label": "Dad's car",
+            "zones": ["drive"],
+            "start_time": 1.0,
+            "end_time": 9.0,
+            "data": {"top_score": 0.81},
+        }
+    )
+    assert (mqtt.kind, api.kind) == ("new", "end")
+    assert (mqtt.sub_label, mqtt.zones, mqtt.score) == (api.sub_label, api.zones, 0.81)
+
+
+def test_deduper_keeps_only_meaningful_changes():
+    dedupe = fb.Deduper(score_step=0.1)
+    updates = [event("a", score=0.70 + i * 0.001) for i in range(50)]
+    updates += [event("a", score=0.85), event("a", zones=["porch"], score=0.85)]
+    updates += [event("a", kind="end"), event("a", kind="end")]
+    forwarded = [e for e in map(dedupe.significant, updates) if e]
+    assert [e.kind for e in forwarded] == ["new", "update", "update", "end"]
+    assert dedupe.dropped == 50
+
+
+def test_snapshot_becoming_available_is_forwarded():
+    dedupe = fb.Deduper()
+    assert dedupe.significant(event("a", kind="new"))
+    snapshot = replace(event("a"), has_snapshot=True)
+    assert dedupe.significant(snapshot).has_snapshot
+    assert dedupe.significant(snapshot) is None
+
+
+def test_poll_fetches_the_end_of_objects_older_than_the_window():
+    def api(object_id, start):
+        return {"id": object_id, "camera": "yard", "label": "car", "start_time": start}
+
+    frigate = {
+        "/api/events?after=1000&limit=50": [api("fresh", 1100)],
+        "/api/events?in_progress=1&limit=50": [api("parked", 10), api("fresh", 1100)],
+    }
+    calls = []
+
+    def get(path):
+        calls.append(path)
+        if path not in frigate:
+            raise fb.ServiceError("404")
+        return frigate[path]
+
+    dedupe = fb.Deduper()
+    for raw in fb.poll_events(get, 1000, 50, dedupe.open_ids()):
+        dedupe.significant(fb.from_api(raw))
+    assert dedupe.open_ids() == {"parked", "fresh"}
+
+    # "parked" ends: it is neither recent nor in progress any more.
+    frigate["/api/events?in_progress=1&limit=50"] = [api("fresh", 1100)]
+    frigate["/api/events/parked"] = dict(api("parked", 10), end_time=1500)
+    calls.clear()
+    events = fb.poll_events(get, 1000, 50, dedupe.open_ids() | {"deleted"})
+    assert [e["id"] for e in events] == ["parked", "fresh"]
+    assert "/api/events/fresh" not in calls and "/api/events/deleted" in calls
+    forwarded = [dedupe.significant(fb.from_api(raw)) for raw in events]
+    assert forwarded[0].kind == "end" and forwarded[1] is None
+    assert dedupe.open_ids() == {"fresh"}
+
+
+def test_batcher_coalesces_per_object_and_bounds_batches():
+    sent = []
+    batcher = fb.EventBatcher(lambda t, d: sent.append(d), max_batch=3)
+    batcher.offer(event("a", kind="new"))
+    batcher.offer(event("a", score=0.9))
+    for name in "bcde":
+        batcher.offer(event(name, kind="new"))
+    assert batcher.flush() == 3 and batcher.flush() == 2
+    first = sent[0]["events"][0]
+    assert (first["id"], first["kind"], first["score"]) == ("a", "new", 0.9)
+    assert batcher.stats.coalesced == 1
+
+
+def test_backpressure_blocks_then_drops_only_updates():
+    batcher = fb.EventBatcher(lambda t, d: None, max_pending=2, block_timeout=0.05)
+    assert batcher.offer(event("a", kind="new"))
+    assert batcher.offer(event("b"))
+    started = time.monotonic()
+    assert not batcher.offer(event("c"))
+    assert time.monotonic() - started >= 0.05
+    assert batcher.offer(event("d", kind="end"))  # evicts the pending update
+    assert len(batcher) == 2 and batcher.stats.dropped == 2
+    threading.Timer(0.02, batcher.flush).start()
+    assert batcher.offer(event("e"))  # unblocked by the flush
+
+
+def test_burst_is_rate_limited_on_the_bus():
+    sent = []
+    bridge = fb.FrigateBridge(
+        fb.Deduper(),
+        fb.EventBatcher(lambda t, d: sent.append((time.monotonic(), d)), rate=20),
+    )
+    stop = threading.Event()
+    worker = threading.Thread(target=bridge.batcher.run, args=(stop,))
+    worker.start()
+    for frame in range(30):
+        for obj in range(40):
+            bridge.handle(event(f"obj{obj}", score=0.5 + frame * 0.01))
+    time.sleep(0.3)
+    stop.set()
+    worker.join()
+    events = [e for _, d in sent for e in d["events"]]
+    assert {e["id"] for e in events} == {f"obj{i}" for i in range(40)}
+    assert len(events) < 40 * 30 / 5
+    gaps = [b[0] - a[0] for a, b in zip(sent, sent[1:])]
+    assert all(gap >= 0.045 for gap in gaps[:-1])
@@ -0,0 +1,114 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for frigate_tune.py with canned ffmpeg/ffprobe output."""
+
+import json
+import subprocess
+
+import pytest
+
+import frigate_tune as ft
+
+STREAMS = {
+    "main.mp4": ("h264", 2560, 1440, "25/1"),
+    "sub.mp4": ("h264", 640, 480, "15/1"),
+}
+
+
+class FakeFFmpeg:
+    """ffprobe/ffmpeg stand-in: decode fps per hwaccel, None for failure."""
+
+    def __init__(self, decode_fps):
+        self.decode_fps = decode_fps
+        self.commands = []
+
+    def __call__(self, command):
+        self.commands.append(command)
+        if command[0] == "ffprobe":
+            name = command[-1].split("/")[-1]
+            if name.endswith(".mkv"):  # a captured live stream
+                name = "main.mp4"
+            codec, width, height, rate = STREAMS[name]
+            stream = dict(
+                codec_name=codec, width=width, height=height, avg_frame_rate=rate
+            )
+            out = json.dumps({"streams": [stream]})
+            return subprocess.CompletedProcess(command, 0, out, "")
+        if "-hwaccels" in command:
+            out = "Hardware acceleration methods:\nvdpau\nvaapi\ncuda\n"
+            return subprocess.CompletedProcess(command, 0, out, "")
+        if "-c" in command:  # clip capture
+            return subprocess.CompletedProcess(command, 0, "", "")
+        hwaccel = (
+            command[command.index("-hwaccel") + 1] if "-hwaccel" in command else ""
+        )
+        fps = self.decode_fps.get(hwaccel)
+        if fps is None:
+            return subprocess.CompletedProcess(command, 1, "", "No device")
+        err = f"frame=  100 fps=0.0\nframe= {int(fps * 4)}\nbench: rtime=4.000s\n"
+        return subprocess.CompletedProcess(command, 0, "", err)
+
+
+def test_fastest_working_decoder_wins():
+    ffmpeg = FakeFFmpeg({"": 120.0, "vaapi": 400.0, "cuda": None})
+    hwaccels = ft.available_hwaccels(ffmpeg)
+    assert hwaccels == ["vaapi", "cuda"]
+    bench = ft.bench_camera("front", "main.mp4", "sub.mp4", hwaccels, run=ffmpeg)
+    assert bench.detect_stream.width == 640
+    assert bench.best_decode.hwaccel == "vaapi"
+    assert bench.best_decode.fps == pytest.approx(400.0)
+
+
+def test_live_streams_are_copied_before_decoding():
+    ffmpeg = FakeFFmpeg({"": 200.0})
+    bench = ft.bench_camera("front", "rtsp://10.0.10.10:554/rtsp", run=ffmpeg)
+    assert bench.main.source == "rtsp://10.0.10.10:554/rtsp"
+    decode = ffmpeg.commands[-1]
+    assert decode[decode.index("-i") + 1].endswith(".mkv")
+
+
+def test_plan_steps_down_resolution_as_cameras_share_the_detector():
+    ffmpeg = FakeFFmpeg({"": 300.0})
+    bench = ft.bench_camera("front", "main.mp4", run=ffmpeg)
+    (alone,) = ft.plan_cameras([bench], inference_ms=10)
+    assert (alone.detect_width, alone.detect_height, alone.detect_fps) == (
+        1280,
+        720,
+        5,
+    )
+    crowded = ft.plan_cameras([bench] * 6, inference_ms=40)
+    assert crowded[0].detect_width < 1280 and crowded[0].detect_fps >= 1
+    assert sum(plan.detect_load for plan in crowded) <= 0.7
+    assert alone.decode_load == pytest.approx(25 / 300)
+
+
+def test_cameras_yaml_replaces_only_the_cameras_section():
+    ffmpeg = FakeFFmpeg({"": 100.0, "vaapi": 300.0})
+    bench = ft.bench_camera("front", "main.mp4", "sub.mp4", ["vaapi"], run=ffmpeg)
+    section = ft.cameras_yaml(ft.plan_cameras([bench], inference_ms=10))
+    assert "hwaccel_args: preset-vaapi" in section
+    assert "    snapshots:\n      enabled: true" in section
+    assert "        - path: sub.mp4\n          roles:\n            - detect" in section
+    assert "        - path: main.mp4\n          roles:\n            - record" in section
+    config = (
+        "mqtt:\n  enabled: false\n\ncameras:\n  old:\n    enabled: true\n"
+        "# trailing note\nversion: 0.15-1\n"
+    )
+    updated = ft.replace_section(config, "cameras", section)
+    assert updated.startswith("mqtt:\n  enabled: false\n\ncameras:\n  front:")
+    assert "old:" not in updated and updated.endswith("version: 0.15-1\n")
+
+
+def test_rtsp_inputs_read_the_go2rtc_restream():
+    ffmpeg = FakeFFmpeg({"": 200.0})
+    main, sub = "rtsp://10.0.10.10:554/rtsp", "rtsp://10.0.10.10:554/sub"
+    bench = ft.bench_camera("front", main, sub, run=ffmpeg)
+    bench.sub = ft.StreamInfo(sub, "h264", 640, 480, 15.0)
+    plans = ft.plan_cameras([bench], inference_ms=10)
+    assert ft.go2rtc_yaml(plans) == (
+        f"go2rtc:\n  streams:\n    front_sub: {sub}\n    front: {main}\n"
+    )
+    section = ft.cameras_yaml(plans)
+    assert "10.0.10.10" not in section
+    assert section.count("input_args: preset-rtsp-restream") == 2
+    assert "- path: rtsp://127.0.0.1:8554/front_sub" in section
+    assert main in ft.cameras_yaml(plans, restream=False)
@@ -0,0 +1,76 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for llm_bench.py against its recorded-response stand-in server."""
+
+import json
+import threading
+
+import pytest
+
+import llm_bench as lb
+from llm_backends import OllamaBackend, TGIBackend
+
+RECORDINGS = {
+    "hello": [[0.02, "Hi"], [0.005, " there"], [0.005, "!"]],
+    "weather": [[0.02, "Sunny"], [0.005, "."]],
+}
+
+
+@pytest.fixture
+def standin():
+    server = lb.make_standin(RECORDINGS, slots=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_standin_speaks_ollama_and_tgi_protocols(standin):
+    assert "".join(OllamaBackend(standin).stream("hello")) == "Hi there!"
+    assert "".join(TGIBackend(standin).stream("weather", system="Be brief")) == (
+        "Sunny."
+    )
+    assert "".join(OllamaBackend(standin).stream("unknown")) in ("Hi there!", "Sunny.")
+
+
+def test_timed_request_measures_ttft_and_gaps(standin):
+    timing = lb.timed_request(OllamaBackend(standin).stream, lb.Prompt("hello"))
+    assert timing.error is None and timing.tokens == 3
+    assert timing.ttft >= 0.02 and len(timing.gaps) == 2
+
+
+def test_single_slot_serializes_concurrent_requests(standin):
+    stream = OllamaBackend(standin).stream
+    prompts = [lb.Prompt("hello")]
+    _, serial = lb.run_level(stream, prompts, 1, 4)
+    timings, parallel = lb.run_level(stream, prompts, 4, 4)
+    assert parallel > serial * 0.7  # one decode slot: no speed-up
+    result = lb.summarize(4, timings, parallel)
+    assert result.tokens == 12 and result.errors == 0
+    assert result.ttft_p95 > result.ttft_p50 >= 0.02
+
+
+def test_errors_are_counted_not_raised():
+    timing = lb.timed_request(
+        OllamaBackend("http://127.0.0.1:9", timeout=1).stream, lb.Prompt("x")
+    )
+    assert timing.error
+    result = lb.summarize(1, [timing], 1.0)
+    assert result.errors == 1 and result.ttft_p50 is None
+    assert "-" in lb.format_table([result])
+
+
+def test_record_round_trips_into_standin(standin, tmp_path):
+    path = tmp_path / "answers.jsonl"
+    prompts = lb.load_prompts(None)[:1]
+    assert lb.record(OllamaBackend(standin).stream, prompts, path) == 1
+    recording = json.loads(path.read_text())
+    assert recording["prompt"] == prompts[0].prompt and recording["chunks"]
+    assert prompts[0].prompt in lb.load_recordings(path)
+
+
+def test_load_prompts_rejects_bad_records(tmp_path):
+    path = tmp_path / "prompts.json"
+    path.write_text(json.dumps(["plain", {"prompt": "p", "system": "s"}]))
+    assert lb.load_prompts(path)[1] == lb.Prompt("p", "s")
+    path.write_text(json.dumps([42]))
+    with pytest.raises(lb.BenchmarkError):
+        lb.load_prompts(path)
@@ -0,0 +1,140 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for llm_router.py with fake backends and a local router server."""
+
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import llm_router as lr
+from conftest import FakeClock
+from llm_backends import RouterBackend
+from single_flight import SingleFlight
+from stack_http import ServiceError, request_json
+
+
+class FakeBackend:
+    def __init__(self, chunks=("Hello", " there", "."), fail=False):
+        self.chunks = chunks
+        self.fail = fail
+        self.prompts = []
+        self.healthy = True
+
+    def stream(self, prompt, system=None):
+        self.prompts.append((prompt, system))
+        if self.fail:
+            raise ServiceError("connection refused")
+        yield from self.chunks
+
+    def check_health(self):
+        if not self.healthy:
+            raise ServiceError("down")
+
+
+def test_choose_prefers_lowest_expected_completion_time():
+    router = lr.LLMRouter({"ollama": FakeBackend(), "tgi": FakeBackend()})
+    router.stats["ollama"].tokens_per_second = 30.0
+    assert router.choose() == "ollama"
+    router.stats["ollama"].in_flight = 1  # one slot: the next request queues
+    assert router.choose() == "tgi"
+    router.stats["tgi"].in_flight = 8
+    assert router.choose() == "ollama"
+    assert router.choose(prefer="tgi") == "tgi"
+
+
+def test_stream_fails_over_before_first_token_and_backs_off():
+    clock = FakeClock()
+    down, up = FakeBackend(fail=True), FakeBackend()
+    router = lr.LLMRouter({"ollama": down, "tgi": up}, retry_after=5, clock=clock)
+    routed = router.stream("hi", max_tokens=10, prefer="ollama")
+    assert "".join(routed) == "Hello there."
+    assert routed.backend == "tgi" and routed.tokens == 3
+    assert not router.stats["ollama"].healthy
+    assert router.choose(prefer="ollama") == "tgi"
+    clock.now += 6  # back-off elapsed: ollama gets another try
+    assert router.choose(prefer="ollama") == "ollama"
+    assert router.stats["ollama"].in_flight == 0 == router.stats["tgi"].in_flight
+
+
+def test_all_backends_down_raises_router_error():
+    router = lr.LLMRouter({"ollama": FakeBackend(fail=True)})
+    with pytest.raises(lr.RouterError):
+        router.generate("hi")
+
+
+def test_probe_marks_health_and_max_tokens_truncates():
+    backend = FakeBackend(chunks=("a", "b", "c", "d"))
+    router = lr.LLMRouter({"tgi": backend})
+    backend.healthy = False
+    router.probe()
+    assert not router.stats["tgi"].healthy
+    backend.healthy = True
+    router.probe()
+    assert router.stats["tgi"].healthy
+    assert router.generate("hi", max_tokens=2) == "ab"
+    assert router.stats["tgi"].requests == 1
+
+
+def test_identical_concurrent_requests_share_one_generation():
+    gate = threading.Event()
+
+    class SlowBackend(FakeBackend):
+        def stream(self, prompt, system=None):
+            self.prompts.append((prompt, system))
+            gate.wait(5)
+            yield from self.chunks
+
+    backend = SlowBackend()
+    router = lr.LLMRouter({"ollama": backend}, flights=SingleFlight())
+    first = router.stream("briefing")
+    second = router.stream("briefing")
+    other = router.stream("weather")
+    gate.set()
+    assert "".join(first) == "".join(second) == "".join(other) == "Hello there."
+    assert len(backend.prompts) == 2
+    assert second.source.backend == "ollama"
+
+
+def test_messages_to_prompt_flattens_turns():
+    messages = [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello"},
+        {"role": "user", "content": [{"type": "text", "text": "Time?"}]},
+    ]
+    prompt, system = lr.messages_to_prompt(messages)
+    assert system == "Be brief."
+    assert prompt == "User: Hi\nAssistant: Hello\nUser: Time?\nAssistant:"
+    assert lr.messages_to_prompt([{"role": "user", "content": "x"}]) == ("x", None)
+
+
+@pytest.fixture
+def router_url():
+    backends = {"ollama": FakeBackend(), "tgi": FakeBackend(fail=True)}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), lr.RouterHandler)
+    server.router = lr.LLMRouter(backends)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_openai_chat_endpoint_streams_and_completes(router_url):
+    client = RouterBackend(router_url, model="tgi")
+    assert "".join(client.stream("hi", system="Be brief.")) == "Hello there."
+    assert client.generate("hi") == "Hello there."
+    stats = request_json("GET", f"{router_url}/stats")["backends"]
+    assert stats["ollama"]["requests"] == 2 and not stats["tgi"]["healthy"]
+    models = request_json("GET", f"{router_url}/v1/models")
+    assert [m["id"] for m in models["data"]] == ["auto", "ollama", "tgi"]
+
+
+def test_completions_endpoint_and_bad_request(router_url):
+    result = request_json(
+        "POST", f"{router_url}/v1/completions", {"prompt": "hi", "max_tokens": 1}
+    )
+    assert result["choices"][0]["text"] == "Hello"
+    assert result["model"] == "ollama"
+    with pytest.raises(ServiceError) as error:
+        request_json("POST", f"{router_url}/v1/chat/completions", {"nope": 1})
+    assert error.value.status == 400
+    assert "invalid_request_error" in str(error.value)
@@ -0,0 +1,114 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for media_index.py on a generated media folder."""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import media_index as mi
+
+
+def touch(path, content=b"x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+
+@pytest.fixture
+def library(tmp_path):
+    music = tmp_path / "Music"
+    touch(music / "Jazz" / "Miles Davis" / "Kind of Blue" / "01 So What.mp3")
+    touch(music / "Jazz" / "Miles Davis" / "Kind of Blue" / "02 Freddie Freeloader.mp3")
+    touch(music / "Rock" / "Queen" / "Greatest Hits" / "01 Bohemian Rhapsody.flac")
+    touch(music / "Rock" / "cover.jpg")
+    (music / "Road Trip.m3u").write_text(
+        "#EXTM3U\nRock/Queen/Greatest Hits/01 Bohemian Rhapsody.flac\n"
+        "http://radio.example/stream\n"
+    )
+    index = mi.MediaIndex(tmp_path / "index.sqlite", [music])
+    yield music, index
+    index.close()
+
+
+def test_scan_is_incremental(library):
+    music, index = library
+    first = index.scan()
+    assert (first.added, first.unchanged) == (4, 0) and len(index) == 4
+    touch(music / "Jazz" / "Miles Davis" / "Kind of Blue" / "01 So What.mp3", b"yy")
+    (music / "Rock" / "Queen" / "Greatest Hits" / "01 Bohemian Rhapsody.flac").unlink()
+    touch(music / "Jazz" / "Coltrane" / "Blue Train" / "01 Blue Train.ogg")
+    second = index.scan()
+    assert second == mi.ScanStats(1, 1, 1, 2, second.seconds)
+    assert len(index) == 4
+
+
+def test_search_uses_tags_folders_and_playlists(library):
+    _, index = library
+    index.scan()
+    jazz = index.search("play some jazz")
+    assert {entry.title for entry in jazz} == {"So What", "Freddie Freeloader"}
+    (what,) = index.search("so what miles")
+    assert (what.artist, what.album) == ("Miles Davis", "Kind of Blue")
+    assert index.search("road trip")[0].kind == "playlist"
+    assert index.search("bohem")[0].title == "Bohemian Rhapsody"
+    partial = index.search("queen polka")
+    assert partial[0].artist == "Queen" and not partial[0].all_words
+    assert index.search("play some") == []
+
+
+def test_update_paths_and_remove_tree(library):
+    music, index = library
+    index.scan()
+    new = touch(music / "Jazz" / "Monk" / "Monk's Dream" / "01 Bye-Ya.mp3")
+    gone = music / "Jazz" / "Miles Davis" / "Kind of Blue" / "01 So What.mp3"
+    gone.unlink()
+    assert index.update_paths([new, gone, music / "notes.txt"]) == 2
+    assert index.search("monk")[0].title == "Bye-Ya"
+    assert index.remove_tree(music / "Jazz") == 2
+    assert index.search("jazz") == []
+
+
+def test_ocp_query_response(library):
+    music, index = library
+    index.scan()
+    sent = []
+    service = mi.MediaIndexService(index, lambda t, d: sent.append((t, d)))
+    service.on_query(SimpleNamespace(data={"phrase": "jazz", "question_type": 2}))
+    ((msg_type, data),) = sent
+    assert msg_type == mi.RESPONSE_MESSAGE and data["skill_id"] == mi.SKILL_ID
+    best = data["results"][0]
+    assert best["match_confidence"] == 90 and best["uri"].startswith("file://")
+    assert best["playback"] == mi.PLAYBACK_AUDIO
+    assert service.results("jazz", question_type=3) == []
+    (playlist,) = service.results("road trip")
+    assert [item["title"] for item in playlist["playlist"]] == [
+        "01 Bohemian Rhapsody",
+        "stream",
+    ]
+
+
+def test_search_stays_in_milliseconds(tmp_path):
+    index = mi.MediaIndex(tmp_path / "index.sqlite", [tmp_path])
+    rows = [
+        dict(
+            path=f"/music/{i}.mp3",
+            kind="audio",
+            mtime=0.0,
+            size=1,
+            title=f"track {i}",
+            artist=f"artist {i % 300}",
+            album=f"album {i % 900}",
+            genre=("jazz", "rock", "folk")[i % 3],
+            tags="",
+            duration=0.0,
+        )
+        for i in range(20000)
+    ]
+    with index._db:
+        index._db.executemany(mi.UPSERT, rows)
+    started = time.perf_counter()
+    for _ in range(20):
+        assert len(index.search("jazz artist 7", limit=20)) == 20
+    assert (time.perf_counter() - started) / 20 < 0.02  # generous for CI
+    index.close()
@@ -0,0 +1,159 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for memory_ingest.py with a fake embedder and Qdrant store."""
+
+import json
+import threading
+import time
+
+import pytest
+
+import memory_ingest as mi
+from stack_http import ServiceError
+
+
+class FakeStore:
+    def __init__(self, fail_after=None):
+        self.points = {}
+        self.upserts = []
+        self.collections = {}
+        self.fail_after = fail_after
+
+    def ensure_collection(self, name, size, payload_indexes=None):
+        self.collections[name] = size
+
+    def upsert(self, name, points):
+        if self.fail_after is not None and len(self.upserts) >= self.fail_after:
+            raise ServiceError("qdrant restarting")
+        self.upserts.append(len(points))
+        self.points.update({p["id"]: p for p in points})
+
+
+def embed(text):
+    return [float(len(text)), 1.0]
+
+
+def documents(n, prefix="doc"):
+    return [mi.Document("notes", f"{prefix}{i}", f"text {i}") for i in range(n)]
+
+
+def test_batches_upserts_and_skips_unchanged_on_rerun(tmp_path):
+    store = FakeStore()
+    checkpoint = mi.Checkpoint(tmp_path / "ckpt.json")
+    pipeline = mi.IngestPipeline(
+        embed, store, batch_size=4, upsert_size=8, checkpoint=checkpoint
+    )
+    stats = pipeline.run(documents(20))
+    assert (stats.seen, stats.upserted, stats.batches) == (20, 20, 5)
+    assert store.upserts == [8, 8, 4] and store.collections == {"stack_memory": 2}
+    point = next(iter(store.points.values()))
+    assert point["payload"]["source"] == "notes" and point["payload"]["text"]
+
+    changed = documents(20)
+    changed[3].text = "edited"
+    rerun = mi.IngestPipeline(
+        embed, store, checkpoint=mi.Checkpoint(tmp_path / "ckpt.json")
+    ).run(changed)
+    assert (rerun.skipped, rerun.upserted) == (19, 1)
+
+
+def test_interrupted_run_resumes_from_acknowledged_batches(tmp_path):
+    path = tmp_path / "ckpt.json"
+    pipeline = mi.IngestPipeline(
+        embed,
+        FakeStore(fail_after=1),
+        batch_size=2,
+        upsert_size=4,
+        concurrency=1,
+        checkpoint=mi.Checkpoint(path),
+    )
+    try:
+        pipeline.run(documents(12))
+    except ServiceError:
+        pass
+    assert len(json.loads(path.read_text())) == 4
+    stats = mi.IngestPipeline(embed, FakeStore(), checkpoint=mi.Checkpoint(path)).run(
+        documents(12)
+    )
+    assert (stats.skipped, stats.upserted) == (4, 8)
+
+
+def test_embedding_runs_concurrently_but_bounded():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def slow_embed(text):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+        return [1.0]
+
+    pipeline = mi.IngestPipeline(slow_embed, FakeStore(), batch_size=1, concurrency=3)
+    stats = pipeline.run(documents(12))
+    assert stats.upserted == 12 and 1 < peak <= 3
+    assert stats.docs_per_second > 0
+
+
+def test_failed_batches_are_counted_and_not_checkpointed():
+    def flaky(text):
+        if text == "text 1":
+            raise ServiceError("ollama busy")
+        return [1.0]
+
+    checkpoint = mi.Checkpoint(None)
+    stats = mi.IngestPipeline(
+        flaky, FakeStore(), batch_size=2, checkpoint=checkpoint
+    ).run(documents(4))
+    assert (stats.failed, stats.upserted) == (2, 2)
+    assert not checkpoint.done(documents(4)[0])
+
+
+def test_unwritable_checkpoint_raises_ingest_error(tmp_path):
+    (tmp_path / "file").write_text("", "utf-8")
+    checkpoint = mi.Checkpoint(tmp_path / "file" / "ckpt.json")
+    with pytest.raises(mi.IngestError, match="Cannot write checkpoint"):
+        checkpoint.mark(documents(1))
+
+
+def test_sources_render_documents(tmp_path):
+    class FakeHA:
+        def states(self):
+            return [
+                {
+                    "entity_id": "sensor.temp",
+                    "state": "21",
+                    "attributes": {
+                        "friendly_name": "Living room",
+                        "device_class": "temperature",
+                        "unit_of_measurement": "°C",
+                    },
+                }
+            ]
+
+    (ha,) = mi.ha_documents(FakeHA())
+    assert ha.text == (
+        "Living room (sensor.temp) is a Home Assistant sensor "
+        "of class temperature measured in °C."
+    )
+    (tmp_path / "a.md").write_text("one\n\n" + "x" * 40 + "\n\ntwo")
+    (tmp_path / "skip.bin").write_text("binary")
+    notes = list(mi.note_documents(tmp_path))
+    assert [n.key for n in notes] == ["a.md#0"]
+    assert mi.chunk_text("one\n\n" + "x" * 40 + "\n\ntwo", 20) == [
+        "one",
+        "x" * 20,
+        "x" * 20,
+        "two",
+    ]
+    state = tmp_path / "conversation.json"
+    state.write_text(
+        json.dumps(
+            {"summary": "s", "turns": [{"user": "u", "assistant": "a", "timestamp": 1}]}
+        )
+    )
+    assert [d.key for d in mi.conversation_documents(state)] == ["summary", "1"]
+    assert list(mi.conversation_documents(tmp_path / "missing.json")) == []
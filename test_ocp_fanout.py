@@ -0,0 +1,146 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for ocp_fanout.py with simulated media skills."""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import ocp_fanout as ocp
+from conftest import SimulatedSkills, simulate
+
+
+def track(title, conf):
+    return {
+        "uri": f"file:///music/{title}.mp3",
+        "title": title,
+        "match_confidence": conf,
+    }
+
+
+class MediaSkills(SimulatedSkills):
+    """OCP media skills; specs are ``(delay, results)``."""
+
+    query_message = ocp.QUERY_MESSAGE
+
+    def announce(self, phrase, skill_id):
+        self.fanout.on_start(SimpleNamespace(data={"skill_id": skill_id}))
+
+    def answer(self, phrase, skill_id, spec):
+        _, results = spec
+        return {
+            "phrase": phrase,
+            "skill_id": skill_id,
+            "results": results,
+            "searching": False,
+        }
+
+
+def make(skills, **kwargs):
+    return simulate(MediaSkills, ocp.OCPFanout, skills, **kwargs)
+
+
+def test_ranker_orders_by_confidence_and_drops_duplicates():
+    ranker = ocp.StreamingRanker()
+    ranker.add("a", [track("x", 40), track("y", 90)])
+    assert len(ranker.add("b", [track("z", 60), track("x", 99)])) == 1
+    assert [r.result["title"] for r in ranker.ranked()] == ["y", "z", "x"]
+    assert ranker.best().confidence == 90
+
+
+def test_playback_starts_on_first_confident_result():
+    bus, fanout = make(
+        {
+            "media_index.openvoiceos": (
+                0.02,
+                [track("So What", 85), track("Blue", 40)],
+            ),
+            "skill-youtube-music": (0.4, [track("So What (live)", 95)]),
+        },
+        timeouts={},
+    )
+    started = time.monotonic()
+    query = fanout.search("so what")
+    assert time.monotonic() - started < 0.2
+    (play,) = bus.of(ocp.PLAY_MESSAGE)
+    assert play["media"]["title"] == "So What"
+    assert [r["title"] for r in play["playlist"]] == ["So What", "Blue"]
+    assert query.done.wait(2)
+    (queued,) = bus.of(ocp.QUEUE_MESSAGE)
+    assert [r["title"] for r in queued["tracks"]] == ["So What (live)"]
+    (report,) = bus.of(ocp.RESULT_MESSAGE)
+    assert report["reason"] == "confident" and report["results"] == 3
+    assert report["seconds_to_play"] < 0.2 <= report["seconds"]
+
+
+def test_per_skill_timeouts_drop_slow_skills():
+    bus, fanout = make(
+        {
+            "media_index.openvoiceos": (0.02, [track("Blue in Green", 60)]),
+            "skill-bandcamp": (0.5, [track("Blue Train", 99)]),
+        },
+        timeouts={"bandcamp": 0.15},
+    )
+    started = time.monotonic()
+    query = fanout.search("blue")
+    assert 0.15 <= time.monotonic() - started < 0.4
+    assert query.done.is_set() and query.reason == "complete"
+    assert query.played.result["title"] == "Blue in Green"
+    assert query.timed_out == {"skill-bandcamp"}
+    time.sleep(0.45)
+    assert len(query.results()) == 1  # the late answer was ignored
+
+
+def test_nothing_good_enough_plays_nothing():
+    bus, fanout = make({"a.skill": (0.02, [track("noise", 20)])})
+    query = fanout.search("something obscure")
+    assert query.played is None and query.reason == "no match"
+    assert bus.of(ocp.PLAY_MESSAGE) == []
+
+
+def skill_event(skill_id, **data):
+    return SimpleNamespace(data={"skill_id": skill_id, **data}, context={})
+
+
+def test_observed_pipeline_search_is_ended_for_overdue_skills():
+    sent = []
+    fanout = ocp.OCPFanout(
+        lambda msg_type, data: sent.append((msg_type, data)),
+        timeouts={"youtube": 0.1},
+        announce_window=0.02,
+    )
+    query = fanout.observe("jazz", question_type=2)
+    for skill_id in ("media_index", "skill-youtube"):
+        fanout.on_start(skill_event(skill_id))
+    fanout.on_response(
+        skill_event("media_index", phrase="jazz", results=[track("So What", 60)])
+    )
+    fanout.on_end(skill_event("media_index"))
+    assert query.done.wait(2)
+    assert [data for msg_type, data in sent if msg_type == ocp.END_MESSAGE] == [
+        {"skill_id": "skill-youtube", "phrase": "jazz"}
+    ]
+    (report,) = [data for msg_type, data in sent if msg_type == ocp.RESULT_MESSAGE]
+    assert report["reason"] == "observed" and report["timed_out"] == ["skill-youtube"]
+    assert not [msg_type for msg_type, _ in sent if msg_type == ocp.PLAY_MESSAGE]
+
+
+def test_phrase_less_skill_events_go_to_the_oldest_waiting_search():
+    fanout = ocp.OCPFanout(lambda *a: None, timeouts={"a": 5.0})
+    first, second = fanout.observe("jazz"), fanout.observe("blues")
+    assert fanout.observe("jazz") is None
+    fanout.on_start(skill_event("a"))
+    fanout.on_start(skill_event("a"))
+    assert "a" in first.searching and "a" in second.searching
+    fanout.on_end(skill_event("a"))
+    assert first.finished == {"a"} and not second.finished
+    fanout.on_end(skill_event("a", phrase="blues"))
+    assert second.finished == {"a"}
+
+
+@pytest.mark.parametrize(
+    ("skill_id", "expected"),
+    [("ovos-skill-youtube-music", 6.0), ("media_index.openvoiceos", 1.0), ("x", 3.0)],
+)
+def test_timeout_for_matches_skill_id(skill_id, expected):
+    assert ocp.OCPFanout(lambda *a: None).timeout_for(skill_id) == expected
@@ -0,0 +1,191 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for ollama_residency.py with a fake Ollama backend and clock."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ollama_residency as orm
+from conftest import FakeClock
+from llm_backends import OllamaBackend, usage_logger
+
+GB = 10**9
+# A Monday at 08:00 local time.
+MONDAY_8AM = time.mktime((2026, 10, 19, 8, 0, 0, 0, 0, -1))
+
+
+class FakeOllama:
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.calls = []
+
+    def installed_models(self):
+        return dict(self.sizes)
+
+    def keep_alive(self, model, seconds):
+        self.calls.append((model, seconds))
+
+
+def make_manager(budget=None, free=None, min_free=None, **kwargs):
+    backend = FakeOllama({"persona": 5 * GB, "coder": 4 * GB, "vision": 6 * GB})
+    events = []
+    manager = orm.ResidencyManager(
+        backend,
+        ["persona"],
+        budget_bytes=budget,
+        min_free_bytes=min_free,
+        free_memory=lambda: free,
+        send=lambda msg_type, data: events.append(data),
+        clock=FakeClock(MONDAY_8AM),
+        **kwargs,
+    )
+    manager.refresh_sizes()
+    return manager, backend, events
+
+
+def test_profile_activity_looks_ahead_and_decays():
+    profile = orm.UsageProfile(half_life_days=7)
+    for _ in range(4):
+        profile.record(MONDAY_8AM)
+    assert profile.activity(MONDAY_8AM) == 1.0
+    assert profile.activity(MONDAY_8AM - 3600) == 1.0  # hour before is warm
+    assert profile.activity(MONDAY_8AM + 3 * 3600) == 0.0
+    profile.record(MONDAY_8AM + 7 * 86400 + 3600)  # a week later, 09:00
+    assert profile.counts[8] == pytest.approx(2.0, rel=0.01)
+    assert orm.UsageProfile.from_dict(profile.to_dict()).counts[9] == 1.0
+
+
+def test_startup_prewarm_loads_pinned_with_idle_keep_alive():
+    manager, backend, events = make_manager()
+    manager.prewarm("startup")
+    assert backend.calls == [("persona", orm.OLLAMA_KEEP_ALIVE)]
+    assert events[0]["event"] == "load" and events[0]["reason"] == "startup"
+    manager.prewarm()
+    assert len(backend.calls) == 1  # already resident
+
+
+def test_tick_refreshes_pinned_during_busy_hours_only():
+    manager, backend, _ = make_manager()
+    manager.profile.record(MONDAY_8AM - 7 * 86400)
+    manager.tick()
+    assert backend.calls == [("persona", 3600.0)]
+    manager.clock.now += 1000
+    manager.tick()
+    assert len(backend.calls) == 1  # plenty of keep-alive left
+    manager.clock.now += 1000
+    manager.tick()
+    assert backend.calls[-1] == ("persona", 3600.0)
+    manager.clock.now += 6 * 3600  # quiet hours: let it expire
+    manager.tick()
+    assert not manager.is_resident("persona")
+    assert len(backend.calls) == 2
+
+
+def test_request_after_prewarm_resets_keep_alive_until_next_tick():
+    manager, backend, _ = make_manager()
+    manager.profile.record(MONDAY_8AM - 7 * 86400)  # busy hour
+    manager.tick()
+    assert backend.calls == [("persona", 3600.0)]
+    manager.clock.now += 60
+    assert manager.record_use("persona", load_seconds=0.01) is False
+    expires = manager.models["persona"].expires_at
+    assert expires == manager.clock.now + orm.OLLAMA_KEEP_ALIVE  # Ollama's reset
+    manager.tick()
+    assert backend.calls[-1] == ("persona", 3600.0)  # long keep-alive again
+    assert manager.models["persona"].expires_at == manager.clock.now + 3600.0
+
+
+def test_cold_hits_from_reported_load_time_and_tracking():
+    manager, _, events = make_manager()
+    assert manager.record_use("coder") is True  # never loaded
+    assert manager.record_use("coder", load_seconds=0.01) is False
+    assert manager.record_use("coder", load_seconds=4.2) is True
+    assert manager.models["coder"].cold_hits == 2
+    assert [e["event"] for e in events] == ["cold_hit", "cold_hit"]
+
+
+class ColdOllamaHandler(BaseHTTPRequestHandler):
+    """``/api/generate`` that streams one word and reports a 3 s load."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        chunks = [
+            {"model": body["model"], "response": "hi", "done": False},
+            {"model": body["model"], "done": True, "load_duration": 3 * 10**9},
+        ]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        self.wfile.write(b"".join(json.dumps(c).encode() + b"\n" for c in chunks))
+
+    def log_message(self, *args):
+        pass
+
+
+def test_backend_usage_log_feeds_cold_hits_and_profile(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ColdOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log = tmp_path / "usage.jsonl"
+    log.write_text('{"model": "coder", "load_seconds": 9}\n')  # before start
+    tail = orm.UsageTail(log, max_bytes=100)
+    manager, _, events = make_manager()
+    backend = OllamaBackend(
+        f"http://127.0.0.1:{server.server_port}", "coder", on_usage=usage_logger(log)
+    )
+    try:
+        assert "".join(backend.stream("hello")) == "hi"
+        assert "".join(backend.stream("again")) == "hi"
+    finally:
+        server.shutdown()
+    reports = tail.read()
+    assert [r["load_seconds"] for r in reports] == [3.0, 3.0]
+    for report in reports:
+        manager.record_report(report)
+    assert manager.models["coder"].cold_hits == 2
+    assert [e["event"] for e in events] == ["cold_hit", "cold_hit"]
+    hour = time.localtime(reports[0]["at"]).tm_hour
+    assert manager.profile.counts[hour] == pytest.approx(2.0)
+    assert (tmp_path / "usage.jsonl.1").exists() and tail.read() == []
+
+
+def test_budget_evicts_least_recently_used_unpinned_first():
+    manager, backend, events = make_manager(budget=11 * GB)
+    manager.prewarm()
+    manager.clock.now += 10
+    manager.record_use("coder")
+    manager.clock.now += 10
+    manager.record_use("vision")  # 5 + 4 + 6 > 11
+    assert backend.calls[-1] == ("coder", 0)
+    assert manager.is_resident("persona") and manager.is_resident("vision")
+    unload = [e for e in events if e["event"] == "unload"]
+    assert unload[0]["model"] == "coder" and unload[0]["reason"] == "budget"
+    assert manager.models["coder"].evictions == 1
+
+
+def test_memory_pressure_evicts_one_model_per_check():
+    manager, backend, _ = make_manager(free=1 * GB, min_free=2 * GB)
+    manager.prewarm()
+    manager.record_use("coder")
+    assert backend.calls[-1] == ("persona", 0)  # the only other resident model
+    assert sum(1 for _, seconds in backend.calls if seconds == 0) == 1
+
+
+def test_save_restore_keeps_counters_but_not_residency(tmp_path):
+    manager, _, _ = make_manager()
+    manager.prewarm()
+    manager.record_use("persona", load_seconds=3.0)
+    path = tmp_path / "residency.json"
+    manager.save(path)
+    fresh, _, _ = make_manager()
+    fresh.restore(path)
+    assert fresh.models["persona"].cold_hits == 1
+    assert not fresh.is_resident("persona")
+    assert "persona" in orm.format_status(orm.read_state(path))
+
+
+def test_read_state_reports_missing_file(tmp_path):
+    with pytest.raises(orm.ResidencyError):
+        orm.read_state(tmp_path / "missing.json")
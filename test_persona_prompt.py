@@ -0,0 +1,114 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for persona_prompt.py."""
+
+import persona_prompt as pp
+from conversation_memory import ConversationMemory
+from semantic_cache import SemanticCache
+from stack_http import ServiceError
+from vector_mirror import LocalQdrant
+
+CONF = {
+    "location": {"city": "Lisbon", "country": "Portugal"},
+    "timezone": {"code": "Europe/Lisbon"},
+    "units": {"system": "metric", "time": 24},
+}
+STATES = [
+    {
+        "entity_id": "sensor.temp",
+        "state": "21",
+        "attributes": {"friendly_name": "Living room", "unit_of_measurement": "°C"},
+    },
+    {"entity_id": "cover.garage", "state": "closed", "attributes": {}},
+    {"entity_id": "light.hall", "state": "on", "attributes": {}},
+]
+
+
+def test_system_prefix_is_stable_and_holds_household_details():
+    clock = iter([0.0, 3600.0])
+    persona = pp.PersonaPrompt("Persona.", CONF, clock=lambda: next(clock))
+    first, _ = persona.build("hi")
+    second, _ = persona.build("hi")
+    assert first == second
+    assert "Lisbon, Portugal" in first and "metric" in first
+
+
+def test_volatile_block_sits_after_conversation_and_before_question():
+    memory = ConversationMemory(lambda summary, turns: summary)
+    memory.add_turn("earlier question", "earlier answer")
+    persona = pp.PersonaPrompt(
+        conf=CONF,
+        states=lambda: STATES,
+        entities=["sensor.temp", "cover.garage"],
+        memory=memory,
+        clock=lambda: 0.0,
+    )
+    _, prompt = persona.build("is it warm")
+    assert prompt.index("earlier answer") < prompt.index("Current time")
+    assert prompt.index("Device states") < prompt.index("is it warm")
+    assert "- cover.garage: closed\n- Living room: 21 °C" in prompt
+    assert "light.hall" not in prompt
+
+
+def test_legacy_layout_puts_volatile_block_in_system_prompt():
+    persona = pp.PersonaPrompt("Persona.", CONF, clock=lambda: 0.0)
+    system, prompt = persona.build("hi", stable_first=False)
+    assert system.startswith("Current time") and "Current time" not in prompt
+
+
+def test_home_assistant_outage_drops_states_only():
+    def down():
+        raise ServiceError("connection refused")
+
+    persona = pp.PersonaPrompt(conf={}, states=down, clock=lambda: 0.0)
+    assert persona.volatile().startswith("Current time")
+    assert "Device states" not in persona.volatile()
+
+
+def test_measure_prefill_reports_per_turn_savings():
+    class FakeOllama:
+        def __init__(self):
+            self.previous = ""
+
+        def generate_raw(self, prompt, system=None, options=None):
+            text = f"{system}\n{prompt}"
+            shared = 0
+            while shared < min(len(text), len(self.previous)) and (
+                text[shared] == self.previous[shared]
+            ):
+                shared += 1
+            self.previous = text
+            return {"prompt_eval_count": len(text) - shared}
+
+    runs = []
+    for stable_first in (False, True):
+        persona = pp.PersonaPrompt(
+            "Persona.", CONF, memory=ConversationMemory(lambda s, t: s)
+        )
+        runs.append(
+            pp.measure_prefill(FakeOllama(), persona, ["a", "b", "c"], stable_first)
+        )
+    old, new = runs
+    assert all(o.prompt_tokens > n.prompt_tokens for o, n in zip(old[1:], new[1:]))
+    assert "mean prefill tokens saved per warm turn" in pp.format_comparison(old, new)
+
+
+def test_answer_goes_through_the_semantic_cache_unless_states_are_live():
+    vectors = {"how far is the moon": [1.0, 0.0], "distance to the moon": [0.99, 0.1]}
+    cache = SemanticCache(vectors.__getitem__, LocalQdrant())
+    prompts = []
+
+    def generate(prompt, system):
+        prompts.append(prompt)
+        return " About 384,000 km. "
+
+    memory = ConversationMemory(lambda summary, turns: summary)
+    persona = pp.PersonaPrompt(conf=CONF, memory=memory, clock=lambda: 0.0)
+    assert persona.answer("how far is the moon", generate, cache) == "About 384,000 km."
+    assert (
+        persona.answer("distance to the moon", generate, cache) == "About 384,000 km."
+    )
+    assert len(prompts) == 1 and cache.metrics.hits == 1
+    assert "distance to the moon" in memory.build_prompt("next")
+    live = pp.PersonaPrompt(conf=CONF, states=lambda: STATES, clock=lambda: 0.0)
+    live.answer("how far is the moon", generate, cache)
+    assert len(prompts) == 2 and cache.metrics.lookups == 2
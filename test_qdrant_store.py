@@ -0,0 +1,92 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for qdrant_store.py against a local stand-in HTTP server."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from qdrant_store import QdrantStore
+from stack_http import ServiceError
+
+
+class StubQdrant(BaseHTTPRequestHandler):
+    requests = []
+    collections = set()
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        self.requests.append((self.command, self.path, body))
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if self.command == "GET" and parts[1] not in self.collections:
+            return self._reply(404, {"status": {"error": "Not found"}})
+        if self.command == "PUT" and len(parts) == 2:
+            self.collections.add(parts[1])
+        if parts[-1] == "search":
+            return self._reply(
+                200, {"result": [{"id": 1, "score": 0.9, "payload": {}}]}
+            )
+        self._reply(200, {"result": True})
+
+    do_GET = do_PUT = do_POST = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def qdrant():
+    StubQdrant.requests = []
+    StubQdrant.collections = set()
+    server = HTTPServer(("127.0.0.1", 0), StubQdrant)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield QdrantStore(f"http://127.0.0.1:{server.server_port}")
+    server.shutdown()
+
+
+def test_ensure_collection_creates_once_with_indexes(qdrant):
+    assert qdrant.ensure_collection("mem", 3, payload_indexes={"ts": "float"})
+    assert not qdrant.ensure_collection("mem", 3)
+    methods = [(m, p.split("?")[0]) for m, p, _ in StubQdrant.requests]
+    assert ("PUT", "/collections/mem") in methods
+    assert ("PUT", "/collections/mem/index") in methods
+
+
+def test_search_sends_threshold_and_filter(qdrant):
+    hits = qdrant.search(
+        "mem", [0.1, 0.2], limit=3, score_threshold=0.8, query_filter={"must": []}
+    )
+    assert hits[0]["score"] == 0.9
+    _, _, body = StubQdrant.requests[-1]
+    assert body["limit"] == 3 and body["score_threshold"] == 0.8
+    assert body["filter"] == {"must": []}
+
+
+def test_unreachable_service_raises_service_error():
+    with pytest.raises(ServiceError):
+        QdrantStore("http://127.0.0.1:9", timeout=1).collection_exists("mem")
+
+
+def test_collection_config_merges_into_vector_params(qdrant):
+    qdrant.ensure_collection(
+        "tuned", 4, config={"vectors": {"on_disk": True}, "on_disk_payload": True}
+    )
+    method, path, body = StubQdrant.requests[-1]
+    assert (method, path) == ("PUT", "/collections/tuned")
+    assert body == {
+        "vectors": {"size": 4, "distance": "Cosine", "on_disk": True},
+        "on_disk_payload": True,
+    }
+    qdrant.search("tuned", [0.1], params={"hnsw_ef": 32}, with_payload=False)
+    _, _, body = StubQdrant.requests[-1]
+    assert body["params"] == {"hnsw_ef": 32} and body["with_payload"] is False
@@ -0,0 +1,57 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for qdrant_tuning.py against the exact local stand-in store."""
+
+import numpy as np
+import pytest
+
+import qdrant_tuning as qt
+from vector_mirror import LocalQdrant
+
+
+def test_chunked_exact_top_k_matches_full_matrix():
+    queries = qt.vector_chunk(1, 0, 5, 16)
+    chunks = list(qt.corpus_chunks(1, 250, 16, 40))
+    corpus = np.concatenate([vectors for _, vectors in chunks])
+    expected = np.argsort(-(queries @ corpus.T), axis=1)[:, :10]
+    found = qt.exact_top_k(queries, iter(chunks), 10)
+    assert all(set(f) == set(e) for f, e in zip(found, expected))
+
+
+def test_benchmark_reports_full_recall_for_an_exact_store():
+    store = LocalQdrant(capacity=512)
+    result = qt.run_case(
+        store, qt.PROFILES["ram_lean"], 300, dim=16, k=5, queries=10, batch=64
+    )
+    assert result.recall == pytest.approx(1.0)
+    # The gauge delta is what the store holds: its preallocated float32 matrix
+    # of 512 rows, not an estimate from the 300 vectors loaded.
+    assert result.ram_mb == pytest.approx(512 * 16 * 4 / 2**20)
+    assert not store.indexes
+    assert store.configs["bench_ram_lean_300"] == qt.PROFILES["ram_lean"].config
+    assert "ram_lean" in qt.format_results([result])
+
+
+def test_recall_counts_partial_overlap():
+    assert qt.recall_at_k([[1, 2], [3, 9]], np.array([[1, 2], [3, 4]])) == 0.75
+
+
+def test_overrides_and_patch_body():
+    profile = qt.build_profile("default", m=8, quantization="binary", on_disk=True)
+    assert profile.config["hnsw_config"] == {"m": 8}
+    assert profile.search["quantization"]["oversampling"] == 3.0
+    assert qt.PROFILES["default"].config == {}
+    body = qt.patch_body(qt.build_profile("ram_lean", quantization="none"))
+    assert body["quantization_config"] == "Disabled"
+    assert body["vectors"] == {"": {"on_disk": True}}
+    with pytest.raises(qt.TuningError):
+        qt.build_profile("fastest")
+
+
+def test_apply_creates_then_patches_stack_collections():
+    store = LocalQdrant()
+    created = qt.apply_profile(store, qt.PROFILES["binary"], 768)
+    assert created == [f"created {name}" for name in qt.STACK_COLLECTIONS]
+    patched = qt.apply_profile(store, qt.PROFILES["binary"], 768)
+    assert all(change.startswith("patched") for change in patched)
+    assert len(store.patches) == len(qt.STACK_COLLECTIONS)
+    assert store.patches[0][1] == qt.patch_body(qt.PROFILES["binary"])
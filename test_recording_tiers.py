@@ -0,0 +1,105 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for recording_tiers.py over a fake Frigate recordings tree."""
+
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+import recording_tiers as rt
+from conftest import FakeClock
+from stack_http import ServiceError
+
+DAY = rt.DAY
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc).timestamp()
+
+
+def write_segments(root, camera, start, count):
+    """``count`` consecutive 10 s segments of ``camera`` from ``start``."""
+    for i in range(count):
+        moment = datetime.fromtimestamp(start + i * 10, timezone.utc)
+        path = Path(root, moment.strftime("%Y-%m-%d/%H"), camera)
+        path.mkdir(parents=True, exist_ok=True)
+        (path / moment.strftime("%M.%S.mp4")).write_bytes(b"x" * 100)
+
+
+@pytest.fixture
+def tiers(tmp_path):
+    tiers = rt.RecordingTiers(
+        ":memory:",
+        tmp_path / "recordings",
+        tmp_path / "archive",
+        hot_days=1,
+        full_days=3,
+        keep_days=10,
+        padding=10,
+        clock=FakeClock(NOW),
+    )
+    yield tiers
+    tiers.close()
+
+
+def test_seek_finds_the_segment_and_ranges_follow_it(tiers):
+    start = NOW - 2 * 3600
+    write_segments(tiers.hot_dir, "driveway", start, 30)
+    write_segments(tiers.hot_dir, "door", start, 5)
+    assert tiers.scan() == 35
+    assert tiers.scan() == 0  # the finished hour is not listed again
+    segment = tiers.seek("driveway", start + 45)
+    assert segment.start == start + 40
+    assert segment.path.endswith("driveway/00.40.mp4")
+    assert tiers.seek("driveway", start + 300) is None
+    assert tiers.seek("door", start - 1) is None
+    segments = tiers.between("driveway", start + 45, start + 75)
+    assert [s.start - start for s in segments] == [40, 50, 60, 70]
+
+
+def test_segments_move_to_bulk_then_thin_to_events_then_expire(tiers):
+    old = NOW - 5 * DAY
+    write_segments(tiers.hot_dir, "driveway", old, 60)  # 10 minutes
+    write_segments(tiers.hot_dir, "driveway", NOW - 3600, 3)
+    events = [
+        {
+            "id": "a",
+            "camera": "driveway",
+            "label": "car",
+            "start_time": old + 100,
+            "end_time": old + 125,
+        },
+    ]
+    report = tiers.run_once(lambda after: events)
+    assert (report.indexed, report.events, report.moved) == (63, 1, 60)
+    # Moved to bulk, then thinned: 100-125 plus 10 s padding spans 90..135.
+    assert report.thinned == 55
+    stats = tiers.tier_stats()
+    assert stats == {"event": (5, 500), "hot": (3, 300)}
+    kept = tiers.between("driveway", old, old + 600)
+    assert [s.start - old for s in kept] == [90, 100, 110, 120, 130]
+    assert all(Path(s.path).is_relative_to(tiers.bulk_dir) for s in kept)
+    assert not any(tiers.hot_dir.glob(f"*/*/driveway/{Path(kept[0].path).name}"))
+
+    tiers.clock.now += 6 * DAY
+    report = tiers.run_once(lambda after: [])
+    assert report.expired == 5 and tiers.seek("driveway", old + 100) is None
+    assert not list(tiers.bulk_dir.rglob("*.mp4"))
+
+
+def test_failed_event_sync_skips_thinning(tiers):
+    write_segments(tiers.hot_dir, "driveway", NOW - 5 * DAY, 6)
+
+    def down(after):
+        raise ServiceError("connection refused")
+
+    report = tiers.run_once(down)
+    assert (report.moved, report.thinned) == (6, 0)
+    assert tiers.tier_stats() == {"bulk": (6, 600)}
+
+
+def test_parse_when_reads_local_times():
+    now = datetime(2026, 10, 19, 9, 30).astimezone()
+    yesterday = datetime(2026, 10, 18, 15, 0).astimezone().timestamp()
+    assert rt.parse_when("yesterday 3pm", now) == yesterday
+    assert rt.parse_when("yesterday 15:00", now) == yesterday
+    assert rt.parse_when("2026-10-18 15:00", now) == yesterday
+    with pytest.raises(rt.RecordingTiersError):
+        rt.parse_when("13pm", now)
@@ -0,0 +1,127 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for semantic_cache.py with in-memory embedder and store."""
+
+import math
+
+import pytest
+
+import semantic_cache as sc
+from stack_http import ServiceError
+
+VECTORS = {
+    "how far is the moon": [1.0, 0.0, 0.1],
+    "distance to the moon": [0.98, 0.05, 0.12],
+    "what is the weather": [0.0, 1.0, 0.0],
+}
+
+
+def embed(text):
+    return VECTORS[text]
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    return dot / (math.hypot(*a) * math.hypot(*b))
+
+
+class MemoryStore:
+    """Stand-in for QdrantStore supporting the filters the cache uses."""
+
+    def __init__(self):
+        self.points = {}
+        self.down = False
+
+    def ensure_collection(self, name, size, distance="Cosine", payload_indexes=None):
+        return True
+
+    def upsert(self, name, points, wait=True):
+        for point in points:
+            self.points[point["id"]] = point
+
+    def _matches(self, payload, condition):
+        value = payload[condition["key"]]
+        if "match" in condition:
+            return value == condition["match"]["value"]
+        return value >= condition["range"]["gte"]
+
+    def _select(self, query_filter):
+        for point in self.points.values():
+            must = all(self._matches(point["payload"], c) for c in query_filter["must"])
+            must_not = any(
+                self._matches(point["payload"], c)
+                for c in query_filter.get("must_not", [])
+            )
+            if must and not must_not:
+                yield point
+
+    def search(self, name, vector, limit=5, score_threshold=None, query_filter=None):
+        if self.down:
+            raise ServiceError("qdrant unavailable")
+        scored = [
+            {
+                "id": p["id"],
+                "score": cosine(vector, p["vector"]),
+                "payload": p["payload"],
+            }
+            for p in self._select(query_filter)
+        ]
+        scored = [s for s in scored if s["score"] >= (score_threshold or -1)]
+        return sorted(scored, key=lambda s: -s["score"])[:limit]
+
+    def delete(self, name, query_filter):
+        for point in list(self._select(query_filter)):
+            del self.points[point["id"]]
+
+
+@pytest.fixture
+def store():
+    return MemoryStore()
+
+
+def test_paraphrase_hits_and_metrics_are_emitted(store):
+    sent = []
+    cache = sc.SemanticCache(embed, store, send=lambda t, d: sent.append((t, d)))
+    calls = []
+
+    def generate(question):
+        calls.append(question)
+        return "About 384,400 km."
+
+    assert cache.answer("How far is the Moon?", generate) == "About 384,400 km."
+    assert cache.answer("Distance to the moon", generate) == "About 384,400 km."
+    assert calls == ["How far is the Moon?"]
+    assert cache.metrics.hits == 1 and cache.metrics.misses == 1
+    assert cache.metrics.hit_rate == 0.5
+    assert sent[-1][0] == sc.METRICS_MESSAGE
+    assert sent[-1][1]["hits"] == 1
+
+
+def test_unrelated_question_misses(store):
+    cache = sc.SemanticCache(embed, store)
+    cache.put("how far is the moon", "far")
+    assert cache.lookup("what is the weather") is None
+
+
+def test_namespace_and_ttl_are_respected(store, monkeypatch):
+    pirate = sc.SemanticCache(embed, store, namespace="pirate", ttl=60)
+    pirate.put("how far is the moon", "Arr, far.")
+    assert (
+        sc.SemanticCache(embed, store, namespace="butler").lookup("how far is the moon")
+        is None
+    )
+    later = sc.time.time() + 120
+    monkeypatch.setattr(sc.time, "time", lambda: later)
+    assert pirate.lookup("how far is the moon") is None
+    pirate.purge_expired()
+    assert store.points == {}
+
+
+def test_store_outage_falls_through_to_generation(store):
+    store.down = True
+    cache = sc.SemanticCache(embed, store)
+    assert cache.answer("how far is the moon", lambda q: "far") == "far"
+    assert cache.metrics.errors == 1
+
+
+def test_normalize_question():
+    assert sc.normalize_question("  How FAR is   the moon?! ") == "how far is the moon"
@@ -0,0 +1,124 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for single_flight.py."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from single_flight import CoalescingTTS, SingleFlight, flight_key
+from stack_http import ServiceError
+
+
+class GatedStream:
+    """Yields its chunks only as the test releases them."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.gate = threading.Semaphore(0)
+        self.calls = 0
+        self.closed = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        return self._generate()
+
+    def _generate(self):
+        try:
+            for chunk in self.chunks:
+                self.gate.acquire()
+                yield chunk
+        finally:
+            self.closed.set()
+
+
+def test_followers_replay_missed_chunks_and_share_the_stream():
+    flights = SingleFlight()
+    upstream = GatedStream(["a", "b", "c"])
+    leader = iter(flights.stream("k", upstream))
+    upstream.gate.release()
+    assert next(leader) == "a"
+    follower = flights.stream("k", upstream)
+    assert not follower.leader
+    upstream.gate.release()
+    upstream.gate.release()
+    assert list(follower) == ["a", "b", "c"]
+    assert list(leader) == ["b", "c"]
+    assert upstream.calls == 1
+    assert (flights.metrics.leaders, flights.metrics.followers) == (1, 1)
+
+
+def test_finished_flight_is_not_reused():
+    flights = SingleFlight()
+    assert flights.do("k", lambda: 1) == 1
+    assert flights.do("k", lambda: 2) == 2
+    assert flights.metrics.leaders == 2
+
+
+def test_errors_reach_every_subscriber():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ServiceError("xtts down")
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flights.do, "k", fail) for _ in range(4)]
+        while flights.metrics.leaders + flights.metrics.followers < 4:
+            time.sleep(0.001)
+        release.set()
+        for future in futures:
+            with pytest.raises(ServiceError):
+                future.result()
+    assert flights.metrics.leaders == 1
+
+
+def test_upstream_closes_when_every_subscriber_leaves():
+    flights = SingleFlight()
+    upstream = GatedStream(["a", "b", "c"])
+    stream = iter(flights.stream("k", upstream))
+    upstream.gate.release()
+    assert next(stream) == "a"
+    stream.close()
+    upstream.gate.release()
+    assert upstream.closed.wait(5)
+    assert flights.metrics.cancelled == 1
+
+
+def test_iterator_of_a_wrapping_iterable_is_closed():
+    class Wrapped:  # like llm_router.RoutedStream: iterable without close()
+        def __init__(self, generator):
+            self.generator = generator
+
+        def __iter__(self):
+            return self.generator
+
+    flights = SingleFlight()
+    upstream = GatedStream(["a", "b", "c"])
+    wrapped = Wrapped(upstream())  # held here, so only close() can end it
+    stream = iter(flights.stream("k", lambda: wrapped))
+    upstream.gate.release()
+    assert next(stream) == "a"
+    stream.close()
+    upstream.gate.release()
+    assert upstream.closed.wait(5)
+
+
+def test_coalescing_tts_keys_on_speaker_and_text():
+    class FakeXTTS:
+        base_url, speaker, language = "http://xtts:5002", "Ana", "en"
+
+        def __init__(self):
+            self.calls = []
+
+        def synthesize(self, text, speaker=None):
+            self.calls.append((text, speaker))
+            return text.encode()
+
+    client = FakeXTTS()
+    tts = CoalescingTTS(client)
+    assert tts.synthesize("Good morning") == b"Good morning"
+    assert flight_key("a", None) != flight_key("a", "b")
+    assert client.calls == [("Good morning", None)]
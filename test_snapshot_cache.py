@@ -0,0 +1,90 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for snapshot_cache.py with a fake fetch and a local server."""
+
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import snapshot_cache as sc
+from conftest import FakeClock
+from stack_http import ServiceError, request_bytes, request_json
+
+
+class FakeFetch:
+    def __init__(self, size=10, delay=0.0):
+        self.size = size
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, camera, height):
+        self.calls.append((camera, height))
+        time.sleep(self.delay)
+        if camera == "broken":
+            raise ServiceError("no frame")
+        return bytes([len(self.calls) % 256]) * self.size
+
+
+def test_fresh_snapshots_are_shared_until_max_age():
+    clock, fetch = FakeClock(), FakeFetch()
+    cache = sc.SnapshotCache(fetch, max_age=1.0, clock=clock)
+    first = cache.get("front")
+    clock.now += 0.5
+    assert cache.get("front") is first
+    assert cache.get("front", height=360) is not first  # another size
+    clock.now += 0.6
+    assert cache.get("front").jpeg != first.jpeg
+    assert cache.get("front", max_age=10) is not first
+    assert fetch.calls == [("front", None), ("front", 360), ("front", None)]
+    stats = cache.snapshot_stats()
+    assert (stats["hits"], stats["misses"], stats["images"]) == (2, 3, 2)
+
+
+def test_concurrent_misses_share_one_fetch():
+    fetch = FakeFetch(delay=0.1)
+    cache = sc.SnapshotCache(fetch)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("front")))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fetch.calls) == 1
+    assert len({id(snapshot) for snapshot in results}) == 1
+
+
+def test_least_recently_used_images_leave_first():
+    cache = sc.SnapshotCache(FakeFetch(size=100), max_bytes=250, clock=FakeClock())
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")  # a is now the most recent
+    cache.get("c")
+    stats = cache.snapshot_stats()
+    assert (stats["images"], stats["bytes"]) == (2, 200)
+    assert len(cache.fetch.calls) == 3
+    cache.get("a")
+    assert len(cache.fetch.calls) == 3  # still cached; b was evicted
+
+
+@pytest.fixture
+def cache_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), sc.SnapshotHandler)
+    server.cache = sc.SnapshotCache(FakeFetch())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_http_serves_jpegs_stats_and_errors(cache_url):
+    jpeg = request_bytes("GET", f"{cache_url}/snapshot/front.jpg?h=360", None, 5)
+    assert jpeg == bytes([1]) * 10
+    assert request_json("GET", f"{cache_url}/stats")["misses"] == 1
+    with pytest.raises(ServiceError):
+        request_bytes("GET", f"{cache_url}/snapshot/broken.jpg", None, 5)
+    with pytest.raises(ServiceError):
+        request_bytes("GET", f"{cache_url}/snapshot/front.jpg?h=tall", None, 5)
+    assert request_json("GET", f"{cache_url}/stats")["errors"] == 1
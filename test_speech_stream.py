@@ -0,0 +1,123 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for speech_stream.py with stand-in LLM, TTS and player."""
+
+import threading
+import time
+
+import pytest
+
+from single_flight import CoalescingTTS
+from speech_stream import SentenceSplitter, SpeechStreamer, StreamError
+
+
+def feed_all(splitter, text, step=3):
+    sentences = []
+    for i in range(0, len(text), step):
+        sentences += splitter.feed(text[i : i + step])
+    return sentences + splitter.flush()
+
+
+def test_splitter_handles_abbreviations_decimals_and_initials():
+    text = (
+        "Dr. Smith measured 3.5 km on Mt. Everest. "
+        "J. R. R. Tolkien wrote it! Was it fun? Yes"
+    )
+    assert feed_all(SentenceSplitter(min_chars=0), text) == [
+        "Dr. Smith measured 3.5 km on Mt. Everest.",
+        "J. R. R. Tolkien wrote it!",
+        "Was it fun?",
+        "Yes",
+    ]
+
+
+def test_splitter_merges_short_fragments_and_caps_length():
+    splitter = SentenceSplitter(min_chars=12, max_chars=40)
+    assert feed_all(splitter, "Ok. That is settled then. ") == [
+        "Ok. That is settled then."
+    ]
+    long = "one two three four five six seven, eight nine ten eleven twelve"
+    pieces = feed_all(SentenceSplitter(max_chars=40), long)
+    assert pieces[0] == "one two three four five six seven,"
+    assert all(len(p) <= 40 for p in pieces)
+
+
+def test_playback_overlaps_generation():
+    events = []
+    lock = threading.Lock()
+
+    def log(event):
+        with lock:
+            events.append(event)
+
+    def tokens():
+        for word in "The moon is far away. It orbits the Earth monthly. ".split(" "):
+            time.sleep(0.02)
+            yield word + " "
+        log("llm_done")
+
+    def synthesize(sentence):
+        time.sleep(0.01)
+        return sentence.encode()
+
+    played = []
+    marks = []
+    streamer = SpeechStreamer(
+        synthesize, lambda audio: (played.append(audio), log("play")), marks.append
+    )
+    timings = streamer.speak_stream(tokens())
+    assert played == [b"The moon is far away.", b"It orbits the Earth monthly."]
+    assert events.index("play") < events.index("llm_done")
+    assert marks == ["tts_first_byte", "playback"]
+    offsets = timings.offsets()
+    assert offsets["first_sentence"] < offsets["playback_start"] < offsets["finished"]
+
+
+def test_tts_failure_stops_stream():
+    def synthesize(sentence):
+        raise OSError("xtts down")
+
+    def endless():
+        while True:
+            yield "Sentence number one is here. "
+
+    streamer = SpeechStreamer(synthesize, lambda audio: None, queue_size=1)
+    with pytest.raises(StreamError, match="xtts down"):
+        streamer.speak_stream(endless())
+
+
+def test_rooms_sharing_coalesced_tts_synthesize_each_sentence_once():
+    class SlowXTTS:
+        base_url, speaker, language = "http://xtts:5002", "Ana", "en"
+
+        def __init__(self):
+            self.calls = []
+
+        def synthesize(self, text, speaker=None):
+            self.calls.append(text)
+            time.sleep(0.05)
+            return text.encode()
+
+    client = SlowXTTS()
+    tts = CoalescingTTS(client)
+    played = {room: [] for room in ("kitchen", "office")}
+    announcement = ["Dinner is ready. ", "Please come down."]
+    rooms = [
+        threading.Thread(
+            target=SpeechStreamer(tts.synthesize, played[room].append).speak_stream,
+            args=(announcement,),
+        )
+        for room in played
+    ]
+    for room in rooms:
+        room.start()
+    for room in rooms:
+        room.join()
+    assert sorted(client.calls) == ["Dinner is ready.", "Please come down."]
+    assert (
+        played["kitchen"]
+        == played["office"]
+        == [
+            b"Dinner is ready.",
+            b"Please come down.",
+        ]
+    )
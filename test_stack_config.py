@@ -0,0 +1,52 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for stack_config.py."""
+
+import os
+
+import pytest
+
+import stack_config
+
+
+def test_strip_json_comments_keeps_strings():
+    text = '{"url": "http://x//y", /* block */ "a": 1 // trailing\n}'
+    assert (
+        stack_config.strip_json_comments(text) == '{"url": "http://x//y",  "a": 1 \n}'
+    )
+
+
+def test_load_repo_mycroft_conf():
+    conf = stack_config.load_mycroft_conf(stack_config.DEFAULT_CONF_PATH)
+    assert conf["listener"]["wake_word"] in conf["hotwords"]
+    assert conf["PHAL"]["admin"]["ovos-PHAL-plugin-system"]["enabled"] is False
+
+
+def test_load_mycroft_conf_reports_missing_file(tmp_path):
+    with pytest.raises(stack_config.ConfigError):
+        stack_config.load_mycroft_conf(tmp_path / "missing.conf")
+
+
+def test_service_url_env_override(monkeypatch):
+    monkeypatch.setenv("OLLAMA_URL", "http://localhost:11434/")
+    assert stack_config.service_url("ollama") == "http://localhost:11434"
+    with pytest.raises(stack_config.ConfigError):
+        stack_config.service_url("nope")
+
+
+def test_bus_settings_prefer_environment(monkeypatch):
+    conf = {"message_bus_client": {"host": "conf_host", "port": 1, "route": "/x"}}
+    monkeypatch.delenv("MESSAGEBUS_HOST", raising=False)
+    monkeypatch.setenv("MESSAGEBUS_PORT", "8181")
+    monkeypatch.delenv("MESSAGEBUS_ROUTE", raising=False)
+    assert stack_config.bus_settings(conf) == {
+        "host": "conf_host",
+        "port": 8181,
+        "route": "/x",
+    }
+
+
+@pytest.mark.skipif(
+    not os.path.exists("/proc/meminfo"), reason="needs Linux /proc/meminfo"
+)
+def test_available_memory_reads_meminfo():
+    assert stack_config.available_memory() > 0
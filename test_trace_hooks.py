@@ -0,0 +1,42 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for trace_hooks.py using a stand-in bus client class."""
+
+from dataclasses import dataclass, field
+
+import trace_hooks as th
+from conftest import FakeClock
+
+
+@dataclass
+class FakeMessage:
+    msg_type: str
+    data: dict = field(default_factory=dict)
+    context: dict = field(default_factory=dict)
+
+
+class FakeClient:
+    def __init__(self):
+        self.sent = []
+
+    def emit(self, message):
+        self.sent.append(message)
+
+
+def test_stamp_records_emit_time_of_stage_events_only():
+    clock = FakeClock(42.0)
+    speak = th.stamp(FakeMessage("speak"), clock)
+    assert speak.context[th.TRACE_CONTEXT_KEY] == 42.0
+    clock.now = 50.0
+    assert th.stamp(speak, clock).context[th.TRACE_CONTEXT_KEY] == 42.0
+    assert th.stamp(FakeMessage("unrelated.message"), clock).context == {}
+
+
+def test_install_wraps_emit_once():
+    client_class = type("Client", (FakeClient,), {})
+    assert th.install(client_class)
+    assert not th.install(client_class)
+    client = client_class()
+    client.emit(FakeMessage("recognizer_loop:utterance"))
+    client.emit(FakeMessage("unrelated.message"))
+    assert th.TRACE_CONTEXT_KEY in client.sent[0].context
+    assert client.sent[1].context == {}
@@ -0,0 +1,83 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for turn_tracer.py using an in-memory stand-in for the bus."""
+
+from dataclasses import dataclass, field
+
+import turn_tracer as tt
+
+
+@dataclass
+class FakeMessage:
+    msg_type: str
+    data: dict = field(default_factory=dict)
+    context: dict = field(default_factory=dict)
+
+
+def session(sid):
+    return {"session": {"session_id": sid}}
+
+
+def test_tracker_builds_spans_between_stage_marks():
+    tracker = tt.TurnTracker()
+    assert tracker.mark("a", "wake", 100.0).duration == 0.0
+    stt = tracker.mark("a", "stt", 101.5)
+    assert (stt.stage, stt.start, stt.duration) == ("stt", 100.0, 1.5)
+    assert tracker.mark("a", "stt", 102.0) is None
+    playback = tracker.mark("a", "playback", 104.0)
+    assert playback.duration == 2.5
+    assert tracker.mark("a", "playback", 105.0) is None
+
+
+def test_tracker_keeps_sessions_apart_and_expires_turns():
+    tracker = tt.TurnTracker(timeout=5)
+    tracker.mark("a", "wake", 0.0)
+    tracker.mark("b", "wake", 1.0)
+    assert tracker.mark("a", "end_of_speech", 2.0).duration == 2.0
+    assert tracker.mark("b", "end_of_speech", 20.0) is None
+
+
+def test_bus_hooks_emit_span_messages():
+    sent = []
+    hooks = tt.BusHooks(lambda msg_type, data: sent.append((msg_type, data)))
+    hooks.on_message(FakeMessage("recognizer_loop:wakeword", {"timestamp": 10.0}))
+    hooks.on_message(FakeMessage("speak", {"timestamp": 12.0}))
+    hooks.on_message(
+        FakeMessage(tt.MARK_MESSAGE, {"stage": "tts_first_byte", "timestamp": 12.4})
+    )
+    hooks.on_message(FakeMessage("unrelated.message"))
+    assert [data["stage"] for _, data in sent] == ["wake", "skill", "tts_first_byte"]
+    assert {msg_type for msg_type, _ in sent} == {tt.SPAN_MESSAGE}
+    assert abs(sent[-1][1]["duration"] - 0.4) < 1e-9
+
+
+def test_bus_hooks_prefer_the_emit_time_stamped_by_trace_hooks():
+    sent = []
+    hooks = tt.BusHooks(lambda msg_type, data: sent.append((msg_type, data)))
+    stamped = {tt.TRACE_CONTEXT_KEY: 20.0}
+    hooks.on_message(FakeMessage("recognizer_loop:wakeword", {}, stamped))
+    hooks.on_message(FakeMessage("speak", {}, {tt.TRACE_CONTEXT_KEY: 21.5}))
+    assert [data["duration"] for _, data in sent] == [0.0, 1.5]
+
+
+def test_collector_roundtrip_and_waterfall(tmp_path):
+    collector = tt.SpanCollector(tmp_path)
+    start = 1_760_000_000.0
+    for turn in range(20):
+        offset = start + turn * 100
+        collector.on_message(
+            FakeMessage(tt.SPAN_MESSAGE, vars(tt.Span(turn, "wake", offset, 0.0)))
+        )
+        collector.on_message(
+            FakeMessage(tt.SPAN_MESSAGE, vars(tt.Span(turn, "stt", offset, 0.8)))
+        )
+        collector.on_message(
+            FakeMessage(tt.SPAN_MESSAGE, vars(tt.Span(turn, "skill", offset, 2.0)))
+        )
+    collector.on_message(FakeMessage(tt.SPAN_MESSAGE, {"bogus": 1}))
+    (path,) = tmp_path.glob("*.spans")
+    spans = tt.read_spans(path)
+    assert len(spans) == 60
+    assert path.stat().st_size == 60 * tt.RECORD.size
+    report = tt.waterfall(spans)
+    assert "stt" in report and "800" in report
+    assert "turn total" in report and "2800" in report
@@ -0,0 +1,142 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for vector_mirror.py."""
+
+import time
+
+import numpy as np
+import pytest
+
+import vector_mirror as vm
+from stack_http import ServiceError
+
+
+def point(i, vector, **payload):
+    return {"id": i, "vector": vector, "payload": payload}
+
+
+def test_top_k_matches_brute_force_with_filters():
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(200, 8))
+    index = vm.LocalIndex(8, capacity=256)
+    index.upsert(
+        [
+            point(i, v.tolist(), ns="a" if i % 2 else "b", ts=float(i))
+            for i, v in enumerate(vectors)
+        ]
+    )
+    query = rng.normal(size=8)
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = unit @ (query / np.linalg.norm(query))
+    wanted = [i for i in np.argsort(-scores) if i % 2 and i >= 100][:5]
+    hits = index.search(
+        query.tolist(),
+        limit=5,
+        query_filter={
+            "must": [
+                {"key": "ns", "match": {"value": "a"}},
+                {"key": "ts", "range": {"gte": 100}},
+            ]
+        },
+    )
+    assert [hit["id"] for hit in hits] == wanted
+    assert hits[0]["score"] == pytest.approx(scores[wanted[0]], abs=1e-5)
+
+
+def test_capacity_evicts_least_recently_used():
+    now = iter(range(100))
+    index = vm.LocalIndex(2, capacity=2, clock=lambda: next(now))
+    index.upsert([point("x", [1, 0]), point("y", [0, 1])])
+    index.search([1, 0], limit=1)
+    index.upsert([point("z", [1, 1])])
+    assert {hit["id"] for hit in index.search([1, 1], limit=5)} == {"x", "z"}
+
+
+def test_delete_compacts_rows():
+    index = vm.LocalIndex(2)
+    index.upsert([point(i, [1, i], ts=float(i)) for i in range(5)])
+    assert index.delete({"must": [{"key": "ts", "range": {"lt": 3}}]}) == 3
+    assert len(index) == 2
+    assert {hit["id"] for hit in index.search([1, 0], limit=5)} == {3, 4}
+    index.upsert([point(9, [0, 1], ts=9.0)])
+    assert len(index) == 3
+
+
+def test_search_over_a_full_hot_subset_is_fast():
+    index = vm.LocalIndex(768)
+    vectors = np.random.default_rng(0).normal(size=(4096, 768))
+    index.upsert([point(i, v) for i, v in enumerate(vectors)])
+    started = time.perf_counter()
+    for v in vectors[:50]:
+        index.search(v, limit=5)
+    assert (time.perf_counter() - started) / 50 < 0.005  # generous for CI
+
+
+class FlakyQdrant(vm.LocalQdrant):
+    def __init__(self):
+        super().__init__()
+        self.down = False
+        self.searches = 0
+
+    def search(self, *args, with_vector=False, **kwargs):
+        self.searches += 1
+        if self.down:
+            raise ServiceError("connection refused")
+        hits = super().search(*args, **kwargs)
+        index = self.indexes[args[0]]
+        for hit in hits:
+            hit["vector"] = index._vectors[index._rows[hit["id"]]].tolist()
+        return hits
+
+
+def test_mirrored_store_serves_hits_while_qdrant_is_down():
+    now = [0.0]
+    qdrant = FlakyQdrant()
+    qdrant.ensure_collection("facts", 2)
+    qdrant.upsert("facts", [point("old", [0, 1], fact="cold start")])
+    store = vm.MirroredStore(qdrant, retry_after=10, clock=lambda: now[0])
+    store.ensure_collection("facts", 2)
+    store.upsert("facts", [point("new", [1, 0], fact="likes jazz")])
+    assert store.search("facts", [0, 1], limit=1)[0]["id"] == "old"
+
+    qdrant.down = True
+    assert store.search("facts", [1, 0.1], limit=1)[0]["payload"] == {
+        "fact": "likes jazz"
+    }
+    assert store.search("facts", [0, 1], limit=1)[0]["id"] == "old"
+    assert qdrant.searches == 2  # the second fallback skipped Qdrant
+    assert store.fallbacks == 2 and not store.available
+    now[0] = 11.0
+    qdrant.down = False
+    assert store.search("facts", [0, 1], limit=1)[0]["id"] == "old"
+    assert store.available
+
+
+def test_mirrored_store_tolerates_qdrant_down_at_startup():
+    class DownQdrant:
+        def ensure_collection(self, *args):
+            raise ServiceError("connection refused")
+
+        search = ensure_collection
+
+    store = vm.MirroredStore(DownQdrant())
+    assert store.ensure_collection("cache", 2) is False
+    assert store.search("cache", [1, 0]) == []
+
+
+def test_must_not_and_should_clauses():
+    index = vm.LocalIndex(2)
+    index.upsert([point(i, [1, i], ns="a", ts=float(i)) for i in range(4)])
+    expired = {
+        "must": [{"key": "ns", "match": {"value": "a"}}],
+        "must_not": [{"key": "ts", "range": {"gte": 2}}],
+    }
+    assert index.delete(expired) == 2
+    either = {
+        "should": [
+            {"key": "ts", "range": {"lt": 2.5}},
+            {"key": "ns", "match": {"value": "b"}},
+        ]
+    }
+    assert [hit["id"] for hit in index.search([1, 0], query_filter=either)] == [2]
+    with pytest.raises(vm.MirrorError):
+        index.search([1, 0], query_filter={"min_should": {}})
@@ -0,0 +1,162 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Tests for vision_describe.py with fake snapshots and a fake vision model."""
+
+import threading
+import time
+
+import vision_describe as vd
+from conftest import FakeClock
+from stack_http import ServiceError
+
+
+class FakeModel:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.active = self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, jpeg):
+        with self._lock:
+            self.calls.append(jpeg)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return f"A {jpeg.decode()}."
+
+
+def make(crops, model=None, **kwargs):
+    sent = []
+
+    def fetch(job):
+        crop = crops[job.event_id or job.camera]
+        if crop is None:
+            raise ServiceError("404")
+        return crop
+
+    describer = vd.VisionDescriber(
+        fetch,
+        model or FakeModel(),
+        lambda msg_type, data: sent.append((msg_type, data)),
+        clock=kwargs.pop("clock", FakeClock()),
+        window=kwargs.pop("window", 0.0),
+        **kwargs,
+    )
+    return describer, sent
+
+
+def event(event_id, camera="front_door", label="person", score=0.8, **fields):
+    defaults = dict(kind="update", has_snapshot=True)
+    return dict(
+        defaults, id=event_id, camera=camera, label=label, score=score, **fields
+    )
+
+
+def spoken(sent):
+    return [data["utterance"] for msg_type, data in sent if msg_type == "speak"]
+
+
+def test_identical_crops_share_one_call_and_repeats_are_cached():
+    model = FakeModel()
+    crops = {"a": b"courier", "b": b"courier", "c": b"cat", "d": b"courier"}
+    describer, sent = make(crops, model)
+    describer.on_events({"events": [event("a"), event("b"), event("c", label="cat")]})
+    batch = describer.next_batch(threading.Event())
+    results = describer.process(batch)
+    assert sorted(model.calls) == [b"cat", b"courier"]
+    assert {r.event_id: r.text for r in results} == {
+        "a": "A courier.",
+        "b": "A courier.",
+        "c": "A cat.",
+    }
+    describer.on_events({"events": [event("d")]})  # same crop, new object
+    (again,) = describer.process(describer.next_batch(threading.Event()))
+    assert again.cached and len(model.calls) == 2
+    assert spoken(sent).count("front door: A courier.") == 3
+    assert describer.stats.cache_hits == 1
+
+
+def test_announced_objects_are_not_described_again_until_asked():
+    model = FakeModel()
+    describer, sent = make({"a": b"courier", "b": b"cat"}, model)
+    describer.on_events({"events": [event("a")]})
+    describer.process(describer.next_batch(threading.Event()))
+    assert describer.on_events({"events": [event("a", score=0.9)]}) == 0
+    describer.on_events({"events": [event("b", label="cat")]})
+    describer.on_events({"events": [event("b", label="cat", score=0.9)]})
+    describer.process(describer.next_batch(threading.Event()))
+    assert describer.stats.repeats == 1 and describer.stats.replaced == 1
+    describer.on_ask({"camera": "front_door", "event_id": "a"})  # re-armed
+    describer.process(describer.next_batch(threading.Event()))
+    assert spoken(sent) == [
+        "front door: A courier.",
+        "front door: A cat.",
+        "front door: A courier.",
+    ]
+    assert describer.stats.jobs == 3
+
+
+def test_batches_wait_for_the_window_and_keep_the_newest_update():
+    describer, _ = make({}, max_batch=3, window=0.2)
+    describer.on_events({"events": [event("a", score=0.5)]})
+    threading.Timer(0.05, describer.on_events, [{"events": [event("b")]}]).start()
+    describer.on_events({"events": [event("a", score=0.9)]})
+    started = time.monotonic()
+    batch = describer.next_batch(threading.Event())
+    assert 0.04 <= time.monotonic() - started < 1.0
+    assert [(job.event_id, job.score) for job in batch] == [("a", 0.9), ("b", 0.8)]
+    assert describer.stats.replaced == 1
+
+
+def test_model_calls_are_bounded_and_stale_or_missing_snapshots_skipped():
+    crops = {str(i): f"thing {i}".encode() for i in range(6)}
+    crops["gone"] = None
+    model = FakeModel(delay=0.05)
+    clock = FakeClock()
+    describer, _ = make(crops, model, max_batch=8, concurrency=2, clock=clock)
+    describer.submit(vd.SnapshotJob("yard", "old", queued_at=clock.now - 60))
+    describer.on_events(
+        {
+            "events": [event(i) for i in crops]
+            + [event("x", label="plant"), event("y", has_snapshot=False)]
+        }
+    )
+    results = describer.process(describer.next_batch(threading.Event()))
+    assert len(results) == 6 and model.peak == 2
+    stats = describer.stats
+    assert (stats.stale, stats.errors, stats.jobs) == (1, 1, 7)
+    describer.close()
+
+
+def test_end_with_the_first_snapshot_is_described_once():
+    describer, sent = make({"a": b"courier"})
+    describer.on_events({"events": [event("a", kind="new", has_snapshot=False)]})
+    assert describer.on_events({"events": [event("a", kind="end")]}) == 1
+    describer.process(describer.next_batch(threading.Event()))
+    assert describer.on_events({"events": [event("a", kind="end")]}) == 0
+    assert spoken(sent) == ["front door: A courier."]
+
+
+def test_ask_repeats_the_latest_object_or_describes_the_frame():
+    model = FakeModel()
+    describer, sent = make({"a": b"courier", "garage": b"car"}, model)
+    describer.on_events({"events": [event("a")]})
+    describer.process(describer.next_batch(threading.Event()))
+    describer.on_ask({"camera": "front_door"})
+    describer.on_ask({"camera": "garage"})
+    describer.process(describer.next_batch(threading.Event()))
+    assert spoken(sent) == [
+        "front door: A courier.",
+        "front door: A courier.",
+        "garage: A car.",
+    ]
+    assert len(model.calls) == 2
+
+
+def test_spoken_keeps_the_first_sentence():
+    assert vd.spoken('"A man in a **blue** jacket.** He holds a box.') == (
+        "A man in a blue jacket."
+    )
+    assert vd.spoken("  a dog  ") == "a dog"
@@ -0,0 +1,128 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Offline tests for wakeword_eval.py (no plugin or XTTS container needed)."""
+
+import json
+import wave
+
+import numpy as np
+import pytest
+
+import wakeword_eval as we
+
+
+class LoudFrameEngine:
+    """Stand-in wake-word engine that fires on any loud frame."""
+
+    def __init__(self, hotword, config, lang):
+        self.threshold = config["threshold"]
+        self._last = b""
+
+    def update(self, chunk):
+        self._last = chunk
+
+    def found_wake_word(self, frame_data):
+        samples = np.frombuffer(frame_data, dtype=np.int16).astype(np.float32)
+        return float(np.sqrt(np.mean(samples**2))) > self.threshold
+
+
+def write_wav(path, samples, rate=we.SAMPLE_RATE):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.asarray(samples, dtype=np.int16).tobytes())
+
+
+def make_corpus(tmp_path, seconds=120):
+    rng = np.random.default_rng(1)
+    background = rng.normal(0, 50, seconds * we.SAMPLE_RATE)
+    write_wav(tmp_path / "quiet.wav", background)
+    clip = np.sin(np.linspace(0, 600 * np.pi, 12000)) * 3000
+    (tmp_path / "positives").mkdir()
+    write_wav(tmp_path / "positives" / "hey_mycroft.wav", clip, rate=24000)
+    manifest = tmp_path / "corpus.json"
+    manifest.write_text(json.dumps({"recordings": [{"audio": "quiet.wav"}]}))
+    return manifest
+
+
+def test_load_corpus_accepts_numbers_and_spans(tmp_path):
+    manifest = tmp_path / "corpus.json"
+    manifest.write_text(
+        json.dumps(
+            {
+                "recordings": [
+                    {"audio": "a.wav", "wake_words": [{"start": 5, "end": 6}, 2]}
+                ]
+            }
+        )
+    )
+    (recording,) = we.load_corpus(manifest)
+    assert recording.audio == tmp_path / "a.wav"
+    assert recording.labels == [we.WakeWordLabel(2, 2), we.WakeWordLabel(5, 6)]
+
+
+def test_load_corpus_rejects_empty_manifest(tmp_path):
+    manifest = tmp_path / "corpus.json"
+    manifest.write_text("{}")
+    with pytest.raises(we.EvaluationError):
+        we.load_corpus(manifest)
+
+
+def test_match_detections_counts_latency_misses_and_false_accepts():
+    labels = [we.WakeWordLabel(10, 11), we.WakeWordLabel(50, 51)]
+    latencies, false_accepts, misses = we.match_detections(
+        [11.25, 30.0], labels, tolerance=1.0
+    )
+    assert latencies == [0.25]
+    assert false_accepts == 1
+    assert misses == 1
+
+
+def test_plan_injections_avoids_labels_and_overlaps():
+    labels = [we.WakeWordLabel(100, 101)]
+    plan = we.plan_injections(3600, [1.0], labels, per_hour=60, seed=3)
+    assert len(plan) == 60
+    offsets = [offset for offset, _ in plan]
+    assert all(abs(o - 100) > 2 for o in offsets)
+    assert all(b - a >= 1.0 for a, b in zip(offsets, offsets[1:]))
+
+
+def test_energy_gate_passes_everything_when_disabled():
+    gate = we.EnergyGate(energy_ratio=1.5, multiplier=0)
+    frame = np.zeros(we.FRAME_SAMPLES, dtype=np.float32)
+    assert len(gate.feed(frame)) == 1
+
+
+def test_energy_gate_flushes_preroll_on_loud_frame():
+    gate = we.EnergyGate(energy_ratio=1.5, multiplier=1.0, hangover=0, preroll=0.2)
+    quiet = np.full(we.FRAME_SAMPLES, 10, dtype=np.float32)
+    for _ in range(10):
+        assert gate.feed(quiet) in ([], [quiet])
+    passed = gate.feed(quiet * 100)
+    assert len(passed) == 1 + int(0.2 / we.SEC_PER_FRAME)
+
+
+def test_sweep_reports_injected_positives(tmp_path):
+    manifest = make_corpus(tmp_path)
+    grid = [we.SweepParams(1000, 1.5, 0), we.SweepParams(1e9, 1.5, 0)]
+    hit, deaf = we.sweep(
+        we.load_corpus(manifest),
+        grid,
+        workers=1,
+        hotword="hey_mycroft",
+        hotword_config={"module": "fake"},
+        lang="en-us",
+        positives=[tmp_path / "positives" / "hey_mycroft.wav"],
+        inject_per_hour=60,
+        snr_db=30,
+        seed=0,
+        refractory=1.0,
+        tolerance=1.0,
+        engine_factory=LoudFrameEngine,
+    )
+    assert hit.labels == 2
+    assert hit.miss_rate == 0
+    assert hit.false_accepts_per_hour == 0
+    assert hit.latency_p50 is not None and hit.latency_p50 <= 1.0
+    assert deaf.miss_rate == 1
+    assert "FA/h" in we.format_report([hit, deaf])
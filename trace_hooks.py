@@ -0,0 +1,100 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""In-process trace hooks for the OVOS listener, intent service and TTS path.
+
+``turn_tracer.py`` turns bus events into per-stage spans, but it only sees a
+message when the bus delivers it, after the sender's work and the messagebus
+hop. The hooks here run inside the processes that do the work:
+
+* ``install`` wraps ``MessageBusClient.emit`` so every stage event the
+  listener (``recognizer_loop:*``) and the intent service / skills
+  (``mycroft.skill.handler.start``, ``speak``) send carries the time it was
+  emitted in ``context["trace_time"]``;
+* ``bus_mark`` gives code that sees a stage with no native bus event, such
+  as the first TTS byte, a ``mark(stage)`` callable that emits
+  ``ovos.trace.mark``.
+
+The ``ovos`` service mounts this file as ``sitecustomize.py`` on its
+``PYTHONPATH`` with ``OVOS_TRACE_HOOKS=1``, which installs the hooks in every
+Python process of the container without touching ovos-core. The module needs
+nothing but ovos-bus-client.
+"""
+
+import logging
+import os
+import time
+from collections.abc import Callable
+from typing import Any
+
+try:
+    from ovos_bus_client import Message, MessageBusClient
+except ImportError:
+    Message = MessageBusClient = None
+
+logger = logging.getLogger("trace_hooks")
+
+BUS_MARKS = {
+    "recognizer_loop:wakeword": "wake",
+    "recognizer_loop:record_end": "end_of_speech",
+    "recognizer_loop:utterance": "stt",
+    "mycroft.skill.handler.start": "intent",
+    "speak": "skill",
+    "recognizer_loop:audio_output_start": "playback",
+}
+MARK_MESSAGE = "ovos.trace.mark"
+TRACE_CONTEXT_KEY = "trace_time"
+
+
+class TraceHookError(Exception):
+    """Raised when a hook needs ovos-bus-client and it is not installed."""
+
+
+def stamp(message: Any, clock: Callable[[], float] = time.time) -> Any:
+    """Record the emit time of a stage event in its context; return it."""
+    if getattr(message, "msg_type", None) in BUS_MARKS:
+        if message.context is None:
+            message.context = {}
+        message.context.setdefault(TRACE_CONTEXT_KEY, clock())
+    return message
+
+
+def install(client_class: Any = None) -> bool:
+    """Stamp stage events sent through ``client_class.emit``; False if absent."""
+    client_class = client_class or MessageBusClient
+    if client_class is None or getattr(client_class.emit, "traced", False):
+        return False
+    emit = client_class.emit
+
+    def traced_emit(self: Any, message: Any, *args: Any, **kwargs: Any) -> Any:
+        return emit(self, stamp(message), *args, **kwargs)
+
+    traced_emit.traced = True
+    client_class.emit = traced_emit
+    return True
+
+
+def emit_mark(
+    bus: Any, stage: str, session_id: str = "default", timestamp: float | None = None
+) -> None:
+    """Mark a stage from code outside the standard bus events (e.g. TTS)."""
+    if Message is None:
+        raise TraceHookError("ovos-bus-client is required to emit trace marks")
+    bus.emit(
+        Message(
+            MARK_MESSAGE,
+            {"stage": stage, "timestamp": timestamp or time.time()},
+            {"session": {"session_id": session_id}},
+        )
+    )
+
+
+def bus_mark(bus: Any, session_id: str = "default") -> Callable[[str], None]:
+    """``mark(stage)`` callable that emits trace marks on ``bus``."""
+
+    def mark(stage: str) -> None:
+        emit_mark(bus, stage, session_id)
+
+    return mark
+
+
+if os.environ.get("OVOS_TRACE_HOOKS") == "1":
+    install()
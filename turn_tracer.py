@@ -0,0 +1,291 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""End-to-end voice turn latency tracer.
+
+A voice turn passes through these stages, each ending at a bus event::
+
+    wake            recognizer_loop:wakeword
+    end_of_speech   recognizer_loop:record_end
+    stt             recognizer_loop:utterance
+    intent          mycroft.skill.handler.start
+    skill           speak
+    tts_first_byte  ovos.trace.mark {"stage": "tts_first_byte"}
+    playback        recognizer_loop:audio_output_start
+
+``BusHooks`` listens for those events, tracks the current turn per session and
+emits one ``ovos.trace.span`` message per stage (time since the previous
+stage). The hooks in ``trace_hooks.py`` run inside the ``ovos`` processes and
+stamp each stage event with the time it was emitted, which ``BusHooks``
+prefers over the time it arrived. Stages without a native bus event, such as
+the first TTS byte, are marked by the code that sees them with
+``trace_hooks.emit_mark`` (``speech_stream.py`` does). ``SpanCollector``
+appends the spans to a compact binary file per day under
+``ovos_config/data/traces`` and ``report`` prints percentile waterfalls; the
+``turn_tracer`` Compose service runs both.
+
+Usage (in the ``turn_tracer`` service or any host that reaches the bus)::
+
+    python turn_tracer.py run
+    python turn_tracer.py report --day 2026-10-18
+"""
+
+import argparse
+import logging
+import os
+import struct
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import date
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from stack_config import DEFAULT_DATA_DIR, bus_settings
+from trace_hooks import BUS_MARKS, MARK_MESSAGE, TRACE_CONTEXT_KEY
+
+try:
+    from ovos_bus_client import Message, MessageBusClient
+except ImportError:
+    Message = MessageBusClient = None
+
+logger = logging.getLogger("turn_tracer")
+
+STAGES = (
+    "wake",
+    "end_of_speech",
+    "stt",
+    "intent",
+    "skill",
+    "tts_first_byte",
+    "playback",
+)
+SPAN_MESSAGE = "ovos.trace.span"
+TRACE_DIR = DEFAULT_DATA_DIR / "traces"
+# turn id, span start (epoch s), duration (s), stage index
+RECORD = struct.Struct("<QdfB")
+TURN_TIMEOUT = 60.0
+
+
+class TracerError(Exception):
+    """Raised when tracing cannot start or a span file is unreadable."""
+
+
+@dataclass
+class Span:
+    """Time spent in one stage of one turn."""
+
+    turn_id: int
+    stage: str
+    start: float
+    duration: float
+
+
+@dataclass
+class _Turn:
+    turn_id: int
+    last_stage: int
+    last_time: float
+
+
+class TurnTracker:
+    """Turns per-session stage marks into spans.
+
+    A turn starts at ``wake`` (or at ``stt`` for typed utterances) and ends at
+    ``playback`` or after ``timeout`` seconds without marks. Only the first
+    mark of each stage counts, so repeated ``speak`` messages do not split it.
+    """
+
+    def __init__(self, timeout: float = TURN_TIMEOUT):
+        self.timeout = timeout
+        self._turns: dict[str, _Turn] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, session: str, stage: str, timestamp: float) -> Span | None:
+        """Record that ``session`` reached ``stage``; return the finished span."""
+        index = STAGES.index(stage)
+        with self._lock:
+            turn = self._turns.get(session)
+            if turn and timestamp - turn.last_time > self.timeout:
+                turn = None
+            if stage == "wake" or (turn is None and stage == "stt"):
+                self._turns[session] = _Turn(time.time_ns(), index, timestamp)
+                return Span(self._turns[session].turn_id, stage, timestamp, 0.0)
+            if turn is None or index <= turn.last_stage:
+                return None
+            span = Span(turn.turn_id, stage, turn.last_time, timestamp - turn.last_time)
+            turn.last_stage, turn.last_time = index, timestamp
+            if stage == STAGES[-1]:
+                del self._turns[session]
+            return span
+
+
+def _session_id(message: Any) -> str:
+    context = getattr(message, "context", None) or {}
+    session = context.get("session") or {}
+    return session.get("session_id") or context.get("session_id") or "default"
+
+
+class BusHooks:
+    """Derives stage marks from bus traffic and emits span messages."""
+
+    def __init__(
+        self,
+        send: Callable[[str, dict[str, Any]], None],
+        tracker: TurnTracker | None = None,
+    ):
+        self.send = send
+        self.tracker = tracker or TurnTracker()
+
+    def on_message(self, message: Any) -> Span | None:
+        """Handle a stage event or an explicit ``ovos.trace.mark``."""
+        data = getattr(message, "data", None) or {}
+        if message.msg_type == MARK_MESSAGE:
+            stage = data.get("stage")
+            if stage not in STAGES:
+                logger.warning(f"Ignoring trace mark for unknown stage {stage!r}")
+                return None
+        else:
+            stage = BUS_MARKS.get(message.msg_type)
+            if stage is None:
+                return None
+        context = getattr(message, "context", None) or {}
+        timestamp = float(
+            data.get("timestamp") or context.get(TRACE_CONTEXT_KEY) or time.time()
+        )
+        span = self.tracker.mark(_session_id(message), stage, timestamp)
+        if span is not None:
+            self.send(SPAN_MESSAGE, asdict(span))
+        return span
+
+    def attach(self, bus: Any) -> None:
+        """Subscribe to every stage event on an ``ovos_bus_client`` bus."""
+        for msg_type in list(BUS_MARKS) + [MARK_MESSAGE]:
+            bus.on(msg_type, self.on_message)
+
+
+def trace_path(day: date | None = None, directory: Path = TRACE_DIR) -> Path:
+    """Span file for ``day`` (today by default)."""
+    return directory / f"{(day or date.today()).isoformat()}.spans"
+
+
+class SpanCollector:
+    """Appends span messages to the day's compact span file."""
+
+    def __init__(self, directory: str | os.PathLike = TRACE_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def write(self, span: Span) -> None:
+        """Append one span record."""
+        record = RECORD.pack(
+            span.turn_id, span.start, span.duration, STAGES.index(span.stage)
+        )
+        path = trace_path(date.fromtimestamp(span.start), self.directory)
+        with self._lock, open(path, "ab") as f:
+            f.write(record)
+
+    def on_message(self, message: Any) -> None:
+        """Bus handler for ``ovos.trace.span``."""
+        try:
+            self.write(Span(**message.data))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Dropping malformed span {message.data!r}: {e}")
+
+    def attach(self, bus: Any) -> None:
+        """Subscribe to span messages."""
+        bus.on(SPAN_MESSAGE, self.on_message)
+
+
+def read_spans(path: str | os.PathLike) -> list[Span]:
+    """Load every span record from a span file."""
+    try:
+        data = Path(path).read_bytes()
+    except OSError as e:
+        raise TracerError(f"Cannot read span file {path}: {e}") from e
+    usable = len(data) - len(data) % RECORD.size
+    return [
+        Span(turn_id, STAGES[stage], start, duration)
+        for turn_id, start, duration, stage in RECORD.iter_unpack(data[:usable])
+    ]
+
+
+def waterfall(spans: list[Span], width: int = 40) -> str:
+    """Per-stage percentile table with a p50 waterfall bar."""
+    by_stage = {stage: [] for stage in STAGES[1:]}
+    turns: dict[int, float] = {}
+    for span in spans:
+        if span.stage in by_stage:
+            by_stage[span.stage].append(span.duration * 1000)
+            turns[span.turn_id] = turns.get(span.turn_id, 0.0) + span.duration * 1000
+    p50s = {s: float(np.percentile(v, 50)) if v else 0.0 for s, v in by_stage.items()}
+    total_p50 = sum(p50s.values()) or 1.0
+    lines = [
+        f"{'stage':<15} {'n':>5} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}  waterfall"
+    ]
+    offset = 0.0
+    for stage, values in by_stage.items():
+        if values:
+            p90, p99 = np.percentile(values, [90, 99])
+            start = int(offset / total_p50 * width)
+            length = max(1, int(p50s[stage] / total_p50 * width))
+            bar = " " * start + "#" * length
+            lines.append(
+                f"{stage:<15} {len(values):>5} {p50s[stage]:>8.0f} {p90:>8.0f} "
+                f"{p99:>8.0f}  |{bar:<{width}}|"
+            )
+        else:
+            lines.append(f"{stage:<15} {0:>5} {'-':>8} {'-':>8} {'-':>8}")
+        offset += p50s[stage]
+    if turns:
+        totals = list(turns.values())
+        p50, p90, p99 = np.percentile(totals, [50, 90, 99])
+        lines.append(
+            f"{'turn total':<15} {len(totals):>5} {p50:>8.0f} {p90:>8.0f} {p99:>8.0f}"
+        )
+    return "\n".join(lines)
+
+
+def run(trace_dir: Path = TRACE_DIR) -> None:
+    """Attach hooks and collector to the messagebus and block."""
+    if MessageBusClient is None:
+        raise TracerError("ovos-bus-client is required; use the turn_tracer service")
+    bus = MessageBusClient(**bus_settings())
+    BusHooks(lambda msg_type, data: bus.emit(Message(msg_type, data))).attach(bus)
+    SpanCollector(trace_dir).attach(bus)
+    logger.info(f"Tracing voice turns into {trace_dir}")
+    bus.run_forever()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Voice turn latency tracer")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="trace turns from the messagebus")
+    run_cmd.add_argument("--dir", type=Path, default=TRACE_DIR)
+    report = sub.add_parser("report", help="print percentile waterfalls")
+    report.add_argument("--day", type=date.fromisoformat)
+    report.add_argument("--file", type=Path)
+    report.add_argument("--dir", type=Path, default=TRACE_DIR)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        if args.command == "run":
+            run(args.dir)
+            return 0
+        spans = read_spans(args.file or trace_path(args.day, args.dir))
+    except TracerError as e:
+        logger.error(str(e))
+        return 1
+    print(waterfall(spans))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
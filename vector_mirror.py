@@ -0,0 +1,480 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""In-process mirror of the hot part of the Qdrant memory collections.
+
+Memory lookups (persona facts, the semantic answer cache) sit on the voice
+path. When the ``qdrant`` container is restarting or not yet healthy, a
+lookup used to fail or wait out the HTTP timeout. ``MirroredStore`` wraps a
+``QdrantStore`` and keeps a bounded copy of recently written and recently
+returned points in a ``LocalIndex`` per collection:
+
+* writes go to Qdrant and to the mirror,
+* searches go to Qdrant and refresh the mirror with the hits; when Qdrant
+  fails, the same search is answered from the mirror and Qdrant is skipped
+  for ``retry_after`` seconds, so later lookups don't pay the timeout again.
+
+``LocalIndex`` holds unit vectors in a preallocated NumPy matrix, so a search
+is one matrix-vector product plus ``argpartition`` (well under a millisecond
+for a few thousand 768-d rows). Payload fields are kept as NumPy columns so
+the ``match``/``range`` filters the stack uses are evaluated vectorized too.
+Once full, the least recently used row is replaced.
+
+``LocalQdrant`` exposes the same methods as ``QdrantStore`` on top of local
+indexes; it is the stand-in for tests that need a vector store offline.
+
+Usage::
+
+    python vector_mirror.py warm --collection persona_facts --limit 2048
+"""
+
+import argparse
+import logging
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import numpy as np
+
+from qdrant_store import QdrantStore
+from stack_http import ServiceError
+
+logger = logging.getLogger("vector_mirror")
+
+DEFAULT_CAPACITY = 4096
+RETRY_AFTER = 15.0
+
+
+class MirrorError(Exception):
+    """Raised when a filter or vector cannot be handled by the local index."""
+
+
+class LocalIndex:
+    """Bounded cosine top-k index over a NumPy matrix with LRU replacement."""
+
+    def __init__(
+        self,
+        dim: int,
+        capacity: int = DEFAULT_CAPACITY,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.dim = dim
+        self.capacity = capacity
+        self.clock = clock
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._used = np.full(capacity, -np.inf)
+        self._ids: list[Any] = [None] * capacity
+        self._payloads: list[dict[str, Any]] = [{}] * capacity
+        self._rows: dict[Any, int] = {}
+        self._keywords: dict[str, np.ndarray] = {}
+        self._numbers: dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _row_for(self, point_id: Any) -> int:
+        row = self._rows.get(point_id)
+        if row is not None:
+            return row
+        if len(self._rows) < self.capacity:
+            row = len(self._rows)
+        else:
+            row = int(np.argmin(self._used))
+            del self._rows[self._ids[row]]
+        self._rows[point_id] = row
+        self._ids[row] = point_id
+        return row
+
+    def _set_payload(self, row: int, payload: dict[str, Any]) -> None:
+        self._payloads[row] = payload
+        for column in self._keywords.values():
+            column[row] = None
+        for column in self._numbers.values():
+            column[row] = np.nan
+        for key, value in payload.items():
+            if isinstance(value, (str, bool, int, float)):
+                if key not in self._keywords:
+                    self._keywords[key] = np.full(self.capacity, None, dtype=object)
+                self._keywords[key][row] = value
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if key not in self._numbers:
+                    self._numbers[key] = np.full(self.capacity, np.nan)
+                self._numbers[key][row] = value
+
+    def upsert(self, points: list[dict[str, Any]]) -> None:
+        """Add or replace ``{"id", "vector", "payload"}`` points."""
+        now = self.clock()
+        for point in points:
+            vector = np.asarray(point["vector"], dtype=np.float32)
+            if vector.shape != (self.dim,):
+                raise MirrorError(f"Expected {self.dim}-d vector, got {vector.shape}")
+            norm = np.linalg.norm(vector)
+            row = self._row_for(point["id"])
+            self._vectors[row] = vector / norm if norm else vector
+            self._set_payload(row, point.get("payload") or {})
+            self._used[row] = now
+
+    def _condition(self, condition: dict[str, Any]) -> np.ndarray:
+        count = len(self._rows)
+        key = condition["key"]
+        if "match" in condition:
+            column = self._keywords.get(key)
+            if column is None:
+                return np.zeros(count, dtype=bool)
+            return column[:count] == condition["match"]["value"]
+        if "range" in condition:
+            column = self._numbers.get(key)
+            if column is None:
+                return np.zeros(count, dtype=bool)
+            values = column[:count]
+            bounds = condition["range"]
+            mask = np.ones(count, dtype=bool)
+            with np.errstate(invalid="ignore"):
+                if "gte" in bounds:
+                    mask &= values >= bounds["gte"]
+                if "gt" in bounds:
+                    mask &= values > bounds["gt"]
+                if "lte" in bounds:
+                    mask &= values <= bounds["lte"]
+                if "lt" in bounds:
+                    mask &= values < bounds["lt"]
+            return mask
+        raise MirrorError(f"Unsupported filter condition: {condition}")
+
+    def _mask(self, query_filter: dict[str, Any] | None) -> np.ndarray:
+        query_filter = query_filter or {}
+        unsupported = set(query_filter) - {"must", "must_not", "should"}
+        if unsupported:
+            raise MirrorError(f"Unsupported filter clauses: {sorted(unsupported)}")
+        mask = np.ones(len(self._rows), dtype=bool)
+        for condition in query_filter.get("must", []):
+            mask &= self._condition(condition)
+        for condition in query_filter.get("must_not", []):
+            mask &= ~self._condition(condition)
+        if query_filter.get("should"):
+            mask &= np.logical_or.reduce(
+                [self._condition(c) for c in query_filter["should"]]
+            )
+        return mask
+
+    def search(
+        self,
+        vector: list[float],
+        limit: int = 5,
+        score_threshold: float | None = None,
+        query_filter: dict[str, Any] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Top ``limit`` cosine matches as Qdrant-style scored points."""
+        count = len(self._rows)
+        if not count or limit <= 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = self._vectors[:count] @ (query / norm if norm else query)
+        scores[~self._mask(query_filter)] = -np.inf
+        if score_threshold is not None:
+            scores[scores < score_threshold] = -np.inf
+        limit = min(limit, count)
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        self._used[top] = self.clock()
+        return [
+            {
+                "id": self._ids[row],
+                "score": float(scores[row]),
+                "payload": self._payloads[row],
+            }
+            for row in top
+        ]
+
+    def delete(self, query_filter: dict[str, Any]) -> int:
+        """Drop every point matching ``query_filter``; return how many."""
+        count = len(self._rows)
+        doomed = self._mask(query_filter)
+        keep = np.flatnonzero(~doomed)
+        kept = len(keep)
+        self._vectors[:kept] = self._vectors[keep]
+        self._used[:kept] = self._used[keep]
+        self._used[kept:] = -np.inf
+        for column, empty in [(c, None) for c in self._keywords.values()] + [
+            (c, np.nan) for c in self._numbers.values()
+        ]:
+            column[:kept] = column[keep]
+            column[kept:] = empty
+        self._ids = [self._ids[row] for row in keep] + [None] * (self.capacity - kept)
+        self._payloads = [self._payloads[row] for row in keep] + [{}] * (
+            self.capacity - kept
+        )
+        self._rows = {point_id: row for row, point_id in enumerate(self._ids[:kept])}
+        return count - kept
+
+
+class LocalQdrant:
+    """``QdrantStore`` look-alike backed by ``LocalIndex`` collections."""
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.capacity = capacity
+        self.clock = clock
+        self.indexes: dict[str, LocalIndex] = {}
+        # Configs received, kept so callers can see what Qdrant would get.
+        self.configs: dict[str, dict[str, Any] | None] = {}
+        self.patches: list[tuple[str, dict[str, Any]]] = []
+        self._lock = threading.Lock()
+
+    def collection_exists(self, name: str) -> bool:
+        """True if collection ``name`` exists."""
+        return name in self.indexes
+
+    def ensure_collection(
+        self,
+        name: str,
+        size: int,
+        distance: str = "Cosine",
+        payload_indexes: dict[str, str] | None = None,
+        config: dict[str, Any] | None = None,
+    ) -> bool:
+        """Create ``name`` if missing; return True when it was created."""
+        with self._lock:
+            if name in self.indexes:
+                return False
+            self.indexes[name] = LocalIndex(size, self.capacity, self.clock)
+            self.configs[name] = config
+            return True
+
+    def update_collection(self, name: str, config: dict[str, Any]) -> None:
+        """Record ``config``; local indexes have no tunables."""
+        self.patches.append((name, config))
+
+    def collection_info(self, name: str) -> dict[str, Any]:
+        """Status and point count of ``name``."""
+        return {"status": "green", "points_count": len(self._index(name))}
+
+    def delete_collection(self, name: str) -> None:
+        """Drop ``name``."""
+        self.indexes.pop(name, None)
+
+    def metrics(self) -> str:
+        """Prometheus-style gauge of the memory held by the matrices."""
+        size = sum(index._vectors.nbytes for index in self.indexes.values())
+        return f"memory_resident_bytes {size}\n"
+
+    def _index(self, name: str) -> LocalIndex:
+        try:
+            return self.indexes[name]
+        except KeyError:
+            raise ServiceError(f"Collection {name} does not exist", 404) from None
+
+    def upsert(
+        self, name: str, points: list[dict[str, Any]], wait: bool = True
+    ) -> None:
+        """Insert or replace points."""
+        index = self._index(name)
+        with self._lock:
+            index.upsert(points)
+
+    def search(
+        self,
+        name: str,
+        vector: list[float],
+        limit: int = 5,
+        score_threshold: float | None = None,
+        query_filter: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
+        with_payload: bool = True,
+        with_vector: bool = False,
+    ) -> list[dict[str, Any]]:
+        """Nearest neighbours of ``vector``; ``params`` are ignored."""
+        index = self._index(name)
+        with self._lock:
+            return index.search(vector, limit, score_threshold, query_filter)
+
+    def delete(self, name: str, query_filter: dict[str, Any]) -> None:
+        """Delete every point matching ``query_filter``."""
+        index = self._index(name)
+        with self._lock:
+            index.delete(query_filter)
+
+
+class MirroredStore:
+    """``QdrantStore`` wrapper that answers searches locally when Qdrant fails."""
+
+    def __init__(
+        self,
+        store: QdrantStore,
+        mirror: LocalQdrant | None = None,
+        retry_after: float = RETRY_AFTER,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.store = store
+        self.mirror = mirror or LocalQdrant(clock=clock)
+        self.retry_after = retry_after
+        self.clock = clock
+        self.down_until = 0.0
+        self.fallbacks = 0
+
+    @property
+    def available(self) -> bool:
+        """False while Qdrant is being skipped after a failure."""
+        return self.clock() >= self.down_until
+
+    def _failed(self, error: ServiceError) -> None:
+        if self.available:
+            logger.warning(
+                f"Qdrant unavailable, serving from the local mirror for "
+                f"{self.retry_after:.0f}s: {error}"
+            )
+        self.down_until = self.clock() + self.retry_after
+
+    def collection_exists(self, name: str) -> bool:
+        """Existence in Qdrant, or in the mirror while Qdrant is down."""
+        if self.available:
+            try:
+                return self.store.collection_exists(name)
+            except ServiceError as e:
+                self._failed(e)
+        return self.mirror.collection_exists(name)
+
+    def ensure_collection(
+        self,
+        name: str,
+        size: int,
+        distance: str = "Cosine",
+        payload_indexes: dict[str, str] | None = None,
+        config: dict[str, Any] | None = None,
+    ) -> bool:
+        """Create ``name`` in the mirror and, if reachable, in Qdrant."""
+        self.mirror.ensure_collection(name, size)
+        if not self.available:
+            return False
+        try:
+            return self.store.ensure_collection(
+                name, size, distance, payload_indexes, config
+            )
+        except ServiceError as e:
+            self._failed(e)
+            return False
+
+    def upsert(
+        self, name: str, points: list[dict[str, Any]], wait: bool = True
+    ) -> None:
+        """Write to the mirror, then to Qdrant (errors still propagate)."""
+        if self.mirror.collection_exists(name):
+            self.mirror.upsert(name, points)
+        try:
+            self.store.upsert(name, points, wait)
+        except ServiceError as e:
+            self._failed(e)
+            raise
+
+    def search(
+        self,
+        name: str,
+        vector: list[float],
+        limit: int = 5,
+        score_threshold: float | None = None,
+        query_filter: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
+        with_payload: bool = True,
+        with_vector: bool = False,
+    ) -> list[dict[str, Any]]:
+        """Search Qdrant, falling back to the mirror when it fails."""
+        if self.available:
+            try:
+                hits = self.store.search(
+                    name,
+                    vector,
+                    limit,
+                    score_threshold,
+                    query_filter,
+                    params,
+                    with_payload=True,
+                    with_vector=True,
+                )
+            except ServiceError as e:
+                self._failed(e)
+            else:
+                self.mirror.ensure_collection(name, len(vector))
+                self.mirror.upsert(
+                    name, [hit for hit in hits if hit.get("vector") is not None]
+                )
+                return hits
+        self.fallbacks += 1
+        if not self.mirror.collection_exists(name):
+            return []
+        try:
+            return self.mirror.search(
+                name, vector, limit, score_threshold, query_filter
+            )
+        except MirrorError as e:
+            raise ServiceError(f"Qdrant down and mirror cannot answer: {e}") from e
+
+    def delete(self, name: str, query_filter: dict[str, Any]) -> None:
+        """Delete from the mirror and from Qdrant."""
+        if self.mirror.collection_exists(name):
+            self.mirror.delete(name, query_filter)
+        try:
+            self.store.delete(name, query_filter)
+        except ServiceError as e:
+            self._failed(e)
+            raise
+
+    def warm(self, name: str, limit: int = DEFAULT_CAPACITY) -> int:
+        """Copy up to ``limit`` points of ``name`` from Qdrant into the mirror."""
+        copied = 0
+        offset = None
+        while copied < limit:
+            points, offset = self.store.scroll(name, min(256, limit - copied), offset)
+            if not points:
+                break
+            self.mirror.ensure_collection(name, len(points[0]["vector"]))
+            self.mirror.upsert(name, points)
+            copied += len(points)
+            if offset is None:
+                break
+        return copied
+
+
+def mirrored_store(timeout: float = 2.0) -> MirroredStore:
+    """Mirrored client for the ``qdrant`` service with a short HTTP timeout."""
+    return MirroredStore(QdrantStore(timeout=timeout))
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Local Qdrant mirror")
+    sub = parser.add_subparsers(dest="command", required=True)
+    warm = sub.add_parser("warm", help="load a collection and time local search")
+    warm.add_argument("--collection", required=True)
+    warm.add_argument("--limit", type=int, default=DEFAULT_CAPACITY)
+    warm.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    store = mirrored_store()
+    try:
+        copied = store.warm(args.collection, args.limit)
+    except ServiceError as e:
+        logger.error(str(e))
+        return 1
+    if not copied:
+        print(f"{args.collection} is empty")
+        return 0
+    index = store.mirror.indexes[args.collection]
+    queries = np.random.default_rng(0).normal(size=(args.queries, index.dim))
+    started = time.perf_counter()
+    for query in queries:
+        index.search(query, limit=5)
+    elapsed = (time.perf_counter() - started) / args.queries * 1000
+    print(f"{copied} points mirrored, local search {elapsed:.3f} ms per query")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
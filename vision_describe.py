@@ -0,0 +1,527 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Spoken descriptions of Frigate snapshots from a local vision model.
+
+A vision model on this host needs seconds per image, so calling it once per
+Frigate event as events arrive would queue announcements far behind the
+door. ``VisionDescriber`` makes each call count:
+
+* jobs from ``frigate.events`` (see ``frigate_bridge.py``) are queued for
+  objects with a snapshot, including an ``end`` for an object not described
+  yet (its snapshot may have arrived with it); they wait up to
+  ``window`` seconds to form a micro-batch of at most ``max_batch``; later
+  updates of the same object replace its queued job and jobs older than
+  ``max_age`` are dropped unspoken;
+* the batch's snapshots are fetched together, cropped to the object and
+  downsized to ``height`` by Frigate itself
+  (``/api/events/<id>/snapshot.jpg?crop=1&h=``), so the model only sees the
+  object, at a size it decodes quickly, and nothing is re-decoded here;
+* identical crops in a batch are described once, and a description is
+  cached under the SHA-256 of its crop (and the model), so the same snapshot
+  is never sent twice, also across restarts;
+* the model calls of a batch run on ``concurrency`` workers, matching
+  Ollama's ``OLLAMA_NUM_PARALLEL`` slots, and each description is announced
+  as soon as it is ready.
+
+Each object is spoken once (``speak``, for ``announce`` cameras, by default
+all); every description is also sent as ``frigate.description``.
+``frigate.describe.ask`` ``{"camera": ...}`` ("who is at the door?")
+repeats the camera's latest object, which is a cache hit, or describes the
+current frame from ``snapshot_cache.py`` when there is none.
+
+The ``vision_describe`` Compose service runs ``run``.
+
+Usage::
+
+    python vision_describe.py run --model moondream --concurrency 1
+    python vision_describe.py run --announce front_door --label person
+    python vision_describe.py describe snapshot.jpg
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote
+
+from llm_backends import OllamaBackend
+from stack_config import DEFAULT_DATA_DIR, bus_settings, service_url
+from stack_http import ServiceError, request_bytes
+
+try:
+    from ovos_bus_client import Message, MessageBusClient
+except ImportError:
+    Message = MessageBusClient = None
+
+logger = logging.getLogger("vision_describe")
+
+EVENTS_MESSAGE = "frigate.events"
+ASK_MESSAGE = "frigate.describe.ask"
+DESCRIPTION_MESSAGE = "frigate.description"
+SPEAK_MESSAGE = "speak"
+CACHE_PATH = DEFAULT_DATA_DIR / "vision_descriptions.json"
+DEFAULT_MODEL = "moondream"
+DEFAULT_HEIGHT = 384
+DEFAULT_LABELS = ("person", "car", "dog", "cat", "package", "bicycle")
+PROMPT = (
+    "Describe who or what is in this picture in one short sentence for a "
+    "spoken doorbell announcement. Mention clothing, vehicles, animals or "
+    "parcels. Do not guess names."
+)
+
+
+class DescribeError(Exception):
+    """Raised when the bus, Frigate or the vision model cannot be used."""
+
+
+@dataclass
+class SnapshotJob:
+    """One object (or, without ``event_id``, one camera frame) to describe."""
+
+    camera: str
+    event_id: str | None = None
+    label: str = ""
+    score: float = 0.0
+    queued_at: float = 0.0
+    announce: bool = True
+
+
+@dataclass
+class Description:
+    """The text for one job and what it cost."""
+
+    camera: str
+    event_id: str | None
+    label: str
+    text: str
+    digest: str
+    cached: bool
+    seconds: float
+
+
+@dataclass
+class DescriberStats:
+    """Counters for the periodic log line."""
+
+    batches: int = 0
+    jobs: int = 0
+    cache_hits: int = 0
+    model_calls: int = 0
+    model_seconds: float = 0.0
+    replaced: int = 0
+    stale: int = 0
+    repeats: int = 0
+    dropped: int = 0
+    errors: int = 0
+
+
+def spoken(text: str) -> str:
+    """The first sentence of a model answer, without quotes or markup."""
+    text = re.sub(r"[*_#`\"]", "", text).strip()
+    match = re.match(r"(.+?[.!?])(\s|$)", text, re.DOTALL)
+    return (match[1] if match else text).strip()
+
+
+def snapshot_digest(jpeg: bytes, model: str) -> str:
+    """Cache key of ``jpeg`` described by ``model``."""
+    return f"{model}:{hashlib.sha256(jpeg).hexdigest()}"
+
+
+def frigate_snapshot(
+    height: int = DEFAULT_HEIGHT,
+    frigate_url: str | None = None,
+    snapshot_url: str | None = None,
+) -> Callable[[SnapshotJob], bytes]:
+    """Fetch a job's object crop from Frigate, or the camera's shared frame."""
+    frigate_url = (frigate_url or service_url("frigate")).rstrip("/")
+    snapshot_url = (snapshot_url or service_url("snapshot_cache")).rstrip("/")
+
+    def fetch(job: SnapshotJob) -> bytes:
+        if job.event_id:
+            url = (
+                f"{frigate_url}/api/events/{quote(job.event_id)}/snapshot.jpg"
+                f"?crop=1&h={height}&bbox=0&timestamp=0"
+            )
+        else:
+            url = f"{snapshot_url}/snapshot/{quote(job.camera)}.jpg?h={height}"
+        return request_bytes("GET", url, None, 10.0)
+
+    return fetch
+
+
+def ollama_vision(
+    backend: OllamaBackend, prompt: str = PROMPT, max_tokens: int = 48
+) -> Callable[[bytes], str]:
+    """Describe one image with an Ollama vision model."""
+
+    def describe(jpeg: bytes) -> str:
+        response = backend.generate_raw(
+            prompt, options={"num_predict": max_tokens}, images=[jpeg]
+        )
+        return spoken(response.get("response", ""))
+
+    return describe
+
+
+class DescriptionCache:
+    """Descriptions by snapshot digest, least recently used out first."""
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, digest: str) -> str | None:
+        """The cached description of ``digest``, if any."""
+        with self._lock:
+            text = self._entries.get(digest)
+            if text is not None:
+                self._entries.move_to_end(digest)
+            return text
+
+    def put(self, digest: str, text: str) -> None:
+        """Remember ``text`` for ``digest``."""
+        with self._lock:
+            self._entries[digest] = text
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self, path: str | os.PathLike = CACHE_PATH) -> None:
+        """Persist the cache atomically."""
+        with self._lock:
+            data = dict(self._entries)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data), "utf-8")
+        os.replace(tmp, path)
+
+    def load(self, path: str | os.PathLike = CACHE_PATH) -> None:
+        """Restore what ``save`` wrote."""
+        try:
+            data = json.loads(Path(path).read_text("utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            raise DescribeError(f"Cannot read {path}: {e}") from e
+        for digest, text in data.items():
+            self.put(digest, text)
+
+
+class VisionDescriber:
+    """Micro-batches snapshot jobs through a cache to the vision model."""
+
+    def __init__(
+        self,
+        fetch: Callable[[SnapshotJob], bytes],
+        describe: Callable[[bytes], str],
+        send: Callable[[str, dict[str, Any]], None],
+        cache: DescriptionCache | None = None,
+        model: str = DEFAULT_MODEL,
+        max_batch: int = 4,
+        window: float = 0.5,
+        concurrency: int = 1,
+        max_age: float = 30.0,
+        max_pending: int = 32,
+        labels: Iterable[str] = DEFAULT_LABELS,
+        announce: Iterable[str] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.fetch = fetch
+        self.describe = describe
+        self.send = send
+        self.cache = cache if cache is not None else DescriptionCache()
+        self.model = model
+        self.max_batch = max_batch
+        self.window = window
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self.labels = set(labels)
+        self.announce = set(announce) if announce else None
+        self.clock = clock
+        self.stats = DescriberStats()
+        self._pending: OrderedDict[str, SnapshotJob] = OrderedDict()
+        self._changed = threading.Condition()
+        self._announced: OrderedDict[str, None] = OrderedDict()
+        self._latest: dict[str, SnapshotJob] = {}
+        self._fetch_pool = ThreadPoolExecutor(max_batch, "vision-fetch")
+        self._model_pool = ThreadPoolExecutor(concurrency, "vision-model")
+
+    def submit(self, job: SnapshotJob) -> bool:
+        """Queue ``job``, replacing a queued job of the same object."""
+        job.queued_at = job.queued_at or self.clock()
+        key = job.event_id or f"camera:{job.camera}"
+        with self._changed:
+            if key in self._pending:
+                self.stats.replaced += 1
+            elif len(self._pending) >= self.max_pending:
+                self.stats.dropped += 1
+                return False
+            self._pending[key] = job
+            self._changed.notify_all()
+        return True
+
+    def on_events(self, data: dict[str, Any]) -> int:
+        """Queue the objects of one ``frigate.events`` message worth describing."""
+        queued = 0
+        for event in data.get("events", []):
+            if not event.get("has_snapshot"):
+                continue
+            if event.get("label") not in self.labels:
+                continue
+            job = SnapshotJob(
+                event["camera"],
+                event["id"],
+                event["label"],
+                float(event.get("score") or 0.0),
+            )
+            self._latest[job.camera] = job
+            if self._was_announced(job):
+                self.stats.repeats += 1  # on_ask re-arms it if wanted
+                continue
+            queued += self.submit(job)
+        return queued
+
+    def _was_announced(self, job: SnapshotJob) -> bool:
+        with self._changed:
+            return bool(job.event_id) and job.event_id in self._announced
+
+    def on_ask(self, data: dict[str, Any]) -> bool:
+        """Describe a camera's latest object, or its current frame, on request."""
+        camera = data.get("camera")
+        if not camera:
+            return False
+        latest = self._latest.get(camera)
+        event_id = data.get("event_id") or (latest.event_id if latest else None)
+        label = latest.label if latest and latest.event_id == event_id else ""
+        job = SnapshotJob(camera, event_id, label)
+        with self._changed:
+            self._announced.pop(event_id or "", None)  # asked for: say it again
+        return self.submit(job)
+
+    def next_batch(self, stop: threading.Event) -> list[SnapshotJob]:
+        """Wait for a job, then up to ``window`` for more, and take a batch."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._pending or stop.is_set())
+            if stop.is_set():
+                return []
+            deadline = time.monotonic() + self.window  # a real wait, not the clock
+            while len(self._pending) < self.max_batch:
+                left = deadline - time.monotonic()
+                if left <= 0 or stop.is_set():
+                    break
+                self._changed.wait(left)
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                batch.append(self._pending.popitem(last=False)[1])
+        batch.sort(key=lambda job: -job.score)
+        return batch
+
+    def _fetch(self, job: SnapshotJob) -> bytes | None:
+        try:
+            return self.fetch(job)
+        except ServiceError as e:
+            logger.warning(f"No snapshot for {job.camera} {job.event_id}: {e}")
+            self.stats.errors += 1
+            return None
+
+    def _call_model(self, jpeg: bytes) -> tuple[str, float]:
+        started = self.clock()
+        text = self.describe(jpeg)
+        return text, self.clock() - started
+
+    def process(self, batch: list[SnapshotJob]) -> list[Description]:
+        """Describe ``batch``, announcing each description as it is ready."""
+        now = self.clock()
+        fresh = [job for job in batch if now - job.queued_at <= self.max_age]
+        self.stats.stale += len(batch) - len(fresh)
+        new = [job for job in fresh if not self._was_announced(job)]
+        self.stats.repeats += len(fresh) - len(new)  # announced while queued
+        fresh = new
+        if not fresh:
+            return []
+        self.stats.batches += 1
+        self.stats.jobs += len(fresh)
+        crops = list(self._fetch_pool.map(self._fetch, fresh))
+        waiting: dict[str, tuple[bytes, list[SnapshotJob]]] = {}
+        results = []
+        for job, jpeg in zip(fresh, crops):
+            if jpeg is None:
+                continue
+            digest = snapshot_digest(jpeg, self.model)
+            text = self.cache.get(digest)
+            if text is not None:
+                self.stats.cache_hits += 1
+                results.append(self._emit(job, text, digest, True, 0.0))
+            else:
+                waiting.setdefault(digest, (jpeg, []))[1].append(job)
+        futures = {
+            self._model_pool.submit(self._call_model, jpeg): digest
+            for digest, (jpeg, _) in waiting.items()
+        }
+        for future in as_completed(futures):
+            digest = futures[future]
+            try:
+                text, seconds = future.result()
+            except ServiceError as e:
+                logger.warning(f"Vision model failed: {e}")
+                self.stats.errors += 1
+                continue
+            self.stats.model_calls += 1
+            self.stats.model_seconds += seconds
+            if not text:
+                continue
+            self.cache.put(digest, text)
+            for job in waiting[digest][1]:
+                results.append(self._emit(job, text, digest, False, seconds))
+        return results
+
+    def _emit(
+        self, job: SnapshotJob, text: str, digest: str, cached: bool, seconds: float
+    ) -> Description:
+        description = Description(
+            job.camera, job.event_id, job.label, text, digest, cached, seconds
+        )
+        self.send(
+            DESCRIPTION_MESSAGE,
+            {
+                "camera": job.camera,
+                "event_id": job.event_id,
+                "label": job.label,
+                "description": text,
+                "cached": cached,
+                "seconds": round(seconds, 3),
+            },
+        )
+        key = job.event_id or ""
+        with self._changed:
+            first = key not in self._announced
+            if key:
+                self._announced[key] = None
+                while len(self._announced) > 1000:
+                    self._announced.popitem(last=False)
+        wanted = self.announce is None or job.camera in self.announce
+        if job.announce and wanted and first:
+            where = job.camera.replace("_", " ")
+            self.send(SPEAK_MESSAGE, {"utterance": f"{where}: {text}"})
+        return description
+
+    def run(self, stop: threading.Event) -> None:
+        """Process batches until ``stop`` is set."""
+        while not stop.is_set():
+            batch = self.next_batch(stop)
+            if batch:
+                self.process(batch)
+
+    def close(self) -> None:
+        """Stop the worker pools."""
+        self._fetch_pool.shutdown(wait=False, cancel_futures=True)
+        self._model_pool.shutdown(wait=False, cancel_futures=True)
+
+    def summary(self) -> str:
+        """Counters for the periodic log line."""
+        stats = self.stats
+        per_call = stats.model_seconds / stats.model_calls if stats.model_calls else 0
+        return (
+            f"{stats.jobs} snapshots in {stats.batches} batches, "
+            f"{stats.cache_hits} cached, {stats.model_calls} model calls "
+            f"({per_call:.1f}s each), {stats.replaced} replaced, {stats.stale} stale, "
+            f"{stats.repeats} repeats, {stats.dropped} dropped, {stats.errors} errors"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Vision-model snapshot descriptions")
+    parser.add_argument("--model", default=os.environ.get("OLLAMA_VISION_MODEL"))
+    parser.add_argument("--cache", type=Path, default=CACHE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="describe Frigate events from the bus")
+    run_cmd.add_argument("--height", type=int, default=DEFAULT_HEIGHT)
+    run_cmd.add_argument("--max-batch", type=int, default=4)
+    run_cmd.add_argument("--window", type=float, default=0.5)
+    run_cmd.add_argument("--concurrency", type=int, default=1)
+    run_cmd.add_argument("--max-age", type=float, default=30.0)
+    run_cmd.add_argument("--label", action="append", help="labels to describe")
+    run_cmd.add_argument("--announce", action="append", help="cameras to speak for")
+    describe_cmd = sub.add_parser("describe", help="describe one image file")
+    describe_cmd.add_argument("image", type=Path)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    model = args.model or DEFAULT_MODEL
+    cache = DescriptionCache()
+    try:
+        if args.cache.exists():
+            cache.load(args.cache)
+        describe = ollama_vision(OllamaBackend(model=model))
+        if args.command == "describe":
+            jpeg = args.image.read_bytes()
+            digest = snapshot_digest(jpeg, model)
+            text = cache.get(digest)
+            if text is None:
+                text = describe(jpeg)
+                cache.put(digest, text)
+                cache.save(args.cache)
+            print(text)
+            return 0
+        if MessageBusClient is None:
+            raise DescribeError("ovos-bus-client is required")
+    except (DescribeError, ServiceError, OSError) as e:
+        logger.error(str(e))
+        return 1
+
+    bus = MessageBusClient(**bus_settings())
+    describer = VisionDescriber(
+        frigate_snapshot(args.height),
+        describe,
+        lambda msg_type, data: bus.emit(Message(msg_type, data)),
+        cache,
+        model,
+        max_batch=args.max_batch,
+        window=args.window,
+        concurrency=args.concurrency,
+        max_age=args.max_age,
+        labels=args.label or DEFAULT_LABELS,
+        announce=args.announce,
+    )
+    bus.on(EVENTS_MESSAGE, lambda message: describer.on_events(message.data))
+    bus.on(ASK_MESSAGE, lambda message: describer.on_ask(message.data))
+    bus.run_in_thread()
+    stop = threading.Event()
+
+    def report() -> None:
+        while not stop.wait(60):
+            logger.info(describer.summary())
+            cache.save(args.cache)
+
+    threading.Thread(target=report, daemon=True).start()
+    try:
+        describer.run(stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        describer.close()
+        cache.save(args.cache)
+        logger.info(describer.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,606 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Offline wake-word accuracy and CPU cost evaluator.
+
+Runs the wake-word plugin configured in ``mycroft.conf`` over a labeled corpus
+of long recordings and reports, for every point of a parameter sweep:
+
+- false accepts per hour of audio
+- miss rate over the labeled (and injected) wake words
+- detection latency after the end of the wake phrase (p50/p95)
+- CPU seconds spent per hour of audio
+
+Known positives can be injected into the recordings from XTTS renders of the
+wake phrase, so a corpus of ordinary household audio doubles as a positive set.
+Sweep points run in parallel across cores.
+
+The corpus manifest is JSON; audio paths are relative to the manifest::
+
+    {"recordings": [
+        {"audio": "kitchen.wav", "wake_words": [12.4, {"start": 80.1, "end": 81.0}]},
+        {"audio": "lounge_tv.wav", "wake_words": []}
+    ]}
+
+Recordings must be 16 kHz mono 16-bit WAV
+(``ffmpeg -i in.mp3 -ar 16000 -ac 1 out.wav``).
+
+Usage::
+
+    python wakeword_eval.py render --out xtts/positives --speaker "Claribel Dervla"
+    python wakeword_eval.py evaluate corpus/corpus.json --positives xtts/positives \\
+        --thresholds 1e-90 1e-60 1e-30 --energy-ratios 1.5 2.0 --workers 4
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import time
+import wave
+import zlib
+from collections import deque
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from stack_config import load_mycroft_conf
+from stack_http import ServiceError
+from xtts_client import XTTSClient
+
+try:
+    from ovos_plugin_manager.wakewords import load_wake_word_plugin
+except ImportError:
+    load_wake_word_plugin = None
+
+logger = logging.getLogger("wakeword_eval")
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 1024
+SEC_PER_FRAME = FRAME_SAMPLES / SAMPLE_RATE
+# Matches the dynamic energy damping of the classic Mycroft recognizer.
+ENERGY_DAMPING = 0.15
+
+
+class EvaluationError(Exception):
+    """Raised when the corpus, audio or wake-word plugin cannot be evaluated."""
+
+
+@dataclass(frozen=True)
+class WakeWordLabel:
+    """Time span (seconds) of one spoken wake phrase in a recording."""
+
+    start: float
+    end: float
+
+
+@dataclass
+class Recording:
+    """A long recording and its labeled wake-word spans."""
+
+    audio: Path
+    labels: list[WakeWordLabel] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class SweepParams:
+    """One point of the parameter sweep."""
+
+    threshold: float
+    energy_ratio: float
+    multiplier: float
+
+
+@dataclass
+class EvalTask:
+    """Everything a worker process needs to evaluate one recording."""
+
+    recording: Recording
+    params: SweepParams
+    hotword: str
+    hotword_config: dict[str, Any]
+    lang: str
+    positives: list[Path]
+    inject_per_hour: float
+    snr_db: float
+    seed: int
+    refractory: float
+    tolerance: float
+    engine_factory: Callable[..., Any] | None = None
+
+
+@dataclass
+class RecordingResult:
+    """Raw outcome of one recording at one sweep point."""
+
+    audio: str
+    duration: float
+    labels: int
+    misses: int
+    false_accepts: int
+    latencies: list[float]
+    cpu_seconds: float
+
+
+@dataclass
+class SweepPoint:
+    """Aggregated metrics for one sweep point over the whole corpus."""
+
+    params: SweepParams
+    audio_hours: float
+    labels: int
+    false_accepts_per_hour: float
+    miss_rate: float
+    latency_p50: float | None
+    latency_p95: float | None
+    cpu_seconds_per_hour: float
+
+
+def load_corpus(manifest: str | os.PathLike) -> list[Recording]:
+    """Parse a corpus manifest into recordings with absolute audio paths."""
+    manifest = Path(manifest)
+    try:
+        data = json.loads(manifest.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        raise EvaluationError(f"Cannot load corpus manifest {manifest}: {e}") from e
+    recordings = []
+    for entry in data.get("recordings", []):
+        labels = []
+        for item in entry.get("wake_words", []):
+            if isinstance(item, dict):
+                start = float(item["start"])
+                labels.append(WakeWordLabel(start, float(item.get("end", start))))
+            else:
+                labels.append(WakeWordLabel(float(item), float(item)))
+        audio = manifest.parent / entry["audio"]
+        recordings.append(
+            Recording(audio=audio, labels=sorted(labels, key=lambda x: x.start))
+        )
+    if not recordings:
+        raise EvaluationError(f"Corpus manifest {manifest} lists no recordings")
+    return recordings
+
+
+def resample(samples: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Linearly resample a mono float signal."""
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    duration = len(samples) / src_rate
+    dst_len = int(round(duration * dst_rate))
+    src_t = np.arange(len(samples)) / src_rate
+    dst_t = np.arange(dst_len) / dst_rate
+    return np.interp(dst_t, src_t, samples).astype(np.float32)
+
+
+def read_clip(path: str | os.PathLike) -> np.ndarray:
+    """Read a short 16-bit WAV clip as mono float32 at the evaluation rate."""
+    with wave.open(str(path), "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise EvaluationError(f"{path}: only 16-bit PCM is supported")
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    samples = pcm.astype(np.float32)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return resample(samples, rate, SAMPLE_RATE)
+
+
+def iter_frames(path: str | os.PathLike) -> Iterable[np.ndarray]:
+    """Stream a long 16 kHz mono recording as float32 frames."""
+    with wave.open(str(path), "rb") as wav:
+        if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (
+            SAMPLE_RATE,
+            1,
+            2,
+        ):
+            raise EvaluationError(
+                f"{path}: recordings must be {SAMPLE_RATE} Hz mono 16-bit WAV"
+            )
+        while True:
+            data = wav.readframes(FRAME_SAMPLES)
+            if not data:
+                return
+            yield np.frombuffer(data, dtype=np.int16).astype(np.float32)
+
+
+def wav_duration(path: str | os.PathLike) -> float:
+    """Return the duration of a WAV file in seconds."""
+    with wave.open(str(path), "rb") as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+def render_positives(
+    out_dir: str | os.PathLike,
+    text: str = "hey mycroft",
+    speakers: list[str] | None = None,
+    language: str = "en",
+    xtts_url: str | None = None,
+) -> list[Path]:
+    """Render the wake phrase with XTTS once per speaker and save the WAVs."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    client = XTTSClient(xtts_url, language=language)
+    paths = []
+    for speaker in speakers or [""]:
+        logger.info(f"Rendering {text!r} with speaker {speaker or 'default'!r}")
+        try:
+            audio = client.synthesize(text, speaker=speaker or None)
+        except ServiceError as e:
+            raise EvaluationError(f"XTTS render failed for {speaker!r}: {e}") from e
+        slug = "".join(c if c.isalnum() else "_" for c in (speaker or "default"))
+        path = out_dir / f"{text.replace(' ', '_')}_{slug}.wav"
+        path.write_bytes(audio)
+        paths.append(path)
+    return paths
+
+
+def plan_injections(
+    duration: float,
+    clip_durations: list[float],
+    labels: list[WakeWordLabel],
+    per_hour: float,
+    seed: int,
+    margin: float = 2.0,
+) -> list[tuple[float, int]]:
+    """Choose non-overlapping ``(offset, clip_index)`` injection points.
+
+    Injections keep ``margin`` seconds away from each other and from the
+    recording's own labeled wake words.
+    """
+    if not clip_durations or per_hour <= 0:
+        return []
+    rng = random.Random(seed)
+    wanted = int(round(duration / 3600 * per_hour))
+    taken = [(label.start - margin, label.end + margin) for label in labels]
+    plan = []
+    for _ in range(wanted * 20):
+        if len(plan) >= wanted:
+            break
+        index = rng.randrange(len(clip_durations))
+        length = clip_durations[index]
+        if duration - length - 2 * margin <= margin:
+            break
+        offset = rng.uniform(margin, duration - length - margin)
+        span = (offset - margin, offset + length + margin)
+        if any(span[0] < end and start < span[1] for start, end in taken):
+            continue
+        taken.append(span)
+        plan.append((offset, index))
+    return sorted(plan)
+
+
+class Injector:
+    """Mixes scheduled positive clips into a stream of frames at a target SNR."""
+
+    def __init__(
+        self,
+        clips: list[np.ndarray],
+        plan: list[tuple[float, int]],
+        snr_db: float,
+    ):
+        self._pending = deque(
+            (int(offset * SAMPLE_RATE), clips[index]) for offset, index in plan
+        )
+        self._active: list[tuple[int, np.ndarray]] = []
+        self._snr_gain = 10 ** (snr_db / 20)
+        self.labels = [
+            WakeWordLabel(offset, offset + len(clips[index]) / SAMPLE_RATE)
+            for offset, index in plan
+        ]
+
+    def mix(self, frame: np.ndarray, start: int, ambient_rms: float) -> np.ndarray:
+        """Return ``frame`` (starting at sample ``start``) with clips mixed in."""
+        end = start + len(frame)
+        while self._pending and self._pending[0][0] < end:
+            offset, clip = self._pending.popleft()
+            clip_rms = float(np.sqrt(np.mean(clip**2))) or 1.0
+            gain = max(ambient_rms, 1.0) * self._snr_gain / clip_rms
+            self._active.append((offset, clip * gain))
+        if not self._active:
+            return frame
+        frame = frame.copy()
+        still_active = []
+        for offset, clip in self._active:
+            lo = max(start, offset)
+            hi = min(end, offset + len(clip))
+            if hi > lo:
+                frame[lo - start : hi - start] += clip[lo - offset : hi - offset]
+            if offset + len(clip) > end:
+                still_active.append((offset, clip))
+        self._active = still_active
+        return np.clip(frame, -32768, 32767)
+
+
+class EnergyGate:
+    """Energy pre-filter modelled on the classic listener's dynamic threshold.
+
+    The threshold tracks ambient energy scaled by ``energy_ratio``; frames
+    louder than ``threshold * multiplier`` open the gate for ``hangover``
+    seconds and flush ``preroll`` seconds of buffered audio to the engine.
+    A ``multiplier`` of zero or less disables gating.
+    """
+
+    def __init__(
+        self,
+        energy_ratio: float,
+        multiplier: float,
+        hangover: float = 1.5,
+        preroll: float = 0.5,
+    ):
+        self.energy_ratio = energy_ratio
+        self.multiplier = multiplier
+        self.threshold: float | None = None
+        self.ambient_rms = 0.0
+        self._damping = ENERGY_DAMPING**SEC_PER_FRAME
+        self._hangover_frames = int(hangover / SEC_PER_FRAME)
+        self._open_frames = 0
+        self._preroll: deque[np.ndarray] = deque(maxlen=int(preroll / SEC_PER_FRAME))
+
+    def feed(self, frame: np.ndarray) -> list[np.ndarray]:
+        """Return the frames that should reach the wake-word engine."""
+        energy = float(np.sqrt(np.mean(frame**2)))
+        if self.threshold is None:
+            self.threshold = energy * self.energy_ratio
+            self.ambient_rms = energy
+        if self.multiplier <= 0:
+            return [frame]
+        if energy >= self.threshold * self.multiplier:
+            self._open_frames = self._hangover_frames
+            flushed = list(self._preroll)
+            self._preroll.clear()
+            return flushed + [frame]
+        self.threshold = self.threshold * self._damping + (
+            energy * self.energy_ratio
+        ) * (1 - self._damping)
+        self.ambient_rms = self.ambient_rms * self._damping + energy * (
+            1 - self._damping
+        )
+        if self._open_frames > 0:
+            self._open_frames -= 1
+            return [frame]
+        self._preroll.append(frame)
+        return []
+
+
+def load_engine(hotword: str, config: dict[str, Any], lang: str) -> Any:
+    """Instantiate the configured OVOS wake-word plugin."""
+    if load_wake_word_plugin is None:
+        raise EvaluationError(
+            "ovos-plugin-manager is not installed; run inside the ovos container"
+        )
+    module = config.get("module")
+    engine_class = load_wake_word_plugin(module)
+    if engine_class is None:
+        raise EvaluationError(f"Wake-word plugin {module!r} could not be loaded")
+    return engine_class(hotword.replace("_", " "), config=config, lang=lang)
+
+
+def match_detections(
+    detections: list[float], labels: list[WakeWordLabel], tolerance: float
+) -> tuple[list[float], int, int]:
+    """Pair detections with labels.
+
+    A detection counts for a label when it falls between the label start and
+    ``tolerance`` seconds after its end. Returns ``(latencies, false_accepts,
+    misses)`` where latency is measured from the end of the wake phrase.
+    """
+    unmatched = sorted(detections)
+    latencies = []
+    misses = 0
+    for label in labels:
+        hit = next(
+            (t for t in unmatched if label.start <= t <= label.end + tolerance), None
+        )
+        if hit is None:
+            misses += 1
+            continue
+        unmatched.remove(hit)
+        latencies.append(max(0.0, hit - label.end))
+    return latencies, len(unmatched), misses
+
+
+def evaluate_recording(task: EvalTask) -> RecordingResult:
+    """Run one recording through the gate and engine at one sweep point."""
+    config = dict(task.hotword_config, threshold=task.params.threshold)
+    factory = task.engine_factory or load_engine
+    engine = factory(task.hotword, config, task.lang)
+
+    duration = wav_duration(task.recording.audio)
+    clips = [read_clip(p) for p in task.positives]
+    seed = task.seed ^ zlib.crc32(task.recording.audio.name.encode())
+    plan = plan_injections(
+        duration,
+        [len(c) / SAMPLE_RATE for c in clips],
+        task.recording.labels,
+        task.inject_per_hour,
+        seed,
+    )
+    injector = Injector(clips, plan, task.snr_db)
+    gate = EnergyGate(task.params.energy_ratio, task.params.multiplier)
+
+    detections = []
+    last_detection = float("-inf")
+    cpu_seconds = 0.0
+    position = 0
+    for frame in iter_frames(task.recording.audio):
+        frame = injector.mix(frame, position, gate.ambient_rms)
+        position += len(frame)
+        now = position / SAMPLE_RATE
+        started = time.process_time()
+        for chunk in gate.feed(frame):
+            data = chunk.astype(np.int16).tobytes()
+            engine.update(data)
+            if engine.found_wake_word(data) and now - last_detection >= task.refractory:
+                detections.append(now)
+                last_detection = now
+        cpu_seconds += time.process_time() - started
+    if hasattr(engine, "shutdown"):
+        engine.shutdown()
+
+    labels = sorted(task.recording.labels + injector.labels, key=lambda x: x.start)
+    latencies, false_accepts, misses = match_detections(
+        detections, labels, task.tolerance
+    )
+    return RecordingResult(
+        audio=str(task.recording.audio),
+        duration=duration,
+        labels=len(labels),
+        misses=misses,
+        false_accepts=false_accepts,
+        latencies=latencies,
+        cpu_seconds=cpu_seconds,
+    )
+
+
+def summarize(params: SweepParams, results: list[RecordingResult]) -> SweepPoint:
+    """Aggregate per-recording results into the sweep-point metrics."""
+    hours = sum(r.duration for r in results) / 3600
+    labels = sum(r.labels for r in results)
+    latencies = [lat for r in results for lat in r.latencies]
+    return SweepPoint(
+        params=params,
+        audio_hours=hours,
+        labels=labels,
+        false_accepts_per_hour=(
+            sum(r.false_accepts for r in results) / hours if hours else 0.0
+        ),
+        miss_rate=sum(r.misses for r in results) / labels if labels else 0.0,
+        latency_p50=float(np.percentile(latencies, 50)) if latencies else None,
+        latency_p95=float(np.percentile(latencies, 95)) if latencies else None,
+        cpu_seconds_per_hour=(
+            sum(r.cpu_seconds for r in results) / hours if hours else 0.0
+        ),
+    )
+
+
+def sweep(
+    recordings: list[Recording],
+    grid: list[SweepParams],
+    workers: int | None = None,
+    **task_kwargs: Any,
+) -> list[SweepPoint]:
+    """Evaluate every grid point over every recording, in parallel."""
+    tasks = [
+        EvalTask(recording=rec, params=params, **task_kwargs)
+        for params in grid
+        for rec in recordings
+    ]
+    if workers == 1:
+        results = [evaluate_recording(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(evaluate_recording, tasks))
+    by_params: dict[SweepParams, list[RecordingResult]] = {p: [] for p in grid}
+    for task, result in zip(tasks, results):
+        by_params[task.params].append(result)
+    return [summarize(p, by_params[p]) for p in grid]
+
+
+def format_report(points: list[SweepPoint]) -> str:
+    """Render sweep points as a fixed-width table."""
+
+    def fmt(value: float | None) -> str:
+        return "-" if value is None else f"{value:.2f}"
+
+    lines = [
+        f"{'threshold':>10} {'e_ratio':>7} {'mult':>5} {'FA/h':>7} {'miss%':>6} "
+        f"{'lat p50':>8} {'lat p95':>8} {'CPU s/h':>8} {'core%':>6}"
+    ]
+    for p in points:
+        lines.append(
+            f"{p.params.threshold:>10.3g} {p.params.energy_ratio:>7.2f} "
+            f"{p.params.multiplier:>5.2f} {p.false_accepts_per_hour:>7.2f} "
+            f"{p.miss_rate * 100:>6.1f} {fmt(p.latency_p50):>8} "
+            f"{fmt(p.latency_p95):>8} {p.cpu_seconds_per_hour:>8.1f} "
+            f"{p.cpu_seconds_per_hour / 36:>6.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    render = sub.add_parser("render", help="render wake-phrase positives with XTTS")
+    render.add_argument("--out", required=True)
+    render.add_argument("--text", default="hey mycroft")
+    render.add_argument("--speaker", action="append", dest="speakers")
+    render.add_argument("--language", default="en")
+
+    evaluate = sub.add_parser("evaluate", help="evaluate a labeled corpus")
+    evaluate.add_argument("manifest")
+    evaluate.add_argument("--conf", help="path to mycroft.conf")
+    evaluate.add_argument("--thresholds", type=float, nargs="+")
+    evaluate.add_argument("--energy-ratios", type=float, nargs="+")
+    evaluate.add_argument("--multipliers", type=float, nargs="+")
+    evaluate.add_argument("--positives", help="directory of positive WAV clips")
+    evaluate.add_argument("--inject-per-hour", type=float, default=30.0)
+    evaluate.add_argument("--snr-db", type=float, default=10.0)
+    evaluate.add_argument("--seed", type=int, default=0)
+    evaluate.add_argument("--refractory", type=float, default=1.0)
+    evaluate.add_argument("--tolerance", type=float, default=1.5)
+    evaluate.add_argument("--workers", type=int, default=os.cpu_count())
+    evaluate.add_argument("--json", help="write the sweep results to this file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        if args.command == "render":
+            for path in render_positives(
+                args.out, args.text, args.speakers, args.language
+            ):
+                print(path)
+            return 0
+
+        conf = load_mycroft_conf(args.conf)
+        listener = conf.get("listener", {})
+        hotword = listener.get("wake_word", "hey_mycroft")
+        hotword_config = conf.get("hotwords", {}).get(hotword)
+        if not hotword_config:
+            raise EvaluationError(f"No hotwords.{hotword} section in mycroft.conf")
+        grid = [
+            SweepParams(*values)
+            for values in itertools.product(
+                args.thresholds or [hotword_config.get("threshold", 0.5)],
+                args.energy_ratios or [listener.get("energy_ratio", 1.5)],
+                args.multipliers or [listener.get("multiplier", 1.0)],
+            )
+        ]
+        positives = sorted(Path(args.positives).glob("*.wav")) if args.positives else []
+        points = sweep(
+            load_corpus(args.manifest),
+            grid,
+            workers=args.workers,
+            hotword=hotword,
+            hotword_config=hotword_config,
+            lang=hotword_config.get("lang", conf.get("lang", "en-us")),
+            positives=positives,
+            inject_per_hour=args.inject_per_hour if positives else 0.0,
+            snr_db=args.snr_db,
+            seed=args.seed,
+            refractory=args.refractory,
+            tolerance=args.tolerance,
+        )
+    except EvaluationError as e:
+        logger.error(str(e))
+        return 1
+
+    print(format_report(points))
+    if args.json:
+        Path(args.json).write_text(
+            json.dumps([asdict(p) for p in points], indent=2), encoding="utf-8"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,32 @@
+# See AI_CODING_BASELINE_RULES.md for required practices.
+"""Client for the ``xtts`` service (Coqui ``tts-server`` on port 5002)."""
+
+import urllib.parse
+
+from stack_config import service_url
+from stack_http import request_bytes
+
+
+class XTTSClient:
+    """Synthesizes text to WAV bytes through ``/api/tts``."""
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        speaker: str | None = None,
+        language: str = "en",
+        timeout: float = 120.0,
+    ):
+        self.base_url = (base_url or service_url("xtts")).rstrip("/")
+        self.speaker = speaker
+        self.language = language
+        self.timeout = timeout
+
+    def synthesize(self, text: str, speaker: str | None = None) -> bytes:
+        """Return the WAV rendering of ``text``."""
+        query = {"text": text, "language_id": self.language}
+        speaker = speaker or self.speaker
+        if speaker:
+            query["speaker_id"] = speaker
+        url = f"{self.base_url}/api/tts?{urllib.parse.urlencode(query)}"
+        return request_bytes("GET", url, timeout=self.timeout)